@@ -0,0 +1,55 @@
+"""
+Measures LastValueCache against what dashboards do today: decoding every frame into a J1939Message
+and keeping a dict of the newest one per (PGN, source). Times the receive path (storing every
+frame) and the read path (looking up the newest value of every key).
+
+Usage: python Benchmarks/bench_cache.py [num_frames] [num_reads]
+"""
+import random
+import sys
+import time
+import standin # adds the repo to sys.path
+from RP1210.Cache import LastValueCache
+from RP1210.J1939 import J1939Message, toJ1939Message
+from RP1210.VirtualDriver import DEFAULT_LOAD_PGNS
+
+def by_hand(frames : list[bytes]) -> dict:
+    latest = {}
+    for frame in frames:
+        msg = J1939Message(frame)
+        latest[(msg.pgn, msg.sa)] = (msg, time.perf_counter())
+    return latest
+
+def main(n : int = 200_000, reads : int = 200_000):
+    rng = random.Random(23)
+    frames = [i.to_bytes(4, 'big') + toJ1939Message(pgn, 6, sa, 0xFF, rng.randbytes(8))
+                for i, (pgn, sa) in enumerate(rng.choice(DEFAULT_LOAD_PGNS) for _ in range(n))]
+    keys = [rng.choice(DEFAULT_LOAD_PGNS) for _ in range(reads)]
+    start = time.perf_counter()
+    expected = by_hand(frames)
+    hand_time = time.perf_counter() - start
+    cache = LastValueCache()
+    start = time.perf_counter()
+    cache.feed_batch(frames)
+    feed_time = time.perf_counter() - start
+    start = time.perf_counter()
+    hand_values = [expected[key][0].data for key in keys]
+    hand_read_time = time.perf_counter() - start
+    start = time.perf_counter()
+    values = [cache.data(pgn, sa) for pgn, sa in keys]
+    read_time = time.perf_counter() - start
+    assert values == hand_values
+    start = time.perf_counter()
+    snapshot = cache.snapshot()
+    snap_time = time.perf_counter() - start
+    assert {key: entry[0] for key, entry in snapshot.items()} == {key: bytes(msg[0].timestamp_bytes() + msg[0].msg)
+                                                                    for key, msg in expected.items()}
+    print(f"{n:,} frames, {len(cache)} keys, {len(cache.buffer):,} byte store")
+    print(f"store  dict of J1939Message: {hand_time / n * 1e9:8,.0f} ns/frame")
+    print(f"       LastValueCache:       {feed_time / n * 1e9:8,.0f} ns/frame ({hand_time / feed_time:.1f}x)")
+    print(f"read   dict of J1939Message: {hand_read_time / reads * 1e9:8,.0f} ns/read")
+    print(f"       LastValueCache.data:  {read_time / reads * 1e9:8,.0f} ns/read")
+    print(f"snapshot:                    {snap_time * 1e6:8,.0f} µs")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,45 @@
+"""
+Measures the cost of recording frames to a capture file, and of reading them back.
+
+The CPU share is estimated for a fully loaded 1 Mbit/s bus (about 7,800 extended frames/sec with 8
+data bytes each).
+
+Usage: python Benchmarks/bench_capture.py [num_msgs]
+"""
+import os
+import sys
+import tempfile
+import time
+import standin # adds the repo to sys.path
+from RP1210.Capture import CaptureReader, CaptureWriter
+from RP1210.VirtualDriver import VirtualBus
+
+FULL_LOAD_FPS = VirtualBus(baud=1000000).frameRate(1.0)
+
+def main(num_msgs : int = 500_000):
+    frame = bytes(range(18)) # timestamp + J1939 header + 8 data bytes
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "bench.rpcap")
+        start = time.process_time()
+        with CaptureWriter(path) as writer:
+            write = writer.write
+            for _ in range(num_msgs):
+                write(frame)
+        write_time = time.process_time() - start
+        size = os.path.getsize(path)
+        start = time.process_time()
+        count = sum(1 for _ in CaptureReader(path).records())
+        read_time = time.process_time() - start
+        start = time.process_time()
+        for _ in CaptureReader(path):
+            pass
+        parse_time = time.process_time() - start
+    per_msg = write_time / num_msgs
+    print(f"write: {per_msg * 1e9:8,.0f} ns/record, {size / num_msgs:.1f} bytes/record")
+    print(f"       {per_msg * FULL_LOAD_FPS * 100:.2f}% of one core at 1 Mbit/s full load "
+            f"({FULL_LOAD_FPS:,.0f} frames/sec)")
+    print(f"read : {count / read_time:12,.0f} records/sec (raw)")
+    print(f"       {count / parse_time:12,.0f} records/sec (J1939Message)")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
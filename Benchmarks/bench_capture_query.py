@@ -0,0 +1,51 @@
+"""
+Compares an indexed MappedCapture query against a linear scan with CaptureReader, for "PGN 0xFECA
+from SA 0x00 in a time window".
+
+Usage: python Benchmarks/bench_capture_query.py [num_msgs]
+"""
+import os
+import sys
+import tempfile
+import time
+import standin # adds the repo to sys.path
+from RP1210 import J1939
+from RP1210.Capture import CaptureReader, CaptureWriter, MappedCapture
+from RP1210.VirtualDriver import DEFAULT_LOAD_PGNS
+
+def write_capture(path : str, num_msgs : int):
+    pgns = DEFAULT_LOAD_PGNS + ((0xFECA, 0x00),)
+    frames = [J1939.toJ1939Message(pgn, 6, sa, 0xFF, b'\x00' * 8) for pgn, sa in pgns]
+    with CaptureWriter(path, buffer_size=1 << 20) as writer:
+        for i in range(num_msgs):
+            writer.write(i.to_bytes(4, 'big') + frames[i % len(frames)], time_ns=i * 128000)
+
+def main(num_msgs : int = 1_000_000):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "bench.rpcap")
+        write_capture(path, num_msgs)
+        t1, t2 = num_msgs // 4 * 128000, num_msgs // 2 * 128000
+
+        start = time.perf_counter()
+        found = [msg for msg in CaptureReader(path)
+                    if msg.pgn == 0xFECA and msg.sa == 0x00 and t1 <= msg.timestamp * 128000 < t2]
+        scan_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with MappedCapture(path) as capture:
+            build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        with MappedCapture(path) as capture:
+            load_time = time.perf_counter() - start
+            start = time.perf_counter()
+            result = list(capture.query(pgn=0xFECA, sa=0x00, start_ns=t1, end_ns=t2).messages())
+            query_time = time.perf_counter() - start
+    assert len(result) == len(found)
+    print(f"{num_msgs:,} records, {len(found):,} matches")
+    print(f"linear scan + parse : {scan_time * 1000:10.1f} ms")
+    print(f"index build (once)  : {build_time * 1000:10.1f} ms")
+    print(f"index load          : {load_time * 1000:10.1f} ms")
+    print(f"indexed query       : {query_time * 1000:10.1f} ms")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
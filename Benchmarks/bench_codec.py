@@ -0,0 +1,109 @@
+"""
+Measures the precompiled-struct encoders (toJ1939Message, DTC.to_bytes, generateNetMgmtName,
+Commands.setJ1939Filters/setCANFilters/protectJ1939Address, UDSMessage.raw) against the previous
+field-by-field sanitize_msg_param implementations (reproduced below), and checks that both produce
+identical bytes.
+
+Usage: python Benchmarks/bench_codec.py [iterations]
+"""
+import sys
+import time
+import standin # adds the repo to sys.path
+from RP1210 import Commands, J1939, UDS
+
+def legacy_sanitize(param, num_bytes = 0, byteorder = 'big') -> bytes:
+    """sanitize_msg_param as it was, converting bytes to int and back."""
+    if param is None:
+        param = b''
+    if isinstance(param, int):
+        if num_bytes == 0:
+            num_bytes = max((param.bit_length() + 7) // 8, 1)
+        return param.to_bytes(num_bytes, byteorder)
+    if isinstance(param, bytes):
+        if num_bytes == 0:
+            if param == b'':
+                return b''
+            num_bytes = len(param)
+        param2 = param[::-1] if byteorder == 'little' else param
+        return legacy_sanitize(int.from_bytes(param2[:num_bytes], byteorder), num_bytes, byteorder)
+    return legacy_sanitize(bytes(param), num_bytes, byteorder)
+
+def legacy_toJ1939Message(pgn, pri, sa, da, data, size = 0, how = 0) -> bytes:
+    ret_val = legacy_sanitize(pgn, 3, 'little')
+    how_pri = legacy_sanitize(pri, 1)[0] & 0b111 + ((legacy_sanitize(how, 1)[0] & 0b1) << 7)
+    ret_val += legacy_sanitize(how_pri, 1)
+    ret_val += legacy_sanitize(sa, 1)
+    ret_val += legacy_sanitize(da, 1)
+    ret_val += legacy_sanitize(data, size)
+    return ret_val
+
+def legacy_dtc(spn, fmi, oc) -> bytes:
+    spn_bytes = legacy_sanitize(spn, 3, 'little')
+    ret_val = int.to_bytes(spn_bytes[0], 1, 'big') + int.to_bytes(spn_bytes[1], 1, 'big')
+    ret_val += legacy_sanitize(((spn_bytes[2] << 5) & 0b11100000) | (fmi & 0b00011111))
+    ret_val += legacy_sanitize(oc & 0b01111111)
+    return ret_val
+
+def legacy_name(aac, ig, vsi, vs, func, func_inst, ecu_inst, mc, id_n) -> bytes:
+    return (legacy_sanitize((mc << 21) | id_n, 4, 'little') + legacy_sanitize((func_inst << 3) | ecu_inst, 1)
+            + legacy_sanitize(func, 1) + legacy_sanitize(vs << 1, 1)
+            + legacy_sanitize((aac << 7) | (ig << 4) | vsi, 1))
+
+def legacy_j1939_filter(filter_flag, pgn, source, dest) -> bytes:
+    return (legacy_sanitize(filter_flag, 1) + legacy_sanitize(pgn, 3, 'little') + legacy_sanitize(0, 1)
+            + legacy_sanitize(source, 1) + legacy_sanitize(dest, 1))
+
+def legacy_can_filter(can_type, mask, header) -> bytes:
+    return legacy_sanitize(can_type, 1) + legacy_sanitize(mask, 4) + legacy_sanitize(header, 4)
+
+def legacy_protect(address, name, blocking = True) -> bytes:
+    return legacy_sanitize(address, 1) + legacy_sanitize(name, 8) + legacy_sanitize(0 if blocking else 2, 1)
+
+def legacy_uds_raw(msg : UDS.UDSMessage) -> bytes:
+    val = legacy_sanitize(msg._sid, 1)
+    if msg._hasSubfn:
+        val += legacy_sanitize(msg._subfn, 1)
+    if msg._hasDID:
+        val += legacy_sanitize(msg._did, 2)
+    if msg._hasData:
+        val += legacy_sanitize(msg._data, msg._dataSize)
+    return val
+
+def uds_raw(msg : UDS.UDSMessage) -> bytes:
+    return msg.raw
+
+UDS_MSGS = (UDS.ReadDataByIdentifierResponse(0xF190, b'1FUJGLDR12LM12345'),
+            UDS.DiagnosticSessionControlRequest(0x03), UDS.TesterPresentRequest())
+
+CASES = (
+    ("toJ1939Message", legacy_toJ1939Message, J1939.toJ1939Message,
+        lambda i: (0xFEF1, 6, i & 0xFF, 0xFF, b'\x11' * 8)),
+    ("toJ1939Message(bytes pgn)", legacy_toJ1939Message, J1939.toJ1939Message,
+        lambda i: (b'\xF1\xFE\x00', 6, i & 0xFF, 0xFF, b'\x11' * 8)),
+    ("DTC.to_bytes", legacy_dtc, J1939.DTC.to_bytes, lambda i: (i & 0x7FFFF, i & 0x1F, i & 0x7F)),
+    ("generateNetMgmtName", legacy_name, J1939.generateNetMgmtName,
+        lambda i: (1, 0, 0, 0, 0, 0, 0, 0x123, i & 0x1FFFFF)),
+    ("setJ1939Filters", legacy_j1939_filter, Commands.setJ1939Filters,
+        lambda i: (1 + 4, 0xF004, i & 0xFF, 0xFF)),
+    ("setCANFilters", legacy_can_filter, Commands.setCANFilters, lambda i: (1, 0x00FFFF00, i)),
+    ("protectJ1939Address", legacy_protect, Commands.protectJ1939Address,
+        lambda i: (i & 0xFF, 0x8000000012345678 + i)),
+    ("UDSMessage.raw", legacy_uds_raw, uds_raw, lambda i: (UDS_MSGS[i % len(UDS_MSGS)],)),
+)
+
+def run(func, args : list) -> tuple:
+    start = time.perf_counter()
+    out = [func(*arg) for arg in args]
+    return out, time.perf_counter() - start
+
+def main(n : int = 100_000):
+    for name, legacy, current, make_args in CASES:
+        args = [make_args(i) for i in range(n)]
+        before, before_time = run(legacy, args)
+        after, after_time = run(current, args)
+        assert before == after, name
+        print(f"{name:26s}: before {n / before_time:10,.0f}/s, after {n / after_time:10,.0f}/s "
+                f"({before_time / after_time:.2f}x)")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
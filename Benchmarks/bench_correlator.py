@@ -0,0 +1,54 @@
+"""
+Measures the cost of matching received frames to outstanding J1939 requests: Correlator against
+decoding every frame and checking it against a list of pending requests, with a mostly unrelated
+stream of broadcast traffic and a response for every request mixed in.
+
+Usage: python Benchmarks/bench_correlator.py [num_frames] [num_requests]
+"""
+import random
+import sys
+import time
+import standin # adds the repo to sys.path
+from RP1210.Correlator import Correlator
+from RP1210.J1939 import J1939Message, toJ1939Message
+from RP1210.VirtualDriver import DEFAULT_LOAD_PGNS
+
+REQUESTED_PGNS = (0xFEEC, 0xFEEB, 0xFEDA, 0xFDC5, 0xFEE5, 0xFE6B)
+
+def by_hand(frames : list[bytes], requests : list[tuple]) -> list[J1939Message]:
+    pending = list(requests)
+    answered = []
+    for frame in frames:
+        msg = J1939Message(frame)
+        for i, (pgn, da) in enumerate(pending):
+            if msg.pgn == pgn and msg.sa == da:
+                answered.append(msg)
+                del pending[i]
+                break
+    return answered
+
+def main(n : int = 200_000, num_requests : int = 300):
+    rng = random.Random(20)
+    requests = [(pgn, da) for da in range(num_requests // len(REQUESTED_PGNS) + 1)
+                for pgn in REQUESTED_PGNS][:num_requests]
+    frames = [b'\x00' * 4 + toJ1939Message(pgn, 6, sa, 0xFF, bytes(8))
+                for pgn, sa in (rng.choice(DEFAULT_LOAD_PGNS) for _ in range(n - num_requests))]
+    for pgn, da in requests: # responses arrive spread through the traffic
+        frames.insert(rng.randrange(len(frames)), b'\x00' * 4 + toJ1939Message(pgn, 6, da, 0xFF, b'RESPONSE'))
+    start = time.perf_counter()
+    expected = by_hand(frames, requests)
+    hand_time = time.perf_counter() - start
+    corr = Correlator(lambda msg: None, address=0xF9, timeout=60.0)
+    futures = [corr.request(pgn, da) for pgn, da in requests]
+    start = time.perf_counter()
+    for frame in frames:
+        corr.feed(frame)
+    corr_time = time.perf_counter() - start
+    assert all(future.done() for future in futures) and len(expected) == num_requests
+    assert sorted(future.result().msg for future in futures) == sorted(msg.msg for msg in expected)
+    print(f"{len(frames):,} frames, {num_requests} requests outstanding")
+    print(f"decode + scan: {hand_time / len(frames) * 1e9:8,.0f} ns/frame")
+    print(f"Correlator:    {corr_time / len(frames) * 1e9:8,.0f} ns/frame ({hand_time / corr_time:.1f}x)")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,65 @@
+"""
+Measures loading a large generated J1939 DBC file: parsing and compiling it (the first load),
+against loading the cache saved beside it (every later load).
+
+Usage: python Benchmarks/bench_dbc.py [num_messages] [signals_per_message]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import standin # adds the repo to sys.path
+from RP1210.DBC import CACHE_SUFFIX, loadDBC
+from RP1210.J1939 import toJ1939Message
+
+def generate(num_messages : int, num_signals : int, rng : random.Random) -> str:
+    lines = ['VERSION ""', "", "BU_: ECU", ""]
+    attributes = []
+    for i in range(num_messages):
+        pgn = 0xFF00 | (i % 0x100) if i % 3 else 0xEF21 # proprietary B, or proprietary A to 0x21
+        pgn |= ((i // 0x100) % 2) << 16 # and data page 1
+        frame_id = 0x80000000 | (6 << 26) | (pgn << 8) | (i // 0x200) % 0xFE
+        lines.append(f"BO_ {frame_id} Message{i}: 8 ECU")
+        bit = 0
+        for j in range(num_signals):
+            length = rng.choice((1, 2, 4, 8)) if bit < 56 else 64 - bit
+            if bit + length > 64:
+                break
+            scale = rng.choice(("1", "0.5", "0.125", "0.00390625"))
+            lines.append(f' SG_ Signal{i}_{j} : {bit}|{length}@1+ ({scale},{rng.randrange(-50, 1)}) '
+                            f'[0|1000] "unit" ECU')
+            attributes.append(f'BA_ "SPN" SG_ {frame_id} Signal{i}_{j} {100000 + i * num_signals + j};')
+            bit += length
+        lines.append("")
+    return "\n".join(lines + attributes) + "\n"
+
+def main(num_messages : int = 3000, num_signals : int = 12):
+    rng = random.Random(25)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "generated.dbc")
+        with open(path, "w") as f:
+            f.write(generate(num_messages, num_signals, rng))
+        start = time.perf_counter()
+        parsed = loadDBC(path)
+        parse_time = time.perf_counter() - start
+        start = time.perf_counter()
+        cached = loadDBC(path)
+        cache_time = time.perf_counter() - start
+        start = time.perf_counter()
+        decoder = cached.decoder()
+        decoder_time = time.perf_counter() - start
+        assert not parsed.cached and cached.cached
+        assert decoder.plans() == parsed.decoder().plans()
+        for message in rng.sample(parsed.messages, 50):
+            frame = b'\x00' * 4 + toJ1939Message(message.pgn, 6, message.sa, message.da, rng.randbytes(8))
+            assert decoder.decode(frame) == parsed.decoder().decode(frame)
+        num_loaded = sum(len(message.signals) for message in parsed.messages)
+        print(f"{len(parsed):,} messages, {num_loaded:,} signals, {len(parsed.pgns())} PGNs, "
+                f"{os.path.getsize(path) / 1e6:.1f} MB DBC, {os.path.getsize(path + CACHE_SUFFIX) / 1e6:.1f} MB cache")
+    print(f"parse + compile: {parse_time * 1e3:8,.1f} ms")
+    print(f"cached load:     {cache_time * 1e3:8,.1f} ms ({parse_time / cache_time:.1f}x)")
+    print(f"cached decoder:  {decoder_time * 1e3:8,.1f} ms")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
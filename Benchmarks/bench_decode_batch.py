@@ -0,0 +1,33 @@
+"""
+Compares `J1939.decode_batch()` against constructing one J1939Message per frame.
+
+Usage: python Benchmarks/bench_decode_batch.py [num_msgs]
+"""
+import sys
+import time
+import numpy as np
+import standin # adds the repo to sys.path
+from RP1210 import J1939
+from RP1210.VirtualDriver import DEFAULT_LOAD_PGNS
+
+def main(num_msgs : int = 1_000_000):
+    frames = [i.to_bytes(4, 'big') + J1939.toJ1939Message(pgn, 6, sa, 0xFF, b'\x00' * 8)
+                for i, (pgn, sa) in enumerate(DEFAULT_LOAD_PGNS)]
+    frames = (frames * (num_msgs // len(frames) + 1))[:num_msgs]
+    buffer = b''.join(frames)
+    offsets = np.cumsum([0] + [len(frame) for frame in frames])
+
+    start = time.perf_counter()
+    msgs = [J1939.J1939Message(frame) for frame in frames]
+    object_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = J1939.decode_batch(buffer, offsets)
+    batch_time = time.perf_counter() - start
+
+    assert [msg.pgn for msg in msgs[:100]] == batch['pgn'][:100].tolist()
+    print(f"J1939Message per frame: {object_time:8.3f} s ({num_msgs / object_time:12,.0f} frames/sec)")
+    print(f"decode_batch          : {batch_time:8.3f} s ({num_msgs / batch_time:12,.0f} frames/sec)")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
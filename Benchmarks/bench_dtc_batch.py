@@ -0,0 +1,48 @@
+"""
+Compares `J1939.decode_dtcs_batch()` / `encode_dtcs_batch()` against DiagnosticMessage and DTC
+objects, for DM payloads with a few DTCs each.
+
+Usage: python Benchmarks/bench_dtc_batch.py [num_payloads]
+"""
+import random
+import sys
+import time
+import standin # adds the repo to sys.path
+from RP1210 import J1939
+
+def main(num_payloads : int = 100_000):
+    rng = random.Random(0)
+    payloads = [bytes((rng.randrange(256), 0xFF)) + rng.randbytes(4 * rng.randrange(1, 5))
+                for _ in range(num_payloads)]
+
+    start = time.perf_counter()
+    rows = []
+    for i, payload in enumerate(payloads):
+        dm = J1939.DiagnosticMessage()
+        dm.data = payload
+        for dtc in dm:
+            rows.append((i, dtc.spn, dtc.fmi, dtc.oc, dtc.cm(), dm.mil(), dm.rsl(), dm.awl(), dm.pl()))
+    object_decode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dtcs = J1939.decode_dtcs_batch(payloads)
+    batch_decode = time.perf_counter() - start
+    assert dtcs.tolist() == rows
+
+    start = time.perf_counter()
+    for spn, fmi, oc in zip(dtcs['spn'].tolist(), dtcs['fmi'].tolist(), dtcs['oc'].tolist()):
+        J1939.DTC.to_bytes(spn, fmi, oc)
+    object_encode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    J1939.encode_dtcs_batch(dtcs, num_payloads)
+    batch_encode = time.perf_counter() - start
+
+    print(f"{num_payloads:,} payloads, {len(dtcs):,} DTCs")
+    print(f"decode: objects {object_decode:7.3f} s, batch {batch_decode:7.3f} s "
+            f"({object_decode / batch_decode:.0f}x)")
+    print(f"encode: objects {object_encode:7.3f} s, batch {batch_encode:7.3f} s "
+            f"({object_encode / batch_encode:.0f}x)")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
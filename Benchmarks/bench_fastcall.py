@@ -0,0 +1,62 @@
+"""
+Measures per-call overhead of RP1210API's pre-bound DLL functions against the old pattern of
+`getDLL().RP1210_X(...)` (DLL attribute lookup + sanitize_msg_param on every call).
+
+Uses real ctypes function pointers (the C library's `abs()`, which returns 0 for ClientID 0) in
+place of RP1210 functions, so argument conversion costs are the same as with a real driver.
+
+Usage: python Benchmarks/bench_fastcall.py [num_calls]
+"""
+import ctypes.util
+import sys
+import time
+from ctypes import CDLL, create_string_buffer
+import standin # sets up sys.path
+import RP1210
+from RP1210 import sanitize_msg_param
+
+class CFunctionDLL():
+    """Every RP1210 function is a separate ctypes function pointer to abs()."""
+    def __init__(self):
+        libc = CDLL(ctypes.util.find_library('c') or 'msvcrt')
+        for name in list(RP1210.RP1210_FUNCTION_TYPES) + list(RP1210.RP1210C_FUNCTION_TYPES):
+            setattr(self, name, libc['abs'])
+
+def legacy_send(api : RP1210.RP1210API, msg : bytes) -> int:
+    """SendMessage as it was before functions were pre-bound."""
+    msg = sanitize_msg_param(msg)
+    ret_val = api.getDLL().RP1210_SendMessage(0, msg, len(msg), 0, 0) & 0xFFFF
+    if ret_val >= 0x08000:
+        ret_val = (ret_val - 0x10000)
+    return ret_val
+
+def legacy_read(api : RP1210.RP1210API, buffer) -> int:
+    """ReadMessage as it was before functions were pre-bound."""
+    ret_val = api.getDLL().RP1210_ReadMessage(0, buffer, len(buffer), 0) & 0xFFFF
+    if ret_val >= 0x8000:
+        ret_val = (ret_val - 0x10000)
+    return ret_val
+
+def timeit(func, num_calls : int) -> float:
+    start = time.perf_counter()
+    for _ in range(num_calls):
+        func()
+    return (time.perf_counter() - start) / num_calls * 1e9
+
+def main(num_calls : int = 500_000):
+    api = RP1210.RP1210API("CFunctions")
+    api.setDLL(CFunctionDLL())
+    msg = b'\x04\xF0\x00\x03\x00\xFF' + b'\x11' * 8
+    buffer = create_string_buffer(256)
+    results = [
+        ("SendMessage (legacy)", lambda: legacy_send(api, msg)),
+        ("SendMessage (bound)", lambda: api.SendMessage(0, msg)),
+        ("ReadMessage (legacy)", lambda: legacy_read(api, buffer)),
+        ("ReadMessage (bound)", lambda: api.ReadMessage(0, buffer, 256)),
+        ("raw ctypes call", lambda: api._ReadMessage(0, buffer, 256, 0)),
+    ]
+    for name, func in results:
+        print(f"{name:22s}: {timeit(func, num_calls):8.1f} ns/call")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,63 @@
+"""
+Measures how much traffic planned adapter filters keep off the host, on a virtual CAN bus with a
+skewed mix of IDs: for each filter budget, the planner's estimate against the frames a CAN client
+actually receives, and the cost of host-side filtering with everything passed instead.
+
+Usage: python Benchmarks/bench_filter_plan.py [num_frames] [num_ids] [num_wanted]
+"""
+import random
+import sys
+import time
+import standin # adds the repo to sys.path
+from RP1210 import Commands
+from RP1210.Filters import measureTraffic, planCANFilters
+from RP1210.RP1210 import RP1210API
+from RP1210.VirtualDriver import VirtualBus, VirtualDLL
+
+def receive(bus : VirtualBus, frames : list[int], program) -> list[bytes]:
+    """Puts `frames` (CAN IDs) on the bus and returns what a CAN client set up by `program` gets."""
+    api = RP1210API("VIRTUAL")
+    api.setDLL(VirtualDLL(bus, rx_queue_size=1 << 26))
+    client_id = api.ClientConnect(1, b"CAN:Baud=500")
+    program(api, client_id)
+    for can_id in frames:
+        bus.inject(can_id, b'\x00' * 8)
+    received = list(iter(lambda: api.ReadDirect(client_id), b''))
+    api.ClientDisconnect(client_id)
+    return received
+
+def main(n : int = 50_000, num_ids : int = 200, num_wanted : int = 12):
+    rng = random.Random(19)
+    ids = rng.sample(range(1 << 29), num_ids)
+    rates = [1 / (i + 1) for i in range(num_ids)] # a few busy IDs, many quiet ones
+    frames = rng.choices(ids, rates, k=n)
+    wanted = rng.sample(ids, num_wanted)
+    traffic = measureTraffic(receive(VirtualBus(), frames[:n // 10],
+                                        lambda api, client_id: api.SendCommand(3, client_id)), "CAN")
+
+    def program_plan(plan):
+        def program(api, client_id):
+            api.SendCommand(3 if plan.pass_all else 17, client_id)
+            for args in plan.filters:
+                api.SendCommand(5, client_id, Commands.setCANFilters(*args), 9)
+        return program
+
+    everything = receive(VirtualBus(), frames, lambda api, client_id: api.SendCommand(3, client_id))
+    wanted_set = set(wanted)
+    start = time.perf_counter()
+    expected = [frame[4:] for frame in everything if int.from_bytes(frame[5:9], 'big') in wanted_set]
+    host_time = time.perf_counter() - start
+    print(f"{n:,} frames over {num_ids} IDs, {num_wanted} wanted ({len(expected):,} frames)")
+    print(f"pass all: {len(everything):,} frames to the host, {host_time / n * 1e9:,.0f} ns/frame to filter")
+    for budget in (num_wanted, num_wanted // 2, num_wanted // 4, 1):
+        start = time.perf_counter()
+        plan = planCANFilters(wanted, budget, traffic)
+        plan_time = time.perf_counter() - start
+        received = receive(VirtualBus(), frames, program_plan(plan))
+        kept = [frame[4:] for frame in received if plan.wants(int.from_bytes(frame[5:9], 'big'))]
+        assert kept == expected # timestamps differ between runs
+        print(f"{budget:3} filters: estimated {plan.fraction:6.1%}, measured {len(received) / n:6.1%} "
+                f"of traffic to the host (planned in {plan_time * 1e3:.1f} ms)")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
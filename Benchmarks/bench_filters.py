@@ -0,0 +1,55 @@
+"""
+Measures SoftwareFilter against decoding each frame into a J1939Message and checking the same
+rules by hand, over a mix of PGNs, sources and priorities.
+
+Usage: python Benchmarks/bench_filters.py [num_frames] [num_rules]
+"""
+import random
+import sys
+import time
+import standin # adds the repo to sys.path
+from RP1210.Filters import DISCARD, PASS, FilterRule, SoftwareFilter
+from RP1210.J1939 import J1939Message, toJ1939Message
+
+def make_rules(n : int) -> list[tuple]:
+    """(pgn, sa, action) rules; the last one checks the first data byte too."""
+    rng = random.Random(18)
+    rules = [(0xF000 + rng.randrange(100), rng.randrange(16), rng.random() < 0.5) for _ in range(n)]
+    return rules
+
+def by_hand(frames : list[bytes], rules : list[tuple]) -> list[bytes]:
+    out = []
+    for frame in frames:
+        msg = J1939Message(frame)
+        for pgn, sa, action in rules:
+            if msg.pgn == pgn and msg.sa == sa:
+                if action:
+                    out.append(frame)
+                break
+        else:
+            if msg.pgn == 0xFF00 and msg.data[0] == 0x42:
+                out.append(frame)
+    return out
+
+def main(n : int = 200_000, num_rules : int = 40):
+    rng = random.Random(1)
+    frames = [b'\x00' * 4 + toJ1939Message(rng.choice([0xF000 + rng.randrange(100), 0xFF00]), 6,
+                                            rng.randrange(16), 0xFF, bytes((rng.choice((0x41, 0x42)),)) * 8)
+                for _ in range(n)]
+    rules = make_rules(num_rules)
+    filt = SoftwareFilter([FilterRule(pgn=pgn, sa=sa, action=action) for pgn, sa, action in rules]
+                            + [FilterRule(pgn=0xFF00, data_mask=b'\xFF', data_value=b'\x42', action=PASS)],
+                            default=DISCARD)
+    start = time.perf_counter()
+    expected = by_hand(frames, rules)
+    hand_time = time.perf_counter() - start
+    start = time.perf_counter()
+    passed = filt.filter(frames)
+    filter_time = time.perf_counter() - start
+    assert passed == expected
+    print(f"{n:,} frames, {num_rules + 1} rules, {len(passed):,} passed")
+    print(f"decode + check: {hand_time / n * 1e9:8,.0f} ns/frame")
+    print(f"SoftwareFilter: {filter_time / n * 1e9:8,.0f} ns/frame ({hand_time / filter_time:.1f}x)")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,57 @@
+"""
+Measures reading header fields and data from received frames in an RxArena, via J1939Message (which
+copies and decodes the whole frame) and via one reused J1939FrameView (which reads fields in place).
+
+Usage: python Benchmarks/bench_frameview.py [iterations]
+"""
+import sys
+import time
+import standin # adds the repo to sys.path
+import RP1210
+from RP1210 import J1939
+
+def fill_arena(arena : RP1210.RxArena) -> None:
+    for i in range(arena.max_msgs):
+        frame = i.to_bytes(4, 'big') + J1939.toJ1939Message(0xF004 + (i & 3), 3, i & 0xFF, 0xFF,
+                                                                i.to_bytes(8, 'little'))
+        offset = arena.offsets[i]
+        arena.buffer[offset:offset + len(frame)] = frame
+        arena.lengths[i] = len(frame)
+    arena.count = arena.max_msgs
+
+def with_message(arena : RP1210.RxArena, rounds : int) -> int:
+    total = 0
+    for _ in range(rounds):
+        for frame in arena:
+            msg = J1939.J1939Message(frame)
+            if msg.pgn == 0xF004:
+                total += msg.sa + msg.data[0]
+    return total
+
+def with_view(arena : RP1210.RxArena, rounds : int) -> int:
+    total = 0
+    view = J1939.J1939FrameView()
+    for _ in range(rounds):
+        for frame in arena:
+            view.bind(frame)
+            if view.pgn == 0xF004:
+                total += view.sa + view.data[0]
+    return total
+
+def main(n : int = 200_000):
+    arena = RP1210.RxArena(64)
+    fill_arena(arena)
+    rounds = max(n // arena.max_msgs, 1)
+    frames = rounds * arena.max_msgs
+    times = {}
+    results = {}
+    for name, bench in (("J1939Message", with_message), ("J1939FrameView", with_view)):
+        start = time.perf_counter()
+        results[name] = bench(arena, rounds)
+        times[name] = time.perf_counter() - start
+        print(f"{name:15s}: {frames / times[name]:12,.0f} frames/s")
+    assert results["J1939Message"] == results["J1939FrameView"]
+    print(f"speedup: {times['J1939Message'] / times['J1939FrameView']:.2f}x")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,63 @@
+"""
+Measures J1939Message construction, mutation and parsing, against a subclass that re-encodes the
+message after every change (as J1939Message did before encoding became lazy), and checks that both
+produce identical bytes.
+
+Usage: python Benchmarks/bench_j1939message.py [iterations]
+"""
+import sys
+import time
+import tracemalloc
+import standin # adds the repo to sys.path
+from RP1210 import J1939
+
+class EagerJ1939Message(J1939.J1939Message):
+    """Re-encodes `msg` on every property change."""
+    __slots__ = ()
+
+    def _assign_to_msg(self):
+        self._msg = J1939.toJ1939Message(self._pgn, self._pri, self._sa, self._da, self._data,
+                                            size=self.size, how=self._how)
+        self._dirty = False
+
+def construct(cls, n : int) -> list:
+    return [cls(pgn=0xFEF1, sa=0x00, data=b'\x11' * 8, pri=6, size=8).msg for _ in range(n)]
+
+def mutate(cls, n : int) -> list:
+    out = []
+    for i in range(n):
+        msg = cls()
+        msg.pgn = 0xEA00
+        msg.da = i & 0xFF
+        msg.sa = 0xF9
+        msg.pri = 3
+        msg.data = b'\xCA\xFE\x00'
+        out.append(msg.msg)
+    return out
+
+def parse(cls, n : int) -> list:
+    frame = b'\x00\x00\x00\x01' + J1939.toJ1939Message(0xF004, 3, 0x00, 0xFF, b'\x22' * 8)
+    return [cls(frame).pgn for _ in range(n)]
+
+def instance_size(cls) -> int:
+    tracemalloc.start()
+    msgs = [cls(pgn=0xF004, data=b'\x00' * 8, size=8) for _ in range(10000)]
+    size = tracemalloc.get_traced_memory()[0] / len(msgs)
+    tracemalloc.stop()
+    return size
+
+def main(n : int = 100_000):
+    for name, bench in (("construct", construct), ("mutate x5", mutate), ("parse", parse)):
+        times = {}
+        results = {}
+        for cls in (EagerJ1939Message, J1939.J1939Message):
+            start = time.perf_counter()
+            results[cls] = bench(cls, n)
+            times[cls] = time.perf_counter() - start
+        assert results[EagerJ1939Message] == results[J1939.J1939Message]
+        eager, lazy = times[EagerJ1939Message], times[J1939.J1939Message]
+        print(f"{name:10s}: eager {n / eager:10,.0f}/s, lazy {n / lazy:10,.0f}/s ({eager / lazy:.2f}x)")
+    print(f"memory per message (incl. data): {instance_size(J1939.J1939Message):.0f} bytes")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,59 @@
+"""
+Measures NetworkTable through an ignition-on address claim storm: every ECU claims several times
+(some contending for the same address) in the middle of ordinary broadcast traffic. Compared with
+decoding every frame and keeping the table as a list of (address, NAME) pairs.
+
+Usage: python Benchmarks/bench_network.py [num_frames] [num_ecus] [claims_per_ecu]
+"""
+import random
+import sys
+import time
+import standin # adds the repo to sys.path
+from RP1210.J1939 import J1939Message, generateNetMgmtName, toJ1939Message
+from RP1210.Network import PGN_ADDRESS_CLAIMED, NetworkTable
+from RP1210.VirtualDriver import DEFAULT_LOAD_PGNS
+
+def by_hand(frames : list[bytes]) -> dict:
+    table = [] # (sa, name)
+    for frame in frames:
+        msg = J1939Message(frame)
+        if msg.pgn & 0x3FF00 != PGN_ADDRESS_CLAIMED or msg.sa >= 0xFE:
+            continue
+        name = int.from_bytes(msg.data[:8], 'little')
+        holder = next((entry for entry in table if entry[0] == msg.sa), None)
+        if holder is not None and holder[1] == name:
+            continue
+        table = [entry for entry in table if entry[1] != name] # a new claim means it moved
+        if holder is not None:
+            if holder[1] < name: # and lost
+                continue
+            table.remove(holder)
+        table.append((msg.sa, name))
+    return dict(table)
+
+def main(n : int = 200_000, num_ecus : int = 200, claims_per_ecu : int = 20):
+    rng = random.Random(21)
+    names = [generateNetMgmtName(1, 0, 0, 0, rng.randrange(255), 0, 0, 0x123, i) for i in range(num_ecus)]
+    claims = [b'\x00' * 4 + toJ1939Message(PGN_ADDRESS_CLAIMED, 6, min(rng.choice((sa, sa, sa, sa + 1)), 0xFD),
+                                            0xFF, name)
+                for _ in range(claims_per_ecu) for sa, name in enumerate(names)]
+    frames = [b'\x00' * 4 + toJ1939Message(pgn, 6, sa, 0xFF, bytes(8))
+                for pgn, sa in (rng.choice(DEFAULT_LOAD_PGNS) for _ in range(n - len(claims)))]
+    position = 0
+    for frame in claims: # the storm, spread over the first part of the traffic
+        position += rng.randrange(3)
+        frames.insert(position, frame)
+    start = time.perf_counter()
+    expected = by_hand(frames)
+    hand_time = time.perf_counter() - start
+    table = NetworkTable()
+    start = time.perf_counter()
+    events = table.feed_batch(frames)
+    table_time = time.perf_counter() - start
+    assert table.items() == dict(sorted(expected.items()))
+    print(f"{len(frames):,} frames, {len(claims):,} claims from {num_ecus} ECUs, {len(events):,} events")
+    print(f"decode + list: {hand_time / len(frames) * 1e9:8,.0f} ns/frame")
+    print(f"NetworkTable:  {table_time / len(frames) * 1e9:8,.0f} ns/frame ({hand_time / table_time:.1f}x)")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,41 @@
+"""
+Compares receive throughput of a `ReadDirect()` loop against `ReadMany()` into a reusable RxArena.
+
+Both paths read from the same stand-in driver, so the numbers only measure the Python/ctypes
+overhead of each path (which is what dominates on a busy bus).
+
+Usage: python Benchmarks/bench_readmany.py [num_msgs]
+"""
+import sys
+import time
+from standin import StandInDLL
+import RP1210
+
+BATCH = 64
+
+def bench_readdirect(api : RP1210.RP1210API, dll : StandInDLL, num_msgs : int) -> float:
+    start = time.perf_counter()
+    for _ in range(num_msgs // BATCH):
+        dll.refill()
+        while api.ReadDirect(0):
+            pass
+    return time.perf_counter() - start
+
+def bench_readmany(api : RP1210.RP1210API, dll : StandInDLL, num_msgs : int) -> float:
+    arena = RP1210.RxArena(BATCH)
+    start = time.perf_counter()
+    for _ in range(num_msgs // BATCH):
+        dll.refill()
+        api.ReadMany(0, arena)
+    return time.perf_counter() - start
+
+def main(num_msgs : int = 200_000):
+    dll = StandInDLL(queue_len=BATCH)
+    api = RP1210.RP1210API("StandIn")
+    api.setDLL(dll)
+    for name, bench in (("ReadDirect loop", bench_readdirect), ("ReadMany", bench_readmany)):
+        elapsed = bench(api, dll, num_msgs)
+        print(f"{name:16s}: {num_msgs / elapsed:12,.0f} msgs/sec")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
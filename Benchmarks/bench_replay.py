@@ -0,0 +1,21 @@
+"""
+Measures replay timing accuracy: frames spaced evenly at `rate` frames/sec are read with blocking
+`rx()`, and the achieved rate and delivery lag (how late each frame was) are reported.
+
+Usage: python Benchmarks/bench_replay.py [rate] [seconds]
+"""
+import sys
+import standin # adds the repo to sys.path
+from RP1210.Replay import ReplayClient
+
+def main(rate : int = 4000, seconds : float = 2.0):
+    num_msgs = int(rate * seconds)
+    interval_ns = 10 ** 9 // rate
+    frame = bytes(18)
+    replay = ReplayClient(((i * interval_ns, 0, frame) for i in range(num_msgs)))
+    while replay.rx(blocking=1):
+        pass
+    print(replay.stats())
+
+if __name__ == "__main__":
+    main(*(convert(arg) for convert, arg in zip((int, float), sys.argv[1:])))
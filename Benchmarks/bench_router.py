@@ -0,0 +1,59 @@
+"""
+Measures per-frame dispatch cost with many handlers: Router's HeaderIndex against the usual
+approach of decoding each frame and letting every handler check `if msg.pgn == ...` itself.
+
+Usage: python Benchmarks/bench_router.py [num_frames] [num_handlers]
+"""
+import random
+import sys
+import time
+import standin # adds the repo to sys.path
+from RP1210.J1939 import J1939Message, toJ1939Message
+from RP1210.Router import Router
+
+def make_frames(n : int) -> list[bytes]:
+    rng = random.Random(17)
+    pgns = [0xF000 + i for i in range(100)] # a busy bus: 100 PGNs from 10 sources
+    return [b'\x00\x00\x00\x00' + toJ1939Message(rng.choice(pgns), 6, rng.randrange(10), 0xFF, bytes(8))
+            for _ in range(n)]
+
+def main(n : int = 200_000, num_handlers : int = 50):
+    frames = make_frames(n)
+    counts = [0] * num_handlers
+
+    def make_handler(i : int):
+        def handler(msg):
+            counts[i] += 1
+        return handler
+    handlers = [make_handler(i) for i in range(num_handlers)]
+    subscriptions = [(0xF000 + i * 2, i % 10) for i in range(num_handlers)] # (pgn, sa)
+
+    # baseline: decode every frame, every handler checks it
+    def make_checker(i : int, pgn : int, sa : int):
+        def check(msg):
+            if msg.pgn == pgn and msg.sa == sa:
+                counts[i] += 1
+        return check
+    checkers = [make_checker(i, pgn, sa) for i, (pgn, sa) in enumerate(subscriptions)]
+    start = time.perf_counter()
+    for frame in frames:
+        msg = J1939Message(frame)
+        for check in checkers:
+            check(msg)
+    chain_time = time.perf_counter() - start
+    chain_counts = list(counts)
+
+    counts[:] = [0] * num_handlers
+    router = Router()
+    for handler, (pgn, sa) in zip(handlers, subscriptions):
+        router.subscribe(handler, pgn=pgn, sa=sa)
+    start = time.perf_counter()
+    router.dispatch_batch(frames)
+    router_time = time.perf_counter() - start
+    assert counts == chain_counts
+    print(f"{n:,} frames, {num_handlers} handlers, {sum(counts):,} deliveries")
+    print(f"if-chain: {chain_time / n * 1e9:8,.0f} ns/frame")
+    print(f"Router  : {router_time / n * 1e9:8,.0f} ns/frame ({chain_time / router_time:.1f}x)")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
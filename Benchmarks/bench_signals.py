@@ -0,0 +1,90 @@
+"""
+Measures SignalDecoder on engine and vehicle messages, frame by frame and in batches, against
+decoding each frame into a J1939Message and pulling each signal out of `data` by hand (slice,
+int.from_bytes, shift, mask, checks for not available/error, scale).
+
+Usage: python Benchmarks/bench_signals.py [num_frames] [batch_size]
+"""
+import math
+import random
+import sys
+import time
+import standin # adds the repo to sys.path
+from RP1210.J1939 import J1939Message, toJ1939Message
+from RP1210.Signals import Signal, SignalDecoder
+
+SIGNALS = {
+    0xF004: [Signal("EngineTorqueMode", position="1.1", length=4),
+            Signal("DriversDemandTorque", position="2", length=8, offset=-125),
+            Signal("ActualTorque", position="3", length=8, offset=-125),
+            Signal("EngineSpeed", position="4-5", length=16, scale=0.125),
+            Signal("SourceAddress", position="6", length=8),
+            Signal("EngineStarterMode", position="7.1", length=4),
+            Signal("DemandTorque", position="8", length=8, offset=-125)],
+    0xFEF1: [Signal("ParkingBrake", position="1.3", length=2),
+            Signal("WheelSpeed", position="2-3", length=16, scale=1 / 256),
+            Signal("CruiseActive", position="4.1", length=2),
+            Signal("BrakeSwitch", position="4.5", length=2),
+            Signal("CruiseSetSpeed", position="6", length=8)],
+    0xFEEE: [Signal("CoolantTemp", position="1", length=8, offset=-40),
+            Signal("FuelTemp", position="2", length=8, offset=-40),
+            Signal("OilTemp", position="3-4", length=16, scale=0.03125, offset=-273)],
+}
+
+def by_hand(frames : list[bytes]) -> list[dict]:
+    decoded = []
+    for frame in frames:
+        msg = J1939Message(frame)
+        signals = SIGNALS.get(msg.pgn)
+        if signals is None:
+            decoded.append(None)
+            continue
+        values = {}
+        for signal in signals:
+            first, last = signal.byteSpan()
+            raw = int.from_bytes(msg.data[first:last + 1], 'little') >> (signal.start % 8)
+            raw &= (1 << signal.length) - 1
+            if signal.length >= 8:
+                top = raw >> (signal.length - 8)
+                special = top >= 0xFE
+            else:
+                special = raw >= (1 << signal.length) - 2
+            values[signal.name] = None if special else raw * signal.scale + signal.offset
+        decoded.append(values)
+    return decoded
+
+def main(n : int = 100_000, batch_size : int = 256):
+    rng = random.Random(24)
+    frames = [i.to_bytes(4, 'big') + toJ1939Message(rng.choice((0xF004, 0xF004, 0xFEF1, 0xFEEE, 0xFECA)),
+                                                    6, 0x00, 0xFF, rng.randbytes(8))
+                for i in range(n)]
+    batches = []
+    for i in range(0, n, batch_size):
+        batch = frames[i:i + batch_size]
+        offsets = [0]
+        for frame in batch:
+            offsets.append(offsets[-1] + len(frame))
+        batches.append((b''.join(batch), offsets))
+    decoder = SignalDecoder(SIGNALS)
+    start = time.perf_counter()
+    expected = by_hand(frames)
+    hand_time = time.perf_counter() - start
+    start = time.perf_counter()
+    decoded = [decoder.decode(frame) for frame in frames]
+    decode_time = time.perf_counter() - start
+    assert decoded == expected
+    start = time.perf_counter()
+    columns = [decoder.decode_batch(buffer, offsets) for buffer, offsets in batches]
+    batch_time = time.perf_counter() - start
+    speeds = [value for batch in columns for value in batch[0xF004]["EngineSpeed"].tolist()]
+    hand_speeds = [values["EngineSpeed"] for values in expected if values and "EngineSpeed" in values]
+    assert [None if math.isnan(value) else value for value in speeds] == hand_speeds
+    num_signals = sum(len(values) for values in expected if values)
+    print(f"{n:,} frames, {num_signals:,} signal values")
+    print(f"J1939Message + by hand:       {hand_time / n * 1e9:8,.0f} ns/frame")
+    print(f"SignalDecoder.decode:         {decode_time / n * 1e9:8,.0f} ns/frame ({hand_time / decode_time:.1f}x)")
+    print(f"SignalDecoder.decode_batch:   {batch_time / n * 1e9:8,.0f} ns/frame ({hand_time / batch_time:.1f}x, "
+            f"batches of {batch_size})")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,70 @@
+"""
+Measures BusStatistics on a minute of simulated J1939 traffic, fed frame by frame and as batch-read
+buffers, against decoding every frame and keeping a list of timestamps per (PGN, source) that's
+trimmed to the window as it goes.
+
+Usage: python Benchmarks/bench_statistics.py [num_frames] [batch_size]
+"""
+import random
+import sys
+import time
+import standin # adds the repo to sys.path
+from RP1210.J1939 import J1939Message, toJ1939Message
+from RP1210.Statistics import BusStatistics
+from RP1210.VirtualDriver import DEFAULT_LOAD_PGNS
+
+def by_hand(frames : list[bytes], window : float) -> dict:
+    arrivals = {} # (pgn, sa): [time, ...]
+    now = 0.0
+    for frame in frames:
+        msg = J1939Message(frame)
+        now = msg.timestamp * 1e-6
+        pgn = msg.pgn & 0x3FF00 if (msg.pgn >> 8) & 0xFF < 0xF0 else msg.pgn
+        times = arrivals.setdefault((pgn, msg.sa), [])
+        times.append(now)
+        while times[0] <= now - window:
+            times.pop(0)
+    return {stream: len(times) for stream, times in arrivals.items() if times}
+
+def main(n : int = 200_000, batch_size : int = 64):
+    rng = random.Random(22)
+    frames = []
+    ticks = 0
+    for pgn, sa in (rng.choice(DEFAULT_LOAD_PGNS) for _ in range(n)):
+        ticks += rng.randrange(500, 1500) # about 1,000 frames/s
+        frames.append(ticks.to_bytes(4, 'big') + toJ1939Message(pgn, 6, sa, 0xFF, bytes(8)))
+    buffers = []
+    for i in range(0, n, batch_size):
+        batch = frames[i:i + batch_size]
+        offsets = [0]
+        for frame in batch:
+            offsets.append(offsets[-1] + len(frame))
+        buffers.append((b''.join(batch), offsets))
+    start = time.perf_counter()
+    expected = by_hand(frames, 1.0)
+    hand_time = time.perf_counter() - start
+    stats = BusStatistics(window=1.0, buckets=10)
+    start = time.perf_counter()
+    stats.feed_batch(frames)
+    feed_time = time.perf_counter() - start
+    batched = BusStatistics(window=1.0, buckets=10)
+    start = time.perf_counter()
+    for buffer, offsets in buffers:
+        batched.feed_buffer(buffer, offsets)
+    buffer_time = time.perf_counter() - start
+    start = time.perf_counter()
+    snap = stats.snapshot()
+    snap_time = time.perf_counter() - start
+    # the window slides a bucket at a time, so it's within a bucket of the exact one
+    counts = {stream: rate * snap.span for stream, (rate, _, _) in snap.streams.items()}
+    assert counts.keys() == expected.keys()
+    assert all(abs(counts[stream] - count) <= count * 0.1 + 2 for stream, count in expected.items())
+    assert batched.snapshot().frames == snap.frames
+    print(f"{n:,} frames over {ticks * 1e-6:.0f} s, {len(snap.streams)} streams: {snap}")
+    print(f"decode + lists:       {hand_time / n * 1e9:8,.0f} ns/frame")
+    print(f"BusStatistics.feed:   {feed_time / n * 1e9:8,.0f} ns/frame ({hand_time / feed_time:.1f}x)")
+    print(f"feed_buffer (x{batch_size}):   {buffer_time / n * 1e9:8,.0f} ns/frame ({hand_time / buffer_time:.1f}x)")
+    print(f"snapshot:             {snap_time * 1e6:8,.0f} µs")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
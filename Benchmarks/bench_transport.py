@@ -0,0 +1,40 @@
+"""
+Measures TPReassembler throughput with many BAM sessions in progress at once: every session's
+packets are interleaved, like on a busy bus with lots of nodes broadcasting multi-packet messages.
+
+Usage: python Benchmarks/bench_transport.py [num_sessions (max 254)] [message_size]
+"""
+import sys
+import time
+import standin # adds the repo to sys.path
+from RP1210.J1939 import toJ1939Message
+from RP1210.Transport import TPReassembler, TP_CM, TP_DT, CM_BAM
+
+def bam_frames(sa : int, pgn : int, data : bytes) -> list[bytes]:
+    packets = (len(data) + 6) // 7
+    control = bytes((CM_BAM, len(data) & 0xFF, len(data) >> 8, packets, 0xFF)) + pgn.to_bytes(3, 'little')
+    frames = [b'\x00' * 4 + toJ1939Message(TP_CM, 7, sa, 0xFF, control)]
+    for seq in range(1, packets + 1):
+        chunk = data[(seq - 1) * 7:seq * 7].ljust(7, b'\xFF')
+        frames.append(b'\x00' * 4 + toJ1939Message(TP_DT, 7, sa, 0xFF, bytes((seq,)) + chunk))
+    return frames
+
+def main(num_sessions : int = 250, size : int = 1785):
+    streams = [bam_frames(sa, 0xFECA, bytes((sa,)) * size) for sa in range(num_sessions)]
+    # round-robin interleave: packet 1 of every session, then packet 2, ...
+    frames = [stream[i] for i in range(len(streams[0])) for stream in streams]
+    tp = TPReassembler(max_sessions=num_sessions, max_total_bytes=num_sessions * 1785)
+    feed = tp.feed
+    completed = 0
+    start = time.perf_counter()
+    for frame in frames:
+        if feed(frame, 0.0) is not None:
+            completed += 1
+    elapsed = time.perf_counter() - start
+    assert completed == num_sessions
+    print(f"{len(frames):,} packets, {num_sessions} concurrent sessions of {size} bytes, in {elapsed:.3f} s")
+    print(f"{len(frames) / elapsed:12,.0f} packets/sec")
+    print(f"{completed * size / elapsed / 1e6:12,.2f} MB/sec reassembled")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
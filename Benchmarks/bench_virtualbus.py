@@ -0,0 +1,46 @@
+"""
+End-to-end throughput over the virtual RP1210 driver: one client transmits with `SendMany()`, another
+receives with `ReadMany()`, optionally on top of synthetic bus load from other (simulated) nodes.
+
+Runs anywhere; no adapter or vendor DLL is needed.
+
+Usage: python Benchmarks/bench_virtualbus.py [num_msgs] [load_fraction]
+"""
+import sys
+import time
+import standin # adds the repo to sys.path
+import RP1210
+from RP1210.VirtualDriver import VirtualBus, VirtualDLL
+
+BATCH = 64
+
+def connect(bus : VirtualBus) -> tuple:
+    api = RP1210.RP1210API("VIRTUAL")
+    api.setDLL(VirtualDLL(bus, rx_queue_size=1 << 24))
+    client_id = api.ClientConnect(1)
+    api.SendCommand(3, client_id)
+    return api, client_id
+
+def main(num_msgs : int = 200_000, load : float = 0.0):
+    bus = VirtualBus(baud=500000)
+    tx_api, tx_id = connect(bus)
+    rx_api, rx_id = connect(bus)
+    msgs = [RP1210.J1939.toJ1939Message(0xFEF1, 6, 0x00, 0xFF, i.to_bytes(8, 'little'))
+            for i in range(BATCH)]
+    arena = RP1210.RxArena(BATCH)
+    if load:
+        bus.start_load(load=load)
+    received = 0
+    start = time.perf_counter()
+    for _ in range(num_msgs // BATCH):
+        tx_api.SendMany(tx_id, msgs)
+        while rx_api.ReadMany(rx_id, arena) > 0:
+            received += arena.count
+    elapsed = time.perf_counter() - start
+    bus.stop_load()
+    print(f"sent {num_msgs // BATCH * BATCH:,}, received {received:,} "
+            f"(incl. {bus.load_frames:,} synthetic) in {elapsed:.3f} s")
+    print(f"{received / elapsed:12,.0f} msgs/sec")
+
+if __name__ == "__main__":
+    main(*(convert(arg) for convert, arg in zip((int, float), sys.argv[1:])))
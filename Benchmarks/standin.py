@@ -0,0 +1,54 @@
+"""
+Stand-in RP1210 driver for benchmarks. Mimics the parts of an RP1210 CDLL that the benchmarks
+need, so they can run without an adapter (or Windows).
+
+Inject it with `RP1210API.setDLL(StandInDLL())`.
+"""
+import os
+import sys
+from ctypes import memmove
+
+# let the benchmarks run from a source checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 4-byte timestamp + PGN 0xF004 (EEC1) from SA 0x00, 8 data bytes
+DEFAULT_FRAME = b'\x00\x01\x02\x03' + b'\x04\xF0\x00\x03\x00\xFF' + b'\x11\x22\x33\x44\x55\x66\x77\x88'
+
+class StandInDLL():
+    """
+    Returns the same frame from every RP1210_ReadMessage call, until `queue_len` frames have been
+    read (then returns 0 until `refill()` is called). RP1210_SendMessage always succeeds.
+    """
+    def __init__(self, frame : bytes = DEFAULT_FRAME, queue_len : int = 0):
+        self.frame = frame
+        self.queue_len = queue_len
+        self.remaining = queue_len
+        frame_len = len(frame)
+
+        def read_message(client_id, buffer, size, block):
+            if self.queue_len:
+                if not self.remaining:
+                    return 0
+                self.remaining -= 1
+            memmove(buffer, frame, frame_len)
+            return frame_len
+
+        def send_message(client_id, msg, size, notify, block):
+            return 0
+
+        def noop(*args):
+            return 0
+
+        # plain functions (rather than bound methods) so RP1210API can set argtypes on them
+        self.RP1210_ReadMessage = read_message
+        self.RP1210_SendMessage = send_message
+        self.RP1210_ClientConnect = noop
+        self.RP1210_ClientDisconnect = noop
+        self.RP1210_ReadVersion = noop
+        self.RP1210_GetErrorMsg = noop
+        self.RP1210_GetHardwareStatus = noop
+        self.RP1210_SendCommand = noop
+
+    def refill(self):
+        """Puts `queue_len` frames back in the queue."""
+        self.remaining = self.queue_len
@@ -0,0 +1,187 @@
+"""
+asyncio interface for RP1210Client.
+
+AsyncRP1210Client wraps an RP1210Client that has already been set up (vendor, device, connect) and
+lets coroutines receive and transmit without a thread handoff per message. One background reader
+thread per client fills a ring buffer; the event loop is only woken when that buffer goes from empty
+to non-empty, and each wakeup delivers everything that arrived in the meantime.
+"""
+import asyncio
+import functools
+from .RP1210 import RP1210Client, RxRingBuffer
+
+ERR_TX_QUEUE_FULL = 137
+
+class AsyncRP1210Client:
+    """
+    asyncio facade over an RP1210Client.
+    ```
+    client = RP1210Client()
+    client.setVendor("NULN2R32")
+    client.setDevice(1)
+    client.connect()
+
+    async with AsyncRP1210Client(client) as aclient:
+        await aclient.setAllFiltersToPass()     # any RP1210Client method can be awaited
+        await aclient.tx(msg)                   # waits while the adapter's TX queue is full
+        async for msg in aclient.messages():    # bytes from RP1210_ReadMessage
+            process(msg)
+    ```
+    One event loop can serve any number of AsyncRP1210Client objects.
+    ---
+    Params:
+    - `client` : connected RP1210Client
+    - `capacity` : size of the reader thread's ring buffer, in messages (int)
+    - `batch_size` : max number of messages handed over per wakeup; 0 = everything available (int)
+    - `blocking` : whether the reader thread uses BLOCKING_IO reads (see `RP1210Client.start_reader()`)
+    """
+    def __init__(self, client : RP1210Client, capacity : int = 4096, batch_size : int = 0,
+                    blocking = True) -> None:
+        self.client = client
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.blocking = blocking
+        self.rxBuffer = None #type: RxRingBuffer
+        self._loop = None #type: asyncio.AbstractEventLoop
+        self._data_ready = None #type: asyncio.Event
+        self._running = False
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def __getattr__(self, name : str):
+        """
+        Exposes RP1210Client methods (e.g. `setEcho()`, `getBaud()`) as coroutines that run in the
+        event loop's default executor, so slow driver calls don't stall the loop.
+        """
+        if name == 'client': # not set yet
+            raise AttributeError(name)
+        attr = getattr(self.client, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        async def call(*args, **kwargs):
+            return await self._run(attr, *args, **kwargs)
+        call.__name__ = name
+        call.__doc__ = attr.__doc__
+        return call
+
+    ####################
+    # PUBLIC FUNCTIONS #
+    ####################
+
+    async def start(self) -> None:
+        """Starts the client's background reader thread and hooks it up to the running event loop."""
+        if self._running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._data_ready = asyncio.Event()
+        self.rxBuffer = self.client.start_reader(self.capacity, blocking=self.blocking)
+        self.rxBuffer.on_data = self._notify
+        self._running = True
+        if self.rxBuffer: # messages arrived before on_data was set
+            self._data_ready.set()
+
+    async def stop(self) -> None:
+        """
+        Stops the background reader thread. Any `messages()` iterators finish once the messages
+        already buffered have been delivered.
+        """
+        if not self._running:
+            return
+        self._running = False
+        self.rxBuffer.on_data = None
+        self._data_ready.set() # wake up anyone waiting in rx_batch()
+        await self._run(self.client.stop_reader)
+
+    def isRunning(self) -> bool:
+        """Returns True between `start()` and `stop()`."""
+        return self._running
+
+    async def rx_batch(self, max_msgs : int = 0) -> list[bytes]:
+        """
+        Waits for messages and returns up to `max_msgs` of them (defaults to `batch_size`).
+
+        Returns an empty list once the client has been stopped and its buffer is empty.
+        """
+        if not max_msgs:
+            max_msgs = self.batch_size
+        while True:
+            self._data_ready.clear()
+            msgs = self.rxBuffer.pop_many(max_msgs)
+            if msgs or not self._running:
+                if msgs and self.rxBuffer: # more left over; don't make the next call wait
+                    self._data_ready.set()
+                return msgs
+            await self._data_ready.wait()
+
+    async def rx(self) -> bytes:
+        """Waits for and returns a single message. Returns b'' once the client has been stopped."""
+        msgs = await self.rx_batch(1)
+        if msgs:
+            return msgs[0]
+        return b''
+
+    async def messages(self, batches = False):
+        """
+        Async iterator over received messages. Finishes when the client is stopped.
+
+        Set `batches` = True to iterate over lists of messages instead (one list per wakeup).
+        """
+        while True:
+            msgs = await self.rx_batch()
+            if not msgs:
+                return
+            if batches:
+                yield msgs
+            else:
+                for msg in msgs:
+                    yield msg
+
+    async def tx(self, message, msg_size = 0, retry_interval : float = 0.0005,
+                    max_interval : float = 0.05, timeout : float = None) -> int:
+        """
+        Sends a message. If the adapter reports ERR_TX_QUEUE_FULL (137), waits (without blocking the
+        event loop) and retries, backing off from `retry_interval` up to `max_interval` seconds.
+        - timeout = give up and return the ERR_TX_QUEUE_FULL code after this many seconds (None =
+        keep trying forever)
+
+        The send itself is non-blocking, so it's called directly from the event loop.
+
+        Returns the result of `RP1210Client.tx()`.
+        """
+        ret_val = self.client.tx(message, msg_size)
+        if abs(ret_val) != ERR_TX_QUEUE_FULL:
+            return ret_val
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        interval = retry_interval
+        while abs(ret_val) == ERR_TX_QUEUE_FULL:
+            if deadline is not None and loop.time() + interval > deadline:
+                break
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, max_interval)
+            ret_val = self.client.tx(message, msg_size)
+        return ret_val
+
+    async def command(self, CommandNumber, ClientCommand = b"", MessageSize = 0) -> int:
+        """Calls RP1210_SendCommand in the default executor and returns its result."""
+        return await self._run(self.client.command, CommandNumber, ClientCommand, MessageSize)
+
+    #######################
+    # PROTECTED FUNCTIONS #
+    #######################
+
+    def _notify(self):
+        """Called from the reader thread when the ring buffer goes from empty to non-empty."""
+        try:
+            self._loop.call_soon_threadsafe(self._data_ready.set)
+        except RuntimeError: # event loop has been closed
+            pass
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
@@ -0,0 +1,236 @@
+"""
+Keeps the newest frame of every (PGN, source address), for dashboards and rule engines that only
+care about the latest value.
+
+LastValueCache is fed received frames, like Router or NetworkTable, and any number of threads can
+read it while it's being fed:
+```
+cache = LastValueCache()
+client.start_reader()
+while True: # receive thread
+    for frame in client.rx_batch(timeout=0.1):
+        cache.feed(frame)
+...
+rpm = cache.message(0xF004, 0x00) # any thread: newest EEC1 from the engine, or None
+if cache.age(0xF004, 0x00) > 0.5:
+    print("engine speed is stale")
+```
+Memory is allocated up front and doesn't grow with the message rate.
+"""
+import threading
+import time
+from array import array
+from .J1939 import J1939Message
+
+class LastValueCache():
+    """
+    The newest raw frame, and when it was received, for each (PGN, source address).
+
+    Frames are copied into a preallocated bytearray split into `max_entries` slots of `slot_size`
+    bytes, and a dict maps each (PGN, SA) to its slot the first time it's seen. Longer frames (e.g.
+    reassembled transport messages) are kept as bytes alongside their slot instead. Once every slot
+    is taken, frames with new keys are dropped (and counted), so memory stays the same however
+    busy the bus is.
+
+    Writers take a lock; readers don't. Each slot has a sequence number that's odd while the slot is
+    being written, so a reader copies the slot and tries again if the sequence number changed
+    underneath it. `snapshot()` copies the whole store under the writers' lock, so every entry in it
+    is from the same moment.
+
+    PDU1 PGNs (PF < 0xF0) are stored with the PS byte cleared: 0xEF00 from 0x03 is the newest 0xEFxx
+    from 0x03, whatever its destination.
+    ---
+    Params:
+    - `max_entries` : most (PGN, SA) pairs kept (int)
+    - `slot_size` : bytes per slot, including the timestamp and header (int)
+    - `echo` : set to True if frames include the echo byte (bool)
+    ---
+    Accessible properties:
+    - `updates` : frames stored (int)
+    - `dropped` : frames dropped because the cache was full (int)
+    """
+    def __init__(self, max_entries : int = 1024, slot_size : int = 32, echo = False) -> None:
+        if max_entries < 1 or slot_size < 1:
+            raise ValueError("LastValueCache max_entries and slot_size must be positive.")
+        self.max_entries = max_entries
+        self.slot_size = slot_size
+        self.echo = echo
+        self.buffer = bytearray(max_entries * slot_size)
+        self._lengths = array('H', bytes(2 * max_entries))
+        self._times = array('d', bytes(8 * max_entries))
+        self._sequence = array('Q', bytes(8 * max_entries)) # odd while a slot is being written
+        self._large = [None] * max_entries #type: list[bytes]
+        self._index = {} #type: dict[int, int]
+        self._keys = [] #type: list[int]
+        self._lock = threading.Lock()
+        self._start = 4 + int(bool(echo)) # header offset in a frame
+        self.updates = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key : tuple) -> bool:
+        return self._key(*key) in self._index
+
+    ####################
+    # PUBLIC FUNCTIONS #
+    ####################
+
+    def feed(self, frame, now : float = None) -> None:
+        """
+        Stores one received frame (bytes-like from RP1210_ReadMessage, or a J1939Message) as the
+        newest for its PGN and source.
+        - now = when it was received; defaults to `time.perf_counter()`
+        """
+        if isinstance(frame, J1939Message):
+            pgn = frame.pgn & 0x3FFFF
+            sa = frame.sa
+            frame = frame.timestamp_bytes() + (bytes((int(frame.isEcho()),)) if self.echo else b'') + frame.msg
+        else:
+            start = self._start
+            header = frame[start:start + 6]
+            if len(header) < 6:
+                return
+            pgn = header[0] | (header[1] << 8) | ((header[2] & 0x03) << 16)
+            sa = header[4]
+        if (pgn >> 8) & 0xFF < 0xF0:
+            pgn &= 0x3FF00
+        key = (pgn << 8) | sa
+        if now is None:
+            now = time.perf_counter()
+        size = len(frame)
+        with self._lock:
+            slot = self._index.get(key)
+            if slot is None:
+                if len(self._keys) == self.max_entries:
+                    self.dropped += 1
+                    return
+                slot = len(self._keys)
+                self._keys.append(key)
+                self._index[key] = slot
+            sequence = self._sequence
+            sequence[slot] += 1
+            if size <= self.slot_size:
+                offset = slot * self.slot_size
+                self.buffer[offset:offset + size] = frame
+                self._large[slot] = None
+            else:
+                self._large[slot] = bytes(frame)
+            self._lengths[slot] = min(size, 0xFFFF)
+            self._times[slot] = now
+            sequence[slot] += 1
+            self.updates += 1
+
+    def feed_batch(self, frames, now : float = None) -> None:
+        """Stores every frame in `frames` (e.g. from `rx_batch()`, or an RxArena)."""
+        feed = self.feed
+        for frame in frames:
+            feed(frame, now)
+
+    def entry(self, pgn : int, sa : int) -> tuple:
+        """Returns (newest raw frame (bytes), when it was received) for `pgn` from `sa`, or None."""
+        if (pgn >> 8) & 0xFF < 0xF0:
+            pgn &= 0x3FF00
+        slot = self._index.get(((pgn & 0x3FFFF) << 8) | sa)
+        if slot is None:
+            return None
+        return self._read(slot, 0)
+
+    def get(self, pgn : int, sa : int) -> bytes:
+        """Returns the newest raw frame for `pgn` from `sa`, as RP1210_ReadMessage gave it, or None."""
+        entry = self.entry(pgn, sa)
+        return None if entry is None else entry[0]
+
+    def message(self, pgn : int, sa : int) -> J1939Message:
+        """Returns the newest message for `pgn` from `sa` as a J1939Message, or None."""
+        frame = self.get(pgn, sa)
+        return None if frame is None else J1939Message(frame, echo=self.echo)
+
+    def data(self, pgn : int, sa : int) -> bytes:
+        """Returns the data bytes of the newest message for `pgn` from `sa`, or None."""
+        if (pgn >> 8) & 0xFF < 0xF0:
+            pgn &= 0x3FF00
+        slot = self._index.get(((pgn & 0x3FFFF) << 8) | sa)
+        if slot is None:
+            return None
+        return self._read(slot, self._start + 6)[0]
+
+    def age(self, pgn : int, sa : int, now : float = None) -> float:
+        """Returns seconds since the newest message for `pgn` from `sa` was received, or None."""
+        slot = self._index.get(self._key(pgn, sa))
+        if slot is None:
+            return None
+        if now is None:
+            now = time.perf_counter()
+        return now - self._times[slot]
+
+    def stale(self, max_age : float, now : float = None) -> list[tuple]:
+        """Returns the (PGN, SA) pairs that haven't been received for more than `max_age` seconds."""
+        if now is None:
+            now = time.perf_counter()
+        cutoff = now - max_age
+        times = self._times
+        keys = list(self._keys)
+        return [(key >> 8, key & 0xFF) for slot, key in enumerate(keys) if times[slot] < cutoff]
+
+    def keys(self) -> list[tuple]:
+        """Returns every (PGN, SA) pair in the cache, in the order they were first received."""
+        return [(key >> 8, key & 0xFF) for key in list(self._keys)]
+
+    def snapshot(self) -> dict[tuple, tuple]:
+        """
+        Returns {(PGN, SA): (newest raw frame, when it was received)} for everything in the cache,
+        all from the same moment. Writers wait only while the store is copied.
+        """
+        with self._lock:
+            keys = list(self._keys)
+            buffer = bytes(self.buffer[:len(keys) * self.slot_size])
+            lengths = self._lengths[:len(keys)]
+            times = self._times[:len(keys)]
+            large = self._large[:len(keys)]
+        slot_size = self.slot_size
+        ret_val = {}
+        for slot, key in enumerate(keys):
+            offset = slot * slot_size
+            frame = large[slot] if large[slot] is not None else buffer[offset:offset + lengths[slot]]
+            ret_val[(key >> 8, key & 0xFF)] = (frame, times[slot])
+        return ret_val
+
+    def clear(self) -> None:
+        """Forgets every entry. Counters are left alone."""
+        with self._lock:
+            self._index = {}
+            self._keys = []
+            self._large = [None] * self.max_entries
+
+    #######################
+    # PROTECTED FUNCTIONS #
+    #######################
+
+    def _key(self, pgn : int, sa : int) -> int:
+        pgn &= 0x3FFFF
+        if (pgn >> 8) & 0xFF < 0xF0:
+            pgn &= 0x3FF00
+        return (pgn << 8) | sa
+
+    def _read(self, slot : int, skip : int) -> tuple:
+        """
+        Copies a slot, less its first `skip` bytes, without locking; retries if it was written
+        while being copied.
+        """
+        sequence = self._sequence
+        offset = slot * self.slot_size
+        while True:
+            before = sequence[slot]
+            if before & 1: # being written; let the writer finish
+                time.sleep(0)
+                continue
+            large = self._large[slot]
+            if large is None:
+                frame = self.buffer[offset + skip:offset + self._lengths[slot]]
+            else:
+                frame = large[skip:]
+            received = self._times[slot]
+            if sequence[slot] == before:
+                return bytes(frame), received
@@ -0,0 +1,683 @@
+"""
+Compact binary capture files for RP1210 traffic.
+
+A capture file is a fixed 48-byte header followed by append-only records:
+```
+header: magic (8s) | version (H) | flags (H) | timestamp_weight (d) | created_ns (q) | protocol (16s) | 4 reserved bytes
+record: time_ns (Q) | flags (H) | length (H) | frame (length bytes)
+```
+All integers are little-endian. `time_ns` is the host's wall-clock time (nanoseconds since the epoch)
+when the frame was recorded, and `frame` is the raw RP1210_ReadMessage output, adapter timestamp and
+all.
+
+Record everything a client receives:
+```
+with CaptureWriter("truck.rpcap", echo=False) as recorder:
+    client.setRecorder(recorder) # rx(), rx_many() and the background reader now write to the file
+    ...
+```
+Read it back:
+```
+for msg in CaptureReader("truck.rpcap"): # J1939Message objects
+    ...
+```
+Or query it through an index (built on first use and saved beside the file as "truck.rpcap.idx"):
+```
+with MappedCapture("truck.rpcap") as capture:
+    for msg in capture.query(pgn=0xFECA, sa=0x00, start_ns=t1, end_ns=t2).messages():
+        ...
+```
+"""
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from heapq import merge
+from .J1939 import J1939Message
+
+CAPTURE_MAGIC = b"RP1210CP"
+CAPTURE_VERSION = 1
+
+HEADER = struct.Struct("<8sHHdq16s4x")
+"""Capture file header: magic, version, flags, timestamp_weight, created_ns, protocol."""
+RECORD = struct.Struct("<QHH")
+"""Record header: time_ns, flags, length."""
+
+FLAG_ECHO = 0x01
+"""Frame includes the echo byte that follows the timestamp (echo was on when it was recorded)."""
+FLAG_TX = 0x02
+"""Frame was transmitted by the recording application, rather than received."""
+
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"RP1210IX"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<8sHHqQQqIIQ")
+"""
+Index file header: magic, version, flags, created_ns (of the capture), indexed_size, num_records,
+last_time_ns, block_size, num_blocks, num_keys.
+"""
+INDEX_MONOTONIC = 0x01
+"""Index flag: record times never decrease, so time ranges can be found by binary search."""
+
+_TIME = struct.Struct("<Q")
+
+class CaptureWriter:
+    """
+    Appends RP1210 frames to a capture file, buffering writes in memory.
+
+    If the file already exists, records are appended after its existing records; otherwise a new
+    header is written. An existing header must match this version of the format and the `protocol`,
+    `echo` and `timestamp_weight` given here, and a record that was cut short at the end of the file
+    (e.g. the recording application crashed) is truncated away before appending.
+
+    `write()` is thread-safe, so the same writer can be fed by a background reader thread and by the
+    main thread at once.
+    ---
+    Params:
+    - `path` : capture file path (str)
+    - `protocol` : protocol name stored in the header, e.g. "J1939" or "CAN" (str)
+    - `echo` : set to True if the client has echo turned on, so frames include the echo byte (bool)
+    - `timestamp_weight` : adapter timestamp resolution, from `RP1210Config.getTimeStampWeight()` (float)
+    - `buffer_size` : number of bytes to buffer before writing to disk (int)
+    ---
+    Accessible properties:
+    - `records` : number of records written by this writer (int)
+    """
+    def __init__(self, path : str, protocol : str = "J1939", echo = False, timestamp_weight : float = 1.0,
+                    buffer_size : int = 1 << 16) -> None:
+        self.path = path
+        self.echo = echo
+        self.buffer_size = buffer_size
+        self.records = 0
+        self._flags = FLAG_ECHO if echo else 0
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        protocol_name = protocol.encode('utf-8')[:16]
+        if not os.path.isfile(path) or os.path.getsize(path) == 0:
+            self._file = open(path, "wb")
+            self._file.write(HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, self._flags, timestamp_weight,
+                                            time.time_ns(), protocol_name))
+            return
+        self._file = open(path, "r+b")
+        try:
+            _, flags, weight, _, name = readHeader(self._file.read(HEADER.size))
+            if name != protocol_name.rstrip(b'\x00').decode('utf-8'):
+                raise ValueError(f"Capture file protocol is {name!r}, not {protocol!r}.")
+            if flags & FLAG_ECHO != self._flags:
+                raise ValueError(f"Capture file was recorded with echo {'on' if flags & FLAG_ECHO else 'off'}.")
+            if weight != timestamp_weight:
+                raise ValueError(f"Capture file timestamp weight is {weight}, not {timestamp_weight}.")
+            end = _recordsEnd(self._file)
+            self._file.truncate(end) # drop a partial record left by a writer that didn't finish
+            self._file.seek(end)
+        except Exception:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, frame, flags : int = None, time_ns : int = None) -> None:
+        """
+        Appends a frame (bytes-like) to the capture.
+        - flags = record flags (FLAG_ECHO, FLAG_TX); defaults to FLAG_ECHO if the writer has `echo` on
+        - time_ns = record time in nanoseconds since the epoch; defaults to now
+        """
+        if flags is None:
+            flags = self._flags
+        if time_ns is None:
+            time_ns = time.time_ns()
+        with self._lock:
+            buffer = self._buffer
+            buffer += RECORD.pack(time_ns, flags, len(frame))
+            buffer += frame
+            self.records += 1
+            if len(buffer) >= self.buffer_size:
+                self._file.write(buffer)
+                buffer.clear()
+
+    def write_many(self, frames, flags : int = None, time_ns : int = None) -> None:
+        """Appends several frames with the same flags and record time (defaults to now)."""
+        if flags is None:
+            flags = self._flags
+        if time_ns is None:
+            time_ns = time.time_ns()
+        pack = RECORD.pack
+        with self._lock:
+            buffer = self._buffer
+            for frame in frames:
+                buffer += pack(time_ns, flags, len(frame))
+                buffer += frame
+                self.records += 1
+            if len(buffer) >= self.buffer_size:
+                self._file.write(buffer)
+                buffer.clear()
+
+    def flush(self) -> None:
+        """Writes buffered records to the file."""
+        with self._lock:
+            if self._buffer:
+                self._file.write(self._buffer)
+                self._buffer.clear()
+            self._file.flush()
+
+    def close(self) -> None:
+        """Flushes and closes the file. Does nothing if it's already closed."""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def isClosed(self) -> bool:
+        """Returns True once the file has been closed."""
+        return self._file.closed
+
+class CaptureReader:
+    """
+    Reads a capture file written by CaptureWriter.
+
+    Iterating over a CaptureReader yields J1939Message objects; use `records()` for the raw frames.
+    A record that was cut short (e.g. the recording application crashed) ends the capture.
+    ---
+    Params:
+    - `path` : capture file path (str)
+    - `chunk_size` : number of bytes read from disk at a time (int)
+    ---
+    Accessible properties:
+    - `version`, `flags`, `timestamp_weight`, `created_ns`, `protocol` : header fields
+    """
+    def __init__(self, path : str, chunk_size : int = 1 << 20) -> None:
+        self.path = path
+        self.chunk_size = chunk_size
+        with open(path, "rb") as f:
+            header = readHeader(f.read(HEADER.size))
+        self.version, self.flags, self.timestamp_weight, self.created_ns, self.protocol = header
+
+    def __iter__(self):
+        return self.messages()
+
+    def records(self):
+        """Generator of (time_ns, flags, frame) tuples, in file order. `frame` is bytes."""
+        unpack_from = RECORD.unpack_from
+        record_size = RECORD.size
+        with open(self.path, "rb") as f:
+            f.seek(HEADER.size)
+            data = b''
+            pos = 0
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    return
+                data = data[pos:] + chunk
+                pos = 0
+                end = len(data)
+                while pos + record_size <= end:
+                    time_ns, flags, length = unpack_from(data, pos)
+                    start = pos + record_size
+                    if start + length > end:
+                        break
+                    yield (time_ns, flags, data[start:start + length])
+                    pos = start + length
+
+    def messages(self):
+        """Generator of J1939Message objects, with `echo` set from each record's flags."""
+        for _, flags, frame in self.records():
+            yield J1939Message(frame, echo=bool(flags & FLAG_ECHO))
+
+    def count(self) -> int:
+        """Returns the number of complete records in the file."""
+        return sum(1 for _ in self.records())
+
+def readHeader(header : bytes) -> tuple:
+    """
+    Parses a capture file header. Returns (version, flags, timestamp_weight, created_ns, protocol).
+
+    Raises ValueError if `header` isn't a capture file header this module can read.
+    """
+    if len(header) < HEADER.size:
+        raise ValueError("Capture file header is truncated.")
+    magic, version, flags, weight, created_ns, protocol = HEADER.unpack_from(header)
+    if magic != CAPTURE_MAGIC:
+        raise ValueError("Not an RP1210 capture file.")
+    if version > CAPTURE_VERSION:
+        raise ValueError(f"Unsupported capture file version: {version}")
+    return (version, flags, weight, created_ns, protocol.rstrip(b'\x00').decode('utf-8'))
+
+def _recordsEnd(f) -> int:
+    """Returns the offset just past the last complete record of an open capture file."""
+    chunk_size = max(1 << 20, RECORD.size + 0xFFFF) # always holds at least one whole record
+    unpack_from = RECORD.unpack_from
+    record_size = RECORD.size
+    pos = HEADER.size
+    while True:
+        f.seek(pos)
+        data = f.read(chunk_size)
+        end = len(data)
+        offset = 0
+        while offset + record_size <= end:
+            next_offset = offset + record_size + unpack_from(data, offset)[2]
+            if next_offset > end:
+                break
+            offset = next_offset
+        if offset == 0:
+            return pos
+        pos += offset
+
+def isCaptureFile(path : str) -> bool:
+    """Returns True if the file at `path` starts with a valid capture file header."""
+    if not os.path.isfile(path):
+        return False
+    with open(path, "rb") as f:
+        try:
+            readHeader(f.read(HEADER.size))
+            return True
+        except ValueError:
+            return False
+
+class CaptureRecord:
+    """
+    A zero-copy view of one record in a MappedCapture.
+    ---
+    Accessible properties:
+    - `offset` : byte offset of the record in the capture file (int)
+    - `time_ns` : record time in nanoseconds since the epoch (int)
+    - `flags` : record flags (int)
+    - `frame` : raw RP1210 frame, as a memoryview into the capture file (memoryview)
+    """
+    __slots__ = ("_capture", "offset")
+
+    def __init__(self, capture : 'MappedCapture', offset : int) -> None:
+        self._capture = capture
+        self.offset = offset
+
+    def __repr__(self) -> str:
+        return f"CaptureRecord(offset={self.offset}, time_ns={self.time_ns})"
+
+    @property
+    def time_ns(self) -> int:
+        return RECORD.unpack_from(self._capture._map, self.offset)[0]
+
+    @property
+    def flags(self) -> int:
+        return RECORD.unpack_from(self._capture._map, self.offset)[1]
+
+    @property
+    def frame(self) -> memoryview:
+        return self._capture.frame(self.offset)
+
+    def message(self) -> J1939Message:
+        """Decodes the frame as a J1939Message."""
+        return self._capture.message(self.offset)
+
+class CaptureSlice:
+    """
+    The records matched by a `MappedCapture.query()`, in file order.
+
+    Indexing gives CaptureRecord views, and slicing gives another CaptureSlice; nothing is decoded
+    until you ask for it.
+    ---
+    Accessible properties:
+    - `offsets` : byte offset of each record in the capture file (array of unsigned long long)
+    """
+    def __init__(self, capture : 'MappedCapture', offsets : array) -> None:
+        self._capture = capture
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CaptureSlice(self._capture, self.offsets[index])
+        return CaptureRecord(self._capture, self.offsets[index])
+
+    def __iter__(self):
+        capture = self._capture
+        for offset in self.offsets:
+            yield CaptureRecord(capture, offset)
+
+    def frames(self):
+        """Generator of raw frames, as memoryviews into the capture file."""
+        frame = self._capture.frame
+        for offset in self.offsets:
+            yield frame(offset)
+
+    def messages(self):
+        """Generator of J1939Message objects, decoded one at a time."""
+        message = self._capture.message
+        for offset in self.offsets:
+            yield message(offset)
+
+    def times(self) -> list[int]:
+        """Returns the record time (ns since the epoch) of each record."""
+        unpack_from = _TIME.unpack_from
+        buf = self._capture._map
+        return [unpack_from(buf, offset)[0] for offset in self.offsets]
+
+class MappedCapture:
+    """
+    Memory-mapped capture file with a time index and a PGN/SA index, for fast range queries.
+
+    The index is built by scanning the file once, and saved beside it (`path` + ".idx"). Opening
+    the capture again loads the index and only scans records appended since it was saved; call
+    `refresh()` to pick up records appended while it's open.
+
+    The time index is sparse: one (offset, min time, max time) entry per `block_size` records. The
+    PGN/SA index holds the offset of every record for each (PGN, source address) pair. For PDU1
+    messages the PGN is indexed without its destination address (e.g. 0xEA00).
+
+    Frames returned by queries are memoryviews into the map; release them (or drop all references)
+    before calling `close()`.
+    ---
+    Params:
+    - `path` : capture file path (str)
+    - `block_size` : number of records per time index entry (int)
+    - `persist_index` : save the index beside the capture file (bool)
+    ---
+    Accessible properties:
+    - `version`, `flags`, `timestamp_weight`, `created_ns`, `protocol` : header fields
+    - `num_records` : number of indexed records (int)
+    - `index_path` : path of the saved index (str)
+    """
+    def __init__(self, path : str, block_size : int = 1024, persist_index = True) -> None:
+        if block_size < 1:
+            raise ValueError("MappedCapture block_size must be positive.")
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.block_size = block_size
+        self.persist_index = persist_index
+        self._file = open(path, "rb")
+        try:
+            header = readHeader(self._file.read(HEADER.size))
+        except ValueError:
+            self._file.close()
+            raise
+        self.version, self.flags, self.timestamp_weight, self.created_ns, self.protocol = header
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self._reset_index()
+        if not self._load_index():
+            self._reset_index()
+        if self._index_records() and persist_index:
+            self.saveIndex()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.num_records
+
+    def __iter__(self):
+        return iter(self.query())
+
+    ####################
+    # PUBLIC FUNCTIONS #
+    ####################
+
+    def query(self, pgn : int = None, sa : int = None, start_ns : int = None,
+                end_ns : int = None) -> CaptureSlice:
+        """
+        Returns the records matching every argument that isn't None, in file order.
+        - pgn = PGN (PDU1 PGNs match regardless of destination address)
+        - sa = source address
+        - start_ns, end_ns = record time range, start inclusive and end exclusive (ns since the epoch)
+        """
+        ranges = self._offset_ranges(start_ns, end_ns)
+        if pgn is None and sa is None:
+            offsets = array('Q')
+            for lo, hi in ranges:
+                offsets.extend(self._scan(lo, hi))
+        else:
+            postings = [self._postings[key] for key in self._keys(pgn, sa)]
+            offsets = array('Q')
+            for lo, hi in ranges:
+                parts = [p[bisect_left(p, lo):bisect_left(p, hi)] for p in postings]
+                if len(parts) == 1:
+                    offsets.extend(parts[0])
+                elif parts:
+                    offsets.extend(merge(*parts))
+        if start_ns is not None or end_ns is not None:
+            lo = start_ns if start_ns is not None else 0
+            hi = end_ns if end_ns is not None else 1 << 64
+            unpack_from = _TIME.unpack_from
+            buf = self._map
+            offsets = array('Q', (offset for offset in offsets
+                                    if lo <= unpack_from(buf, offset)[0] < hi))
+        return CaptureSlice(self, offsets)
+
+    def keys(self) -> list[tuple]:
+        """Returns every indexed (PGN, source address) pair."""
+        return sorted((key >> 8, key & 0xFF) for key in self._postings)
+
+    def timeRange(self) -> tuple:
+        """Returns the (earliest, latest) record time in ns, or (None, None) if the capture is empty."""
+        if not self._block_min:
+            return (None, None)
+        return (min(self._block_min), max(self._block_max))
+
+    def frame(self, offset : int) -> memoryview:
+        """Returns the frame of the record at `offset` as a memoryview into the capture file."""
+        _, _, length = RECORD.unpack_from(self._map, offset)
+        start = offset + RECORD.size
+        return self._view[start:start + length]
+
+    def message(self, offset : int) -> J1939Message:
+        """Decodes the frame of the record at `offset` as a J1939Message."""
+        _, flags, length = RECORD.unpack_from(self._map, offset)
+        start = offset + RECORD.size
+        return J1939Message(self._map[start:start + length], echo=bool(flags & FLAG_ECHO))
+
+    def refresh(self) -> int:
+        """
+        Re-maps the file and indexes any records appended since it was opened (saving the index if
+        `persist_index` is set). Returns the number of new records.
+        """
+        old_count = self.num_records
+        self._view.release()
+        self._map.close()
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        if self._index_records() and self.persist_index:
+            self.saveIndex()
+        return self.num_records - old_count
+
+    def saveIndex(self) -> None:
+        """Writes the index beside the capture file, replacing any previous index."""
+        keys = array('I', sorted(self._postings))
+        counts = array('Q', (len(self._postings[key]) for key in keys))
+        flags = INDEX_MONOTONIC if self._monotonic else 0
+        header = INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, flags, self.created_ns,
+                                    self._indexed_size, self.num_records, self._last_time,
+                                    self.block_size, len(self._block_offsets), len(keys))
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            for arr in (self._block_offsets, self._block_min, self._block_max, keys, counts):
+                f.write(_array_bytes(arr))
+            for key in keys:
+                f.write(_array_bytes(self._postings[key]))
+        os.replace(tmp_path, self.index_path)
+
+    def close(self) -> None:
+        """
+        Unmaps and closes the capture file. Raises BufferError if frames from this capture are
+        still referenced.
+        """
+        if self._file.closed:
+            return
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    #######################
+    # PROTECTED FUNCTIONS #
+    #######################
+
+    def _reset_index(self):
+        self.num_records = 0
+        self._indexed_size = HEADER.size
+        self._last_time = 0
+        self._monotonic = True
+        self._block_offsets = array('Q')
+        self._block_min = array('q')
+        self._block_max = array('q')
+        self._postings = {} #type: dict[int, array]
+
+    def _load_index(self) -> bool:
+        """Loads the saved index if it matches this capture file. Returns True if it was loaded."""
+        try:
+            with open(self.index_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return False
+        if len(data) < INDEX_HEADER.size:
+            return False
+        (magic, version, flags, created_ns, indexed_size, num_records, last_time, block_size,
+            num_blocks, num_keys) = INDEX_HEADER.unpack_from(data)
+        if (magic != INDEX_MAGIC or version != INDEX_VERSION or created_ns != self.created_ns
+                or block_size != self.block_size or indexed_size > len(self._map)):
+            return False
+        try:
+            pos = INDEX_HEADER.size
+            self._block_offsets, pos = _read_array('Q', data, pos, num_blocks)
+            self._block_min, pos = _read_array('q', data, pos, num_blocks)
+            self._block_max, pos = _read_array('q', data, pos, num_blocks)
+            keys, pos = _read_array('I', data, pos, num_keys)
+            counts, pos = _read_array('Q', data, pos, num_keys)
+            for key, count in zip(keys, counts):
+                self._postings[key], pos = _read_array('Q', data, pos, count)
+        except ValueError: # index file is truncated
+            return False
+        self.num_records = num_records
+        self._indexed_size = indexed_size
+        self._last_time = last_time
+        self._monotonic = bool(flags & INDEX_MONOTONIC)
+        return True
+
+    def _index_records(self) -> int:
+        """Indexes complete records after `_indexed_size`. Returns the number of records indexed."""
+        buf = self._map
+        end = len(buf)
+        pos = self._indexed_size
+        unpack_from = RECORD.unpack_from
+        record_size = RECORD.size
+        block_size = self.block_size
+        block_offsets = self._block_offsets
+        block_min = self._block_min
+        block_max = self._block_max
+        postings = self._postings
+        index_pgns = self.protocol == "J1939"
+        count = self.num_records
+        last_time = self._last_time
+        monotonic = self._monotonic
+        while pos + record_size <= end:
+            time_ns, flags, length = unpack_from(buf, pos)
+            start = pos + record_size
+            if start + length > end:
+                break
+            if count % block_size == 0:
+                block_offsets.append(pos)
+                block_min.append(time_ns)
+                block_max.append(time_ns)
+            elif time_ns < block_min[-1]:
+                block_min[-1] = time_ns
+            elif time_ns > block_max[-1]:
+                block_max[-1] = time_ns
+            if time_ns < last_time:
+                monotonic = False
+            last_time = time_ns
+            p = start + 4 + (flags & FLAG_ECHO)
+            if index_pgns and length >= p - start + 6:
+                pf = buf[p + 1]
+                pgn = buf[p] | (pf << 8) | ((buf[p + 2] & 0b11) << 16)
+                if pf < 0xF0: # PDU1
+                    pgn &= 0x3FF00
+                key = (pgn << 8) | buf[p + 4]
+                offsets = postings.get(key)
+                if offsets is None:
+                    offsets = postings[key] = array('Q')
+                offsets.append(pos)
+            count += 1
+            pos = start + length
+        new_records = count - self.num_records
+        self.num_records = count
+        self._indexed_size = pos
+        self._last_time = last_time
+        self._monotonic = monotonic
+        return new_records
+
+    def _offset_ranges(self, start_ns : int, end_ns : int) -> list[tuple]:
+        """Returns the (lo, hi) byte ranges of the blocks that may hold records in the time range."""
+        num_blocks = len(self._block_offsets)
+        if start_ns is None and end_ns is None or not num_blocks:
+            return [(HEADER.size, self._indexed_size)]
+        lo = start_ns if start_ns is not None else -(1 << 63)
+        hi = end_ns if end_ns is not None else (1 << 63) - 1
+        if self._monotonic:
+            first = bisect_left(self._block_max, lo)
+            last = bisect_left(self._block_min, hi) # exclusive
+            blocks = [(first, last)] if first < last else []
+        else: # check every block, merging neighbours
+            blocks = []
+            for i, (b_min, b_max) in enumerate(zip(self._block_min, self._block_max)):
+                if b_max >= lo and b_min < hi:
+                    if blocks and blocks[-1][1] == i:
+                        blocks[-1] = (blocks[-1][0], i + 1)
+                    else:
+                        blocks.append((i, i + 1))
+        offsets = self._block_offsets
+        return [(offsets[first], offsets[last] if last < num_blocks else self._indexed_size)
+                for first, last in blocks]
+
+    def _scan(self, lo : int, hi : int) -> array:
+        """Returns the offset of every record in the byte range [lo, hi)."""
+        unpack_from = RECORD.unpack_from
+        record_size = RECORD.size
+        buf = self._map
+        offsets = array('Q')
+        pos = lo
+        while pos < hi:
+            offsets.append(pos)
+            pos += record_size + unpack_from(buf, pos)[2]
+        return offsets
+
+    def _keys(self, pgn : int, sa : int) -> list[int]:
+        """Returns the index keys matching `pgn` and/or `sa`."""
+        if pgn is not None:
+            pgn &= 0x3FFFF
+            if (pgn >> 8) & 0xFF < 0xF0: # PDU1
+                pgn &= 0x3FF00
+            if sa is not None:
+                key = (pgn << 8) | (sa & 0xFF)
+                return [key] if key in self._postings else []
+            return [key for key in self._postings if key >> 8 == pgn]
+        return [key for key in self._postings if key & 0xFF == sa]
+
+def _array_bytes(arr : array) -> bytes:
+    """Returns the little-endian bytes of an array."""
+    if sys.byteorder == 'little':
+        return arr.tobytes()
+    arr = array(arr.typecode, arr)
+    arr.byteswap()
+    return arr.tobytes()
+
+def _read_array(typecode : str, data : bytes, pos : int, count : int) -> tuple:
+    """Reads `count` little-endian items from `data` at `pos`. Returns (array, new position)."""
+    arr = array(typecode)
+    end = pos + count * arr.itemsize
+    if end > len(data):
+        raise ValueError("Index data is truncated.")
+    arr.frombytes(data[pos:end])
+    if sys.byteorder != 'little':
+        arr.byteswap()
+    return arr, end
@@ -3,9 +3,15 @@ Generate ClientCommand inputs for RP1210_SendCommand.
 
 Each function in this file returns a value that can be used for ClientCommand.
 """
+import struct
 from typing import Literal
 from . import sanitize_msg_param
 
+# precompiled layouts for plain int arguments; anything else goes through sanitize_msg_param
+_J1939_FILTER = struct.Struct("<BHBBBB") # flag, PGN (3 bytes, LE), priority (unused), SA, DA
+_CAN_FILTER = struct.Struct(">BII")
+_PROTECT_ADDRESS = struct.Struct(">BQB")
+
 COMMAND_IDS = {
     "RESET_DEVICE" : 0,
     "SET_ALL_FILTERS_STATES_TO_PASS" : 3,
@@ -170,6 +176,10 @@ def setJ1939Filters(filter_flag : int, pgn = 0, source = 0, dest = 0) -> bytes:
         Example (this will filter for messages that come from 0x1E and sent to 0xB0):
             command = Commands.setJ1939Filters(4+8, source=0x1E, dest=0xB0)
     """
+    if (type(filter_flag) is int and type(pgn) is int and type(source) is int and type(dest) is int
+            and 0 <= filter_flag <= 0xFF and 0 <= pgn <= 0xFFFFFF and 0 <= source <= 0xFF
+            and 0 <= dest <= 0xFF):
+        return _J1939_FILTER.pack(filter_flag, pgn & 0xFFFF, pgn >> 16, 0, source, dest)
     ret_val = sanitize_msg_param(filter_flag, 1)
     ret_val += sanitize_msg_param(pgn, 3, 'little')
     ret_val += sanitize_msg_param(0, 1) # FILTER_PRIORITY was removed from RP1210 standard
@@ -191,6 +201,9 @@ def setCANFilters(can_type, mask, header) -> bytes:
 
     This is one of those functions that you're going to want the RP1210C documentation for.
     """
+    if (type(can_type) is int and type(mask) is int and type(header) is int and 0 <= can_type <= 0xFF
+            and 0 <= mask <= 0xFFFFFFFF and 0 <= header <= 0xFFFFFFFF):
+        return _CAN_FILTER.pack(can_type, mask, header)
     ret_val = sanitize_msg_param(can_type, 1)
     ret_val += sanitize_msg_param(mask, 4)
     ret_val += sanitize_msg_param(header, 4)
@@ -252,6 +265,9 @@ def protectJ1939Address(address_to_claim, network_mgt_name, blocking = True) ->
         - Lowest name takes priority if two devices try to claim the same address
     - blocking (bool) - True will block until done, False will return before completion
     """
+    if (type(address_to_claim) is int and type(network_mgt_name) is int
+            and 0 <= address_to_claim <= 0xFF and 0 <= network_mgt_name <= 0xFFFFFFFFFFFFFFFF):
+        return _PROTECT_ADDRESS.pack(address_to_claim, network_mgt_name, 0 if blocking else 2)
     addr = sanitize_msg_param(address_to_claim, 1)
     name = sanitize_msg_param(network_mgt_name, 8)
     if blocking:
@@ -0,0 +1,336 @@
+"""
+Sends J1939 requests (PGN 0xEA00) and matches them up with their responses.
+
+Each request returns a `concurrent.futures.Future`, so any number of them can be outstanding at
+once while a single receive loop feeds frames to the Correlator:
+```
+corr = Correlator(client.tx, address=0xF9)
+vins = {ecu: corr.request(0xFEEC, da=ecu) for ecu in (0x00, 0x03, 0x0B)} # VIN from each ECU
+ids = corr.request(0xFEEB) # component ID, from everyone who answers
+corr.run(lambda timeout: client.rx_batch(timeout=timeout))
+for ecu, future in vins.items():
+    try:
+        print(ecu, future.result().data)
+    except RequestNACK as nack:
+        print(ecu, "can't answer:", nack)
+    except TimeoutError:
+        print(ecu, "didn't answer")
+print(ids.result()) # {source address: J1939Message}
+```
+Or call `feed()` from an existing receive loop (e.g. from a Router subscription) and wait on the
+futures from other threads; `asyncio.wrap_future()` turns them into awaitables.
+
+A request to one address completes with the first response from that address: the requested PGN,
+sent directly or with the transport protocol, or an Acknowledgment (PGN 0xE800). A positive
+Acknowledgment completes the future with the Acknowledgment message; a negative one (NACK, access
+denied, cannot respond) raises RequestNACK from it. With no answer in time it raises TimeoutError.
+A global request collects responses from every address until its timeout, then completes with a
+dict of them by source address (empty if nobody answered).
+"""
+import heapq
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from .J1939 import J1939Message, toJ1939Request
+from .Router import routingPGN
+from .Transport import TP_CM, TP_DT, TPReassembler
+
+PGN_REQUEST = 0xEA00
+PGN_ACKNOWLEDGMENT = 0xE800
+
+# Acknowledgment control bytes
+ACK = 0
+NACK = 1
+ACK_ACCESS_DENIED = 2
+ACK_CANNOT_RESPOND = 3
+
+RESPONSE_TIMEOUT = 1.25 # how long a requester waits for a response (J1939-21 T3) (s)
+
+class RequestNACK(Exception):
+    """
+    Raised (by a request's future) when the addressed ECU answers with a negative Acknowledgment.
+    ---
+    Accessible properties:
+    - `pgn` : the PGN that was requested (int)
+    - `sa` : the address that sent the Acknowledgment (int)
+    - `control` : NACK, ACK_ACCESS_DENIED or ACK_CANNOT_RESPOND (int)
+    - `msg` : the Acknowledgment (J1939Message)
+    """
+    def __init__(self, pgn : int, sa : int, control : int, msg : J1939Message) -> None:
+        reason = {NACK: "NACK", ACK_ACCESS_DENIED: "access denied",
+                    ACK_CANNOT_RESPOND: "cannot respond"}.get(control, f"control byte {control}")
+        super().__init__(f"Request for PGN {pgn:#06x} refused by {sa:#04x}: {reason}")
+        self.pgn = pgn
+        self.sa = sa
+        self.control = control
+        self.msg = msg
+
+class _PendingRequest():
+    """One outstanding request; `responses` is only used by global requests."""
+    __slots__ = ("key", "future", "deadline", "responses")
+
+    def __init__(self, key : tuple, future : Future, deadline : float) -> None:
+        self.key = key
+        self.future = future
+        self.deadline = deadline
+        self.responses = {} #type: dict[int, J1939Message]
+
+class Correlator():
+    """
+    Issues J1939 requests and completes their futures from the frames passed to `feed()`.
+
+    Outstanding requests are kept in a dict keyed by (PGN, address), so each received frame costs
+    a header check and at most two dict lookups however many requests are waiting; only frames
+    that answer a request are decoded. Requests for a PGN that's already been requested from the
+    same address (and not answered yet) aren't sent again; they share the first one's response.
+
+    Responses sent with the transport protocol are reassembled by `transport`, which also answers
+    RTS/CTS sessions addressed to `address`. While a transport session from the requested address
+    is carrying the requested PGN, the request doesn't time out.
+
+    Feeding frames and making requests are thread safe. Times (the `now` arguments) are
+    `time.perf_counter()` values.
+    ---
+    Params:
+    - `send` : function that transmits a message from `toJ1939Message()`, e.g. `client.tx`
+    - `address` : our source address for the requests (int)
+    - `echo` : set to True if frames include the echo byte; echoed frames are ignored (bool)
+    - `timeout` : default seconds to wait for a response (float)
+    - `pri` : priority of the requests (int)
+    - `transport` : TPReassembler to use for multi-packet responses; by default one is created
+    ---
+    Accessible properties:
+    - `transport` : the TPReassembler (TPReassembler)
+    - `sent`, `answered`, `refused`, `timed_out` : request counts (int)
+    """
+    def __init__(self, send, address : int, echo = False, timeout : float = RESPONSE_TIMEOUT,
+                    pri : int = 6, transport : TPReassembler = None) -> None:
+        self.send = send
+        self.address = address
+        self.echo = echo
+        self.timeout = timeout
+        self.pri = pri
+        if transport is None:
+            transport = TPReassembler(address=address, send=send, echo=echo)
+        self.transport = transport
+        self.sent = 0
+        self.answered = 0
+        self.refused = 0
+        self.timed_out = 0
+        self._pending = {} #type: dict[tuple[int, int], list[_PendingRequest]]
+        self._deadlines = [] #type: list[tuple[float, int, _PendingRequest]]
+        self._counter = itertools.count() # heap tiebreaker
+        self._next_deadline = math.inf # earliest deadline in the heap; read without the lock
+        self._lock = threading.RLock()
+        self._start = 4 + int(bool(echo)) # header offset in a frame
+
+    ####################
+    # PUBLIC FUNCTIONS #
+    ####################
+
+    def request(self, pgn : int, da : int = 0xFF, timeout : float = None, now : float = None) -> Future:
+        """
+        Requests `pgn` from `da` (0xFF = global), sending the request unless the same one is
+        already outstanding.
+        - timeout = seconds to wait for the response (or, for global requests, to collect them);
+        defaults to `self.timeout`
+
+        Returns a Future: see the module docstring for what it completes with.
+        """
+        if now is None:
+            now = time.perf_counter()
+        if timeout is None:
+            timeout = self.timeout
+        key = (routingPGN(pgn), da & 0xFF)
+        pending = _PendingRequest(key, Future(), now + timeout)
+        with self._lock:
+            waiting = self._pending.setdefault(key, [])
+            waiting.append(pending)
+            heapq.heappush(self._deadlines, (pending.deadline, next(self._counter), pending))
+            self._next_deadline = self._deadlines[0][0]
+            send = len(waiting) == 1
+            if send:
+                self.sent += 1
+        if send: # registered first, so even an immediate response is matched
+            self.send(toJ1939Request(key[0], self.address, key[1], self.pri))
+        return pending.future
+
+    def feed(self, frame, now : float = None) -> J1939Message:
+        """
+        Processes one received frame (bytes-like from RP1210_ReadMessage, or a J1939Message).
+
+        Returns the message if it answered at least one request, otherwise None.
+        """
+        if isinstance(frame, J1939Message):
+            msg = frame
+            pgn = frame.pgn & 0x3FFFF
+            sa = frame.sa
+        else:
+            msg = None
+            start = self._start
+            header = frame[start - 1:start + 6]
+            if len(header) < 7:
+                return None
+            if self.echo and header[0]:
+                return None # our own message
+            pgn = (header[1] | (header[2] << 8) | (header[3] << 16)) & 0x3FFFF
+            sa = header[5]
+        if (pgn >> 8) & 0xFF < 0xF0: # PDU1: clear the destination, like routingPGN()
+            pgn &= 0x3FF00
+        if now is None:
+            now = time.perf_counter()
+        if now >= self._next_deadline:
+            self.expire(now)
+        if (pgn != TP_CM and pgn != TP_DT and pgn != PGN_ACKNOWLEDGMENT
+                and (pgn, sa) not in self._pending and (pgn, 0xFF) not in self._pending):
+            return None # nothing to do with us (dict lookups are safe without the lock)
+        with self._lock:
+            if pgn == TP_CM or pgn == TP_DT:
+                msg = self.transport.feed(frame, now)
+                if msg is None:
+                    return None
+                pgn = routingPGN(msg.pgn)
+            elif pgn == PGN_ACKNOWLEDGMENT:
+                if msg is None:
+                    msg = J1939Message(bytes(frame), echo=self.echo)
+                return msg if self._on_ack(msg) else None
+            if msg is None:
+                msg = J1939Message(bytes(frame), echo=self.echo)
+            if msg.pdu() == 1 and msg.da not in (self.address, 0xFF):
+                return None # a response to someone else's request
+            return msg if self._on_response(pgn, msg) else None
+
+    def expire(self, now : float = None) -> int:
+        """
+        Completes requests whose time is up: global requests with what they've collected, others
+        with TimeoutError. Returns how many were completed.
+        """
+        if now is None:
+            now = time.perf_counter()
+        count = 0
+        with self._lock:
+            deadlines = self._deadlines
+            while deadlines and deadlines[0][0] <= now:
+                _, _, pending = heapq.heappop(deadlines)
+                if pending not in self._pending.get(pending.key, ()):
+                    continue # already answered
+                if pending.future.done(): # cancelled by the caller
+                    self._remove(pending)
+                    continue
+                pgn, da = pending.key
+                if da != 0xFF and self.transport.isReceiving(da, pgn):
+                    # the response is on its way; give it as long as the transport session gets
+                    pending.deadline = now + self.transport.timeout
+                    heapq.heappush(deadlines, (pending.deadline, next(self._counter), pending))
+                    continue
+                self._remove(pending)
+                count += 1
+                if da == 0xFF:
+                    self._complete(pending, result=pending.responses)
+                else:
+                    self.timed_out += 1
+                    self._complete(pending, exception=TimeoutError(
+                                    f"No response to request for PGN {pgn:#06x} from {da:#04x}"))
+            self._next_deadline = deadlines[0][0] if deadlines else math.inf
+        return count
+
+    def run(self, receive, timeout : float = None) -> bool:
+        """
+        Feeds frames to the Correlator until every request has completed.
+        - receive = function that takes a timeout in seconds and returns received frames, e.g.
+        `lambda timeout: client.rx_batch(timeout=timeout)`
+        - timeout = give up after this many seconds (None = no limit); requests still outstanding
+        stay outstanding
+
+        Returns True if every request completed before the timeout.
+        """
+        end = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            now = time.perf_counter()
+            self.expire(now)
+            next_time = self.nextDeadline()
+            if next_time is None:
+                return True
+            if end is not None:
+                if now >= end:
+                    return False
+                next_time = min(next_time, end)
+            for frame in receive(max(next_time - now, 0.0)):
+                self.feed(frame)
+
+    def nextDeadline(self) -> float:
+        """Returns the time the next outstanding request times out, or None if there are none."""
+        with self._lock:
+            deadlines = self._deadlines
+            while deadlines and deadlines[0][2].future.done():
+                heapq.heappop(deadlines) # already answered (or cancelled)
+            return deadlines[0][0] if deadlines else None
+
+    def numPending(self) -> int:
+        """Returns the number of requests waiting for a response."""
+        with self._lock:
+            return sum(len(waiting) for waiting in self._pending.values())
+
+    def cancelAll(self) -> int:
+        """Cancels every outstanding request. Returns how many were cancelled."""
+        with self._lock:
+            pending = [request for waiting in self._pending.values() for request in waiting]
+            self._pending.clear()
+            self._deadlines.clear()
+            self._next_deadline = math.inf
+        return sum(request.future.cancel() for request in pending)
+
+    #######################
+    # PROTECTED FUNCTIONS #
+    #######################
+
+    def _on_response(self, pgn : int, msg : J1939Message) -> bool:
+        """Completes the requests `msg` answers. Returns True if there were any."""
+        sa = msg.sa
+        matched = False
+        waiting = self._pending.pop((pgn, sa), None)
+        if waiting:
+            for pending in waiting:
+                self.answered += 1
+                self._complete(pending, result=msg)
+            matched = True
+        if sa != 0xFF:
+            for pending in self._pending.get((pgn, 0xFF), ()):
+                pending.responses.setdefault(sa, msg)
+                matched = True
+        return matched
+
+    def _on_ack(self, msg : J1939Message) -> bool:
+        """Completes the requests an Acknowledgment answers. Returns True if there were any."""
+        data = msg.data
+        if len(data) < 8 or data[4] not in (self.address, 0xFF):
+            return False
+        pgn = routingPGN(data[5] | (data[6] << 8) | (data[7] << 16))
+        control = data[0]
+        if control == ACK:
+            return self._on_response(pgn, msg)
+        waiting = self._pending.pop((pgn, msg.sa), None) # global requests aren't NACKed
+        if not waiting:
+            return False
+        for pending in waiting:
+            self.refused += 1
+            self._complete(pending, exception=RequestNACK(pgn, msg.sa, control, msg))
+        return True
+
+    def _remove(self, pending : _PendingRequest) -> None:
+        waiting = self._pending.get(pending.key)
+        if waiting is not None:
+            waiting.remove(pending)
+            if not waiting:
+                del self._pending[pending.key]
+
+    def _complete(self, pending : _PendingRequest, result = None, exception : Exception = None) -> None:
+        try:
+            if exception is None:
+                pending.future.set_result(result)
+            else:
+                pending.future.set_exception(exception)
+        except InvalidStateError: # cancelled by the caller
+            pass
@@ -0,0 +1,310 @@
+"""
+Loads J1939 message and signal definitions from DBC files, for `Signals.SignalDecoder`.
+
+```
+db = loadDBC("j1939.dbc") # parsed once; later loads come from "j1939.dbc.cache"
+eec1 = db.message(0xF004) # MessageDefinition, looked up by PGN (and SA, if you like)
+decoder = db.decoder()
+values = decoder.decode(frame)
+```
+Messages with 29-bit IDs are read the J1939 way: priority, PGN, and source address, with the PS
+byte of PDU1 PGNs (PF < 0xF0) being the destination address. PGNs are indexed like
+`Router.routingPGN()`: PDU1 PGNs with the PS byte cleared, so `J1939Message.pgn & 0x3FF00` finds
+them.
+
+Parsing and compiling a large DBC file takes a while, so the result is saved beside it (`path` +
+".cache"), together with the SHA-256 of the DBC file. The cache is only used while the file's hash
+still matches:
+```
+cache: magic (8s) | version (H) | flags (H) | sha256 (32s) | marshal'd messages and extraction plans
+```
+Only BO_, SG_ and the J1939 `BA_ "SPN"` signal attribute are read. Multiplexed signals (other than
+the multiplexor itself) and signals SignalDecoder can't extract are left out, and listed in
+`DBCDatabase.skipped`.
+"""
+import hashlib
+import marshal
+import os
+import re
+import struct
+from .Router import routingPGN
+from .Signals import Signal, SignalDecoder
+
+CACHE_SUFFIX = ".cache"
+CACHE_MAGIC = b"RP1210DB"
+CACHE_VERSION = 1
+CACHE_HEADER = struct.Struct("<8sHH32s")
+"""DBC cache file header: magic, version, flags, SHA-256 of the DBC file."""
+CACHE_SPECIAL = 0x01
+"""Cache flag: unsigned signals were loaded with J1939 not available/error values (`special`)."""
+
+_EXTENDED_ID = 0x80000000 # set in BO_ IDs of 29-bit frames
+_INDEPENDENT_SIGNALS = 0xC0000000 # VECTOR__INDEPENDENT_SIG_MSG, a holder for unused signals
+
+_MESSAGE = re.compile(r"BO_\s+(\d+)\s+(\w+)\s*:\s*(\d+)\s+(\w+)")
+_SIGNAL = re.compile(r"SG_\s+(\w+)\s*(M|m\d+)?\s*:\s*(\d+)\|(\d+)@([01])([+-])\s*\(([^,]+),([^)]+)\)"
+                        r"\s*\[([^|]*)\|([^\]]*)\]\s*\"((?:[^\"\\]|\\.)*)\"")
+_SPN = re.compile(r"BA_\s+\"SPN\"\s+SG_\s+(\d+)\s+(\w+)\s+(\d+)\s*;")
+
+def _number(text : str):
+    """DBC number as an int if it's a whole number, or a float."""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+class MessageDefinition():
+    """
+    One message (BO_) from a DBC file.
+    ---
+    Accessible properties:
+    - `frame_id` : CAN ID, without the DBC extended ID flag (int)
+    - `name` : (str)
+    - `size` : data bytes (int)
+    - `sender` : transmitting node, as named in the DBC (str)
+    - `extended` : True for 29-bit IDs (bool)
+    - `pgn` : PGN, with the PS byte cleared for PDU1; None for 11-bit IDs (int)
+    - `sa` : source address; None for 11-bit IDs (int)
+    - `da` : destination address of PDU1 messages, 0xFF for PDU2; None for 11-bit IDs (int)
+    - `pri` : priority; None for 11-bit IDs (int)
+    - `signals` : (list of Signal)
+    """
+    __slots__ = ("frame_id", "name", "size", "sender", "extended", "pgn", "sa", "da", "pri", "_signals",
+                    "_signal_fields")
+
+    def __init__(self, frame_id : int, name : str, size : int, sender : str, extended = True,
+                    signals : list = None) -> None:
+        self.frame_id = frame_id
+        self.name = name
+        self.size = size
+        self.sender = sender
+        self.extended = extended
+        self._signals = signals if signals is not None else []
+        self._signal_fields = None # from the cache: made into Signals when they're first needed
+        if extended:
+            pgn = (frame_id >> 8) & 0x3FFFF
+            pdu1 = (pgn >> 8) & 0xFF < 0xF0
+            self.pgn = pgn & 0x3FF00 if pdu1 else pgn
+            self.da = pgn & 0xFF if pdu1 else 0xFF
+            self.sa = frame_id & 0xFF
+            self.pri = (frame_id >> 26) & 0b111
+        else:
+            self.pgn = self.sa = self.da = self.pri = None
+
+    @property
+    def signals(self) -> list[Signal]:
+        if self._signals is None:
+            self._signals = [_signal(*fields) for fields in self._signal_fields]
+            self._signal_fields = None
+        return self._signals
+
+    def __repr__(self) -> str:
+        return f"MessageDefinition({self.name!r}, frame_id={self.frame_id:#x}, {len(self.signals)} signals)"
+
+class DBCDatabase():
+    """
+    The messages from a DBC file, indexed by PGN and name.
+
+    There can be several messages for one PGN (e.g. from different source addresses); the
+    decoder from `decoder()` uses the first one's signals for each PGN.
+    ---
+    Accessible properties:
+    - `messages` : in file order (list of MessageDefinition)
+    - `skipped` : (message name, signal name) of signals that were left out (list of tuple)
+    - `path` : the DBC file, if it was loaded from one (str)
+    - `cached` : True if it was loaded from the cache (bool)
+    """
+    def __init__(self, messages : list, skipped : list = (), plans : dict = None) -> None:
+        self.messages = messages
+        self.skipped = list(skipped)
+        self.path = None #type: str
+        self.cached = False
+        self._plans = plans
+        self._decoder = None #type: SignalDecoder
+        self._by_pgn = {} #type: dict[int, list[MessageDefinition]]
+        self._by_name = {}
+        for message in messages:
+            self._by_name.setdefault(message.name, message)
+            if message.pgn is not None:
+                self._by_pgn.setdefault(message.pgn, []).append(message)
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __contains__(self, pgn : int) -> bool:
+        return routingPGN(pgn) in self._by_pgn
+
+    ####################
+    # PUBLIC FUNCTIONS #
+    ####################
+
+    def message(self, pgn : int, sa : int = None) -> MessageDefinition:
+        """
+        Returns the message for `pgn` (PDU1 PGNs with or without the PS byte), preferring the one
+        from `sa` if there are several; or None.
+        """
+        messages = self._by_pgn.get(routingPGN(pgn))
+        if not messages:
+            return None
+        if sa is not None:
+            for message in messages:
+                if message.sa == sa:
+                    return message
+        return messages[0]
+
+    def messagesFor(self, pgn : int) -> list[MessageDefinition]:
+        """Returns every message for `pgn`, in file order."""
+        return list(self._by_pgn.get(routingPGN(pgn), ()))
+
+    def byName(self, name : str) -> MessageDefinition:
+        """Returns the first message named `name`, or None."""
+        return self._by_name.get(name)
+
+    def pgns(self) -> list[int]:
+        """Returns every PGN with a message, in file order."""
+        return list(self._by_pgn)
+
+    def decoder(self, echo = False) -> SignalDecoder:
+        """Returns a SignalDecoder for every PGN's signals (built once, from the cache if loaded)."""
+        if self._decoder is not None and self._decoder.echo == echo:
+            return self._decoder
+        signals = {pgn: messages[0].signals for pgn, messages in self._by_pgn.items() if messages[0].signals}
+        if self._plans is None:
+            decoder = SignalDecoder(signals, echo=echo)
+            self._plans = decoder.plans()
+        else:
+            decoder = SignalDecoder(signals, echo=echo, plans=self._plans)
+        self._decoder = decoder
+        return decoder
+
+def parseDBC(text : str, special = True) -> DBCDatabase:
+    """
+    Parses the text of a DBC file.
+    - special = unsigned signals have the J1939 not available/error values (see `Signal`)
+    """
+    messages = []
+    skipped = []
+    by_id = {}
+    spns = {} # (frame id, signal name): SPN
+    message = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("SG_"):
+            match = _SIGNAL.match(line)
+            if match is None or message is None:
+                continue
+            (name, mux, start, length, order, sign, scale, offset, minimum, maximum,
+                unit) = match.groups()
+            if mux is not None and mux != "M": # multiplexed: only there for some multiplexor values
+                skipped.append((message.name, name))
+                continue
+            signed = sign == "-"
+            try:
+                signal = Signal(name, int(start), int(length), _number(scale), _number(offset),
+                                little_endian=order == "1", signed=signed, unit=unit,
+                                special=special and not signed, minimum=_number(minimum) if minimum else None,
+                                maximum=_number(maximum) if maximum else None)
+            except ValueError:
+                skipped.append((message.name, name))
+                continue
+            first, last = signal.byteSpan()
+            if last - first >= 8:
+                skipped.append((message.name, name))
+                continue
+            message.signals.append(signal)
+        elif line.startswith("BO_ "):
+            match = _MESSAGE.match(line)
+            if match is None:
+                message = None
+                continue
+            frame_id = int(match.group(1))
+            if frame_id == _INDEPENDENT_SIGNALS:
+                message = None
+                continue
+            extended = bool(frame_id & _EXTENDED_ID)
+            message = MessageDefinition(frame_id & 0x1FFFFFFF, match.group(2), int(match.group(3)),
+                                        match.group(4), extended)
+            messages.append(message)
+            by_id.setdefault(frame_id, message)
+        elif line.startswith("BA_ "):
+            match = _SPN.match(line)
+            if match is not None:
+                spns[(int(match.group(1)), match.group(2))] = int(match.group(3))
+        else: # anything else ends the message's signals
+            message = None
+    for (frame_id, name), spn in spns.items():
+        message = by_id.get(frame_id)
+        for signal in message.signals if message is not None else ():
+            if signal.name == name:
+                signal.spn = spn
+    return DBCDatabase(messages, skipped)
+
+def loadDBC(path : str, special = True, cache_path : str = None, persist_cache = True) -> DBCDatabase:
+    """
+    Loads a DBC file, from its cache if the cache was saved from the same file contents.
+    - special = unsigned signals have the J1939 not available/error values (see `Signal`)
+    - cache_path = where the cache is kept; defaults to `path` + ".cache"
+    - persist_cache = save the cache after parsing (failures to save it are ignored)
+    """
+    with open(path, "rb") as f:
+        contents = f.read()
+    digest = hashlib.sha256(contents).digest()
+    if cache_path is None:
+        cache_path = path + CACHE_SUFFIX
+    flags = CACHE_SPECIAL if special else 0
+    db = _load_cache(cache_path, digest, flags)
+    if db is None:
+        db = parseDBC(contents.decode("latin-1"), special)
+        db.decoder() # compile the plans, so they're cached too
+        if persist_cache:
+            try:
+                _save_cache(db, cache_path, digest, flags)
+            except OSError: # e.g. the DBC file's directory is read-only
+                pass
+    db.path = path
+    return db
+
+def _signal(name, start, length, scale, offset, little_endian, signed, unit, spn, special, minimum,
+                maximum) -> Signal:
+    return Signal(name, start, length, scale, offset, little_endian, signed, unit, spn, special=special,
+                    minimum=minimum, maximum=maximum)
+
+def _save_cache(db : DBCDatabase, cache_path : str, digest : bytes, flags : int) -> None:
+    messages = tuple((message.frame_id, message.name, message.size, message.sender, message.extended,
+                        tuple((signal.name, signal.start, signal.length, signal.scale, signal.offset,
+                                signal.little_endian, signal.signed, signal.unit, signal.spn,
+                                signal.special, signal.minimum, signal.maximum)
+                                for signal in message.signals))
+                    for message in db.messages)
+    payload = marshal.dumps((messages, tuple(db.skipped), db._plans))
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, flags, digest))
+        f.write(payload)
+    os.replace(tmp_path, cache_path)
+
+def _load_cache(cache_path : str, digest : bytes, flags : int) -> DBCDatabase:
+    """Returns the database saved in `cache_path` if it was saved from the same file, or None."""
+    try:
+        with open(cache_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < CACHE_HEADER.size:
+        return None
+    magic, version, cache_flags, cache_digest = CACHE_HEADER.unpack_from(data)
+    if magic != CACHE_MAGIC or version != CACHE_VERSION or cache_flags != flags or cache_digest != digest:
+        return None
+    try:
+        messages, skipped, plans = marshal.loads(data[CACHE_HEADER.size:])
+        definitions = []
+        for frame_id, name, size, sender, extended, signals in messages:
+            message = MessageDefinition(frame_id, name, size, sender, extended, None)
+            message._signals = None
+            message._signal_fields = signals
+            definitions.append(message)
+    except (EOFError, ValueError, TypeError): # truncated or from another version of this module
+        return None
+    db = DBCDatabase(definitions, [tuple(entry) for entry in skipped], plans)
+    db.cached = True
+    return db
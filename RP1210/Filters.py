@@ -0,0 +1,476 @@
+"""
+Host-side (software) filtering for J1939 frames, for rules the adapter can't apply itself.
+
+`Commands.setJ1939Filters()` only takes one PGN/SA/DA combination per command, and some drivers
+limit how many filters they'll hold (ERR_MAX_FILTERS_EXCEEDED). SoftwareFilter takes any number of
+pass/discard rules over PGN, source, destination, priority and data bytes, and applies them to raw
+frames before anything is decoded:
+```
+filt = SoftwareFilter([
+    FilterRule(pgn=0xFECA, action=PASS), # DM1 from anyone
+    FilterRule(sa=range(0x80, 0xF8), action=DISCARD), # nothing else from these sources
+    FilterRule(pgn=0xFF00, data_mask=b'\\xFF', data_value=b'\\x42', action=PASS),
+    FilterRule(pri=(0, 1, 2, 3), action=PASS),
+], default=DISCARD)
+for msg in filt.filter(client.rx_batch()):
+    ...
+```
+Rules are checked in order and the first one that matches decides; frames no rule matches get
+`default`.
+
+To keep unwanted traffic off the host in the first place, `planCANFilters()` and
+`planJ1939Filters()` fit the IDs or PGNs you want into the adapter's filter budget, merging them
+where they have to so as little else as possible gets through:
+```
+plan = planJ1939Filters([0xFECA, (0xF004, 0x00), (0xFEF1, 0x00)], max_filters=2,
+                        traffic=measureTraffic(client.rx_batch(timeout=1.0)))
+plan.program(client)
+print(plan.fraction) # estimated share of bus traffic that still reaches the host
+frames = client.rx_batch()
+if plan.software: # the adapter also passes some frames that weren't asked for
+    frames = plan.software.filter(frames)
+```
+"""
+from functools import partial
+from . import Commands
+from .J1939 import J1939Message
+from .Router import HeaderIndex, routingPGN
+
+PASS = True
+DISCARD = False
+
+def _table(values) -> bytes:
+    """256-entry lookup table: 1 for each value in `values` (int or iterable of int), or all 1s."""
+    if values is None:
+        return b'\x01' * 256
+    if isinstance(values, int):
+        values = (values,)
+    table = bytearray(256)
+    for value in values:
+        table[value] = 1
+    return bytes(table)
+
+def _values(table : bytes):
+    """The values a `_table()` accepts, or None if it accepts everything."""
+    if all(table):
+        return None
+    return [value for value, accepted in enumerate(table) if accepted]
+
+class FilterRule():
+    """
+    One pass or discard rule for SoftwareFilter. Criteria that are None match anything; a frame
+    matches the rule if it matches every criterion.
+    ---
+    Params:
+    - `pgn` : PGN(s); for PDU1 PGNs the PS byte is ignored, use `da` (int or iterable of int)
+    - `pgn_range` : (first, last) PGNs, inclusive (tuple of 2 int)
+    - `sa` : source address(es) (int or iterable of int, e.g. a range)
+    - `da` : destination address(es); PDU2 messages have DA 0xFF (int or iterable of int)
+    - `pri` : priority/priorities (int or iterable of int)
+    - `data_mask`, `data_value` : the start of the data, ANDed with `data_mask`, must equal
+    `data_value` (bytes)
+    - `action` : PASS or DISCARD (bool)
+    """
+    __slots__ = ("pgns", "pgn_range", "sa_table", "da_table", "pri_table", "data_mask",
+                    "data_value", "data_size", "action")
+
+    def __init__(self, pgn = None, pgn_range : tuple = None, sa = None, da = None, pri = None,
+                    data_mask : bytes = b'', data_value : bytes = b'', action : bool = PASS) -> None:
+        if isinstance(pgn, int):
+            pgn = (pgn,)
+        self.pgns = None if pgn is None else frozenset(routingPGN(value) for value in pgn)
+        self.pgn_range = None if pgn_range is None else (pgn_range[0], pgn_range[1])
+        self.sa_table = _table(sa)
+        self.da_table = _table(da)
+        self.pri_table = _table(pri)
+        if len(data_value) > len(data_mask):
+            data_mask = data_mask + b'\xFF' * (len(data_value) - len(data_mask))
+        self.data_size = len(data_mask)
+        self.data_mask = int.from_bytes(data_mask, 'big')
+        self.data_value = int.from_bytes(data_value.ljust(len(data_mask), b'\x00'), 'big') & self.data_mask
+        self.action = bool(action)
+
+    def matchesHeader(self, pgn : int, sa : int, da : int, pri : int) -> bool:
+        """Checks everything but the data bytes. `pgn` must be a routing PGN (see `routingPGN()`)."""
+        if self.pgns is not None and pgn not in self.pgns:
+            return False
+        if self.pgn_range is not None and not self.pgn_range[0] <= pgn <= self.pgn_range[1]:
+            return False
+        return bool(self.sa_table[sa] and self.da_table[da] and self.pri_table[pri])
+
+    def matchesData(self, data) -> bool:
+        """Checks the data bytes (bytes-like). Data shorter than the mask doesn't match."""
+        if not self.data_size:
+            return True
+        if len(data) < self.data_size:
+            return False
+        return int.from_bytes(data[:self.data_size], 'big') & self.data_mask == self.data_value
+
+class SoftwareFilter():
+    """
+    Applies pass/discard rules to raw J1939 frames (or J1939Messages).
+
+    The rules are compiled into a HeaderIndex as they're added: per-field tables (PGNs, PGN
+    ranges, SA, DA, priority) holding one bit per rule. A frame's header picks out the rules it
+    matches with a few lookups, and the lowest one decides, so the cost doesn't grow with the
+    number of rules or depend on what traffic has been seen. Only rules with a data mask look at
+    the data, and only if their header matches.
+    ---
+    Params:
+    - `rules` : FilterRules, checked in order (iterable)
+    - `default` : what happens to frames no rule matches: PASS or DISCARD (bool)
+    - `echo` : set to True if frames include the echo byte (bool)
+    ---
+    Accessible properties:
+    - `passed`, `discarded` : frame counts (int)
+    """
+    def __init__(self, rules = (), default : bool = DISCARD, echo = False) -> None:
+        self.default = bool(default)
+        self.echo = echo
+        self.passed = 0
+        self.discarded = 0
+        self._rules = [] #type: list[FilterRule]
+        self._index = HeaderIndex(echo)
+        self._start = 4 + int(bool(echo)) # header offset in a frame
+        for rule in rules:
+            self.addRule(rule)
+
+    ####################
+    # PUBLIC FUNCTIONS #
+    ####################
+
+    def addRule(self, rule : FilterRule = None, **kwargs) -> FilterRule:
+        """
+        Adds a rule after the existing ones: either a FilterRule, or FilterRule's arguments.
+
+        Returns the rule.
+        """
+        if rule is None:
+            rule = FilterRule(**kwargs)
+        self._rules.append(rule)
+        self._index.add(rule.pgns, rule.pgn_range, _values(rule.sa_table), _values(rule.da_table),
+                        _values(rule.pri_table[:8]))
+        return rule
+
+    def rules(self) -> list[FilterRule]:
+        """Returns the rules, in the order they're checked."""
+        return list(self._rules)
+
+    def clear(self) -> None:
+        """Removes every rule (so every frame gets `default`)."""
+        self._rules.clear()
+        self._index.clear()
+
+    def accepts(self, frame) -> bool:
+        """Returns True if the frame (bytes-like from RP1210_ReadMessage, or J1939Message) passes."""
+        bits = self._index.match(frame)
+        decision = self.default
+        data = None
+        rules = self._rules
+        while bits: # the rules whose header matches, in order
+            low = bits & -bits
+            rule = rules[low.bit_length() - 1]
+            if not rule.data_size:
+                decision = rule.action
+                break
+            if data is None:
+                data = frame.data if isinstance(frame, J1939Message) else frame[self._start + 6:]
+            if rule.matchesData(data):
+                decision = rule.action
+                break
+            bits ^= low
+        if decision:
+            self.passed += 1
+        else:
+            self.discarded += 1
+        return decision
+
+    def filter(self, frames) -> list:
+        """
+        Returns the frames that pass, from any iterable of frames (e.g. `rx_batch()`, or an RxArena,
+        whose frames are only valid until it's read into again).
+        """
+        accepts = self.accepts
+        return [frame for frame in frames if accepts(frame)]
+
+    def filter_buffer(self, buffer, offsets, lengths = None) -> list[int]:
+        """
+        Returns the indices of the frames that pass in a batch-read buffer. Takes the same
+        arguments as `J1939.decode_batch()`:
+        - offsets = N+1 frame boundaries in `buffer` (frame i is `buffer[offsets[i]:offsets[i+1]]`),
+        or N frame start offsets if `lengths` is given
+        - lengths = N frame lengths, for frames that aren't contiguous (e.g. RxArena slots)
+
+        Nothing is copied but the headers.
+        """
+        view = memoryview(buffer)
+        if view.format != 'B' or view.ndim != 1:
+            view = view.cast('B')
+        accepts = self.accepts
+        if lengths is None:
+            bounds = list(offsets)
+            starts = bounds[:-1]
+            ends = bounds[1:]
+        else:
+            starts = offsets
+            ends = [offset + length for offset, length in zip(offsets, lengths)]
+        return [i for i, (start, end) in enumerate(zip(starts, ends)) if accepts(view[start:end])]
+
+###########################
+# HARDWARE FILTER PLANNER #
+###########################
+
+ERR_MAX_FILTERS_EXCEEDED = 161
+
+# planner keys: 29- or 11-bit CAN IDs, or (routing PGN << 8) | SA for J1939 (a CAN ID minus priority)
+_J1939_FIELDS = (0x3FFFF << 8, 0xFF) # PGN, SA
+_J1939_WIDTH = 26
+
+def _popcount(value : int) -> int:
+    return bin(value).count("1")
+
+def j1939CANFilter(pgn : int = None, sa : int = None, da : int = None) -> tuple:
+    """
+    Returns the (mask, header) for `setCANFilters()` that matches J1939 frames on an extended CAN
+    client, whatever their priority. Leave out `pgn`, `sa` or `da` to match any; `da` only applies
+    to PDU1 PGNs, and is ignored for PDU2 PGNs (where the PS byte is the group extension).
+    """
+    mask = header = 0
+    pdu1 = True
+    if pgn is not None:
+        pdu1 = (pgn >> 8) & 0xFF < 0xF0
+        pgn_mask = 0x3FF00 if pdu1 else 0x3FFFF
+        mask |= pgn_mask << 8
+        header |= (pgn & pgn_mask) << 8
+    if da is not None and pdu1:
+        mask |= 0xFF00
+        header |= (da & 0xFF) << 8
+    if sa is not None:
+        mask |= 0xFF
+        header |= sa & 0xFF
+    return (mask, header)
+
+def measureTraffic(frames, protocol : str = "J1939", echo = False) -> dict:
+    """
+    Counts frames (from `rx_batch()`, a capture, etc.) by the key the filter planner uses: the CAN
+    ID for CAN frames, or `(routingPGN(pgn) << 8) | sa` for J1939 frames. Pass the result to
+    `planCANFilters()` or `planJ1939Filters()` as `traffic`.
+    """
+    start = 4 + int(bool(echo))
+    counts = {} #type: dict[int, int]
+    for frame in frames:
+        if isinstance(frame, J1939Message):
+            key = (routingPGN(frame.pgn) << 8) | frame.sa
+        elif protocol == "J1939":
+            header = frame[start:start + 6]
+            if len(header) < 6:
+                continue
+            key = (routingPGN(int.from_bytes(header[:3], 'little')) << 8) | header[4]
+        else: # CAN: type byte, then a 4-byte (extended) or 2-byte (standard) ID
+            header = frame[start:start + 5]
+            if len(header) < 3:
+                continue
+            if header[0]:
+                key = int.from_bytes(header[1:5], 'big') & 0x1FFFFFFF
+            else:
+                key = int.from_bytes(header[1:3], 'big') & 0x7FF
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+class FilterPlan():
+    """
+    Adapter filters worked out by `planCANFilters()` or `planJ1939Filters()`.
+
+    The adapter filters can only pass a superset of what was asked for; when the filter budget
+    forced wanted IDs to be merged, `software` (J1939) or `wants()` picks out the frames that were
+    actually wanted from the ones the adapter also lets through.
+    ---
+    Accessible properties:
+    - `protocol` : "J1939" or "CAN" (str)
+    - `filters` : arguments for each `setJ1939Filters()` or `setCANFilters()` call (list of tuple)
+    - `pass_all` : True if the adapter should pass everything (bool)
+    - `max_filters` : the filter budget the plan was made for (int)
+    - `fraction` : estimated fraction of bus traffic the adapter will pass to the host (float)
+    - `exact` : True if the adapter filters pass nothing but the wanted frames (bool)
+    - `software` : SoftwareFilter for what the adapter passes, or None if `exact` or CAN (SoftwareFilter)
+    """
+    def __init__(self, protocol : str, wanted : list, cubes : list, max_filters : int,
+                    fraction : float, replan = None, can_type : int = 1) -> None:
+        self.protocol = protocol
+        self.max_filters = max_filters
+        self.fraction = fraction
+        self.pass_all = any(mask == 0 for mask, _ in cubes)
+        self.exact = not self.pass_all and set(cubes) <= set(wanted)
+        self._wanted = wanted
+        self._replan = replan
+        if self.pass_all:
+            self.filters = []
+        elif protocol == "J1939":
+            self.filters = [_j1939FilterArgs(mask, header) for mask, header in cubes]
+        else:
+            self.filters = [(can_type, mask, header) for mask, header in cubes]
+        self.software = None
+        if protocol == "J1939" and not self.exact:
+            rules = []
+            for mask, header in wanted:
+                pgn, sa = _j1939FilterArgs(mask, header)[1:3]
+                rules.append(FilterRule(pgn=pgn if mask & _J1939_FIELDS[0] else None,
+                                        sa=sa if mask & _J1939_FIELDS[1] else None))
+            self.software = SoftwareFilter(rules, default=DISCARD)
+
+    def __str__(self) -> str:
+        filters = "pass all" if self.pass_all else f"{len(self.filters)} filters"
+        return f"{self.protocol} filter plan: {filters}, ~{self.fraction:.1%} of traffic"
+
+    def wants(self, key : int) -> bool:
+        """Returns True if a CAN ID (or J1939 planner key, see `measureTraffic()`) was asked for."""
+        return any(key & mask == header for mask, header in self._wanted)
+
+    def program(self, client) -> int:
+        """
+        Programs the adapter through an RP1210Client (or anything with its filter commands). If
+        the driver runs out of filters before the plan does (ERR_MAX_FILTERS_EXCEEDED), the plan is
+        redone for the number of filters it took, and programmed again.
+
+        Returns the RP1210 error code (0 for success).
+        """
+        while True:
+            if self.pass_all:
+                return client.setAllFiltersToPass()
+            ret_val = client.setAllFiltersToDiscard()
+            if ret_val:
+                return ret_val
+            set_filter = client.setJ1939Filters if self.protocol == "J1939" else client.setCANFilters
+            for index, args in enumerate(self.filters):
+                ret_val = set_filter(*args)
+                if ret_val:
+                    break
+            else:
+                return 0
+            if ret_val != ERR_MAX_FILTERS_EXCEEDED or self._replan is None:
+                return ret_val
+            self.__dict__.update(self._replan(max_filters=index).__dict__)
+
+def planCANFilters(ids, max_filters : int = 8, traffic : dict = None, extended = True) -> FilterPlan:
+    """
+    Works out at most `max_filters` CAN mask/header filters that pass every wanted ID while
+    letting as little else through as possible.
+    ---
+    Params:
+    - `ids` : wanted CAN IDs, or (mask, header) pairs such as `j1939CANFilter()` returns (iterable)
+    - `max_filters` : the driver's filter budget (int)
+    - `traffic` : frame counts or rates by CAN ID, e.g. from `measureTraffic()`; without it, every
+    ID is assumed to be equally busy (dict)
+    - `extended` : 29-bit (True) or 11-bit (False) IDs (bool)
+    """
+    ids = list(ids)
+    width = 29 if extended else 11
+    full = (1 << width) - 1
+    wanted = []
+    for item in ids:
+        mask, header = (full, item) if isinstance(item, int) else item
+        wanted.append((mask & full, header & mask & full))
+    cubes, fraction = _plan(wanted, max_filters, traffic, width, None)
+    replan = partial(planCANFilters, ids, traffic=traffic, extended=extended)
+    return FilterPlan("CAN", wanted, cubes, max_filters, fraction, replan, int(bool(extended)))
+
+def planJ1939Filters(wanted, max_filters : int = 8, traffic : dict = None) -> FilterPlan:
+    """
+    Works out at most `max_filters` J1939 (PGN, source) filters that pass every wanted message
+    while letting as little else through as possible. Filters that can't each have their own
+    entry are widened to every source of a PGN, or every PGN from a source.
+    ---
+    Params:
+    - `wanted` : PGNs, or (PGN, SA) tuples where either may be None for any (iterable)
+    - `max_filters` : the driver's filter budget (int)
+    - `traffic` : frame counts or rates by `(routingPGN(pgn) << 8) | sa`, e.g. from
+    `measureTraffic()`; without it, every PGN and source is assumed to be equally busy (dict)
+    """
+    wanted = list(wanted)
+    cubes = []
+    for item in wanted:
+        pgn, sa = (item, None) if isinstance(item, int) else item
+        mask = header = 0
+        if pgn is not None:
+            mask |= _J1939_FIELDS[0]
+            header |= routingPGN(pgn) << 8
+        if sa is not None:
+            mask |= _J1939_FIELDS[1]
+            header |= sa & 0xFF
+        cubes.append((mask, header))
+    planned, fraction = _plan(cubes, max_filters, traffic, _J1939_WIDTH, _J1939_FIELDS)
+    replan = partial(planJ1939Filters, wanted, traffic=traffic)
+    return FilterPlan("J1939", cubes, planned, max_filters, fraction, replan)
+
+def _j1939FilterArgs(mask : int, header : int) -> tuple:
+    """(filter_flag, pgn, source, dest) for `setJ1939Filters()` from a J1939 planner mask/header."""
+    flag = 0
+    if mask & _J1939_FIELDS[0]:
+        flag |= Commands.J1939_FILTERS["PGN"]
+    if mask & _J1939_FIELDS[1]:
+        flag |= Commands.J1939_FILTERS["SOURCE"]
+    return (flag, header >> 8, header & 0xFF, 0)
+
+def _plan(cubes : list, max_filters : int, traffic : dict, width : int, fields : tuple):
+    """
+    Greedily merges (mask, header) filters until there are at most `max_filters`, each time
+    picking the merge that adds the least traffic (ties go to the merge that adds the fewest IDs).
+    With `fields`, whole fields are kept or dropped, as J1939 filters work.
+
+    Returns (filters, estimated fraction of traffic passed).
+    """
+    traffic = list((traffic or {}).items())
+    total_ids = 1 << width
+    full = total_ids - 1
+
+    def size(mask):
+        return 1 << (width - _popcount(mask))
+
+    def weight(cube):
+        mask, header = cube
+        return sum(rate for key, rate in traffic if key & mask == header)
+
+    def merge(a, b):
+        mask = a[0] & b[0] & ~(a[1] ^ b[1]) & full
+        if fields is not None:
+            for field in fields:
+                if mask & field != field:
+                    mask &= ~field
+        return (mask, a[1] & mask)
+
+    def covers(a, b): # a passes everything b does
+        return b[0] & a[0] == a[0] and b[1] & a[0] == a[1]
+
+    # drop duplicates and filters another one already covers
+    filters = []
+    for cube in sorted(set(cubes), key=lambda cube: _popcount(cube[0])):
+        if not any(covers(other, cube) for other in filters):
+            filters.append(cube)
+    if max_filters < 1 and filters:
+        filters = [(0, 0)] # nothing to filter with: pass everything
+    weights = {cube: weight(cube) for cube in filters}
+
+    def cost(a, b):
+        merged = merge(a, b)
+        if merged not in weights:
+            weights[merged] = weight(merged)
+        return (weights[merged] - weights[a] - weights[b], size(merged[0]) - size(a[0]) - size(b[0]))
+
+    costs = {(a, b): cost(a, b) for i, a in enumerate(filters) for b in filters[i + 1:]}
+    while len(filters) > max(max_filters, 1):
+        a, b = min(costs, key=costs.get)
+        merged = merge(a, b)
+        filters = [cube for cube in filters if not covers(merged, cube)]
+        alive = set(filters)
+        costs = {pair: value for pair, value in costs.items() if pair[0] in alive and pair[1] in alive}
+        costs.update({(cube, merged): cost(cube, merged) for cube in filters})
+        filters.append(merged)
+
+    total = sum(rate for _, rate in traffic)
+    if total:
+        passed = sum(rate for key, rate in traffic
+                        if any(key & mask == header for mask, header in filters))
+        fraction = passed / total
+    else: # at most; filters may overlap
+        fraction = min(1.0, sum(size(mask) for mask, _ in filters) / total_ids)
+    return filters, fraction
@@ -6,8 +6,20 @@ While a dict of J1939 PGNs would be convenient, they are not provided here becau
 copyright of SAE.
 """
 
+import struct
 from . import sanitize_msg_param
 
+try:
+    import numpy as np
+except ImportError: # numpy is only needed for the batch functions
+    np = None
+
+# precompiled layouts for the fixed-size encoders; the generic sanitize_msg_param path handles
+# anything that isn't a plain in-range int
+_J1939_HEADER = struct.Struct("<HBBBB") # PGN (3 bytes, LE), how/pri, SA, DA
+_DTC = struct.Struct("<HBB") # SPN low 16 bits, SPN high 3 bits + FMI, CM + OC
+_NET_MGMT_NAME = struct.Struct("<IBBBB")
+
 def toJ1939Message(pgn, pri, sa, da, data, size = 0, how = 0) -> bytes:
     """
     Converts args to J1939 message suitable for RP1210_SendMessage function.
@@ -30,6 +42,11 @@ def toJ1939Message(pgn, pri, sa, da, data, size = 0, how = 0) -> bytes:
     so don't provide it with letters or special characters unless that's what you mean to send.
     If you want to send it 0xFF, send it as an int and not "FF". Likewise, 0 != "0".
     """
+    if (type(pgn) is int and type(pri) is int and type(sa) is int and type(da) is int
+            and type(how) is int and 0 <= pgn <= 0xFFFFFF and 0 <= pri <= 0xFF and 0 <= how <= 0xFF
+            and 0 <= sa <= 0xFF and 0 <= da <= 0xFF):
+        how_pri = pri & (0b111 + ((how & 0b1) << 7))
+        return _J1939_HEADER.pack(pgn & 0xFFFF, pgn >> 16, how_pri, sa, da) + sanitize_msg_param(data, size)
     ret_val = sanitize_msg_param(pgn, 3, 'little')
     how_pri = sanitize_msg_param(pri, 1)[0] & 0b111 + ((sanitize_msg_param(how, 1)[0] & 0b1) << 7)
     ret_val += sanitize_msg_param(how_pri, 1) # combine how & pri
@@ -216,6 +233,9 @@ class DTC():
     @staticmethod
     def to_bytes(spn : int, fmi : int, oc : int) -> bytes:
         """Generates 4-byte DTC from SPN, FMI, and OC."""
+        if type(spn) is int and type(fmi) is int and type(oc) is int and 0 <= spn <= 0xFFFFFF:
+            return _DTC.pack(spn & 0xFFFF, ((spn >> 11) & 0b11100000) | (fmi & 0b00011111),
+                                oc & 0b01111111)
         ret_val = b''
         # bytes 0 and 1 are just SPN in little-endian format
         spn_bytes = sanitize_msg_param(spn, 3, 'little')
@@ -310,7 +330,13 @@ class J1939Message():
 
     NOTE: When PGN and other values like DA conflict, the most recently assigned value will take precedence.
     When ambiguous, this class will default to assigning the destination address to the PGN rather than from it.
+
+    NOTE: Setting properties doesn't re-encode the message; it's encoded once, the next time `msg` (or
+    `bytes()`, `len()`, etc.) is read. Instances use `__slots__`, so other attributes can't be added.
     """
+    __slots__ = ("_msg", "_pgn", "_da", "_sa", "_pri", "_data", "_res", "_dp", "timestamp", "_isecho",
+                    "_how", "_dirty")
+
     def __init__(self, RP1210_ReadMessage_bytes : bytes = None,
                     pgn : int = None, da : int = None, sa : int = None, data : bytes = None,
                     pri : int = 6, size : int = 0, how = 0, echo = False) -> None:
@@ -326,6 +352,7 @@ class J1939Message():
         self.timestamp = 0 # will only be overwritten if RP1210_ReadMessage_bytes is provided
         self._isecho = False
         self._how = how
+        self._dirty = False # True when _msg needs to be re-encoded from the other fields
         # process bytes from RP1210_ReadMessage
         if RP1210_ReadMessage_bytes is not None:
             self._assign_from_rp1210_readmessage(RP1210_ReadMessage_bytes, int(echo))
@@ -344,6 +371,7 @@ class J1939Message():
             RP1210_ReadMessage_bytes += b'\x00' * missing_length
         self.timestamp = int.from_bytes(RP1210_ReadMessage_bytes[0:4], 'big')
         self._msg = RP1210_ReadMessage_bytes[4+echo:]
+        self._dirty = False
         if echo and RP1210_ReadMessage_bytes[4] == 0x01:
             self._isecho = True
         self._assign_from_msg()
@@ -393,8 +421,19 @@ class J1939Message():
         self._assign_to_pgn(assign_da=True)
 
     def _assign_to_msg(self):
-        self._msg = toJ1939Message(self._pgn, self._pri, self._sa, self._da, self._data,
-                                    size=self.size, how=self._how)
+        """Marks `msg` as out of date; it's re-encoded the next time it's read."""
+        self._dirty = True
+
+    def _encode(self) -> bytes:
+        """Encodes the message from its fields. Same output as `toJ1939Message()`."""
+        pgn, pri, sa, da, how, data = self._pgn, self._pri, self._sa, self._da, self._how, self._data
+        if (type(pgn) is int and type(pri) is int and type(sa) is int and type(da) is int
+                and type(how) is int and type(data) is bytes and 0 <= pgn <= 0xFFFFFF
+                and 0 <= pri <= 0xFF and 0 <= sa <= 0xFF and 0 <= da <= 0xFF and 0 <= how <= 0xFF):
+            # toJ1939Message masks pri with (0b111 + how bit), so do the same
+            return _J1939_HEADER.pack(pgn & 0xFFFF, pgn >> 16, pri & (0b111 + ((how & 0b1) << 7)),
+                                        sa, da) + data
+        return toJ1939Message(pgn, pri, sa, da, data, size=len(data), how=how)
 
     def _assign_from_pgn(self, assign_da = True):
         if self.pdu() == 1 and (assign_da or self._da is None): # destination specific
@@ -422,6 +461,9 @@ class J1939Message():
 
         Will be filled with bytes of 0x00 if len isn't long enough to fill a message.
         """
+        if self._dirty:
+            self._msg = self._encode()
+            self._dirty = False
         return self._msg
 
     @msg.setter
@@ -432,6 +474,7 @@ class J1939Message():
             new_val += b'\x00' * (6 - len(new_val)) # fill with empty bytes to hit 6
         # assign values
         self._msg = new_val
+        self._dirty = False
         self._assign_from_msg()
 
     @property
@@ -580,45 +623,43 @@ class J1939Message():
     #################
 
     def __getitem__(self, index : int) -> int:
-        return self._msg[index]
+        return self.msg[index]
 
     def __setitem__(self, index : int, val):
-        if index >= len(self._msg):
+        if index >= len(self.msg):
             self.size = index - 5
-        new_msg = b''
-        for x in range(len(self._msg)):
-            if x == index:
-                new_msg += sanitize_msg_param(val, 1)
-            else:
-                new_msg += int.to_bytes(self._msg[x], 1, 'big')
-        self._msg = new_msg
+        new_msg = bytearray(self.msg)
+        if 0 <= index < len(new_msg):
+            new_msg[index:index + 1] = sanitize_msg_param(val, 1)
+        self._msg = bytes(new_msg)
+        self._dirty = False
         self._assign_from_msg()
 
     def __iadd__(self, val):
-        self._msg += sanitize_msg_param(val, 1)
+        self._msg = self.msg + sanitize_msg_param(val, 1)
         self._assign_from_msg()
         return self
 
     def __bytes__(self) -> bytes:
-        return self._msg
+        return self.msg
 
     def __int__(self) -> int:
-        return int.from_bytes(self._msg, 'big')
+        return int.from_bytes(self.msg, 'big')
 
     def __str__(self) -> str:
-        return str(self._msg)
+        return str(self.msg)
 
     def __len__(self) -> int:
-        return len(self._msg)
+        return len(self.msg)
 
     def __eq__(self, other) -> bool:
         try:
-            return self._msg == sanitize_msg_param(other)
+            return self.msg == sanitize_msg_param(other)
         except TypeError:
             return False
 
     def __bool__(self) -> bool:
-        return len(self._msg) > 6
+        return len(self.msg) > 6
 
     ##################
     # PUBLIC METHODS #
@@ -663,6 +704,150 @@ class J1939Message():
         """
         return self._isecho # set in __init__
 
+_EMPTY_FRAME = memoryview(bytes(11)) # zeroed frame for unbound views (long enough for echo)
+
+class J1939FrameView():
+    """
+    A read-only, zero-copy view of an RP1210_ReadMessage J1939 frame.
+
+    Fields are decoded from the underlying buffer each time they're read, and `data` is a memoryview,
+    so nothing is copied. Values match what J1939Message would give for the same frame. Use
+    `toMessage()` when you need a full (mutable) J1939Message.
+    ```
+    view = J1939FrameView()
+    for frame in client.rx_many(arena):
+        view.bind(frame) # reuse one view for every frame
+        if view.pgn == 0xF004:
+            process(view.data)
+    ```
+    The view is only valid while the buffer holds the frame (e.g. until the next read into an RxArena).
+    ---
+    Params:
+    - `buffer` : frame from RP1210_ReadMessage (bytes-like)
+    - `echo` : set to True if echo is turned on, so frames include the echo byte (bool)
+    ---
+    Accessible properties:
+    - `timestamp`, `pgn`, `pri`, `how`, `sa`, `da`, `dp`, `res`, `size` : same as J1939Message (int)
+    - `data` : message data (memoryview)
+    - `msg` : the message without timestamp (and echo byte), as passed to RP1210_SendMessage (memoryview)
+    """
+    __slots__ = ("_buf", "_echo", "_start")
+
+    def __init__(self, buffer = b'', echo = False) -> None:
+        self._echo = int(bool(echo))
+        self._start = 4 + self._echo
+        self.bind(buffer)
+
+    def bind(self, buffer) -> 'J1939FrameView':
+        """Points the view at a new frame. Returns the view."""
+        buf = memoryview(buffer)
+        if buf.format != 'B' or buf.ndim != 1: # e.g. ctypes char arrays
+            buf = buf.cast('B')
+        if len(buf) < self._start + 6: # too short; pad with zeros like J1939Message
+            buf = memoryview(bytes(buf) + b'\x00' * (self._start + 6 - len(buf)))
+        self._buf = buf
+        return self
+
+    def release(self) -> None:
+        """Drops the reference to the bound frame (e.g. so a bytearray buffer can be resized)."""
+        self._buf = _EMPTY_FRAME
+
+    @property
+    def timestamp(self) -> int:
+        return int.from_bytes(self._buf[0:4], 'big')
+
+    @property
+    def msg(self) -> memoryview:
+        return self._buf[self._start:]
+
+    @property
+    def pgn(self) -> int:
+        buf = self._buf
+        i = self._start
+        pf = buf[i + 1]
+        if pf < 0xF0: # PDU1; PS byte is the destination address
+            return ((buf[i + 2] & 0b11) << 16) | (pf << 8) | buf[i + 5]
+        return ((buf[i + 2] & 0b11) << 16) | (pf << 8) | buf[i]
+
+    @property
+    def pri(self) -> int:
+        return self._buf[self._start + 3] & 0b111
+
+    @property
+    def how(self) -> int:
+        return self._buf[self._start + 3] >> 7
+
+    @property
+    def sa(self) -> int:
+        return self._buf[self._start + 4]
+
+    @property
+    def da(self) -> int:
+        if self._buf[self._start + 1] < 0xF0:
+            return self._buf[self._start + 5]
+        return 0xFF
+
+    @property
+    def dp(self) -> int:
+        return self._buf[self._start + 2] & 0b1
+
+    @property
+    def res(self) -> int:
+        return (self._buf[self._start + 2] >> 1) & 0b1
+
+    @property
+    def data(self) -> memoryview:
+        return self._buf[self._start + 6:]
+
+    @property
+    def size(self) -> int:
+        return len(self._buf) - self._start - 6
+
+    def pf(self) -> int:
+        """Returns PDU Format byte as int."""
+        return self._buf[self._start + 1]
+
+    def ps(self) -> int:
+        """Returns PDU Specific byte as int (the DA for PDU1 messages)."""
+        return self.pgn & 0xFF
+
+    def pdu(self) -> int:
+        """Returns PDU type: 1 = PDU 1 (destination specific), 2 = PDU 2 (broadcast)."""
+        return 1 if self.pf() < 0xF0 else 2
+
+    def isRequest(self) -> bool:
+        return self.pf() == 0xEA
+
+    def isEcho(self) -> bool:
+        """Returns True if echo is on and this frame is an echo of a message you sent."""
+        return bool(self._echo) and self._buf[4] == 0x01
+
+    def timestamp_bytes(self) -> bytes:
+        """Returns the 4-byte timestamp as bytes."""
+        return bytes(self._buf[0:4])
+
+    def toMessage(self) -> J1939Message:
+        """Copies the frame into a full J1939Message."""
+        return J1939Message(bytes(self._buf), echo=bool(self._echo))
+
+    def __bytes__(self) -> bytes:
+        return bytes(self.msg)
+
+    def __len__(self) -> int:
+        return len(self._buf) - self._start
+
+    def __getitem__(self, index : int) -> int:
+        return self.msg[index]
+
+    def __eq__(self, other) -> bool:
+        try:
+            return bytes(self.msg) == sanitize_msg_param(other)
+        except TypeError:
+            return False
+
+    def __str__(self) -> str:
+        return str(bytes(self.msg))
+
 class DiagnosticMessage():
     """
     A convenience class for parsing Diagnostic Messages DM1, DM2, and DM12.
@@ -877,6 +1062,186 @@ class DiagnosticMessage():
 
     #endregion
 
+###################
+# BATCH FUNCTIONS #
+###################
+
+J1939_BATCH_FIELDS = [('timestamp', 'u4'), ('echo', 'u1'), ('pgn', 'u4'), ('pri', 'u1'), ('how', 'u1'),
+                        ('sa', 'u1'), ('da', 'u1'), ('dp', 'u1'), ('res', 'u1'), ('pf', 'u1'),
+                        ('ps', 'u1'), ('data_offset', 'u4'), ('size', 'u2')]
+"""Fields of the structured array returned by `decode_batch()`, as (name, NumPy type) pairs."""
+
+def decode_batch(buffer, offsets, lengths = None, echo = False):
+    """
+    Decodes many RP1210_ReadMessage J1939 frames at once into a NumPy structured array, with the
+    same field values J1939Message would give each frame. Requires NumPy.
+    - buffer = bytes-like object holding the frames
+    - offsets = N+1 frame boundaries in `buffer` (frame i is `buffer[offsets[i]:offsets[i+1]]`), or N
+    frame start offsets if `lengths` is given
+    - lengths = N frame lengths, for frames that aren't contiguous (e.g. RxArena slots)
+    - echo = frames include the echo byte (echo was turned on)
+
+    Returns a structured array with one row per frame and the fields in J1939_BATCH_FIELDS:
+    timestamp, echo (1 if the frame is an echo), pgn, pri, how, sa, da, dp, res, pf, ps, data_offset
+    (offset of the data in `buffer`) and size (data length). Message data isn't copied; slice it out
+    of `buffer` with `data_offset` and `size`.
+    ```
+    arena = client.rx_many(arena)
+    frames = J1939.decode_batch(arena.buffer, arena.offsets[:arena.count], arena.lengths[:arena.count])
+    engine_speed = frames[frames['pgn'] == 0xF004]
+    ```
+    """
+    if np is None:
+        raise ImportError("decode_batch() requires NumPy.")
+    buf = np.frombuffer(buffer, dtype=np.uint8)
+    if lengths is None:
+        bounds = np.asarray(offsets, dtype=np.int64)
+        starts = bounds[:-1]
+        ends = bounds[1:]
+    else:
+        starts = np.asarray(offsets, dtype=np.int64)
+        ends = starts + np.asarray(lengths, dtype=np.int64)
+    if len(starts) and (starts.min() < 0 or ends.max() > len(buf) or (ends < starts).any()):
+        raise ValueError("Frame offsets must be within buffer.")
+    echo = int(bool(echo))
+    header = 4 + echo # start of the RP1210 J1939 message within each frame
+    # pad so reads past the end of short frames stay in bounds; those bytes are zeroed below
+    padded = np.concatenate((buf, np.zeros(header + 6, dtype=np.uint8)))
+
+    def byte_at(pos):
+        """Byte `pos` of every frame, or 0 where the frame is too short (like J1939Message)."""
+        idx = starts + pos
+        vals = padded[idx]
+        vals[idx >= ends] = 0
+        return vals.astype(np.uint32)
+
+    frames = np.zeros(len(starts), dtype=J1939_BATCH_FIELDS)
+    frames['timestamp'] = (byte_at(0) << 24) | (byte_at(1) << 16) | (byte_at(2) << 8) | byte_at(3)
+    if echo:
+        frames['echo'] = byte_at(4) == 1
+    pgn = byte_at(header) | (byte_at(header + 1) << 8) | ((byte_at(header + 2) & 0b11) << 16)
+    how_pri = byte_at(header + 3)
+    da = byte_at(header + 5)
+    pf = (pgn >> 8) & 0xFF
+    pdu1 = pf < 240
+    pgn = np.where(pdu1, (pgn & 0x3FF00) | da, pgn) # PS byte is the DA for PDU1
+    frames['pgn'] = pgn
+    frames['pri'] = how_pri & 0b111
+    frames['how'] = how_pri >> 7
+    frames['sa'] = byte_at(header + 4)
+    frames['da'] = np.where(pdu1, da, 0xFF)
+    frames['dp'] = (pgn >> 16) & 0b1
+    frames['res'] = (pgn >> 17) & 0b1
+    frames['pf'] = pf
+    frames['ps'] = pgn & 0xFF
+    frames['data_offset'] = np.minimum(starts + header + 6, ends)
+    frames['size'] = np.maximum(ends - starts - header - 6, 0)
+    return frames
+
+DTC_BATCH_FIELDS = [('source', 'u4'), ('spn', 'u4'), ('fmi', 'u1'), ('oc', 'u1'), ('cm', 'u1'),
+                    ('mil', 'u1'), ('rsl', 'u1'), ('awl', 'u1'), ('pl', 'u1')]
+"""Fields of the structured array returned by `decode_dtcs_batch()`, as (name, NumPy type) pairs."""
+
+def decode_dtcs_batch(payloads, offsets = None):
+    """
+    Extracts the DTCs from many diagnostic message (DM1, DM2, DM12) payloads at once, with the same
+    values DiagnosticMessage and DTC would give. Requires NumPy.
+    - payloads = sequence of message data (bytes-like; lamp bytes followed by 4-byte DTCs), or one
+    bytes-like buffer if `offsets` is given
+    - offsets = N+1 payload boundaries in `payloads` (payload i is `payloads[offsets[i]:offsets[i+1]]`)
+
+    Returns a structured array with one row per DTC and the fields in DTC_BATCH_FIELDS: source (index
+    of the payload the DTC came from), spn, fmi, oc, cm, and the payload's lamp states mil, rsl, awl
+    and pl. Rows are in payload order; payloads without DTCs contribute no rows.
+    """
+    if np is None:
+        raise ImportError("decode_dtcs_batch() requires NumPy.")
+    if offsets is None:
+        payloads = [bytes(payload) for payload in payloads]
+        bounds = np.zeros(len(payloads) + 1, dtype=np.int64)
+        np.cumsum([len(payload) for payload in payloads], out=bounds[1:])
+        buf = np.frombuffer(b''.join(payloads), dtype=np.uint8)
+    else:
+        bounds = np.asarray(offsets, dtype=np.int64)
+        buf = np.frombuffer(payloads, dtype=np.uint8)
+    starts = bounds[:-1]
+    lengths = bounds[1:] - starts
+    if len(starts) and (starts.min() < 0 or bounds[1:].max() > len(buf) or (lengths < 0).any()):
+        raise ValueError("Payload offsets must be within buffer.")
+    # lamp byte of each payload (0 for empty payloads)
+    lamps = np.where(lengths > 0, np.concatenate((buf, [0]))[np.minimum(starts, len(buf))], 0)
+    # only complete 4-byte chunks after the 2 lamp bytes are DTCs
+    num_dtcs = np.maximum(lengths - 2, 0) // 4
+    source = np.repeat(np.arange(len(starts)), num_dtcs)
+    first_dtc = np.cumsum(num_dtcs) - num_dtcs # row number of each payload's first DTC
+    index = np.arange(len(source)) - first_dtc[source] # DTC number within its payload
+    pos = starts[source] + 2 + 4 * index
+    b0 = buf[pos].astype(np.uint32)
+    b1 = buf[pos + 1].astype(np.uint32)
+    b2 = buf[pos + 2]
+    b3 = buf[pos + 3]
+    dtcs = np.zeros(len(source), dtype=DTC_BATCH_FIELDS)
+    dtcs['source'] = source
+    dtcs['spn'] = (((b2 >> 5) & 0b111).astype(np.uint32) << 16) | (b1 << 8) | b0
+    dtcs['fmi'] = b2 & 0b00011111
+    dtcs['oc'] = b3 & 0b01111111
+    dtcs['cm'] = b3 >> 7
+    lamp = lamps[source]
+    dtcs['mil'] = (lamp >> 6) & 0b11
+    dtcs['rsl'] = (lamp >> 4) & 0b11
+    dtcs['awl'] = (lamp >> 2) & 0b11
+    dtcs['pl'] = lamp & 0b11
+    return dtcs
+
+def encode_dtcs_batch(dtcs, num_payloads : int = None, reserved = 0x00) -> list[bytes]:
+    """
+    Inverse of `decode_dtcs_batch()`: packs DTCs into diagnostic message payloads. Requires NumPy.
+    - dtcs = structured array (or dict of arrays) with fields source, spn, fmi and oc; cm, mil, rsl,
+    awl and pl are optional and default to 0. Each payload's lamp byte is taken from its first DTC.
+    - num_payloads = number of payloads to return; payloads without DTCs get lamp bytes only.
+    Defaults to the highest `source` + 1.
+    - reserved = value of the second lamp byte
+
+    Returns a list of payloads (bytes), each made of 2 lamp bytes followed by its 4-byte DTCs in
+    the order they appear in `dtcs`. The DTC bytes match `DTC.to_bytes()` (plus the CM bit).
+    """
+    if np is None:
+        raise ImportError("encode_dtcs_batch() requires NumPy.")
+    source = np.asarray(dtcs['source'], dtype=np.int64)
+    names = dtcs.dtype.names if hasattr(dtcs, 'dtype') else tuple(dtcs)
+    def field(name):
+        if name in names:
+            return np.asarray(dtcs[name], dtype=np.uint32)
+        return np.zeros(len(source), dtype=np.uint32)
+    spn = field('spn')
+    packed = np.empty((len(source), 4), dtype=np.uint8)
+    packed[:, 0] = spn & 0xFF
+    packed[:, 1] = (spn >> 8) & 0xFF
+    packed[:, 2] = (((spn >> 16) & 0b111) << 5) | (field('fmi') & 0b00011111)
+    packed[:, 3] = ((field('cm') & 0b1) << 7) | (field('oc') & 0b01111111)
+    lamp = (((field('mil') & 0b11) << 6) | ((field('rsl') & 0b11) << 4)
+            | ((field('awl') & 0b11) << 2) | (field('pl') & 0b11))
+    if num_payloads is None:
+        num_payloads = int(source.max()) + 1 if len(source) else 0
+    if len(source) and (source.min() < 0 or source.max() >= num_payloads):
+        raise ValueError("DTC source index out of range.")
+    order = np.argsort(source, kind='stable')
+    counts = np.bincount(source, minlength=num_payloads)
+    first = np.cumsum(counts) - counts # row (in `order`) of each payload's first DTC
+    # lay every payload out in one buffer, then split it
+    bounds = np.zeros(num_payloads + 1, dtype=np.int64)
+    np.cumsum(2 + 4 * counts, out=bounds[1:])
+    out = np.zeros(bounds[-1], dtype=np.uint8)
+    has_dtcs = counts > 0
+    out[bounds[:-1][has_dtcs]] = lamp[order[first[has_dtcs]]]
+    out[bounds[:-1] + 1] = reserved & 0xFF
+    sorted_source = source[order]
+    dest = bounds[sorted_source] + 2 + 4 * (np.arange(len(order)) - first[sorted_source])
+    out[dest[:, None] + np.arange(4)] = packed[order]
+    out = out.tobytes()
+    bounds = bounds.tolist()
+    return [out[bounds[i]:bounds[i + 1]] for i in range(num_payloads)]
+
 ############################
 # MOSTLY USELESS FUNCTIONS #
 ############################
@@ -999,21 +1364,31 @@ def generateNetMgmtName(aac, ig, vsi, vs, func, func_inst, ecu_inst, mc, id_n) -
     if not 0 <= id_n <= 2097151:
         raise IndexError('Identity number is not in the range [0, 2097151].')
 
-    name = b''
+    return _NET_MGMT_NAME.pack(
+        (mc << 21) | id_n, # manufacturer Code and Identity Number (4 bytes)
+        (func_inst << 3) | ecu_inst, # Function Instance and ECU Instance (1 byte)
+        func, # Function (1 byte)
+        vs << 1, # Vehicle System and Reserved (1 byte)
+        (aac << 7) | (ig << 4) | vsi) # Arbitrary Addess Capable, Industry Group, and VSI (1 byte)
 
-    # combine manufacturer Code and Identity Number (4 bytes)
-    name += sanitize_msg_param((mc << 21) | id_n, 4, 'little')
-
-    # combine Function Instance and ECU Instance (1 byte)
-    name += sanitize_msg_param((func_inst << 3) | ecu_inst, 1)
-
-    # concate Function (1 byte)
-    name += sanitize_msg_param(func, 1)
-
-    # combine Vehicle System and Reserved (1 byte)
-    name += sanitize_msg_param(vs << 1, 1)
+def decodeNetMgmtName(name) -> tuple:
+    """
+    Splits a network management NAME (8 bytes, as sent in an address claim, or the same value as
+    an int) into its 9 fields, in the order `generateNetMgmtName()` takes them:
 
-    # combine Arbitrary Addess Capable, Industry Group, and Vehicle System Instance (1 byte)
-    name += sanitize_msg_param((aac << 7) | (ig << 4) | vsi, 1)
+    (aac, ig, vsi, vs, func, func_inst, ecu_inst, mc, id_n)
 
-    return name
+    so that `generateNetMgmtName(*decodeNetMgmtName(name)) == name` for any valid NAME.
+    """
+    if not isinstance(name, int):
+        name = int.from_bytes(bytes(name[:8]), 'little')
+    return (
+        (name >> 63) & 0b1, # Arbitrary Address Capable
+        (name >> 60) & 0b111, # Industry Group
+        (name >> 56) & 0xF, # Vehicle System Instance
+        (name >> 49) & 0x7F, # Vehicle System
+        (name >> 40) & 0xFF, # Function
+        (name >> 35) & 0x1F, # Function Instance
+        (name >> 32) & 0b111, # ECU Instance
+        (name >> 21) & 0x7FF, # Manufacturer Code
+        name & 0x1FFFFF) # Identity Number
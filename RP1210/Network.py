@@ -0,0 +1,271 @@
+"""
+Tracks which ECU (NAME) is at which J1939 source address, from address claims (PGN 0xEE00).
+
+NetworkTable is fed received frames, like Router or TPReassembler, and keeps the address <-> NAME
+mapping up to date one claim at a time, reporting the changes as NetworkEvents:
+```
+table = NetworkTable(on_event=print) # e.g. "join 0x00: NAME 0x8000... (was at 0x01)"
+table.requestClaims(client.tx, sa=0xF9) # ask everyone to claim again, to fill the table
+while True:
+    for frame in client.rx_batch(timeout=0.1):
+        table.feed(frame)
+    engine = table.address(engine_name) # O(1), both ways
+    name = table.name(0x03)
+```
+NAMEs are 64-bit ints, the 8 bytes of the claim read little-endian; a lower value wins address
+contention (J1939-81). Use `J1939.decodeNetMgmtName()` to split one into its fields.
+"""
+import time
+from .J1939 import J1939Message, decodeNetMgmtName, toJ1939Request
+
+PGN_ADDRESS_CLAIMED = 0xEE00
+NULL_ADDRESS = 0xFE # source address of Cannot Claim Address messages
+
+# NetworkEvent kinds
+JOIN = "join" # a NAME claimed an address (`other` is where it was before, if anywhere)
+LEAVE = "leave" # a NAME gave up an address, lost it, or went quiet (`other`: the NAME that took it)
+CONFLICT = "conflict" # two NAMEs claimed the same address (`name` won it, `other` lost)
+CANNOT_CLAIM = "cannot claim" # a NAME couldn't claim any address
+
+class NetworkEvent():
+    """
+    A change to a NetworkTable.
+    ---
+    Accessible properties:
+    - `kind` : JOIN, LEAVE, CONFLICT or CANNOT_CLAIM (str)
+    - `sa` : the address (NULL_ADDRESS for CANNOT_CLAIM) (int)
+    - `name` : the NAME that joined, left, won or couldn't claim (int)
+    - `other` : see the event kinds; None if it doesn't apply (int)
+    - `time` : when the claim was received (`time.perf_counter()`) (float)
+    """
+    __slots__ = ("kind", "sa", "name", "other", "time")
+
+    def __init__(self, kind : str, sa : int, name : int, other : int = None, time : float = None) -> None:
+        self.kind = kind
+        self.sa = sa
+        self.name = name
+        self.other = other
+        self.time = time
+
+    def __str__(self) -> str:
+        ret_val = f"{self.kind} {self.sa:#04x}: NAME {self.name:#018x}"
+        if self.other is not None:
+            if self.kind == JOIN:
+                ret_val += f" (was at {self.other:#04x})"
+            elif self.kind == CONFLICT:
+                ret_val += f" (over NAME {self.other:#018x})"
+            else:
+                ret_val += f" (taken by NAME {self.other:#018x})"
+        return ret_val
+
+    def __repr__(self) -> str:
+        return f"NetworkEvent({self})"
+
+class NetworkTable():
+    """
+    Address <-> NAME table for a J1939 network, updated incrementally from address claims.
+
+    Both directions are O(1): a 256-entry list from address to NAME, and a dict from NAME to
+    address. Each claim changes only the entries it affects, so the table holds up when every ECU
+    claims at once (e.g. at ignition on, or after a Request for Address Claimed); repeated claims
+    of the same address by the same NAME only refresh it.
+
+    A claim for an address that another NAME holds is settled as J1939-81 says: the lower NAME
+    keeps (or takes) the address, and the other one is expected to claim another address or send
+    Cannot Claim Address. Either way a CONFLICT event is reported.
+
+    With `max_age`, every frame passed to `feed()` counts as a sign of life for its source, and
+    `expire()` removes ECUs that haven't sent anything for `max_age` seconds (LEAVE events).
+    ---
+    Params:
+    - `on_event` : function called with each NetworkEvent, or None
+    - `echo` : set to True if frames include the echo byte (bool)
+    - `max_age` : seconds of silence before an ECU is considered gone; None = never (float)
+    ---
+    Accessible properties:
+    - `claims` : address claims processed (int)
+    """
+    def __init__(self, on_event = None, echo = False, max_age : float = None) -> None:
+        self.on_event = on_event
+        self.echo = echo
+        self.max_age = max_age
+        self.claims = 0
+        self._names = [None] * 256 #type: list[int]
+        self._addresses = {} #type: dict[int, int]
+        self._last_seen = [0.0] * 256
+        self._unclaimed = set() #type: set[int]
+        self._start = 4 + int(bool(echo)) # header offset in a frame
+
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+    def __contains__(self, sa : int) -> bool:
+        return 0 <= sa <= 0xFF and self._names[sa] is not None
+
+    ####################
+    # PUBLIC FUNCTIONS #
+    ####################
+
+    def feed(self, frame, now : float = None) -> list[NetworkEvent]:
+        """
+        Processes one received frame (bytes-like from RP1210_ReadMessage, or a J1939Message).
+        Frames other than address claims are ignored, unless `max_age` is set.
+
+        Returns the events the frame caused (usually none).
+        """
+        if isinstance(frame, J1939Message):
+            pgn = frame.pgn & 0x3FF00
+            sa = frame.sa
+            data = frame.data
+        else:
+            start = self._start
+            header = frame[start:start + 6]
+            if len(header) < 6:
+                return []
+            pgn = (header[1] | (header[2] << 8)) & 0x3FF # data page and PF; PS is the DA here
+            pgn <<= 8
+            sa = header[4]
+            data = frame[start + 6:start + 14] if pgn == PGN_ADDRESS_CLAIMED else None
+        if self.max_age is not None:
+            if now is None:
+                now = time.perf_counter()
+            self._last_seen[sa] = now
+        if pgn != PGN_ADDRESS_CLAIMED or len(data) < 8:
+            return []
+        if now is None:
+            now = time.perf_counter()
+        name = int.from_bytes(data[:8], 'little')
+        self.claims += 1
+        if sa == NULL_ADDRESS:
+            events = self._cannot_claim(name, now)
+        elif sa < NULL_ADDRESS:
+            events = self._claim(sa, name, now)
+        else:
+            return []
+        if self.on_event is not None:
+            for event in events:
+                self.on_event(event)
+        return events
+
+    def feed_batch(self, frames, now : float = None) -> list[NetworkEvent]:
+        """Processes every frame in `frames` (e.g. from `rx_batch()`). Returns all the events."""
+        events = []
+        feed = self.feed
+        for frame in frames:
+            found = feed(frame, now)
+            if found:
+                events += found
+        return events
+
+    def expire(self, now : float = None) -> list[NetworkEvent]:
+        """
+        Removes ECUs that haven't sent anything for `max_age` seconds (only with `max_age`).
+
+        Returns the LEAVE events.
+        """
+        if self.max_age is None:
+            return []
+        if now is None:
+            now = time.perf_counter()
+        cutoff = now - self.max_age
+        events = []
+        for sa, name in enumerate(self._names):
+            if name is not None and self._last_seen[sa] < cutoff:
+                self._release(sa)
+                events.append(NetworkEvent(LEAVE, sa, name, None, now))
+        if self.on_event is not None:
+            for event in events:
+                self.on_event(event)
+        return events
+
+    def name(self, sa : int) -> int:
+        """Returns the NAME that holds address `sa`, or None."""
+        return self._names[sa]
+
+    def address(self, name) -> int:
+        """Returns the address held by `name` (int or 8 bytes), or None."""
+        if not isinstance(name, int):
+            name = int.from_bytes(bytes(name[:8]), 'little')
+        return self._addresses.get(name)
+
+    def fields(self, sa : int) -> tuple:
+        """Returns the NAME fields (see `J1939.decodeNetMgmtName()`) of the ECU at `sa`, or None."""
+        name = self._names[sa]
+        return None if name is None else decodeNetMgmtName(name)
+
+    def items(self) -> dict[int, int]:
+        """Returns {address: NAME} for every claimed address, in address order."""
+        return {sa: name for sa, name in enumerate(self._names) if name is not None}
+
+    def unclaimed(self) -> set[int]:
+        """Returns the NAMEs that sent Cannot Claim Address and haven't claimed one since."""
+        return set(self._unclaimed)
+
+    def lastSeen(self, sa : int) -> float:
+        """Returns when `sa` last sent anything (with `max_age`) or claimed its address, or None."""
+        return self._last_seen[sa] if self._names[sa] is not None else None
+
+    def requestClaims(self, send, sa : int = NULL_ADDRESS, da : int = 0xFF, pri : int = 6) -> None:
+        """
+        Sends a Request for Address Claimed (to everyone, by default), so the ECUs claim their
+        addresses again and the table fills up.
+        - send = function that transmits a message from `toJ1939Message()`, e.g. `client.tx`
+        - sa = our address; a node without one uses the null address (0xFE)
+        """
+        send(toJ1939Request(PGN_ADDRESS_CLAIMED, sa, da, pri))
+
+    def clear(self) -> None:
+        """Forgets every address and NAME (without events)."""
+        self._names = [None] * 256
+        self._addresses.clear()
+        self._unclaimed.clear()
+
+    #######################
+    # PROTECTED FUNCTIONS #
+    #######################
+
+    def _claim(self, sa : int, name : int, now : float) -> list[NetworkEvent]:
+        names = self._names
+        current = names[sa]
+        self._last_seen[sa] = now
+        if current == name: # the usual case: a repeated claim
+            return []
+        events = []
+        if current is not None:
+            if current < name: # the current holder keeps the address
+                events.append(NetworkEvent(CONFLICT, sa, current, name, now))
+                old_sa = self._addresses.get(name)
+                if old_sa is not None: # it moved, and lost the new address
+                    self._release(old_sa)
+                    events.append(NetworkEvent(LEAVE, old_sa, name, None, now))
+                return events
+            events.append(NetworkEvent(CONFLICT, sa, name, current, now))
+            self._release(sa)
+            events.append(NetworkEvent(LEAVE, sa, current, name, now))
+        old_sa = self._addresses.get(name)
+        if old_sa is not None:
+            self._release(old_sa)
+            events.append(NetworkEvent(LEAVE, old_sa, name, None, now))
+        names[sa] = name
+        self._addresses[name] = sa
+        self._unclaimed.discard(name)
+        events.append(NetworkEvent(JOIN, sa, name, old_sa, now))
+        return events
+
+    def _cannot_claim(self, name : int, now : float) -> list[NetworkEvent]:
+        events = []
+        old_sa = self._addresses.get(name)
+        if old_sa is not None:
+            self._release(old_sa)
+            events.append(NetworkEvent(LEAVE, old_sa, name, None, now))
+        if name not in self._unclaimed:
+            self._unclaimed.add(name)
+            events.append(NetworkEvent(CANNOT_CLAIM, NULL_ADDRESS, name, None, now))
+        return events
+
+    def _release(self, sa : int) -> None:
+        name = self._names[sa]
+        if name is not None:
+            self._names[sa] = None
+            if self._addresses.get(name) == sa:
+                del self._addresses[name]
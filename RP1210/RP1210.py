@@ -3,8 +3,10 @@ Base RP1210 functions.
 """
 import os
 import configparser
+import threading
+from array import array
 from configparser import ConfigParser
-from ctypes import POINTER, c_char_p, c_int32, c_long, c_short, c_void_p, cdll, CDLL, create_string_buffer
+from ctypes import POINTER, c_char, c_char_p, c_int32, c_long, c_short, c_void_p, cdll, CDLL, create_string_buffer
 from typing import Literal
 from . import Commands, sanitize_msg_param
 
@@ -127,6 +129,23 @@ IOCTL_IDS = {
 }
 """IOCTL ID values - use these to lookup inputs to Ioctl function."""
 
+RP1210_FUNCTION_TYPES = {
+    "RP1210_ClientConnect" : ([c_long, c_short, c_char_p, c_long, c_long, c_short], c_short),
+    "RP1210_ClientDisconnect" : ([c_short], c_short),
+    "RP1210_SendMessage" : ([c_short, c_char_p, c_short, c_short, c_short], c_short),
+    "RP1210_ReadMessage" : ([c_short, c_char_p, c_short, c_short], c_short),
+    "RP1210_ReadVersion" : ([c_char_p, c_char_p, c_char_p, c_char_p], c_short),
+    "RP1210_GetErrorMsg" : ([c_short, c_char_p], c_short),
+    "RP1210_GetHardwareStatus" : ([c_short, c_char_p, c_short, c_short], c_short),
+    "RP1210_SendCommand" : ([c_short, c_short, c_char_p, c_short], c_short)}
+"""Argument and return types for each RP1210 function, as (argtypes, restype)."""
+
+RP1210C_FUNCTION_TYPES = {
+    "RP1210_ReadDetailedVersion" : ([c_short, c_char_p, c_char_p, c_char_p], c_short),
+    "RP1210_GetLastErrorMsg" : ([c_short, POINTER(c_int32), c_char_p, c_short], c_short),
+    "RP1210_Ioctl" : ([c_short, c_long, c_void_p, c_void_p], c_short)}
+"""Argument and return types for functions added in RP1210C, as (argtypes, restype)."""
+
 def translateErrorCode(ClientID :int) -> str:
         """
         Matches clientID with error string in RP1210_ERRORS.
@@ -789,6 +808,259 @@ class RP1210Config(ConfigParser):
         else:
             return os.path.join(os.environ["WINDIR"], self._api_name + ".ini")
 
+class RxArena:
+    """
+    A preallocated, reusable receive buffer for `RP1210API.ReadMany()`.
+
+    The arena is one contiguous `bytearray` split into `max_msgs` fixed-size slots of `slot_size`
+    bytes. Each call to `ReadMany()` reads messages into consecutive slots and records the length
+    of each message, so no buffers or `bytes` objects are allocated while draining the adapter.
+    ```
+    arena = RxArena(max_msgs=64)
+    while True:
+        for msg in client.rx_many(arena): # msg is a memoryview into the arena
+            process(msg)
+    ```
+    Message contents are only valid until the next read into the same arena; call `message()` or
+    `bytes(msg)` to keep a copy.
+    ---
+    Accessible properties:
+    - `buffer` : the underlying arena (bytearray)
+    - `offsets` : start offset of each slot in `buffer` (array of unsigned ints)
+    - `lengths` : length of the message in each slot from the last read (array of unsigned shorts)
+    - `count` : number of messages read by the last call to `ReadMany()` (int)
+    """
+    def __init__(self, max_msgs : int = 64, slot_size : int = 256) -> None:
+        if max_msgs < 1 or slot_size < 1:
+            raise ValueError("RxArena max_msgs and slot_size must be positive.")
+        self.max_msgs = max_msgs
+        self.slot_size = slot_size
+        self.buffer = bytearray(max_msgs * slot_size)
+        self.offsets = array('I', range(0, max_msgs * slot_size, slot_size))
+        self.lengths = array('H', bytes(2 * max_msgs))
+        self.count = 0
+        self._view = memoryview(self.buffer)
+        # ctypes views of each slot, created once so they can be passed straight to ReadMessage
+        slot_type = c_char * slot_size
+        self._slots = [slot_type.from_buffer(self.buffer, offset) for offset in self.offsets]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index : int) -> memoryview:
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("RxArena index out of range.")
+        offset = self.offsets[index]
+        return self._view[offset:offset + self.lengths[index]]
+
+    def __iter__(self):
+        view = self._view
+        offsets = self.offsets
+        lengths = self.lengths
+        for i in range(self.count):
+            offset = offsets[i]
+            yield view[offset:offset + lengths[i]]
+
+    def message(self, index : int) -> bytes:
+        """Returns a copy of the message at `index` as bytes."""
+        return bytes(self[index])
+
+    def messages(self) -> list[bytes]:
+        """Returns a copy of every message from the last read as a list of bytes."""
+        return [bytes(msg) for msg in self]
+
+class RxRingBuffer:
+    """
+    A fixed-capacity ring buffer of received messages, filled by RP1210Client's background reader
+    thread (see `RP1210Client.start_reader()`) and emptied by your application.
+
+    Memory is allocated once: `capacity` slots of `slot_size` bytes, plus one spare slot that the
+    reader thread reads into directly, so adapter messages are never copied on the way in. If the
+    buffer is full when a new message arrives, the oldest message is discarded and `overflows` is
+    incremented - the adapter's own RX queue keeps draining either way.
+
+    Thread-safe for one producer (the reader thread) and any number of consumers. `close()` wakes
+    every consumer that's waiting for a message, e.g. when the reader thread stops.
+
+    Set `on_data` to a callable to be notified (from the producer's thread) whenever the buffer goes
+    from empty to non-empty; this is how AsyncRP1210Client wakes its event loop once per batch
+    rather than once per message.
+    ---
+    Counters:
+    - `received` : messages read from the adapter (int)
+    - `overflows` : messages discarded because the buffer was full (int)
+    - `errors` : error codes returned by RP1210_ReadMessage (int)
+    - `rx_queue_full` : times the adapter reported ERR_RX_QUEUE_FULL (139) (int)
+    - `last_error` : most recent error code, or 0 (int)
+    """
+    def __init__(self, capacity : int = 4096, slot_size : int = 256) -> None:
+        if capacity < 1 or slot_size < 1:
+            raise ValueError("RxRingBuffer capacity and slot_size must be positive.")
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self._num_slots = capacity + 1 # one spare slot for the producer to write into
+        self.buffer = bytearray(self._num_slots * slot_size)
+        self._view = memoryview(self.buffer)
+        self._lengths = array('H', bytes(2 * self._num_slots))
+        slot_type = c_char * slot_size
+        self._slots = [slot_type.from_buffer(self.buffer, i * slot_size) for i in range(self._num_slots)]
+        self._head = 0 # oldest message
+        self._tail = 0 # next slot to write
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self.received = 0
+        self.overflows = 0
+        self.errors = 0
+        self.rx_queue_full = 0
+        self.last_error = 0
+        self.on_data = None
+        self._closed = False
+
+    def __len__(self) -> int:
+        with self._lock:
+            return (self._tail - self._head) % self._num_slots
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def write_slot(self):
+        """
+        Returns the ctypes buffer that the next message should be read into. Call `commit()` once
+        the message has been written.
+
+        For use by the single producer only.
+        """
+        return self._slots[self._tail]
+
+    def commit(self, size : int) -> None:
+        """Publishes the message written into `write_slot()`. For use by the single producer only."""
+        with self._lock:
+            tail = self._tail
+            was_empty = tail == self._head
+            self._lengths[tail] = size
+            tail += 1
+            if tail == self._num_slots:
+                tail = 0
+            if tail == self._head: # full; drop oldest
+                self._head = self._head + 1 if self._head + 1 < self._num_slots else 0
+                self.overflows += 1
+            self._tail = tail
+            self.received += 1
+            self._not_empty.notify()
+        if was_empty and self.on_data is not None:
+            self.on_data()
+
+    def push(self, msg : bytes) -> None:
+        """Copies a message into the buffer. Messages longer than `slot_size` are truncated."""
+        size = min(len(msg), self.slot_size)
+        offset = self._tail * self.slot_size
+        self.buffer[offset:offset + size] = msg[:size]
+        self.commit(size)
+
+    def error(self, code : int) -> None:
+        """Records an error code returned by RP1210_ReadMessage."""
+        with self._lock:
+            self.errors += 1
+            self.last_error = code
+            if code == 139: # ERR_RX_QUEUE_FULL
+                self.rx_queue_full += 1
+
+    def pop(self, timeout : float = 0.0) -> bytes:
+        """
+        Removes and returns the oldest message.
+
+        Waits up to `timeout` seconds for a message (forever if `timeout` is None). Returns b'' if no
+        message is available.
+        """
+        msgs = self.pop_many(1, timeout)
+        if msgs:
+            return msgs[0]
+        return b''
+
+    def pop_many(self, max_msgs : int = 0, timeout : float = 0.0) -> list[bytes]:
+        """
+        Removes and returns up to `max_msgs` of the oldest messages (all of them if `max_msgs` is 0).
+
+        Waits up to `timeout` seconds for at least one message (forever if `timeout` is None, or
+        until the buffer is closed). Returns an empty list if no message is available.
+        """
+        with self._not_empty:
+            if self._head == self._tail and timeout != 0 and not self._closed:
+                self._not_empty.wait_for(lambda: self._head != self._tail or self._closed, timeout)
+            available = (self._tail - self._head) % self._num_slots
+            if not max_msgs or max_msgs > available:
+                max_msgs = available
+            view = self._view
+            lengths = self._lengths
+            slot_size = self.slot_size
+            head = self._head
+            msgs = []
+            for _ in range(max_msgs):
+                offset = head * slot_size
+                msgs.append(bytes(view[offset:offset + lengths[head]]))
+                head += 1
+                if head == self._num_slots:
+                    head = 0
+            self._head = head
+            return msgs
+
+    def pop_into(self, arena : RxArena, max_msgs : int = 0, timeout : float = 0.0) -> int:
+        """
+        Moves up to `max_msgs` of the oldest messages (the arena's capacity if 0) into an RxArena,
+        like `RP1210API.ReadMany()` does from the adapter. Messages longer than the arena's
+        `slot_size` are truncated.
+
+        Waits up to `timeout` seconds for at least one message (forever if `timeout` is None, or
+        until the buffer is closed). Returns the number of messages moved, also stored in
+        `arena.count`.
+        """
+        if not max_msgs or max_msgs > arena.max_msgs:
+            max_msgs = arena.max_msgs
+        with self._not_empty:
+            if self._head == self._tail and timeout != 0 and not self._closed:
+                self._not_empty.wait_for(lambda: self._head != self._tail or self._closed, timeout)
+            available = (self._tail - self._head) % self._num_slots
+            count = min(max_msgs, available)
+            view = self._view
+            lengths = self._lengths
+            slot_size = self.slot_size
+            head = self._head
+            buffer = arena.buffer
+            offsets = arena.offsets
+            arena_lengths = arena.lengths
+            arena_slot_size = arena.slot_size
+            for i in range(count):
+                offset = head * slot_size
+                size = min(lengths[head], arena_slot_size)
+                buffer[offsets[i]:offsets[i] + size] = view[offset:offset + size]
+                arena_lengths[i] = size
+                head += 1
+                if head == self._num_slots:
+                    head = 0
+            self._head = head
+        arena.count = count
+        return count
+
+    def close(self) -> None:
+        """
+        Wakes every consumer waiting in `pop()`, `pop_many()` or `pop_into()`, and stops later
+        calls from waiting. Messages already buffered can still be popped.
+        """
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+
+    def isClosed(self) -> bool:
+        """Returns True once `close()` has been called."""
+        return self._closed
+
+    def clear(self) -> None:
+        """Discards all buffered messages. Counters are left alone."""
+        with self._lock:
+            self._head = self._tail
+
 class RP1210API:
     """
     Interface with RP1210 API to call functions from your adapter's drivers.
@@ -801,6 +1073,7 @@ class RP1210API:
         self.dll = None
         self._conforms_to_rp1210c = True
         self._libDir = WorkingAPIDirectory
+        self._unbind_functions()
 
     def __bool__(self):
         return self.isValid()
@@ -897,15 +1170,23 @@ class RP1210API:
         return self._conforms_to_rp1210c
 
     def setDLL(self, dll : CDLL):
-        """Sets the CDLL used to call RP1210 API functions."""
+        """
+        Sets the CDLL used to call RP1210 API functions.
+
+        Every RP1210 function is looked up and given its argtypes/restype here, once, so each call
+        afterwards is a single ctypes call. Always use this function (rather than assigning `dll`
+        directly) to change the DLL.
+        """
         try:
             self.dll = dll
             if self.dll: # check it's not None
                 self._init_functions()
                 self._api_valid = True
             else:
+                self._unbind_functions()
                 self._api_valid = False
         except OSError:
+            self._unbind_functions()
             self._api_valid = False
 
     def ClientConnect(self, DeviceID : int, Protocol = b"J1939:Baud=Auto", TxBufferSize = 8000, 
@@ -923,7 +1204,7 @@ class RP1210API:
 
         Use function translateClientID() to translate ClientID into an error message.
         """
-        clientID = self.getDLL().RP1210_ClientConnect(0, DeviceID, sanitize_msg_param(Protocol),
+        clientID = self._ClientConnect(0, DeviceID, sanitize_msg_param(Protocol),
                                         TxBufferSize, RcvBufferSize, isAppPacketizingincomingMsgs)
         return self._validate_and_fix_clientid(clientID)
     
@@ -934,7 +1215,7 @@ class RP1210API:
         Returns 0 if successful, or >127 if it failed.
             You can use translateClientID() to translate the failure code.
         """
-        return self.getDLL().RP1210_ClientDisconnect(ClientID) & 0xFFFF
+        return self._ClientDisconnect(ClientID) & 0xFFFF
 
     def SendMessage(self, ClientID : int, ClientMessage : bytes, MessageSize = 0) -> int:
         """
@@ -950,16 +1231,57 @@ class RP1210API:
         Returns 0 if successful, or >127 if it failed.
             You can use translateClientID() to translate the failure code.
         """
-        msg = sanitize_msg_param(ClientMessage)
+        if isinstance(ClientMessage, bytes):
+            msg = ClientMessage
+        else:
+            msg = sanitize_msg_param(ClientMessage)
         if MessageSize == 0:
             MessageSize = len(msg)
-        ret_val = self.getDLL().RP1210_SendMessage(ClientID, msg, MessageSize, 0, 0) & 0xFFFF
+        ret_val = self._SendMessage(ClientID, msg, MessageSize, 0, 0) & 0xFFFF
         # check for error codes. ret_val is a 16-bit unsigned int, so must be converted
         # to negative signed int.
         if ret_val >= 0x08000:
             ret_val = (ret_val - 0x10000)
         return ret_val
 
+    def SendMany(self, ClientID : int, Messages, Offsets = None, StopOnError = False) -> array:
+        """
+        Sends a batch of pre-encoded messages, e.g. when replaying a capture or loading the bus.
+        - ClientID = clientID you got from ClientConnect
+        - Messages = a sequence of encoded messages (bytes, or anything `bytes()` accepts, such as
+        J1939Message), OR one packed buffer holding every message back to back.
+        - Offsets = required if Messages is a packed buffer: N+1 boundaries, so that message i is
+        `Messages[Offsets[i]:Offsets[i+1]]`. Leave as None for a sequence of messages.
+        - StopOnError = stop sending at the first message that returns an error code.
+
+        Messages are validated once up front and then sent with RP1210_SendMessage in a tight loop.
+
+        Returns an array of signed shorts with one return code per message sent, using the same
+        convention as SendMessage (0 = success, negative = error code). If StopOnError is set, the
+        array ends at the message that failed.
+        """
+        if Offsets is None:
+            msgs = [msg if isinstance(msg, bytes) else bytes(msg) for msg in Messages]
+        else:
+            packed = Messages if isinstance(Messages, bytes) else bytes(Messages)
+            if len(Offsets) < 1 or Offsets[0] < 0 or Offsets[-1] > len(packed):
+                raise ValueError("Offsets don't fit within the packed message buffer.")
+            if any(Offsets[i] > Offsets[i + 1] for i in range(len(Offsets) - 1)):
+                raise ValueError("Offsets must not decrease.")
+            msgs = [packed[Offsets[i]:Offsets[i + 1]] for i in range(len(Offsets) - 1)]
+        send = self._SendMessage
+        results = array('h', bytes(2 * len(msgs)))
+        for i, msg in enumerate(msgs):
+            ret_val = send(ClientID, msg, len(msg), 0, 0) & 0xFFFF
+            if ret_val >= 0x8000:
+                ret_val -= 0x10000
+                if StopOnError:
+                    results[i] = ret_val
+                    del results[i + 1:]
+                    break
+            results[i] = ret_val
+        return results
+
     def ReadMessage(self, ClientID : int, RxBuffer : bytes, BufferSize = 0, 
                         BlockOnRead = 0) -> int:
         """
@@ -977,7 +1299,7 @@ class RP1210API:
         """
         if not BufferSize:
             BufferSize = len(RxBuffer)
-        ret_val = self.getDLL().RP1210_ReadMessage(ClientID, RxBuffer, BufferSize, BlockOnRead) & 0xFFFF
+        ret_val = self._ReadMessage(ClientID, RxBuffer, BufferSize, BlockOnRead) & 0xFFFF
         # check for error codes. ret_val is a 16-bit unsigned int, so must be converted
         # to negative signed int.
         if ret_val >= 0x8000:
@@ -994,11 +1316,46 @@ class RP1210API:
         Output still includes leading 4 timestamp bytes, if applicable.
         """
         RxBuffer = create_string_buffer(BufferSize)
-        size = self.ReadMessage(ClientID, RxBuffer, BufferSize, BlockOnRead)
-        if size <= 0:
+        size = self._ReadMessage(ClientID, RxBuffer, BufferSize, BlockOnRead) & 0xFFFF
+        if size == 0 or size >= 0x8000: # no message or error code
             return b''
         return RxBuffer[:size]
 
+    def ReadMany(self, ClientID : int, Arena : RxArena, MaxMessages = 0, BlockOnRead = 0) -> int:
+        """
+        Drains up to MaxMessages messages from the adapter into a preallocated RxArena.
+        - ClientID = clientID you got from ClientConnect
+        - Arena = RxArena to read into; it is reused (and overwritten) on every call
+        - MaxMessages = maximum number of messages to read. Defaults to the arena's capacity.
+        - BlockOnRead = sets NON_BLOCKING_IO or BLOCKING_IO for the first read only; the rest of the
+        queue is always drained without blocking.
+
+        Returns the number of messages read, which is also stored in `Arena.count`. Returns a negative
+        error code if the first read failed, e.g. -128 -> error code 128.
+
+        Messages still include leading 4 timestamp bytes, if applicable.
+        """
+        if not MaxMessages or MaxMessages > Arena.max_msgs:
+            MaxMessages = Arena.max_msgs
+        read = self._ReadMessage
+        slots = Arena._slots
+        lengths = Arena.lengths
+        slot_size = Arena.slot_size
+        count = 0
+        block = BlockOnRead
+        while count < MaxMessages:
+            size = read(ClientID, slots[count], slot_size, block) & 0xFFFF
+            if size == 0 or size >= 0x8000:
+                if count == 0 and size >= 0x8000:
+                    Arena.count = 0
+                    return size - 0x10000
+                break
+            lengths[count] = size
+            count += 1
+            block = 0
+        Arena.count = count
+        return count
+
     def ReadVersion(self, DLLMajorVersionBuffer : bytes, 
                         DLLMinorVersionBuffer : bytes,
                         APIMajorVersionBuffer : bytes,
@@ -1010,7 +1367,7 @@ class RP1210API:
 
         Usage of ReadVersionDirect() instead of this function is highly recommended.
         """
-        return self.getDLL().RP1210_ReadVersion(DLLMajorVersionBuffer, DLLMinorVersionBuffer, 
+        return self._ReadVersion(DLLMajorVersionBuffer, DLLMinorVersionBuffer, 
                                                 APIMajorVersionBuffer, APIMinorVersionBuffer) & 0xFFFF
 
     def ReadVersionDirect(self, BufferSize = 16) -> tuple:
@@ -1027,7 +1384,7 @@ class RP1210API:
         DLLMinorVersion = create_string_buffer(BufferSize)
         APIMajorVersion = create_string_buffer(BufferSize)
         APIMinorVersion = create_string_buffer(BufferSize)
-        self.getDLL().RP1210_ReadVersion(DLLMajorVersion, DLLMinorVersion, 
+        self._ReadVersion(DLLMajorVersion, DLLMinorVersion, 
                                         APIMajorVersion, APIMinorVersion)
         dll_version = str(DLLMajorVersion.value + b"." + DLLMinorVersion.value, "utf-8")
         api_version = str(APIMajorVersion.value + b"." + APIMinorVersion.value, "utf-8")
@@ -1068,7 +1425,7 @@ class RP1210API:
         self.getDLL()   # set rp1210c flag
         if not self._conforms_to_rp1210c:
             return 128
-        return self.getDLL().RP1210_ReadDetailedVersion(ClientID, APIVersionBuffer, 
+        return self._ReadDetailedVersion(ClientID, APIVersionBuffer, 
                                                         DLLVersionBuffer, FWVersionBuffer)
         
     def ReadDetailedVersionDirect(self, ClientID : int) -> tuple:
@@ -1089,7 +1446,7 @@ class RP1210API:
         APIVersionInfo = create_string_buffer(17)
         DLLVersionInfo = create_string_buffer(17)
         FWVersionInfo = create_string_buffer(17)
-        self.getDLL().RP1210_ReadDetailedVersion(ClientID, APIVersionInfo, DLLVersionInfo, FWVersionInfo)
+        self._ReadDetailedVersion(ClientID, APIVersionInfo, DLLVersionInfo, FWVersionInfo)
         return (str(APIVersionInfo.value, "utf-8"), str(DLLVersionInfo.value, "utf-8"), 
                 str(FWVersionInfo.value, "utf-8"))
 
@@ -1102,7 +1459,7 @@ class RP1210API:
         If GetErrorMsg fails, this function will return the GetErrorMsg code (generally ERR_CODE_NOT_FOUND).
         """
         ErrorMsg = create_string_buffer(80)
-        ret_code = self.getDLL().RP1210_GetErrorMsg(ErrorCode, ErrorMsg)
+        ret_code = self._GetErrorMsg(ErrorCode, ErrorMsg)
         if ret_code == 0:
             return str(ErrorMsg.value, "utf-8")
         else:
@@ -1120,7 +1477,7 @@ class RP1210API:
         """
         if not BufferSize:
             BufferSize = len(ClientInfoBuffer)
-        return self.getDLL().RP1210_GetHardwareStatus(ClientID, ClientInfoBuffer, BufferSize, 0) & 0xFFFF
+        return self._GetHardwareStatus(ClientID, ClientInfoBuffer, BufferSize, 0) & 0xFFFF
 
     def GetHardwareStatusDirect(self, ClientID : int, BufferSize = 16) -> bytes:
         """
@@ -1129,7 +1486,7 @@ class RP1210API:
         BufferSize must range between 16 and 64, and must be a multiple of 2 (defaults to 64).
         """
         ClientInfo = create_string_buffer(BufferSize)
-        self.getDLL().RP1210_GetHardwareStatus(ClientID, ClientInfo, BufferSize, 0)
+        self._GetHardwareStatus(ClientID, ClientInfo, BufferSize, 0)
         return ClientInfo.raw
 
     def SendCommand(self, CommandNumber : int, ClientID : int, ClientCommand = b"", MessageSize = 0) -> int:
@@ -1142,26 +1499,41 @@ class RP1210API:
         """
         if MessageSize == 0 and ClientCommand != b"":
             MessageSize = len(ClientCommand)
-        return self.getDLL().RP1210_SendCommand(CommandNumber, ClientID, ClientCommand, MessageSize) & 0xFFFF
+        return self._SendCommand(CommandNumber, ClientID, ClientCommand, MessageSize) & 0xFFFF
 
     def _init_functions(self):
-        """Give Python type hints for interfacing with the DLL."""
-        self.dll.RP1210_ClientConnect.argtypes = [c_long, c_short, c_char_p, c_long, c_long, c_short]
-        self.dll.RP1210_ClientDisconnect.argtypes = [c_short]
-        self.dll.RP1210_SendMessage.argtypes = [c_short, c_char_p, c_short, c_short, c_short]
-        self.dll.RP1210_ReadMessage.argtypes = [c_short, c_char_p, c_short, c_short]
-        self.dll.RP1210_ReadVersion.argtypes = [c_char_p, c_char_p, c_char_p, c_char_p]
-        self.dll.RP1210_GetErrorMsg.argtypes = [c_short, c_char_p]
-        self.dll.RP1210_GetHardwareStatus.argtypes = [c_short, c_char_p, c_short, c_short]
-        self.dll.RP1210_SendCommand.argtypes = [c_short, c_short, c_char_p, c_short]
+        """
+        Give Python type hints for interfacing with the DLL, and bind each function to this object
+        (e.g. `self._SendMessage`) so calls skip the DLL attribute lookup.
+        """
+        for name in RP1210_FUNCTION_TYPES:
+            self._bind_function(name, RP1210_FUNCTION_TYPES)
         # RP1210C functions
         try:
-            self.dll.RP1210_ReadDetailedVersion.argtypes = [c_short, c_char_p, c_char_p, c_char_p]
-            self.dll.RP1210_GetLastErrorMsg.argtypes = [c_short, POINTER(c_int32), c_char_p, c_short]
-            self.dll.RP1210_Ioctl.argtypes = [c_short, c_long, c_void_p, c_void_p]
+            for name in RP1210C_FUNCTION_TYPES:
+                self._bind_function(name, RP1210C_FUNCTION_TYPES)
         except Exception: # RP1210C functions not supported
             self._conforms_to_rp1210c = False
 
+    def _bind_function(self, name : str, function_types : dict):
+        """Sets argtypes & restype for DLL function `name` and stores it as `self._<name>`."""
+        func = getattr(self.dll, name)
+        func.argtypes, func.restype = function_types[name]
+        setattr(self, name.replace("RP1210", "", 1), func)
+
+    def _unbind_functions(self):
+        """
+        Points each `self._<name>` function at a stub that loads the DLL on first use, so the DLL is
+        still only loaded when it's needed.
+        """
+        for name in list(RP1210_FUNCTION_TYPES) + list(RP1210C_FUNCTION_TYPES):
+            setattr(self, name.replace("RP1210", "", 1), self._lazy_function(name))
+
+    def _lazy_function(self, name : str):
+        def call(*args):
+            return getattr(self.getDLL(), name)(*args)
+        return call
+
     def _get_alternate_dll_path(self) -> str:
         """
         Some adapter vendors (looking at you, Actia) install their drivers in the wrong directory.
@@ -1488,6 +1860,10 @@ class RP1210Client(RP1210VendorList):
 
     def __init__(self, rp121032_path : str = None, api_dir : str = None, config_dir : str = None) -> None:
         self.clientID = 128 # DLL_NOT_INITIALIZED
+        self.rxBuffer = None #type: RxRingBuffer
+        self._reader = None #type: threading.Thread
+        self._readerStop = threading.Event()
+        self.recorder = None #type: Capture.CaptureWriter
         super().__init__(rp121032_path, api_dir, config_dir)
 
     def __str__(self) -> str:
@@ -1510,6 +1886,19 @@ class RP1210Client(RP1210VendorList):
         """
         return self.clientID
 
+    def setRecorder(self, recorder) -> None:
+        """
+        Records every message received by `rx()`, `rx_many()` and the background reader to
+        `recorder` (a Capture.CaptureWriter, or anything with the same `write()`/`write_many()`).
+
+        Set to None to stop recording. The recorder isn't closed by the client.
+        """
+        self.recorder = recorder
+
+    def getRecorder(self):
+        """Returns the recorder set with `setRecorder()`, or None."""
+        return self.recorder
+
     ####################
     # RP1210 FUNCTIONS #
     ####################
@@ -1537,10 +1926,13 @@ class RP1210Client(RP1210VendorList):
         Returns 0 if successful, or >127 if it failed.
             You can use translateClientID() to translate the failure code.
         """
+        self._readerStop.set() # disconnecting unblocks the reader thread's read, so let it exit
         try:
             return self.getAPI().ClientDisconnect(self.clientID) & 0xFFFF
         except Exception:
             return 128 # DLL_NOT_INITIALIZED
+        finally:
+            self.stop_reader()
 
     def command(self, CommandNumber, ClientCommand = b"", MessageSize = 0) -> int:
         """
@@ -1563,8 +1955,42 @@ class RP1210Client(RP1210VendorList):
 
         Unlike most of the other functions in this module, this function WILL throw an exception
         if the relevant RP1210API isn't able to be initialized!
+
+        If the background reader is running (see `start_reader()`), messages are taken from its
+        ring buffer instead, and `buffer_size` is ignored. A blocking read then waits until a message
+        arrives or the reader is stopped.
         """
-        return self.getAPI().ReadDirect(self.getClientID(), buffer_size, blocking)
+        if self._reader is not None: # already recorded by the reader thread
+            return self.rxBuffer.pop(None if blocking else 0.0)
+        msg = self.getAPI().ReadDirect(self.getClientID(), buffer_size, blocking)
+        if msg and self.recorder is not None:
+            self.recorder.write(msg)
+        return msg
+
+    def rx_many(self, arena : RxArena, max_msgs = 0, blocking = 0) -> RxArena:
+        """
+        Calls ReadMany, draining up to `max_msgs` messages into a reusable RxArena.
+        - arena = RxArena to read into (see RxArena for details)
+        - max_msgs = maximum number of messages to read. Defaults to the arena's capacity.
+        - blocking = sets NON_BLOCKING_IO or BLOCKING_IO for the first read. Defaults to NON_BLOCKING_IO.
+
+        Returns the arena, so you can iterate over it directly. Messages are memoryviews into the
+        arena and are overwritten by the next read. If the read failed, the arena will be empty.
+
+        Like `rx()`, this function WILL throw an exception if the relevant RP1210API isn't able to
+        be initialized!
+
+        If the background reader is running (see `start_reader()`), messages are moved from its
+        ring buffer instead of competing with it for the adapter's queue; a blocking read then
+        waits until a message arrives or the reader is stopped.
+        """
+        if self._reader is not None: # already recorded by the reader thread
+            self.rxBuffer.pop_into(arena, max_msgs, None if blocking else 0.0)
+            return arena
+        self.getAPI().ReadMany(self.getClientID(), arena, max_msgs, blocking)
+        if arena.count and self.recorder is not None:
+            self.recorder.write_many(arena)
+        return arena
 
     def tx(self, message, msg_size = 0) -> int:
         """
@@ -1582,10 +2008,111 @@ class RP1210Client(RP1210VendorList):
         try:
             if msg_size == 0:
                 msg_size = len(message)
-            return self.getAPI().SendMessage(self.clientID, sanitize_msg_param(message, msg_size), msg_size)
+            if not isinstance(message, bytes) or msg_size != len(message):
+                message = sanitize_msg_param(message, msg_size)
+            return self.getAPI().SendMessage(self.clientID, message, msg_size)
         except Exception:
             return 128 # DLL_NOT_INITIALIZED
 
+    def start_reader(self, capacity : int = 4096, slot_size : int = 256, blocking = True,
+                        idle_time : float = 0.001) -> RxRingBuffer:
+        """
+        Starts a background thread that reads messages from the adapter into a fixed-capacity
+        RxRingBuffer (stored in `rxBuffer`), so the adapter's RX queue is drained even when your
+        application is busy. Pull messages out with `rx()` or `rx_batch()`.
+        - capacity = max number of messages held in the ring buffer.
+        - slot_size = max size of each message in bytes. Defaults to 256.
+        - blocking = True to use BLOCKING_IO reads (ctypes releases the GIL while the driver blocks);
+        False to poll with NON_BLOCKING_IO, sleeping `idle_time` seconds whenever the queue is empty.
+
+        A blocking read only returns when a message arrives, the client disconnects, or the driver's
+        blocking timeout expires (see `setBlockingTimeout()`), so `stop_reader()` may have to wait
+        for one of those to happen.
+
+        Returns the ring buffer. Calling this while the reader is already running just returns its
+        ring buffer.
+        """
+        if self._reader is not None:
+            return self.rxBuffer
+        api = self.getAPI()
+        api.getDLL()
+        self.rxBuffer = RxRingBuffer(capacity, slot_size)
+        self._readerStop.clear()
+        self._reader = threading.Thread(target=self._reader_loop, name="RP1210Reader", daemon=True,
+                                        args=(api, self.rxBuffer, int(bool(blocking)), idle_time))
+        self._reader.start()
+        return self.rxBuffer
+
+    def stop_reader(self, timeout : float = 1.0) -> bool:
+        """
+        Stops the background reader thread, waiting up to `timeout` seconds for it to exit.
+
+        Messages already in `rxBuffer` are kept, and anything waiting in `rx()`, `rx_many()` or
+        `rx_batch()` for the reader is woken up. Returns True if the thread has exited (or was never
+        started).
+        """
+        reader = self._reader
+        if reader is None:
+            return True
+        self._readerStop.set()
+        self.rxBuffer.close()
+        reader.join(timeout)
+        self._reader = None
+        return not reader.is_alive()
+
+    def reader_running(self) -> bool:
+        """Returns True if the background reader thread is running."""
+        return self._reader is not None and self._reader.is_alive()
+
+    def rx_batch(self, max_msgs : int = 0, timeout : float = 0.0) -> list[bytes]:
+        """
+        Returns up to `max_msgs` messages (all available if 0) from the background reader's ring
+        buffer, waiting up to `timeout` seconds for the first one (forever if None).
+
+        Returns an empty list if the reader has never been started.
+        """
+        if self.rxBuffer is None:
+            return []
+        return self.rxBuffer.pop_many(max_msgs, timeout)
+
+    def _reader_loop(self, api : RP1210API, ring : RxRingBuffer, blocking : int, idle_time : float):
+        """Body of the background reader thread."""
+        read = api._ReadMessage
+        client_id = self.clientID
+        slot_size = ring.slot_size
+        stop = self._readerStop
+        while not stop.is_set():
+            size = read(client_id, ring.write_slot(), slot_size, blocking) & 0xFFFF
+            if size >= 0x8000: # error code
+                ring.error(0x10000 - size)
+                stop.wait(idle_time) # don't spin on e.g. ERR_CLIENT_DISCONNECTED
+            elif size:
+                recorder = self.recorder
+                if recorder is not None:
+                    recorder.write(ring.write_slot()[:size])
+                ring.commit(size)
+            elif not blocking:
+                stop.wait(idle_time)
+
+    def tx_many(self, messages, offsets = None, stop_on_error = False) -> array:
+        """
+        Sends a batch of pre-encoded messages via SendMany.
+        - messages = sequence of encoded messages, or one packed buffer (see offsets)
+        - offsets = N+1 message boundaries within a packed buffer; None for a sequence of messages
+        - stop_on_error = stop at the first message that fails
+
+        Returns an array of signed shorts with one return code per message sent (0 = success,
+        negative = error code). If the RP1210API can't be initialized, every code will be 128
+        (DLL_NOT_INITIALIZED).
+        """
+        if offsets is None and not hasattr(messages, '__len__'):
+            messages = list(messages) # e.g. a generator, which can only be read once
+        try:
+            return self.getAPI().SendMany(self.clientID, messages, offsets, stop_on_error)
+        except Exception:
+            num_msgs = len(messages) if offsets is None else max(len(offsets) - 1, 0)
+            return array('h', [128] * num_msgs) # DLL_NOT_INITIALIZED
+
     #####################
     # COMMAND FUNCTIONS #
     #####################
@@ -0,0 +1,261 @@
+"""
+Replays capture files (see Capture) through an RP1210Client-like interface.
+
+ReplayClient serves recorded frames from `rx()`, `rx_batch()` and `rx_many()` at the time they were
+originally received, scaled by a speed multiplier, or as fast as they're read:
+```
+replay = ReplayClient("truck.rpcap", speed=10.0) # 10x real time; speed=0 for as fast as possible
+while not replay.isFinished():
+    msg = replay.rx(blocking=1)
+    ...
+print(replay.stats()) # achieved vs target rate, delivery lag
+```
+Anything written for an RP1210Client that only receives and transmits (e.g. diagnostic logic) can be
+pointed at a ReplayClient instead. Transmitted messages are kept in `sent` rather than going anywhere.
+"""
+import time
+from .RP1210 import RxArena
+from .Capture import FLAG_TX, CaptureReader, CaptureSlice, MappedCapture
+
+class ReplayStats:
+    """
+    Replay timing statistics, from `ReplayClient.stats()`.
+    ---
+    Accessible properties:
+    - `frames` : number of frames delivered (int)
+    - `elapsed` : seconds since the replay started (float)
+    - `target_rate` : frames/sec the capture called for at this speed; 0 when speed is unlimited (float)
+    - `achieved_rate` : frames/sec actually delivered (float)
+    - `mean_lag`, `max_lag` : seconds between when each frame was due and when it was delivered (float)
+    """
+    def __init__(self, frames : int, elapsed : float, target_rate : float, mean_lag : float,
+                    max_lag : float) -> None:
+        self.frames = frames
+        self.elapsed = elapsed
+        self.target_rate = target_rate
+        self.achieved_rate = frames / elapsed if elapsed > 0 else 0.0
+        self.mean_lag = mean_lag
+        self.max_lag = max_lag
+
+    def __str__(self) -> str:
+        return (f"{self.frames} frames in {self.elapsed:.3f} s: {self.achieved_rate:,.0f} frames/s "
+                f"(target {self.target_rate:,.0f}), lag mean {self.mean_lag * 1e6:.0f} us, "
+                f"max {self.max_lag * 1e6:.0f} us")
+
+class ReplayClient:
+    """
+    Serves recorded frames like an RP1210Client's receive functions, honouring their original timing.
+
+    The replay clock starts at the first read (or `start()`), not at `isFinished()`: a frame
+    recorded `t` seconds after the first frame becomes available `t / speed` seconds after the
+    start. Non-blocking reads return nothing until a frame is due; blocking reads wait for it,
+    sleeping until shortly before it's due and then spinning, so frames are delivered within
+    microseconds of their due time even at thousands of frames/sec.
+
+    Records flagged `FLAG_TX` (sent by the recording application, not received) are skipped.
+    ---
+    Params:
+    - `source` : capture file path, CaptureReader, MappedCapture, CaptureSlice (e.g. a query result),
+    or any iterable of (time_ns, flags, frame) tuples
+    - `speed` : replay speed multiplier; 0 or None = as fast as possible (float)
+    - `spin_time` : seconds before a frame is due to stop sleeping and start spinning (float)
+    - `clientID` : value returned by `getClientID()` (int)
+    ---
+    Accessible properties:
+    - `sent` : messages passed to `tx()` (list of bytes)
+    """
+    def __init__(self, source, speed : float = 1.0, spin_time : float = 0.0005, clientID = 0) -> None:
+        self.speed = speed
+        self.spin_time = spin_time
+        self.clientID = clientID
+        self.sent = [] #type: list[bytes]
+        self._records = iter(_records(source))
+        self._next_due = None #type: float
+        self._next_frame = None #type: bytes
+        self._next_ns = None #type: int
+        self._last_due = 0.0
+        self._start = None #type: float
+        self._first_ns = None #type: int
+        self._last_ns = None #type: int
+        self._finished = False
+        self._frames = 0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+
+    def __iter__(self):
+        """Iterates over every frame at replay speed (blocking until each is due)."""
+        while True:
+            msg = self.rx(blocking=1)
+            if not msg:
+                return
+            yield msg
+
+    ####################
+    # PUBLIC FUNCTIONS #
+    ####################
+
+    def start(self) -> None:
+        """Starts the replay clock. Called automatically by the first read."""
+        if self._start is None:
+            self._start = time.perf_counter()
+
+    def isFinished(self) -> bool:
+        """Returns True once every frame has been delivered."""
+        return not self._load()
+
+    def rx(self, buffer_size = 256, blocking = 0) -> bytes:
+        """
+        Returns the next frame if it's due, or b'' if it isn't (or the replay has finished).
+        - buffer_size = frames longer than this are truncated, like a too-small RP1210 buffer
+        - blocking = wait until the next frame is due
+        """
+        due = self._peek()
+        if due is None:
+            return b''
+        now = time.perf_counter()
+        if now < due:
+            if not blocking:
+                return b''
+            now = self._wait_until(due)
+        return self._pop(now)[:buffer_size]
+
+    def rx_batch(self, max_msgs : int = 0, timeout : float = 0.0) -> list[bytes]:
+        """
+        Returns up to `max_msgs` frames that are due (all of them if 0), waiting up to `timeout`
+        seconds for the first one (until it's due if None).
+        """
+        due = self._peek()
+        if due is None:
+            return []
+        now = time.perf_counter()
+        if now < due:
+            if timeout is not None and now + timeout < due:
+                if timeout > 0:
+                    time.sleep(timeout)
+                return []
+            now = self._wait_until(due)
+        msgs = []
+        while due is not None and due <= now and (not max_msgs or len(msgs) < max_msgs):
+            msgs.append(self._pop(now))
+            due = self._peek()
+        return msgs
+
+    def rx_many(self, arena : RxArena, max_msgs = 0, blocking = 0) -> RxArena:
+        """
+        Copies frames that are due into a reusable RxArena, like `RP1210Client.rx_many()`.
+        - blocking = wait until the first frame is due
+        """
+        if not max_msgs or max_msgs > arena.max_msgs:
+            max_msgs = arena.max_msgs
+        msgs = self.rx_batch(max_msgs, None if blocking else 0.0)
+        buffer = arena.buffer
+        offsets = arena.offsets
+        lengths = arena.lengths
+        slot_size = arena.slot_size
+        for i, msg in enumerate(msgs):
+            size = min(len(msg), slot_size)
+            buffer[offsets[i]:offsets[i] + size] = msg[:size]
+            lengths[i] = size
+        arena.count = len(msgs)
+        return arena
+
+    def tx(self, message, msg_size = 0) -> int:
+        """Stores the message in `sent`. Returns 0."""
+        if msg_size == 0:
+            msg_size = len(message)
+        self.sent.append(bytes(message[:msg_size]))
+        return 0
+
+    def command(self, CommandNumber, ClientCommand = b"", MessageSize = 0) -> int:
+        """Accepts and ignores RP1210 commands. Returns 0."""
+        return 0
+
+    def getClientID(self) -> int:
+        """Returns the `clientID` given at initialization."""
+        return self.clientID
+
+    def stats(self) -> ReplayStats:
+        """Returns timing statistics for the frames delivered so far."""
+        elapsed = time.perf_counter() - self._start if self._start is not None else 0.0
+        target_rate = 0.0
+        if self.speed and self._frames > 1 and self._last_ns > self._first_ns:
+            span = (self._last_ns - self._first_ns) / 1e9 / self.speed
+            target_rate = (self._frames - 1) / span
+        mean_lag = self._lag_total / self._frames if self._frames else 0.0
+        return ReplayStats(self._frames, elapsed, target_rate, mean_lag, self._lag_max)
+
+    #######################
+    # PROTECTED FUNCTIONS #
+    #######################
+
+    def _load(self) -> bool:
+        """Loads the next received frame if needed. Returns False if there are no more."""
+        if self._next_frame is not None:
+            return True
+        if self._finished:
+            return False
+        for time_ns, flags, frame in self._records:
+            if flags & FLAG_TX: # sent by the recording application, not received
+                continue
+            self._next_ns = time_ns
+            self._next_frame = bytes(frame)
+            self._next_due = None
+            return True
+        self._finished = True
+        return False
+
+    def _peek(self) -> float:
+        """
+        Loads the next frame if needed and returns its due time, or None if there are no more.
+        Starts the replay clock.
+        """
+        if not self._load():
+            return None
+        if self._next_due is None:
+            self.start()
+            time_ns = self._next_ns
+            if self._first_ns is None:
+                self._first_ns = time_ns
+            if self.speed:
+                # clamp so a clock that went backwards in the capture doesn't reorder frames
+                offset = max(time_ns - self._first_ns, 0) / 1e9 / self.speed
+                self._next_due = max(self._start + offset, self._last_due)
+            else:
+                self._next_due = self._start
+            self._last_due = self._next_due
+            self._last_ns = time_ns
+        return self._next_due
+
+    def _pop(self, now : float) -> bytes:
+        """Delivers the loaded frame, recording how late it was."""
+        frame = self._next_frame
+        self._next_frame = None
+        self._frames += 1
+        if self.speed:
+            lag = now - self._next_due
+            self._lag_total += lag
+            if lag > self._lag_max:
+                self._lag_max = lag
+        return frame
+
+    def _wait_until(self, due : float) -> float:
+        """Sleeps, then spins, until `due`. Returns the current time."""
+        now = time.perf_counter()
+        if due - now > self.spin_time:
+            time.sleep(due - now - self.spin_time)
+        now = time.perf_counter()
+        while now < due:
+            now = time.perf_counter()
+        return now
+
+def _records(source):
+    """Returns an iterable of (time_ns, flags, frame) tuples from any supported replay source."""
+    if isinstance(source, str):
+        return CaptureReader(source).records()
+    if isinstance(source, CaptureReader):
+        return source.records()
+    if isinstance(source, MappedCapture):
+        source = source.query()
+    if isinstance(source, CaptureSlice):
+        return ((record.time_ns, record.flags, record.frame) for record in source)
+    return source
@@ -0,0 +1,304 @@
+"""
+Routes received J1939 frames to handlers subscribed by PGN, PGN range, source and destination.
+
+Instead of every handler checking every frame, Router looks each frame's (PGN, SA, DA) up in
+tables of the handlers that want each value (a HeaderIndex), so routing costs the same no matter
+how many handlers there are. Each frame is decoded once, into a J1939Message shared by all of its
+handlers, and only if at least one handler wants it:
+```
+router = Router()
+router.subscribe(on_engine_speed, pgn=0xF004)
+router.subscribe(on_dm1, pgn=0xFECA, sa=0x00)
+router.subscribe(on_proprietary, pgn_range=(0xFF00, 0xFFFF))
+router.subscribe(on_anything_for_me, da=0xF9)
+while True:
+    router.poll(client, timeout=0.1) # or router.dispatch_batch(frames) from your own receive loop
+```
+"""
+from bisect import bisect_right
+from .J1939 import J1939Message
+
+class Subscription():
+    """
+    A handler registered with `Router.subscribe()`. Criteria that are None match anything.
+    ---
+    Accessible properties:
+    - `handler` : function called with each matching J1939Message
+    - `pgn`, `pgn_range`, `sa`, `da` : what it subscribed to (int, tuple of 2 int, int, int)
+    - `count` : number of frames delivered to the handler (int)
+    """
+    __slots__ = ("handler", "pgn", "pgn_range", "sa", "da", "count")
+
+    def __init__(self, handler, pgn : int = None, pgn_range : tuple = None, sa : int = None,
+                    da : int = None) -> None:
+        self.handler = handler
+        self.pgn = None if pgn is None else routingPGN(pgn)
+        self.pgn_range = None if pgn_range is None else (pgn_range[0], pgn_range[1])
+        self.sa = sa
+        self.da = da
+        self.count = 0
+
+    def __str__(self) -> str:
+        criteria = [f"{name}={value!r}" for name, value in (("pgn", self.pgn),
+                    ("pgn_range", self.pgn_range), ("sa", self.sa), ("da", self.da)) if value is not None]
+        name = getattr(self.handler, "__name__", repr(self.handler))
+        return f"{name}({', '.join(criteria) or 'all'}): {self.count} frames"
+
+    def matches(self, pgn : int, sa : int, da : int) -> bool:
+        """Returns True if a frame with this (routing) PGN, SA and DA should go to the handler."""
+        if self.pgn is not None and pgn != self.pgn:
+            return False
+        if self.pgn_range is not None and not self.pgn_range[0] <= pgn <= self.pgn_range[1]:
+            return False
+        return (self.sa is None or sa == self.sa) and (self.da is None or da == self.da)
+
+def routingPGN(pgn : int) -> int:
+    """
+    Returns the PGN used for routing: for PDU1 (destination-specific) PGNs, the PS byte holds the
+    destination address rather than being part of the PGN, so it's cleared.
+    """
+    pgn &= 0x3FFFF
+    if (pgn >> 8) & 0xFF < 0xF0:
+        return pgn & 0x3FF00
+    return pgn
+
+class HeaderIndex():
+    """
+    Finds which entries (e.g. Router subscriptions, SoftwareFilter rules) a J1939 frame's header
+    matches, by PGN, PGN range, source, destination and priority.
+
+    Each entry is one bit of an int, in the order they're added. For each header field the index
+    keeps the bits of the entries that accept each value: 256-entry SA and DA tables, an 8-entry
+    priority table, a dict of PGNs, and sorted PGN range boundaries. They're filled in as entries
+    are added, so a frame costs a handful of lookups ANDed together, however many entries there
+    are and however varied the traffic.
+    ---
+    Params:
+    - `echo` : set to True if frames include the echo byte (bool)
+    """
+    def __init__(self, echo = False) -> None:
+        self._start = 4 + int(bool(echo)) # header offset in a frame
+        self.clear()
+
+    def __len__(self) -> int:
+        return self._count
+
+    ####################
+    # PUBLIC FUNCTIONS #
+    ####################
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        self._count = 0
+        self._pgns = {} #type: dict[int, int] # routing PGN: bits of the entries that list it
+        self._any_pgn = 0 # bits of the entries that don't list PGNs
+        self._bounds = [0] # PGN range boundaries; _range_bits[i] covers _bounds[i] to _bounds[i + 1]
+        self._range_bits = [0]
+        self._ranged = False
+        self._sa = [0] * 256
+        self._da = [0] * 256
+        self._pri = [0] * 8
+
+    def add(self, pgns = None, pgn_range : tuple = None, sa = None, da = None, pri = None) -> int:
+        """
+        Adds an entry that matches frames meeting every criterion; None matches anything.
+        - pgns = routing PGNs, see `routingPGN()` (iterable of int)
+        - pgn_range = (first, last) routing PGNs, inclusive (tuple of 2 int)
+        - sa, da, pri = accepted values (int or iterable of int)
+
+        Returns the entry's bit number.
+        """
+        bit = 1 << self._count
+        if pgns is None:
+            self._any_pgn |= bit
+        else:
+            for pgn in pgns:
+                self._pgns[pgn] = self._pgns.get(pgn, 0) | bit
+        if pgn_range is None:
+            self._range_bits = [bits | bit for bits in self._range_bits]
+        else:
+            first, last = pgn_range
+            self._split(first)
+            self._split(last + 1)
+            for i, start in enumerate(self._bounds):
+                if first <= start <= last:
+                    self._range_bits[i] |= bit
+            self._ranged = True
+        for table, values in ((self._sa, sa), (self._da, da), (self._pri, pri)):
+            if values is None:
+                values = range(len(table))
+            elif isinstance(values, int):
+                values = (values,)
+            for value in values:
+                table[value] |= bit
+        self._count += 1
+        return self._count - 1
+
+    def match(self, frame) -> int:
+        """
+        Returns the bits of the entries that a frame (bytes-like from RP1210_ReadMessage, or a
+        J1939Message) matches.
+        """
+        if isinstance(frame, J1939Message):
+            pgn = frame.pgn & 0x3FFFF
+            pri = frame.pri & 0b111
+            sa = frame.sa
+            da = frame.da
+        else:
+            start = self._start
+            if len(frame) < start + 6: # short frame; J1939Message pads it with zeros
+                frame = bytes(frame[start:start + 6]).ljust(6, b'\x00')
+                start = 0
+            pgn = frame[start] | (frame[start + 1] << 8) | ((frame[start + 2] & 0x03) << 16)
+            pri = frame[start + 3] & 0b111
+            sa = frame[start + 4]
+            da = frame[start + 5]
+        if (pgn >> 8) & 0xFF < 0xF0:
+            pgn &= 0x3FF00
+        else: # PDU2 messages are broadcast, like J1939Message.da says
+            da = 0xFF
+        bits = (self._pgns.get(pgn, 0) | self._any_pgn) & self._sa[sa] & self._da[da] & self._pri[pri]
+        if bits and self._ranged:
+            bits &= self._range_bits[bisect_right(self._bounds, pgn) - 1]
+        return bits
+
+    def matchFields(self, pgn : int, sa : int, da : int = 0xFF, pri : int = None) -> int:
+        """Returns the bits of the entries a frame with this PGN, SA, DA and priority matches."""
+        if (pgn >> 8) & 0xFF >= 0xF0:
+            da = 0xFF
+        pgn = routingPGN(pgn)
+        bits = (self._pgns.get(pgn, 0) | self._any_pgn) & self._sa[sa] & self._da[da]
+        if pri is not None:
+            bits &= self._pri[pri & 0b111]
+        if bits and self._ranged:
+            bits &= self._range_bits[bisect_right(self._bounds, pgn) - 1]
+        return bits
+
+    #######################
+    # PROTECTED FUNCTIONS #
+    #######################
+
+    def _split(self, pgn : int) -> None:
+        """Makes `pgn` a range boundary, if it isn't one."""
+        i = bisect_right(self._bounds, pgn) - 1
+        if self._bounds[i] != pgn:
+            self._bounds.insert(i + 1, pgn)
+            self._range_bits.insert(i + 1, self._range_bits[i])
+
+def entries(bits : int, items : list) -> list:
+    """Returns the `items` whose bits are set in `bits` (from `HeaderIndex.match()`), in order."""
+    matched = []
+    while bits:
+        low = bits & -bits
+        matched.append(items[low.bit_length() - 1])
+        bits ^= low
+    return matched
+
+class Router():
+    """
+    Dispatches received frames to subscribed handlers in constant time per frame.
+
+    Subscriptions are indexed by PGN, PGN range, SA and DA as they're made (see HeaderIndex), so
+    each frame costs a few table lookups and the handler calls, whatever the traffic looks like.
+
+    Handlers are called in the order they subscribed. Exceptions raised by handlers aren't caught.
+    ---
+    Params:
+    - `echo` : set to True if frames include the echo byte (bool)
+    ---
+    Accessible properties:
+    - `frames` : frames dispatched (int)
+    - `unmatched` : frames no handler wanted (int)
+    """
+    def __init__(self, echo = False) -> None:
+        self.echo = echo
+        self.frames = 0
+        self.unmatched = 0
+        self._subscriptions = [] #type: list[Subscription]
+        self._index = HeaderIndex(echo)
+
+    ####################
+    # PUBLIC FUNCTIONS #
+    ####################
+
+    def subscribe(self, handler, pgn : int = None, pgn_range : tuple = None, sa : int = None,
+                    da : int = None) -> Subscription:
+        """
+        Registers `handler` to be called with each received J1939Message that matches every given
+        criterion. Leave them all out to receive every frame.
+        - pgn = PGN; for PDU1 PGNs the PS byte is ignored (use `da` to pick a destination)
+        - pgn_range = (first, last) PGNs, inclusive (PDU1 PGNs are compared with the PS byte cleared)
+        - sa = source address
+        - da = destination address (0xFF for PDU2/broadcast messages)
+
+        Returns the Subscription, for `unsubscribe()` and its `count`.
+        """
+        subscription = Subscription(handler, pgn, pgn_range, sa, da)
+        self._subscriptions.append(subscription)
+        self._add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription : Subscription) -> None:
+        """Removes a subscription. Raises ValueError if it isn't registered."""
+        self._subscriptions.remove(subscription)
+        self._index.clear() # the others' bits move down, so index them again
+        for remaining in self._subscriptions:
+            self._add(remaining)
+
+    def subscriptions(self) -> list[Subscription]:
+        """Returns the registered subscriptions, in the order they're called."""
+        return list(self._subscriptions)
+
+    def dispatch(self, frame) -> int:
+        """
+        Routes one frame (bytes-like from RP1210_ReadMessage, or a J1939Message) to its handlers.
+
+        Returns the number of handlers called.
+        """
+        self.frames += 1
+        bits = self._index.match(frame)
+        if not bits:
+            self.unmatched += 1
+            return 0
+        if bits & (bits - 1):
+            subscriptions = entries(bits, self._subscriptions)
+        else: # just one
+            subscriptions = (self._subscriptions[bits.bit_length() - 1],)
+        msg = frame if isinstance(frame, J1939Message) else J1939Message(bytes(frame), echo=self.echo)
+        for subscription in subscriptions: # the message is decoded once, for all of its handlers
+            subscription.count += 1
+            subscription.handler(msg)
+        return len(subscriptions)
+
+    def dispatch_batch(self, frames) -> int:
+        """
+        Routes every frame in `frames` (e.g. from `rx_batch()`, or an RxArena) to its handlers.
+
+        Returns the number of handler calls made.
+        """
+        dispatch = self.dispatch
+        calls = 0
+        for frame in frames:
+            calls += dispatch(frame)
+        return calls
+
+    def poll(self, client, max_msgs : int = 0, timeout : float = 0.0) -> int:
+        """
+        Reads a batch from an RP1210Client (or anything with `rx_batch()`) and dispatches it.
+
+        Returns the number of handler calls made.
+        """
+        return self.dispatch_batch(client.rx_batch(max_msgs, timeout))
+
+    def handlers(self, pgn : int, sa : int, da : int = 0xFF) -> list:
+        """Returns the handlers a frame with this PGN, SA and DA would be routed to."""
+        bits = self._index.matchFields(pgn, sa, da)
+        return [subscription.handler for subscription in entries(bits, self._subscriptions)]
+
+    #######################
+    # PROTECTED FUNCTIONS #
+    #######################
+
+    def _add(self, subscription : Subscription) -> None:
+        pgns = None if subscription.pgn is None else (subscription.pgn,)
+        self._index.add(pgns, subscription.pgn_range, subscription.sa, subscription.da)
@@ -0,0 +1,385 @@
+"""
+Decodes J1939 signals (SPNs) from message data, using signal definitions you supply.
+
+This package doesn't ship an SAE parameter database. Define the signals you have (from the J1939
+Digital Annex, a DBC file, or a supplier's spec), and SignalDecoder compiles them per PGN:
+```
+decoder = SignalDecoder({
+    0xF004: [Signal("EngineSpeed", position="4-5", length=16, scale=0.125, unit="rpm", spn=190),
+            Signal("EngineTorqueMode", position="1.1", length=4, spn=899)],
+    0xFEEE: [Signal("EngineCoolantTemp", position="1", length=8, offset=-40, unit="°C", spn=110)],
+})
+values = decoder.decode(frame) # {'EngineSpeed': 1500.0, 'EngineTorqueMode': 3}, or None
+columns = decoder.decode_batch(arena.buffer, arena.offsets[:arena.count], arena.lengths[:arena.count])
+rpm = columns[0xF004]['EngineSpeed'] # NumPy array, NaN where not available
+```
+Raw values in the J1939 "not available" or "error" ranges (J1939-71: 0xFF../0xFE.. in the top byte
+of parameters 8 bits or longer; all ones / all ones but one for shorter ones) decode to None, or
+NaN in batches; `statuses()` and `DecodedSignals.status()` say which.
+"""
+import re
+from .J1939 import J1939Message, decode_batch as _decode_headers
+from .Router import routingPGN
+
+try:
+    import numpy as np
+except ImportError: # numpy is only needed for decode_batch()
+    np = None
+
+# signal statuses
+VALID = 0
+ERROR = 1
+NOT_AVAILABLE = 2
+
+def parsePosition(position) -> int:
+    """
+    Returns the start bit (0 = bit 1 of byte 1) of a J1939-71 SPN position: "4-5" (bytes 4 and 5),
+    "1.5" (byte 1, bit 5), "2.1-2.4", or just a byte number.
+    """
+    match = re.fullmatch(r"\s*(\d+)(?:\.(\d+))?(?:\s*-.*)?", str(position))
+    if match is None or int(match.group(1)) < 1 or (match.group(2) and not 1 <= int(match.group(2)) <= 8):
+        raise ValueError(f"Invalid SPN position: {position!r}")
+    return (int(match.group(1)) - 1) * 8 + (int(match.group(2) or 1) - 1)
+
+class Signal():
+    """
+    One signal (SPN) in a message's data, defined the way DBC files define them.
+
+    physical value = raw value * `scale` + `offset`
+    ---
+    Params:
+    - `name` : name, used as the key of decoded values (str)
+    - `start` : for little-endian (Intel, as J1939 uses) signals, the bit number of the least
+    significant bit (byte * 8 + bit, from 0); for big-endian (Motorola) signals, the most
+    significant bit, numbered the same way (int)
+    - `length` : bits, 1 - 64 (int)
+    - `scale`, `offset` : from raw to physical value (int or float)
+    - `little_endian` : byte order (bool)
+    - `signed` : two's complement raw value (bool)
+    - `unit` : (str)
+    - `spn` : Suspect Parameter Number (int)
+    - `position` : J1939-71 position, like "4-5" or "1.5", instead of `start` (str)
+    - `special` : raw values in the not available/error ranges aren't values; set to False for
+    signals that use every raw value (bool)
+    - `minimum`, `maximum` : physical range, for reference; values outside it aren't changed
+    """
+    __slots__ = ("name", "start", "length", "scale", "offset", "little_endian", "signed", "unit", "spn",
+                    "special", "minimum", "maximum")
+
+    def __init__(self, name : str, start : int = None, length : int = 8, scale = 1, offset = 0,
+                    little_endian = True, signed = False, unit : str = "", spn : int = None,
+                    position : str = None, special = True, minimum = None, maximum = None) -> None:
+        if position is not None:
+            start = parsePosition(position)
+        if start is None or start < 0:
+            raise ValueError(f"Signal {name} needs a start bit or position.")
+        if not 1 <= length <= 64:
+            raise ValueError(f"Signal {name} length must be 1 - 64 bits.")
+        self.name = name
+        self.start = start
+        self.length = length
+        self.scale = scale
+        self.offset = offset
+        self.little_endian = little_endian
+        self.signed = signed
+        self.unit = unit
+        self.spn = spn
+        self.special = special
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def __repr__(self) -> str:
+        return (f"Signal({self.name!r}, start={self.start}, length={self.length}, scale={self.scale}, "
+                f"offset={self.offset}, little_endian={self.little_endian}, signed={self.signed})")
+
+    def byteSpan(self) -> tuple:
+        """Returns (first, last) data byte the signal is in."""
+        if self.little_endian:
+            return self.start // 8, (self.start + self.length - 1) // 8
+        first = self.start // 8
+        return first, first + (self.length - 1 - self.start % 8 + 7) // 8
+
+    def limits(self) -> tuple:
+        """
+        Returns the lowest raw values (unsigned) that are errors and that are not available, or
+        values past the raw range if the signal doesn't have them.
+        """
+        length = self.length
+        if not self.special or length < 2:
+            return 1 << length, 1 << length
+        if length >= 8:
+            return 0xFE << (length - 8), 0xFF << (length - 8)
+        return (1 << length) - 2, (1 << length) - 1
+
+class DecodedSignals():
+    """
+    The signals of one PGN, decoded from a batch of frames by `SignalDecoder.decode_batch()`.
+    `decoded[name]` is that signal's column: a float64 array with one value per frame, NaN where
+    the raw value was an error or not available.
+    ---
+    Accessible properties:
+    - `pgn` : (int)
+    - `rows` : index of each frame in the batch (NumPy array)
+    - `timestamp`, `sa`, `da` : of each frame (NumPy arrays)
+    - `values` : {signal name: column} (dict)
+    - `statuses` : {signal name: VALID, ERROR or NOT_AVAILABLE for each frame} (dict of NumPy arrays)
+    """
+    __slots__ = ("pgn", "rows", "timestamp", "sa", "da", "values", "statuses")
+
+    def __init__(self, pgn : int, rows, timestamp, sa, da) -> None:
+        self.pgn = pgn
+        self.rows = rows
+        self.timestamp = timestamp
+        self.sa = sa
+        self.da = da
+        self.values = {}
+        self.statuses = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, name : str):
+        return self.values[name]
+
+    def __contains__(self, name : str) -> bool:
+        return name in self.values
+
+    def status(self, name : str):
+        """Returns the status (VALID, ERROR or NOT_AVAILABLE) of signal `name` in each frame."""
+        return self.statuses[name]
+
+class SignalDecoder():
+    """
+    Decodes the signals of the PGNs it's given definitions for.
+
+    Each PGN's signals are compiled into an extraction plan: per signal, the shift and mask that
+    take it out of the message data read as one integer, the sign bit, scale and offset, and the
+    raw values where the error and not available ranges start. A frame's data is read once as a
+    little-endian integer (and once big-endian, if the PGN has Motorola signals), and each signal
+    is a shift, a mask and a multiply-add; the status is two comparisons used as an index, not a
+    branch. Data shorter than the PGN's signals is padded with 0xFF (not available).
+
+    For batches, signals whose bytes fit in the same 8 bytes are read together as one column of
+    64-bit words, and the not available/error values are masked with array operations.
+
+    PDU1 PGNs are matched with the PS byte cleared, so 0xEF00 covers 0xEFxx.
+    ---
+    Params:
+    - `signals` : {PGN: iterable of Signal} (dict)
+    - `echo` : set to True if frames include the echo byte (bool)
+    - `plans` : the extraction plans `plans()` returned for the same signals, to skip compiling
+    them again (e.g. loaded from a cache) (dict)
+    """
+    def __init__(self, signals : dict = None, echo = False, plans : dict = None) -> None:
+        self.echo = echo
+        self._start = 4 + int(bool(echo)) # header offset in a frame
+        self._signals = {} #type: dict[int, list[Signal]]
+        self._plans = {} #type: dict[int, tuple]
+        if plans is not None:
+            self._signals = {routingPGN(pgn): list(pgn_signals) for pgn, pgn_signals in (signals or {}).items()}
+            self._plans = {routingPGN(pgn): plans[pgn] for pgn in (signals or {})}
+            return
+        for pgn, pgn_signals in (signals or {}).items():
+            self.addSignals(pgn, pgn_signals)
+
+    def __contains__(self, pgn : int) -> bool:
+        return routingPGN(pgn) in self._plans
+
+    ####################
+    # PUBLIC FUNCTIONS #
+    ####################
+
+    def addSignals(self, pgn : int, signals) -> None:
+        """Adds signal definitions for `pgn` (an iterable of Signal, or one Signal)."""
+        if isinstance(signals, Signal):
+            signals = (signals,)
+        pgn = routingPGN(pgn)
+        pgn_signals = self._signals.setdefault(pgn, [])
+        names = {signal.name for signal in pgn_signals}
+        for signal in signals:
+            if signal.name in names:
+                raise ValueError(f"PGN {pgn:#06x} already has a signal named {signal.name}.")
+            names.add(signal.name)
+            pgn_signals.append(signal)
+        self._plans[pgn] = self._compile(pgn_signals)
+
+    def signals(self, pgn : int = None):
+        """Returns the signals of `pgn` (list), or {PGN: signals} for every PGN."""
+        if pgn is None:
+            return {pgn: list(signals) for pgn, signals in self._signals.items()}
+        return list(self._signals.get(routingPGN(pgn), ()))
+
+    def pgns(self) -> list[int]:
+        """Returns the PGNs with signals, in the order they were added."""
+        return list(self._plans)
+
+    def plans(self) -> dict[int, tuple]:
+        """
+        Returns {PGN: extraction plan}. Plans are nested tuples of ints, floats, bools and strs, so
+        they can be saved (e.g. with `marshal`) and passed back to SignalDecoder.
+        """
+        return dict(self._plans)
+
+    def decode(self, frame) -> dict:
+        """
+        Decodes a frame (bytes-like from RP1210_ReadMessage, or a J1939Message).
+
+        Returns {signal name: physical value, or None if not available or an error}, or None if
+        there aren't any signals for the frame's PGN.
+        """
+        if isinstance(frame, J1939Message):
+            pgn = frame.pgn & 0x3FFFF
+            data = frame.data
+        else:
+            start = self._start
+            header = frame[start:start + 3]
+            if len(header) < 3:
+                return None
+            pgn = header[0] | (header[1] << 8) | ((header[2] & 0x03) << 16)
+            data = frame[start + 6:]
+        if (pgn >> 8) & 0xFF < 0xF0:
+            pgn &= 0x3FF00
+        plan = self._plans.get(pgn)
+        if plan is None:
+            return None
+        return self._decode(plan, data)
+
+    def decodeData(self, pgn : int, data) -> dict:
+        """Like `decode()`, but for message data (bytes-like) you already know the PGN of."""
+        plan = self._plans.get(routingPGN(pgn))
+        if plan is None:
+            return None
+        return self._decode(plan, data)
+
+    def statuses(self, pgn : int, data) -> dict:
+        """Returns {signal name: VALID, ERROR or NOT_AVAILABLE} for message data of `pgn`, or None."""
+        plan = self._plans.get(routingPGN(pgn))
+        if plan is None:
+            return None
+        nbytes, little, big = plan[:3]
+        data = bytes(data[:nbytes]).ljust(nbytes, b'\xFF')
+        ret_val = {}
+        for word, signals in ((int.from_bytes(data, 'little'), little), (int.from_bytes(data, 'big'), big)):
+            for name, shift, mask, _, _, _, error, not_available in signals:
+                raw = (word >> shift) & mask
+                ret_val[name] = (raw >= error) + (raw >= not_available)
+        return ret_val
+
+    def decode_batch(self, buffer, offsets, lengths = None, pgns = None) -> dict:
+        """
+        Decodes the signals in a batch of frames with NumPy. Takes the same frame arguments as
+        `J1939.decode_batch()`: frame `i` is `buffer[offsets[i]:offsets[i + 1]]`, or starts at
+        `offsets[i]` and is `lengths[i]` bytes long if `lengths` is given (e.g. an RxArena).
+        - pgns = only decode these PGNs (default: every PGN with signals)
+
+        Returns {PGN: DecodedSignals} for the PGNs that had frames in the batch.
+        """
+        if np is None:
+            raise ImportError("decode_batch() requires NumPy.")
+        frames = _decode_headers(buffer, offsets, lengths, self.echo)
+        if not len(frames):
+            return {}
+        routing = np.where(frames['pf'] < 0xF0, frames['pgn'] & 0x3FF00, frames['pgn'])
+        buf = np.frombuffer(buffer, dtype=np.uint8)
+        wanted = self._plans if pgns is None else [routingPGN(pgn) for pgn in pgns]
+        ret_val = {}
+        for pgn in wanted:
+            plan = self._plans.get(pgn)
+            if plan is None:
+                continue
+            rows = np.flatnonzero(routing == pgn)
+            if not len(rows):
+                continue
+            selected = frames[rows]
+            decoded = DecodedSignals(pgn, rows, selected['timestamp'], selected['sa'], selected['da'])
+            data_offsets = selected['data_offset'].astype(np.int64)
+            sizes = selected['size'].astype(np.int64)
+            for first, little_endian, signals in plan[3]:
+                word = self._gather_words(buf, data_offsets, sizes, first, little_endian)
+                for name, shift, mask, sign, scale, offset, error, not_available in signals:
+                    raw = (word >> np.uint64(shift)) & np.uint64(mask)
+                    if not_available > mask: # no special values
+                        status = np.zeros(len(raw), dtype=np.uint8)
+                    else:
+                        status = (raw >= np.uint64(error)).astype(np.uint8) + (raw >= np.uint64(not_available))
+                    if sign:
+                        raw = ((raw ^ np.uint64(sign)) - np.uint64(sign)).view(np.int64)
+                    decoded.values[name] = np.where(status, np.nan, raw * float(scale) + offset)
+                    decoded.statuses[name] = status
+            ret_val[pgn] = decoded
+        return ret_val
+
+    #######################
+    # PROTECTED FUNCTIONS #
+    #######################
+
+    def _compile(self, signals : list) -> tuple:
+        """
+        Returns the extraction plan for a PGN's signals: (data bytes used, little-endian signal
+        steps, big-endian signal steps, batch groups). A step is (name, shift, mask, sign bit,
+        scale, offset, lowest error value, lowest not available value), with the shift into the
+        data read as one integer of that many bytes. A batch group is (first byte, little-endian,
+        steps) with the shifts into the 8 bytes from the first byte.
+        """
+        spans = [signal.byteSpan() for signal in signals]
+        for signal, (first, last) in zip(signals, spans):
+            if last - first >= 8:
+                raise ValueError(f"Signal {signal.name} spans more than 8 bytes.")
+        nbytes = max(last for _, last in spans) + 1
+        little, big = [], []
+        for signal in signals:
+            length = signal.length
+            if signal.little_endian:
+                shift = signal.start
+            else: # counted from the end of the data, to the signal's least significant bit
+                shift = (nbytes - 1 - signal.start // 8) * 8 + signal.start % 8 + 1 - length
+            sign = 1 << (length - 1) if signal.signed else 0
+            step = (signal.name, shift, (1 << length) - 1, sign, signal.scale, signal.offset) + signal.limits()
+            (little if signal.little_endian else big).append(step)
+        # signals share a batch group if they fit in the 8 bytes from the group's first byte
+        groups = {} # (first byte, little endian): steps
+        steps = {step[0]: step for step in little + big}
+        for signal, (first, last) in sorted(zip(signals, spans), key=lambda pair: pair[1]):
+            order = signal.little_endian
+            group = next((start for start, endian in groups if endian == order and last < start + 8), first)
+            if order:
+                shift = signal.start - group * 8
+            else:
+                shift = (7 - (signal.start // 8 - group)) * 8 + signal.start % 8 + 1 - signal.length
+            step = steps[signal.name]
+            groups.setdefault((group, order), []).append((step[0], shift) + step[2:])
+        batch = tuple((first, order, tuple(group)) for (first, order), group in groups.items())
+        return nbytes, tuple(little), tuple(big), batch
+
+    def _decode(self, plan : tuple, data) -> dict:
+        nbytes, little, big, _ = plan
+        if len(data) != nbytes:
+            data = bytes(data[:nbytes]).ljust(nbytes, b'\xFF')
+        values = {}
+        word = int.from_bytes(data, 'little')
+        for name, shift, mask, sign, scale, offset, error, not_available in little:
+            raw = (word >> shift) & mask
+            status = (raw >= error) + (raw >= not_available)
+            if sign:
+                raw = (raw ^ sign) - sign
+            values[name] = (raw * scale + offset, None, None)[status]
+        if big:
+            word = int.from_bytes(data, 'big')
+            for name, shift, mask, sign, scale, offset, error, not_available in big:
+                raw = (word >> shift) & mask
+                status = (raw >= error) + (raw >= not_available)
+                if sign:
+                    raw = (raw ^ sign) - sign
+                values[name] = (raw * scale + offset, None, None)[status]
+        return values
+
+    def _gather_words(self, buf, data_offsets, sizes, first : int, little_endian : bool):
+        """
+        Reads data bytes `first` to `first + 7` of each frame as a 64-bit word; bytes past the end
+        of a frame's data read as 0xFF.
+        """
+        columns = np.arange(first, first + 8)
+        index = data_offsets[:, None] + columns
+        present = columns < sizes[:, None]
+        raw = np.where(present, buf[np.minimum(index, len(buf) - 1)], 0xFF).astype(np.uint8)
+        return np.ascontiguousarray(raw).view('<u8' if little_endian else '>u8').ravel().astype(np.uint64)
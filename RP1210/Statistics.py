@@ -0,0 +1,441 @@
+"""
+Live J1939 bus statistics: frame rates per PGN, per source and per (PGN, source) stream,
+inter-arrival time and jitter, and estimated bus load.
+
+BusStatistics is fed received frames (one at a time, or whole batch-read buffers) and keeps
+sliding-window counters in fixed-size arrays, so each frame costs the same however long it runs.
+`snapshot()` can be called at any time, from any thread, without stopping the receive loop:
+```
+stats = BusStatistics(baud=parseBaud(client.getBaud()), window=1.0,
+                        timestamp_weight=config.getTimeStampWeight())
+arena = client.rx_many(arena)
+stats.feed_buffer(arena.buffer, arena.offsets[:arena.count], arena.lengths[:arena.count])
+snap = stats.snapshot()
+print(f"{snap.load:.1%} load, {snap.frame_rate:.0f} frames/s")
+print(snap.pgnRates()[0xF004], snap.sourceRates()[0x00])
+```
+Time comes from the adapter's frame timestamps (32-bit, in units of `timestamp_weight` µs; wrap-
+around is handled), so statistics don't depend on when the host got around to reading the frames.
+"""
+import re
+from .J1939 import J1939Message
+from .Transport import MAX_TP_SIZE
+
+try:
+    import numpy as np
+except ImportError: # numpy is only needed for the vectorized feed_buffer()
+    np = None
+
+_STREAM_OVERFLOW = -1 # key of the slot shared by streams that don't fit in the table
+
+def frameBits(size : int) -> int:
+    """
+    Estimated bus time, in bits, of a J1939 message with `size` data bytes: an extended CAN frame
+    is 67 bits plus 8 per data byte, plus about one stuff bit per 16 bits from SOF to CRC. Longer
+    messages (reassembled by the adapter) are counted as their TP.CM announcement and TP.DT packets.
+    """
+    if size <= 8:
+        return 67 + 8 * size + (54 + 8 * size) // 16
+    return frameBits(8) * (1 + (size + 6) // 7)
+
+_FRAME_BITS = [frameBits(size) for size in range(MAX_TP_SIZE + 1)]
+_FRAME_BITS_ARRAY = np.asarray(_FRAME_BITS, dtype=np.int64) if np is not None else None
+
+def parseBaud(text) -> int:
+    """
+    Returns the bits/second in the text `RP1210Client.getBaud()` returns (e.g. "b'250000\\x00..."),
+    or 0 if there isn't a number in it.
+    """
+    match = re.search(r"\d+", str(text))
+    return int(match.group()) if match else 0
+
+class BusSnapshot():
+    """
+    Bus statistics over the last window, as of the newest frame fed to BusStatistics.
+    ---
+    Accessible properties:
+    - `time` : timestamp of the newest frame, in seconds (float)
+    - `span` : seconds of traffic the rates are over; less than the window right after starting (float)
+    - `frames` : frames in the window (int)
+    - `frame_rate` : frames/second (float)
+    - `load` : estimated fraction of the bus bandwidth used (float, 0.0 - 1.0)
+    - `streams` : {(PGN, SA): (frames/second, mean inter-arrival time (s), jitter (s))}; jitter is
+    the standard deviation of the inter-arrival time, and both are None until a stream has sent two
+    frames in the window. PDU1 PGNs have the PS byte cleared. Streams that didn't fit in the table
+    are counted under (-1, -1).
+    """
+    __slots__ = ("time", "span", "frames", "frame_rate", "load", "streams")
+
+    def __init__(self, time : float, span : float, frames : int, load : float, streams : dict) -> None:
+        self.time = time
+        self.span = span
+        self.frames = frames
+        self.frame_rate = frames / span if span > 0 else 0.0
+        self.load = load
+        self.streams = streams
+
+    def __str__(self) -> str:
+        return (f"{self.frames} frames in {self.span:.3f} s: {self.frame_rate:.1f} frames/s, "
+                f"{self.load:.1%} bus load, {len(self.streams)} streams")
+
+    def pgnRates(self) -> dict[int, float]:
+        """Returns {PGN: frames/second}, summed over all sources."""
+        rates = {}
+        for (pgn, _), (rate, _, _) in self.streams.items():
+            rates[pgn] = rates.get(pgn, 0.0) + rate
+        return rates
+
+    def sourceRates(self) -> dict[int, float]:
+        """Returns {source address: frames/second}, summed over all PGNs."""
+        rates = {}
+        for (_, sa), (rate, _, _) in self.streams.items():
+            rates[sa] = rates.get(sa, 0.0) + rate
+        return rates
+
+    def traffic(self) -> dict[int, float]:
+        """
+        Returns {(PGN << 8) | SA: frames/second}, the `traffic` argument for
+        `Filters.planJ1939Filters()`.
+        """
+        return {(pgn << 8) | sa: rate for (pgn, sa), (rate, _, _) in self.streams.items() if pgn >= 0}
+
+class BusStatistics():
+    """
+    Sliding-window J1939 bus statistics, updated in O(1) per frame.
+
+    Each (PGN, source) stream gets a slot, found through a dict, in flat lists that hold a ring of
+    `buckets` time buckets covering `window` seconds: frame counts, inter-arrival time sums and
+    bits. Running totals are kept alongside, so the window slides one bucket at a time by
+    subtracting the bucket that falls out of it, and a snapshot only reads the totals. The
+    per-PGN and per-source figures are sums over the streams.
+
+    At most `max_streams` streams get their own slot, in the order they're first seen; the rest
+    share one, which has rates but no inter-arrival times. Nothing is locked: feed frames from one
+    thread, and take snapshots from any.
+    ---
+    Params:
+    - `baud` : bus speed in bits/second, e.g. `parseBaud(client.getBaud())` (int)
+    - `window` : seconds the rates are averaged over (float)
+    - `buckets` : number of steps the window slides in (int)
+    - `timestamp_weight` : µs per adapter timestamp tick, `RP1210Config.getTimeStampWeight()` (float)
+    - `echo` : set to True if frames include the echo byte (bool)
+    - `max_streams` : most (PGN, source) streams tracked separately (int)
+    ---
+    Accessible properties:
+    - `total_frames` : frames fed since the start (int)
+    """
+    def __init__(self, baud : int = 250000, window : float = 1.0, buckets : int = 10,
+                    timestamp_weight : float = 1.0, echo = False, max_streams : int = 1024) -> None:
+        self.baud = baud
+        self.window = window
+        self.buckets = max(buckets, 1)
+        self.timestamp_weight = timestamp_weight
+        self.echo = echo
+        self.max_streams = max_streams
+        self.total_frames = 0
+        self._width = window / self.buckets # seconds per bucket
+        self._stride = max_streams + 1 # slots per bucket, including the overflow slot
+        self._start = 4 + int(bool(echo)) # header offset in a frame
+        self._tick = timestamp_weight * 1e-6 # seconds per timestamp tick
+        self.reset()
+
+    def reset(self) -> None:
+        """Forgets everything."""
+        size = self.buckets * self._stride
+        self._slots = {_STREAM_OVERFLOW: self.max_streams} #type: dict[int, int]
+        self._keys = [None] * self._stride
+        self._keys[self.max_streams] = _STREAM_OVERFLOW
+        self._counts = [0] * size
+        self._totals = [0] * self._stride
+        self._gap_counts = [0] * size # inter-arrival times: count, sum and sum of squares
+        self._gap_sums = [0.0] * size
+        self._gap_squares = [0.0] * size
+        self._last_time = [-1.0] * self._stride
+        self._bits = [0] * self.buckets
+        self._total_bits = 0
+        self._bucket = None #type: int
+        self._first_time = None #type: float
+        self._time = 0.0
+        self._last_raw = 0
+        self._wraps = 0
+        self.total_frames = 0
+
+    ####################
+    # PUBLIC FUNCTIONS #
+    ####################
+
+    def feed(self, frame, now : float = None) -> None:
+        """
+        Counts one frame (bytes-like from RP1210_ReadMessage, or a J1939Message).
+        - now = the frame's time in seconds, instead of its timestamp
+        """
+        if isinstance(frame, J1939Message):
+            raw = frame.timestamp
+            pgn = frame.pgn & 0x3FFFF
+            sa = frame.sa
+            size = len(frame.data)
+        else:
+            start = self._start
+            header = frame[start:start + 6]
+            if len(header) < 6:
+                return
+            raw = (frame[0] << 24) | (frame[1] << 16) | (frame[2] << 8) | frame[3]
+            pgn = (header[0] | (header[1] << 8) | (header[2] << 16)) & 0x3FFFF
+            sa = header[4]
+            size = len(frame) - start - 6
+        if now is None:
+            now = self._timestamp(raw)
+        if now < self._time: # out of order; count it as current
+            now = self._time
+        if (pgn >> 8) & 0xFF < 0xF0:
+            pgn &= 0x3FF00
+        key = (pgn << 8) | sa
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._add_stream(key)
+        bucket = int(now / self._width)
+        if bucket != self._bucket:
+            self._advance(bucket, now)
+        self._time = now
+        ring = bucket % self.buckets
+        index = ring * self._stride + slot
+        self._counts[index] += 1
+        self._totals[slot] += 1
+        if slot != self.max_streams: # overflow frames come from many streams, so have no gaps
+            last = self._last_time[slot]
+            if last >= 0.0:
+                gap = now - last
+                self._gap_counts[index] += 1
+                self._gap_sums[index] += gap
+                self._gap_squares[index] += gap * gap
+            self._last_time[slot] = now
+        bits = _FRAME_BITS[size] if size <= MAX_TP_SIZE else frameBits(size)
+        self._bits[ring] += bits
+        self._total_bits += bits
+        self.total_frames += 1
+
+    def feed_batch(self, frames, now : float = None) -> None:
+        """Counts every frame in `frames` (e.g. from `rx_batch()`, or an RxArena)."""
+        feed = self.feed
+        for frame in frames:
+            feed(frame, now)
+
+    def feed_buffer(self, buffer, offsets, lengths = None) -> None:
+        """
+        Counts the frames in a batch-read buffer, taking the same arguments as
+        `J1939.decode_batch()`: frame `i` is `buffer[offsets[i]:offsets[i + 1]]`, or starts at
+        `offsets[i]` and is `lengths[i]` bytes long if `lengths` is given (e.g. an RxArena).
+
+        With NumPy, the whole batch is counted with array operations and no per-frame objects;
+        without it, frames are fed one at a time.
+        """
+        if np is None:
+            view = memoryview(buffer).cast('B') if not isinstance(buffer, (bytes, bytearray)) else buffer
+            if lengths is None:
+                bounds = list(offsets)
+                pairs = zip(bounds[:-1], bounds[1:])
+            else:
+                pairs = ((offset, offset + length) for offset, length in zip(offsets, lengths))
+            for start, end in pairs:
+                self.feed(view[start:end])
+            return
+        buf = np.frombuffer(buffer, dtype=np.uint8)
+        if lengths is None:
+            bounds = np.asarray(offsets, dtype=np.int64)
+            starts = bounds[:-1]
+            ends = bounds[1:]
+        else:
+            starts = np.asarray(offsets, dtype=np.int64)
+            ends = starts + np.asarray(lengths, dtype=np.int64)
+        header = self._start
+        keep = ends - starts >= header + 6
+        if not keep.all():
+            starts = starts[keep]
+            ends = ends[keep]
+        if not len(starts):
+            return
+        if starts.min() < 0 or ends.max() > len(buf):
+            raise ValueError("Frame offsets must be within buffer.")
+
+        fields = buf[starts[:, None] + np.arange(header + 5)].astype(np.int64) # timestamp to SA
+        raw = (fields[:, 0] << 24) | (fields[:, 1] << 16) | (fields[:, 2] << 8) | fields[:, 3]
+        pgn = (fields[:, header] | (fields[:, header + 1] << 8) | (fields[:, header + 2] << 16)) & 0x3FFFF
+        pgn = np.where(((pgn >> 8) & 0xFF) < 0xF0, pgn & 0x3FF00, pgn)
+        keys = (pgn << 8) | fields[:, header + 4]
+        sizes = np.minimum(ends - starts - header - 6, MAX_TP_SIZE)
+        times = np.maximum.accumulate(np.maximum(self._timestamps(raw), self._time))
+        buckets = (times / self._width).astype(np.int64)
+        # buckets are in order, so the batch splits into runs of frames in the same bucket
+        cuts = np.flatnonzero(np.diff(buckets)) + 1
+        run_buckets = np.concatenate((buckets[:1], buckets[cuts])).tolist()
+        runs = np.zeros(len(keys), dtype=np.int64)
+        runs[cuts] = 1
+        runs = np.cumsum(runs)
+        unique, first_rows, streams = np.unique(keys, return_index=True, return_inverse=True)
+        streams = streams.reshape(-1) # (NumPy 2.0 returns it in the shape of keys)
+        # number the streams in order of arrival, so new ones get slots in the order feed() gives them
+        arrival = np.argsort(first_rows)
+        unique = unique[arrival]
+        rank = np.empty_like(arrival)
+        rank[arrival] = np.arange(len(arrival))
+        streams = rank[streams]
+        # inter-arrival times, per stream (a stable sort keeps each stream in order)
+        order = np.argsort(streams, kind='stable')
+        grouped = streams[order]
+        sorted_times = times[order]
+        same = grouped[1:] == grouped[:-1]
+        later = order[1:][same]
+        gaps = np.diff(sorted_times)[same]
+        firsts = np.concatenate(([0], np.flatnonzero(~same) + 1))
+        lasts = np.concatenate((firsts[1:] - 1, [len(grouped) - 1]))
+        # everything summed per (run, stream) cell, which is then added in one pass per run
+        num_cells = len(run_buckets) * len(unique)
+        cells = runs * len(unique) + streams
+        gap_cells = cells[later]
+        self._feed_cells(unique.tolist(), run_buckets,
+                        np.bincount(cells, minlength=num_cells).tolist(),
+                        np.bincount(gap_cells, minlength=num_cells).tolist(),
+                        np.bincount(gap_cells, weights=gaps, minlength=num_cells).tolist(),
+                        np.bincount(gap_cells, weights=gaps * gaps, minlength=num_cells).tolist(),
+                        np.bincount(runs, weights=_FRAME_BITS_ARRAY[sizes]).tolist(),
+                        order[firsts].tolist(), sorted_times[lasts].tolist(), times, runs)
+        self._time = float(times[-1])
+        self.total_frames += len(keys)
+
+    def snapshot(self) -> BusSnapshot:
+        """Returns the statistics over the last `window` seconds."""
+        keys = list(self._keys)
+        totals = list(self._totals)
+        now = self._time
+        total_bits = self._total_bits
+        if self._bucket is None:
+            return BusSnapshot(now, 0.0, 0, 0.0, {})
+        bucket_start = self._bucket * self._width
+        span = min((self.buckets - 1) * self._width + (now - bucket_start), now - self._first_time)
+        if span <= 0.0:
+            span = self._width
+        counts, sums, squares = self._gap_counts, self._gap_sums, self._gap_squares
+        stride = self._stride
+        streams = {}
+        for slot, key in enumerate(keys):
+            if key is None or not totals[slot]:
+                continue
+            gaps = total = total_sq = 0
+            for index in range(slot, len(counts), stride):
+                gaps += counts[index]
+                total += sums[index]
+                total_sq += squares[index]
+            if gaps:
+                mean = total / gaps
+                jitter = max(total_sq / gaps - mean * mean, 0.0) ** 0.5
+            else:
+                mean = jitter = None
+            stream = (-1, -1) if key == _STREAM_OVERFLOW else (key >> 8, key & 0xFF)
+            streams[stream] = (totals[slot] / span, mean, jitter)
+        load = total_bits / (self.baud * span) if self.baud else 0.0
+        return BusSnapshot(now, span, sum(totals), min(load, 1.0), streams)
+
+    #######################
+    # PROTECTED FUNCTIONS #
+    #######################
+
+    def _timestamp(self, raw : int) -> float:
+        """Seconds from a 32-bit adapter timestamp, counting wrap-arounds."""
+        if raw < self._last_raw and self._last_raw - raw > 0x80000000:
+            self._wraps += 1
+        self._last_raw = raw
+        return ((self._wraps << 32) + raw) * self._tick
+
+    def _timestamps(self, raw):
+        """Vectorized `_timestamp()`."""
+        previous = np.concatenate(([self._last_raw], raw[:-1]))
+        wraps = self._wraps + np.cumsum((previous - raw) > 0x80000000)
+        self._wraps = int(wraps[-1])
+        self._last_raw = int(raw[-1])
+        return ((wraps << 32) + raw) * self._tick
+
+    def _add_stream(self, key : int) -> int:
+        if len(self._slots) > self.max_streams: # every slot but the overflow one is taken
+            return self.max_streams
+        slot = len(self._slots) - 1
+        self._keys[slot] = key
+        self._slots[key] = slot
+        return slot
+
+    def _advance(self, bucket : int, now : float) -> None:
+        """Moves the window forward to `bucket`, clearing the buckets that fall out of it."""
+        if self._bucket is None:
+            self._bucket = bucket
+            self._first_time = now
+            return
+        steps = bucket - self._bucket
+        if steps <= 0:
+            return
+        stride = self._stride
+        totals = self._totals
+        counts = self._counts
+        in_use = list(self._slots.values()) # only slots given to a stream hold anything
+        for step in range(1, min(steps, self.buckets) + 1):
+            ring = (self._bucket + step) % self.buckets
+            base = ring * stride
+            for slot in in_use:
+                count = counts[base + slot]
+                if count:
+                    totals[slot] -= count
+                    counts[base + slot] = 0
+                    self._gap_counts[base + slot] = 0
+                    self._gap_sums[base + slot] = 0.0
+                    self._gap_squares[base + slot] = 0.0
+            self._total_bits -= self._bits[ring]
+            self._bits[ring] = 0
+        self._bucket = bucket
+
+    def _feed_cells(self, keys, run_buckets, counts, gap_counts, gap_sums, gap_squares, bits,
+                    firsts, last_times, times, runs) -> None:
+        """
+        Adds the per-(run, stream) sums from `feed_buffer()` to the window, one run at a time.
+        - firsts = index of each stream's first frame in the batch; its gap from the stream's
+        previous frame is added here, since that's only known per stream
+        """
+        slots = []
+        for key in keys:
+            slot = self._slots.get(key)
+            slots.append(self._add_stream(key) if slot is None else slot)
+        overflow = self.max_streams
+        last_time = self._last_time
+        first_gaps = {} # cell: gap
+        for stream, (slot, first) in enumerate(zip(slots, firsts)):
+            if slot != overflow and last_time[slot] >= 0.0:
+                first_gaps[int(runs[first]) * len(keys) + stream] = float(times[first]) - last_time[slot]
+        for run, bucket in enumerate(run_buckets):
+            if bucket != self._bucket:
+                self._advance(bucket, float(times[np.searchsorted(runs, run)]))
+            ring = bucket % self.buckets
+            base = ring * self._stride
+            cell = run * len(keys)
+            for stream, slot in enumerate(slots):
+                count = counts[cell + stream]
+                if not count:
+                    continue
+                index = base + slot
+                self._counts[index] += count
+                self._totals[slot] += count
+                if slot == overflow:
+                    continue
+                gap_count = gap_counts[cell + stream]
+                gap_sum = gap_sums[cell + stream]
+                gap_square = gap_squares[cell + stream]
+                gap = first_gaps.get(cell + stream)
+                if gap is not None:
+                    gap_count += 1
+                    gap_sum += gap
+                    gap_square += gap * gap
+                self._gap_counts[index] += gap_count
+                self._gap_sums[index] += gap_sum
+                self._gap_squares[index] += gap_square
+            run_bits = int(bits[run])
+            self._bits[ring] += run_bits
+            self._total_bits += run_bits
+        for slot, last in zip(slots, last_times):
+            if slot != overflow:
+                last_time[slot] = last
@@ -0,0 +1,693 @@
+"""
+J1939 transport protocol (J1939-21 TP.CM/TP.DT) for multi-packet messages.
+
+When a client connects with `isAppPacketizingincomingMsgs=1`, the adapter passes transport frames
+through untouched instead of reassembling them, so the application has to do it. TPReassembler
+tracks any number of concurrent BAM and RTS/CTS sessions and turns them back into complete
+J1939Message objects:
+```
+tp = TPReassembler(address=0xF9, send=client.tx) # answers RTS/CTS sessions addressed to 0xF9
+while True:
+    for msg in tp.messages(client.rx_batch(timeout=0.1)):
+        ... # ordinary messages pass straight through; multi-packet messages come out whole
+```
+Sessions addressed to other nodes are reassembled by listening in on their TP.DT packets.
+
+TPTransmitter does the opposite, sending long messages as BAM or RTS/CTS sessions:
+```
+tx = TPTransmitter(client.tx, max_sessions=config.getNumberOfSessions())
+tx.transmit(J1939Message(pgn=0xFECA, sa=0xF9, data=dm1, size=len(dm1))) # BAM
+tx.run(lambda timeout: client.rx_batch(timeout=timeout)) # feeds CTS/EndOfMsgAck back to it
+```
+"""
+import time
+from collections import OrderedDict
+from .J1939 import J1939FrameView, J1939Message, toJ1939Message
+
+TP_CM = 0xEC00 # connection management
+TP_DT = 0xEB00 # data transfer
+
+# TP.CM control bytes
+CM_RTS = 16
+CM_CTS = 17
+CM_EOM_ACK = 19
+CM_BAM = 32
+CM_ABORT = 255
+
+# TP.CM_Abort reasons
+ABORT_BUSY = 1 # already in a session and can't support another
+ABORT_RESOURCES = 2
+ABORT_TIMEOUT = 3
+ABORT_CTS_WHILE_SENDING = 4
+ABORT_MAX_RETRANSMIT = 5
+ABORT_UNEXPECTED_DT = 6
+ABORT_BAD_SEQUENCE = 7
+ABORT_DUPLICATE_SEQUENCE = 8
+ABORT_TOO_LARGE = 9
+
+MAX_TP_SIZE = 1785 # 255 packets * 7 bytes
+T1 = 0.75 # max time between packets (s)
+T2 = 1.25 # max time from sending CTS to receiving data (s)
+
+def isTransportPGN(pgn : int) -> bool:
+    """Returns True if `pgn` is TP.CM or TP.DT (the PS/destination byte is ignored)."""
+    return (pgn & 0x3FF00) in (TP_CM, TP_DT)
+
+class _RxSession():
+    """State for one BAM or RTS/CTS session being received."""
+    __slots__ = ("key", "pgn", "sa", "da", "pri", "size", "packets", "buffer", "seen", "received",
+                    "deadline", "timestamp", "ours", "max_per_cts", "window_end")
+
+    def __init__(self, sa : int, da : int, pgn : int, pri : int, size : int, packets : int) -> None:
+        self.key = (sa, da)
+        self.pgn = pgn
+        self.sa = sa
+        self.da = da
+        self.pri = pri
+        self.size = size
+        self.packets = packets
+        self.buffer = bytearray(packets * 7) # allocated once; packets are copied into place
+        self.seen = bytearray(packets)
+        self.received = 0
+        self.deadline = 0.0
+        self.timestamp = 0
+        self.ours = False
+        self.max_per_cts = 0xFF
+        self.window_end = 0
+
+class TPReassembler():
+    """
+    Reassembles J1939 transport protocol sessions (BAM and RTS/CTS) into J1939Message objects.
+
+    Sessions are keyed by (SA, DA), since TP.DT packets don't carry the PGN and J1939-21 allows only
+    one session per sender/receiver pair; a new BAM or RTS for the same pair replaces the old one.
+    Each session's buffer is allocated once, at its BAM/RTS, and packets are copied straight into
+    it, so nothing is reallocated per packet. Incoming frames are read with J1939FrameView, so
+    they aren't copied either.
+
+    If `address` and `send` are given, RTS/CTS sessions addressed to `address` are answered: CTS
+    for each window of packets (re-requesting any that were missed), EndOfMsgAck when done, and
+    Abort on timeout or when there's no room for the session. Everything else is only listened to.
+
+    Sessions that go quiet for `timeout` seconds (`cts_timeout` after we send a CTS) are dropped.
+    Timeouts are checked on every frame; call `expire()` to check them when no frames arrive.
+    ---
+    Params:
+    - `address` : address(es) to answer RTS/CTS sessions for (int, iterable of int, or None)
+    - `send` : function that transmits a message from `toJ1939Message()`, e.g. `client.tx`
+    - `echo` : set to True if frames include the echo byte (bool)
+    - `timeout` : seconds allowed between packets (J1939-21 T1) (float)
+    - `cts_timeout` : seconds allowed between sending a CTS and receiving data (J1939-21 T2) (float)
+    - `packets_per_cts` : most packets we ask for in each CTS (int, 1-255)
+    - `max_sessions` : most sessions tracked at once; more are rejected (int)
+    - `max_message_size` : largest message accepted, in bytes (int)
+    - `max_total_bytes` : most bytes buffered across all sessions; more sessions are rejected (int)
+    - `pri` : priority of the TP.CM messages we send (int)
+    ---
+    Accessible properties:
+    - `completed`, `aborted`, `timed_out`, `rejected` : session counts (int)
+    """
+    def __init__(self, address = None, send = None, echo = False, timeout : float = T1,
+                    cts_timeout : float = T2, packets_per_cts : int = 16, max_sessions : int = 256,
+                    max_message_size : int = MAX_TP_SIZE, max_total_bytes : int = 1 << 20,
+                    pri : int = 7) -> None:
+        if address is None:
+            address = ()
+        elif isinstance(address, int):
+            address = (address,)
+        self.addresses = frozenset(address)
+        self.send = send
+        self.echo = echo
+        self.timeout = timeout
+        self.cts_timeout = cts_timeout
+        self.packets_per_cts = min(max(packets_per_cts, 1), 0xFF)
+        self.max_sessions = max_sessions
+        self.max_message_size = max_message_size
+        self.max_total_bytes = max_total_bytes
+        self.pri = pri
+        self.completed = 0
+        self.aborted = 0
+        self.timed_out = 0
+        self.rejected = 0
+        self._sessions = OrderedDict() #type: OrderedDict[tuple[int, int], _RxSession]
+        self._total_bytes = 0
+        self._view = J1939FrameView(echo=echo)
+
+    ####################
+    # PUBLIC FUNCTIONS #
+    ####################
+
+    def feed(self, frame, now : float = None) -> J1939Message:
+        """
+        Processes one received frame (bytes-like from RP1210_ReadMessage, or a J1939Message).
+
+        Returns the reassembled J1939Message if this frame completed a session; otherwise None,
+        including for frames that aren't TP.CM/TP.DT.
+        """
+        return self._feed(frame, now)[1]
+
+    def messages(self, frames, now : float = None):
+        """
+        Yields a J1939Message for every frame that isn't part of a transport session, and each
+        reassembled message as its last packet arrives, in order.
+        - frames = iterable of bytes-like frames (e.g. from `rx_batch()` or an RxArena) or J1939Messages
+        """
+        for frame in frames:
+            transport, msg = self._feed(frame, now)
+            if msg is not None:
+                yield msg
+            elif not transport:
+                if not isinstance(frame, J1939Message):
+                    frame = J1939Message(bytes(frame), echo=self.echo)
+                yield frame
+
+    def expire(self, now : float = None) -> int:
+        """Drops sessions that have timed out. Returns how many were dropped."""
+        if now is None:
+            now = time.perf_counter()
+        sessions = self._sessions
+        count = 0
+        # sessions are kept in order of last activity, so only the oldest ones need checking (a
+        # session waiting on a CTS can hold newer ones up by at most cts_timeout - timeout)
+        while sessions:
+            session = next(iter(sessions.values()))
+            if session.deadline > now:
+                break
+            self._close(session)
+            if session.ours:
+                self._send_abort(session, ABORT_TIMEOUT)
+            self.timed_out += 1
+            count += 1
+        return count
+
+    def numSessions(self) -> int:
+        """Returns the number of sessions in progress."""
+        return len(self._sessions)
+
+    def bufferedBytes(self) -> int:
+        """Returns the number of bytes allocated to sessions in progress."""
+        return self._total_bytes
+
+    def isReceiving(self, sa : int, pgn : int = None) -> bool:
+        """
+        Returns True if a session from `sa` is in progress (carrying `pgn`, if given; for PDU1
+        PGNs the PS byte is ignored).
+        """
+        for session in self._sessions.values():
+            if session.sa != sa:
+                continue
+            if pgn is None:
+                return True
+            mask = 0x3FFFF if (pgn >> 8) & 0xFF >= 0xF0 else 0x3FF00
+            if session.pgn & mask == pgn & mask:
+                return True
+        return False
+
+    def clear(self) -> None:
+        """Drops every session in progress (without sending Abort)."""
+        self._sessions.clear()
+        self._total_bytes = 0
+
+    #######################
+    # PROTECTED FUNCTIONS #
+    #######################
+
+    def _feed(self, frame, now : float) -> tuple:
+        """Returns (whether the frame is TP.CM/TP.DT, the reassembled message or None)."""
+        if isinstance(frame, J1939Message):
+            pgn = frame.pgn
+            if not isTransportPGN(pgn):
+                return False, None
+            sa, da, data, pri, timestamp = frame.sa, frame.da, frame.data, frame.pri, frame.timestamp
+        else:
+            view = self._view.bind(frame)
+            pgn = view.pgn
+            if isTransportPGN(pgn):
+                sa, da, data, pri, timestamp = view.sa, view.da, view.data, view.pri, view.timestamp
+            view.release() # don't hold on to the caller's buffer
+            if not isTransportPGN(pgn):
+                return False, None
+        if now is None:
+            now = time.perf_counter()
+        self.expire(now)
+        if pgn & 0x3FF00 == TP_DT:
+            return True, self._on_dt(sa, da, data, timestamp, now)
+        self._on_cm(sa, da, data, pri, now)
+        return True, None
+
+    def _on_cm(self, sa : int, da : int, data, pri : int, now : float) -> None:
+        if len(data) < 8:
+            return
+        control = data[0]
+        pgn = data[5] | (data[6] << 8) | (data[7] << 16)
+        if control == CM_BAM:
+            self._open(sa, 0xFF, pgn, pri, data[1] | (data[2] << 8), data[3], 0xFF, now)
+        elif control == CM_RTS and da != 0xFF:
+            self._open(sa, da, pgn, pri, data[1] | (data[2] << 8), data[3], data[4], now)
+        elif control == CM_ABORT:
+            # either end can abort: the originator (sa, da) or the receiver (da, sa)
+            session = self._sessions.get((sa, da)) or self._sessions.get((da, sa))
+            if session is not None and session.pgn == pgn:
+                self._close(session)
+                self.aborted += 1
+
+    def _open(self, sa : int, da : int, pgn : int, pri : int, size : int, packets : int,
+                max_per_cts : int, now : float) -> None:
+        ours = da in self.addresses and self.send is not None
+        old = self._sessions.get((sa, da))
+        if old is not None: # a new session from the same sender replaces the old one
+            self._close(old)
+            self.aborted += 1
+        if size > self.max_message_size or not 0 < size <= packets * 7:
+            self.rejected += 1
+            if ours:
+                self._send_cm(da, sa, (CM_ABORT, ABORT_TOO_LARGE, 0xFF, 0xFF, 0xFF), pgn)
+            return
+        if (len(self._sessions) >= self.max_sessions
+                or self._total_bytes + packets * 7 > self.max_total_bytes):
+            self.rejected += 1
+            if ours:
+                self._send_cm(da, sa, (CM_ABORT, ABORT_BUSY, 0xFF, 0xFF, 0xFF), pgn)
+            return
+        session = _RxSession(sa, da, pgn, pri, size, packets)
+        session.deadline = now + self.timeout
+        self._sessions[session.key] = session
+        self._total_bytes += len(session.buffer)
+        if ours:
+            session.ours = True
+            session.max_per_cts = max_per_cts or 0xFF # 0xFF = no limit
+            self._send_cts(session, 1, now)
+
+    def _on_dt(self, sa : int, da : int, data, timestamp : int, now : float) -> J1939Message:
+        session = self._sessions.get((sa, da))
+        if session is None or not data:
+            return None
+        seq = data[0]
+        if not 1 <= seq <= session.packets:
+            if session.ours:
+                self._close(session)
+                self._send_abort(session, ABORT_BAD_SEQUENCE)
+                self.aborted += 1
+            return None
+        chunk = data[1:8]
+        start = (seq - 1) * 7
+        session.buffer[start:start + len(chunk)] = chunk
+        if not session.seen[seq - 1]:
+            session.seen[seq - 1] = 1
+            session.received += 1
+        session.timestamp = timestamp
+        if session.received == session.packets:
+            self._close(session)
+            if session.ours:
+                self._send_cm(session.da, session.sa, (CM_EOM_ACK, session.size & 0xFF,
+                                session.size >> 8, session.packets, 0xFF), session.pgn)
+            self.completed += 1
+            msg = J1939Message(pgn=session.pgn, sa=session.sa, da=session.da, pri=session.pri,
+                                data=bytes(session.buffer[:session.size]), size=session.size)
+            msg.timestamp = timestamp
+            return msg
+        session.deadline = now + self.timeout
+        self._sessions.move_to_end(session.key)
+        if session.ours and seq >= session.window_end:
+            # ask for the first missing packet onwards
+            self._send_cts(session, session.seen.find(0) + 1, now)
+        return None
+
+    def _send_cts(self, session : _RxSession, next_seq : int, now : float) -> None:
+        count = min(self.packets_per_cts, session.max_per_cts, session.packets - next_seq + 1)
+        session.window_end = next_seq + count - 1
+        session.deadline = now + self.cts_timeout
+        self._sessions.move_to_end(session.key)
+        self._send_cm(session.da, session.sa, (CM_CTS, count, next_seq, 0xFF, 0xFF), session.pgn)
+
+    def _send_abort(self, session : _RxSession, reason : int) -> None:
+        self._send_cm(session.da, session.sa, (CM_ABORT, reason, 0xFF, 0xFF, 0xFF), session.pgn)
+
+    def _send_cm(self, sa : int, da : int, control : tuple, pgn : int) -> None:
+        data = bytes(control) + (pgn & 0xFFFFFF).to_bytes(3, 'little')
+        self.send(toJ1939Message(TP_CM, self.pri, sa, da, data))
+
+    def _close(self, session : _RxSession) -> None:
+        del self._sessions[session.key]
+        self._total_bytes -= len(session.buffer)
+
+# TPSession states
+SESSION_QUEUED = "queued" # waiting for a free session slot
+SESSION_SENDING = "sending" # sending data packets
+SESSION_WAITING = "waiting" # waiting for CTS or EndOfMsgAck
+SESSION_COMPLETE = "complete"
+SESSION_ABORTED = "aborted"
+SESSION_TIMED_OUT = "timed out"
+
+T3 = 1.25 # max time to wait for CTS or EndOfMsgAck after sending (s)
+T4 = 1.05 # max time to wait for CTS after a hold (CTS for 0 packets) (s)
+
+class TPSession():
+    """
+    A multi-packet message being sent by TPTransmitter.
+    ---
+    Accessible properties:
+    - `pgn`, `sa`, `da`, `pri`, `size`, `packets` : message details (int)
+    - `bam` : True for BAM (broadcast), False for RTS/CTS (bool)
+    - `state` : one of the SESSION_* states (str)
+    - `abort_reason` : Abort reason code, if the session was aborted or timed out (int)
+    - `packets_sent` : data packets sent so far, including re-sent ones (int)
+    """
+    __slots__ = ("pgn", "sa", "da", "pri", "data", "size", "packets", "bam", "state",
+                    "abort_reason", "packets_sent", "next_seq", "window_end", "due", "deadline",
+                    "max_per_cts", "started", "finished")
+
+    def __init__(self, pgn : int, sa : int, da : int, pri : int, data : bytes) -> None:
+        self.pgn = pgn
+        self.sa = sa
+        self.da = da
+        self.pri = pri
+        self.data = data
+        self.size = len(data)
+        self.packets = (len(data) + 6) // 7
+        self.bam = da == 0xFF
+        self.state = SESSION_QUEUED
+        self.abort_reason = None #type: int
+        self.packets_sent = 0
+        self.next_seq = 1
+        self.window_end = 0
+        self.due = None #type: float
+        self.deadline = None #type: float
+        self.max_per_cts = 0xFF
+        self.started = None #type: float
+        self.finished = None #type: float
+
+    def __str__(self) -> str:
+        kind = "BAM" if self.bam else f"RTS/CTS to {self.da:#04x}"
+        return f"{kind} PGN {self.pgn:#07x} from {self.sa:#04x}, {self.size} bytes: {self.state}"
+
+    def isDone(self) -> bool:
+        """Returns True once the session has completed, been aborted or timed out."""
+        return self.state in (SESSION_COMPLETE, SESSION_ABORTED, SESSION_TIMED_OUT)
+
+    def succeeded(self) -> bool:
+        """Returns True if every packet was sent (BAM) or acknowledged (RTS/CTS)."""
+        return self.state == SESSION_COMPLETE
+
+    def elapsed(self) -> float:
+        """Seconds from the BAM/RTS to completion (or to now, if still in progress)."""
+        if self.started is None:
+            return 0.0
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    def throughput(self) -> float:
+        """Message bytes per second achieved by a completed session (0 otherwise)."""
+        elapsed = self.elapsed()
+        return self.size / elapsed if self.succeeded() and elapsed > 0 else 0.0
+
+    def _dt_message(self, seq : int) -> bytes:
+        chunk = self.data[(seq - 1) * 7:seq * 7]
+        if len(chunk) < 7:
+            chunk += b'\xFF' * (7 - len(chunk))
+        return toJ1939Message(TP_DT, self.pri, self.sa, self.da, bytes((seq,)) + chunk)
+
+class TPTransmitter():
+    """
+    Sends J1939 messages longer than 8 bytes with the transport protocol (J1939-21).
+
+    Global messages go out as BAM, with `bam_interval` between packets (J1939-21 allows 50-200 ms).
+    Destination-specific messages use RTS/CTS: packets are sent as each CTS allows, and the session
+    completes on EndOfMsgAck. Responses from the receiver have to be passed to `feed()`.
+
+    `poll()` sends whatever is due and returns when it should next be called, so the transmitter
+    can be driven from an existing receive loop. A BAM session sends at most one packet per call,
+    and never less than `bam_interval` after the previous one, even if `poll()` is called late.
+    `run()` drives it until every session is done, sleeping until shortly before each packet is
+    due and then spinning, so BAM packets go out within microseconds of their schedule.
+    ```
+    tx = TPTransmitter(client.tx, max_sessions=config.getNumberOfSessions())
+    session = tx.transmit(J1939Message(pgn=0xEF00, sa=0xF9, da=0x00, data=payload, size=len(payload)))
+    tx.run(lambda timeout: client.rx_batch(timeout=timeout))
+    print(session.throughput(), "bytes/s")
+    ```
+    Up to `max_sessions` RTS/CTS sessions run at once (see `RP1210Config.getNumberOfSessions()`),
+    plus one BAM per source address; other messages wait their turn. Messages of 8 bytes or less are
+    sent right away as single frames.
+
+    Times (the `now` arguments) are `time.perf_counter()` values, for its resolution on Windows.
+    ---
+    Params:
+    - `send` : function that transmits a message from `toJ1939Message()`, e.g. `client.tx`
+    - `max_sessions` : concurrent RTS/CTS sessions allowed (int)
+    - `bam_interval` : seconds between BAM packets (float)
+    - `dt_interval` : seconds between RTS/CTS data packets (float)
+    - `timeout` : seconds to wait for CTS or EndOfMsgAck (J1939-21 T3) (float)
+    - `hold_timeout` : seconds to wait for CTS after the receiver holds the session (J1939-21 T4) (float)
+    - `max_packets_per_cts` : most packets the receiver may ask for per CTS, sent in the RTS (int)
+    - `echo` : set to True if frames passed to `feed()` include the echo byte (bool)
+    - `spin_time` : seconds before a packet is due that `run()` stops sleeping and spins (float)
+    - `pri` : priority of the TP.CM and TP.DT messages (int)
+    ---
+    Accessible properties:
+    - `completed`, `aborted`, `timed_out` : session counts (int)
+    - `bytes_sent` : message bytes of completed sessions (int)
+    """
+    def __init__(self, send, max_sessions : int = 1, bam_interval : float = 0.05,
+                    dt_interval : float = 0.0, timeout : float = T3, hold_timeout : float = T4,
+                    max_packets_per_cts : int = 0xFF, echo = False, spin_time : float = 0.0005,
+                    pri : int = 7) -> None:
+        self.send = send
+        self.max_sessions = max(max_sessions, 1)
+        self.bam_interval = bam_interval
+        self.dt_interval = dt_interval
+        self.timeout = timeout
+        self.hold_timeout = hold_timeout
+        self.max_packets_per_cts = max_packets_per_cts
+        self.spin_time = spin_time
+        self.pri = pri
+        self.completed = 0
+        self.aborted = 0
+        self.timed_out = 0
+        self.bytes_sent = 0
+        self._queued = [] #type: list[TPSession]
+        self._active = [] #type: list[TPSession]
+        self._first_start = None #type: float
+        self._last_finish = None #type: float
+        self._view = J1939FrameView(echo=echo)
+
+    ####################
+    # PUBLIC FUNCTIONS #
+    ####################
+
+    def transmit(self, msg : J1939Message, now : float = None) -> TPSession:
+        """
+        Queues a message to be sent, starting it right away if there's a free session.
+
+        Returns its TPSession, or None if the message fits in one frame (and was sent as-is).
+        Raises ValueError if the message is too long for the transport protocol.
+        """
+        data = msg.data
+        if len(data) <= 8:
+            self.send(msg.msg)
+            return None
+        if len(data) > MAX_TP_SIZE:
+            raise ValueError(f"Message is too long for the transport protocol ({len(data)} bytes).")
+        pgn = msg.pgn
+        da = msg.da
+        if msg.pdu() == 1:
+            pgn &= 0x3FF00 # the destination goes in DA, not the PGN
+        else:
+            da = 0xFF
+        session = TPSession(pgn, msg.sa, da, self.pri, bytes(data))
+        self._queued.append(session)
+        self.poll(now)
+        return session
+
+    def feed(self, frame, now : float = None) -> TPSession:
+        """
+        Processes a received frame (bytes-like from RP1210_ReadMessage, or a J1939Message),
+        handling CTS, EndOfMsgAck and Abort for our RTS/CTS sessions.
+
+        Returns the session the frame was for, or None if it wasn't for one of ours.
+        """
+        if isinstance(frame, J1939Message):
+            pgn, sa, da, data = frame.pgn, frame.sa, frame.da, frame.data
+        else:
+            view = self._view.bind(frame)
+            pgn, sa, da = view.pgn, view.sa, view.da
+            data = bytes(view.data[:8])
+            view.release()
+        if pgn & 0x3FF00 != TP_CM or len(data) < 8 or da == 0xFF:
+            return None
+        target = data[5] | (data[6] << 8) | (data[7] << 16)
+        for session in self._active:
+            if (session.sa, session.da, session.pgn) == (da, sa, target) and not session.bam:
+                break
+        else:
+            return None
+        if now is None:
+            now = time.perf_counter()
+        control = data[0]
+        if control == CM_CTS:
+            if session.state == SESSION_SENDING: # J1939-21: CTS during a data transfer is an error
+                self._abort(session, ABORT_CTS_WHILE_SENDING, now)
+            elif data[1] == 0: # hold the session open
+                session.deadline = now + self.hold_timeout
+            elif 1 <= data[2] <= session.packets:
+                session.next_seq = data[2]
+                session.window_end = min(data[2] + data[1] - 1, session.packets)
+                session.state = SESSION_SENDING
+                session.due = now
+                session.deadline = None
+        elif control == CM_EOM_ACK:
+            self._finish(session, SESSION_COMPLETE, now)
+        elif control == CM_ABORT:
+            session.abort_reason = data[1]
+            self._finish(session, SESSION_ABORTED, now)
+        self.poll(now)
+        return session
+
+    def poll(self, now : float = None) -> float:
+        """
+        Sends every packet that's due, times out sessions and starts queued ones. Overdue RTS/CTS
+        packets are caught up on; BAM sessions send one packet per call.
+
+        Returns the time (`time.perf_counter()`) it should next be called, or None if there's nothing
+        left to do but wait for responses that don't have a deadline.
+        """
+        if now is None:
+            now = time.perf_counter()
+        self._start_queued(now)
+        next_time = None
+        for session in list(self._active):
+            while session.state == SESSION_SENDING and session.due <= now:
+                self._send_next(session, now)
+                if session.bam: # receivers need the BAM spacing, so don't send a late burst
+                    break
+            if session.deadline is not None and session.deadline <= now:
+                self._abort(session, ABORT_TIMEOUT, now, SESSION_TIMED_OUT)
+        if self._queued: # finished sessions may have freed up a slot
+            self._start_queued(now)
+        for session in self._active:
+            due = session.due if session.state == SESSION_SENDING else session.deadline
+            if due is not None and (next_time is None or due < next_time):
+                next_time = due
+        return next_time
+
+    def run(self, receive = None, timeout : float = None) -> bool:
+        """
+        Drives every queued and active session until they're done.
+        - receive = function that takes a timeout in seconds and returns received frames, e.g.
+        `lambda timeout: client.rx_batch(timeout=timeout)`; needed for RTS/CTS sessions
+        - timeout = give up after this many seconds (None = no limit)
+
+        Returns True if every session finished before the timeout.
+        """
+        end = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            next_time = self.poll()
+            if self.isIdle():
+                return True
+            now = time.perf_counter()
+            if end is not None and now >= end:
+                return False
+            wait_until = next_time if next_time is not None else now + self.timeout
+            if end is not None:
+                wait_until = min(wait_until, end)
+            if receive is not None and wait_until - now > self.spin_time:
+                for frame in receive(wait_until - now - self.spin_time):
+                    self.feed(frame)
+            else:
+                self._wait_until(wait_until)
+
+    def isIdle(self) -> bool:
+        """Returns True if no sessions are queued or in progress."""
+        return not self._active and not self._queued
+
+    def sessions(self) -> list[TPSession]:
+        """Returns the sessions in progress, followed by the queued ones."""
+        return self._active + self._queued
+
+    def throughput(self) -> float:
+        """
+        Message bytes per second across all completed sessions, from the first session starting
+        to the last one finishing.
+        """
+        if self._last_finish is None or self._last_finish <= self._first_start:
+            return 0.0
+        return self.bytes_sent / (self._last_finish - self._first_start)
+
+    #######################
+    # PROTECTED FUNCTIONS #
+    #######################
+
+    def _start_queued(self, now : float) -> None:
+        rts_count = sum(not session.bam for session in self._active)
+        for session in list(self._queued):
+            if not session.bam and rts_count >= self.max_sessions:
+                continue
+            # J1939-21 allows one BAM per source, and one RTS/CTS session per source/destination pair
+            if any(active.sa == session.sa and active.da == session.da for active in self._active):
+                continue
+            self._queued.remove(session)
+            self._active.append(session)
+            session.started = now
+            if self._first_start is None:
+                self._first_start = now
+            if session.bam:
+                self._send_cm(session, (CM_BAM, session.size & 0xFF, session.size >> 8,
+                                        session.packets, 0xFF))
+                session.state = SESSION_SENDING
+                session.window_end = session.packets
+                session.due = now + self.bam_interval
+            else:
+                rts_count += 1
+                self._send_cm(session, (CM_RTS, session.size & 0xFF, session.size >> 8,
+                                        session.packets, self.max_packets_per_cts))
+                session.state = SESSION_WAITING
+                session.deadline = now + self.timeout
+
+    def _send_next(self, session : TPSession, now : float) -> None:
+        seq = session.next_seq
+        self.send(session._dt_message(seq))
+        session.packets_sent += 1
+        session.next_seq = seq + 1
+        if seq >= session.window_end:
+            if session.bam:
+                self._finish(session, SESSION_COMPLETE, now)
+            else: # wait for the next CTS, or EndOfMsgAck after the last packet
+                session.state = SESSION_WAITING
+                session.deadline = now + self.timeout
+            return
+        if session.bam: # keep at least bam_interval between packets, even when polled late
+            session.due = max(session.due, now) + self.bam_interval
+        else: # schedule from the previous due time so pacing doesn't drift
+            session.due += self.dt_interval
+
+    def _abort(self, session : TPSession, reason : int, now : float,
+                state : str = SESSION_ABORTED) -> None:
+        self._send_cm(session, (CM_ABORT, reason, 0xFF, 0xFF, 0xFF))
+        session.abort_reason = reason
+        self._finish(session, state, now)
+
+    def _finish(self, session : TPSession, state : str, now : float) -> None:
+        session.state = state
+        session.finished = now
+        session.deadline = None
+        self._active.remove(session)
+        if state == SESSION_COMPLETE:
+            self.completed += 1
+            self.bytes_sent += session.size
+            self._last_finish = now
+        elif state == SESSION_TIMED_OUT:
+            self.timed_out += 1
+        else:
+            self.aborted += 1
+
+    def _send_cm(self, session : TPSession, control : tuple) -> None:
+        data = bytes(control) + session.pgn.to_bytes(3, 'little')
+        self.send(toJ1939Message(TP_CM, session.pri, session.sa, session.da, data))
+
+    def _wait_until(self, due : float) -> None:
+        """Sleeps, then spins, until `due`."""
+        now = time.perf_counter()
+        if due - now > self.spin_time:
+            time.sleep(due - now - self.spin_time)
+        while time.perf_counter() < due:
+            pass
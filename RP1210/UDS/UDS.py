@@ -1,7 +1,13 @@
+import struct
 from .. import sanitize_msg_param
 
 BYTE_STUFFING_VALUE = b'\xAA'
 
+# precompiled SID + sub-function/DID headers
+_SID_SUBFN = struct.Struct(">BB")
+_SID_DID = struct.Struct(">BH")
+_SID_SUBFN_DID = struct.Struct(">BBH")
+
 ServiceNames = {
     # Diagnostic and Communications Management
     0x10 : "Diagnostic Session Control",
@@ -318,6 +324,22 @@ class UDSMessage:
         3. Data ID (0 or 2 bytes)
         4. Data (0 or n bytes)
         """
+        try: # the setters store ints, so this only fails for unset (None) fields
+            if self._hasDID:
+                if self._hasSubfn:
+                    val = _SID_SUBFN_DID.pack(self._sid, self._subfn, self._did)
+                else:
+                    val = _SID_DID.pack(self._sid, self._did)
+            elif self._hasSubfn:
+                val = _SID_SUBFN.pack(self._sid, self._subfn)
+            else:
+                val = bytes((self._sid,))
+        except (struct.error, TypeError, ValueError):
+            pass
+        else:
+            if self._hasData:
+                val += sanitize_msg_param(self._data, self._dataSize)
+            return val
         val = b''
         val += sanitize_msg_param(self._sid, 1)
         if self._hasSubfn:
@@ -0,0 +1,494 @@
+"""
+A pure-Python virtual RP1210 driver, for testing and benchmarking without an adapter (or Windows).
+
+VirtualDLL stands in for the CDLL that RP1210API loads, and VirtualBus connects any number of
+VirtualDLLs (and any number of clients on each) to the same simulated CAN bus:
+```
+bus = VirtualBus(baud=500000)
+api = RP1210API("VIRTUAL")
+api.setDLL(VirtualDLL(bus))
+client_id = api.ClientConnect(1, b"J1939:Baud=500")
+bus.start_load(load=0.30) # 30% bus load of synthetic J1939 traffic
+```
+Supported protocols are J1939 and CAN, using the RP1210C message formats. The virtual adapter
+implements echo (16), message receive on/off (18), J1939 and CAN filters (3, 4, 5, 17, 25, 26), RX
+queue limits (RcvBufferSize, reported with ERR_RX_QUEUE_FULL), blocking reads with Set_BlockTimeout
+(215) and connection speed (45). Other RP1210 commands are accepted and ignored.
+
+J1939 messages with more than 8 bytes of data are passed between J1939 clients in one piece, as if
+every adapter on the bus handled the transport protocol; they are not visible to CAN clients.
+"""
+import threading
+import time
+from collections import deque
+from ctypes import memmove, sizeof
+from functools import partial
+from .RP1210 import RP1210_ERRORS, RP1210_FUNCTION_TYPES, RP1210C_FUNCTION_TYPES
+
+# error codes used by the virtual driver
+ERR_CLIENT_AREA_FULL = 131
+ERR_INVALID_CLIENT_ID = 129
+ERR_INVALID_PROTOCOL = 136
+ERR_RX_QUEUE_FULL = 139
+ERR_MESSAGE_TOO_LONG = 141
+ERR_INVALID_COMMAND = 144
+ERR_CLIENT_DISCONNECTED = 148
+ERR_CODE_NOT_FOUND = 154
+ERR_MESSAGE_NOT_SENT = 159
+ERR_COMMAND_TIMED_OUT = 213
+ERR_INVALID_IOCTL_ID = 600
+
+# RP1210 commands that the virtual adapter accepts but doesn't need to act on
+IGNORED_COMMANDS = {0, 7, 8, 9, 14, 15, 19, 20, 21, 22, 23, 24, 27, 28, 29, 30, 31, 32, 33, 34, 35,
+                    37, 38, 41, 42, 46, 47, 48, 305}
+
+FILTER_PASS = 0
+FILTER_DISCARD = 1
+FILTER_LIST = 2
+
+# default synthetic traffic: (PGN, source address) broadcast pairs
+DEFAULT_LOAD_PGNS = ((0xF004, 0x00), (0xF003, 0x00), (0xFEF1, 0x00), (0xFEEE, 0x00),
+                        (0xF005, 0x03), (0xFEF2, 0x00), (0xFEF5, 0x00), (0xFEC1, 0x17),
+                        (0xF001, 0x0B), (0xFEF6, 0x00), (0xFEFC, 0x17), (0xFE6C, 0xEE))
+
+def j1939ToCANID(pgn : int, pri : int, sa : int, da : int) -> int:
+    """Builds a 29-bit CAN identifier from J1939 fields."""
+    pgn &= 0x3FFFF
+    if (pgn >> 8) & 0xFF < 0xF0: # PDU1; PS is the destination address
+        pgn = (pgn & 0x3FF00) | (da & 0xFF)
+    return ((pri & 0b111) << 26) | (pgn << 8) | (sa & 0xFF)
+
+def canIDToJ1939(can_id : int) -> tuple:
+    """
+    Splits a 29-bit CAN identifier into J1939 fields. Returns (pgn, pri, sa, da).
+
+    For PDU1 messages the PS byte of the returned PGN is 0, and the destination is returned as `da`.
+    """
+    pgn = (can_id >> 8) & 0x3FFFF
+    if (pgn >> 8) & 0xFF < 0xF0: # PDU1
+        da = pgn & 0xFF
+        pgn &= 0x3FF00
+    else:
+        da = 0xFF
+    return (pgn, (can_id >> 26) & 0b111, can_id & 0xFF, da)
+
+class _BusFrame:
+    """A message on the virtual bus, with its RP1210 J1939 and CAN encodings prepared once."""
+    __slots__ = ("timestamp", "can_id", "extended", "data", "sender", "j1939", "can")
+
+    def __init__(self, timestamp : int, can_id : int, extended : bool, data : bytes, sender, how = 0):
+        self.timestamp = timestamp.to_bytes(4, 'big')
+        self.can_id = can_id
+        self.extended = extended
+        self.data = data
+        self.sender = sender
+        if extended:
+            pgn, pri, sa, da = canIDToJ1939(can_id)
+            self.j1939 = (pgn.to_bytes(3, 'little') + bytes((pri | (how << 7), sa, da)) + data)
+        else:
+            self.j1939 = None
+        if len(data) <= 8:
+            if extended:
+                self.can = b'\x01' + can_id.to_bytes(4, 'big') + data
+            else:
+                self.can = b'\x00' + can_id.to_bytes(2, 'big') + data
+        else:
+            self.can = None
+
+class _VirtualClient:
+    """State for one client connected to a VirtualDLL."""
+    def __init__(self, dll, client_id : int, protocol : str, rx_queue_size : int, lock):
+        self.dll = dll
+        self.client_id = client_id
+        self.protocol = protocol
+        self.rx_queue = deque()
+        self.rx_queue_bytes = 0
+        self.rx_queue_size = rx_queue_size
+        self.rx_overflowed = False
+        self.rx_dropped = 0
+        self.received = 0
+        self.transmitted = 0
+        self.echo = False
+        self.receive = True
+        self.filter_state = FILTER_DISCARD
+        self.filter_exclusive = False
+        self.j1939_filters = [] # (flags, pgn, pri, sa, da)
+        self.can_filters = [] # (can_type, mask, header)
+        self.block_timeout = None # seconds; None = infinite
+        self.connected = True
+        self.not_empty = threading.Condition(lock)
+
+    def accepts(self, frame : _BusFrame) -> bool:
+        """Returns True if this client's filters pass the frame."""
+        if self.protocol == "J1939":
+            if frame.j1939 is None:
+                return False
+        elif frame.can is None:
+            return False
+        if self.filter_state == FILTER_PASS:
+            return True
+        if self.filter_state == FILTER_DISCARD:
+            return False
+        if self.protocol == "J1939":
+            pgn, pri, sa, da = canIDToJ1939(frame.can_id)
+            match = False
+            for flags, f_pgn, f_pri, f_sa, f_da in self.j1939_filters:
+                if ((not flags & 0x01 or f_pgn == pgn)
+                        and (not flags & 0x02 or f_pri == pri)
+                        and (not flags & 0x04 or f_sa == sa)
+                        and (not flags & 0x08 or f_da == da)):
+                    match = True
+                    break
+        else:
+            can_type = 1 if frame.extended else 0
+            match = False
+            for f_type, mask, header in self.can_filters:
+                if f_type == can_type and frame.can_id & mask == header & mask:
+                    match = True
+                    break
+        return match != self.filter_exclusive
+
+    def enqueue(self, frame : _BusFrame, echo : bool) -> None:
+        """Adds a frame to the RX queue. Must be called with the bus lock held."""
+        body = frame.j1939 if self.protocol == "J1939" else frame.can
+        if self.echo:
+            msg = frame.timestamp + (b'\x01' if echo else b'\x00') + body
+        else:
+            msg = frame.timestamp + body
+        if self.rx_queue_bytes + len(msg) > self.rx_queue_size:
+            self.rx_overflowed = True
+            self.rx_dropped += 1
+            return
+        self.rx_queue.append(msg)
+        self.rx_queue_bytes += len(msg)
+        self.received += 1
+        if len(self.rx_queue) == 1:
+            self.not_empty.notify()
+
+class VirtualBus:
+    """
+    A simulated CAN bus shared by every VirtualDLL attached to it.
+
+    Frames sent by a client are delivered to every other client on the bus (subject to their
+    filters), plus the sender itself if it turned echo on.
+    ---
+    Params:
+    - `baud` : bus speed in bits/second, used for `getBaud()` responses and load calculations (int)
+    - `timestamp_weight` : microseconds per RP1210 timestamp tick (int)
+    """
+    def __init__(self, baud : int = 250000, timestamp_weight : int = 1) -> None:
+        self.baud = baud
+        self.timestamp_weight = timestamp_weight
+        self.frames = 0
+        self._clients = [] #type: list[_VirtualClient]
+        self._lock = threading.Lock()
+        self._start_time = time.perf_counter()
+        self._load_thread = None #type: threading.Thread
+        self._load_stop = threading.Event()
+        self.load_frames = 0
+
+    def timestamp(self) -> int:
+        """Returns the current RP1210 timestamp (32-bit, in units of `timestamp_weight` µs)."""
+        elapsed_us = (time.perf_counter() - self._start_time) * 1e6
+        return int(elapsed_us / self.timestamp_weight) & 0xFFFFFFFF
+
+    def numClients(self) -> int:
+        """Returns the number of clients connected to the bus."""
+        with self._lock:
+            return len(self._clients)
+
+    def transmit(self, can_id : int, data : bytes, extended = True, sender : _VirtualClient = None,
+                    how = 0) -> None:
+        """
+        Puts a frame on the bus. `sender` is the transmitting client, or None for frames that come
+        from other nodes on the network.
+        """
+        frame = _BusFrame(self.timestamp(), can_id, extended, data, sender, how)
+        with self._lock:
+            self.frames += 1
+            for client in self._clients:
+                if client is sender:
+                    if client.echo and client.receive and client.accepts(frame):
+                        client.enqueue(frame, True)
+                elif client.receive and client.accepts(frame):
+                    client.enqueue(frame, False)
+
+    def inject(self, can_id : int, data : bytes, extended = True) -> None:
+        """Puts a frame from another (simulated) node on the bus."""
+        self.transmit(can_id, data, extended)
+
+    def injectJ1939(self, pgn : int, sa : int, data : bytes, da : int = 0xFF, pri : int = 6) -> None:
+        """Puts a J1939 message from another (simulated) node on the bus."""
+        self.transmit(j1939ToCANID(pgn, pri, sa, da), data)
+
+    def frameRate(self, load : float, frame_bits : int = 128) -> float:
+        """
+        Returns the number of frames/second that corresponds to `load` (0.0 - 1.0) of the bus baud.
+
+        `frame_bits` defaults to 128: an extended frame with 8 data bytes, including typical bit
+        stuffing and interframe space.
+        """
+        return load * self.baud / frame_bits
+
+    def start_load(self, rate : float = None, load : float = None, frames = None) -> None:
+        """
+        Starts a background thread that puts synthetic traffic on the bus.
+        - rate = frames per second
+        - load = fraction of bus capacity (0.0 - 1.0); used if `rate` isn't given. Defaults to 0.3.
+        - frames = list of (can_id, data) tuples to cycle through. Defaults to a mix of common J1939
+        broadcast PGNs with changing data.
+
+        Frames are injected in bursts as needed to keep the average rate, so high rates are reached
+        even though the thread only wakes up about once per millisecond.
+        """
+        self.stop_load()
+        if rate is None:
+            rate = self.frameRate(0.3 if load is None else load)
+        if frames is None:
+            frames = [(j1939ToCANID(pgn, 6, sa, 0xFF), None) for pgn, sa in DEFAULT_LOAD_PGNS]
+        self._load_stop.clear()
+        self._load_thread = threading.Thread(target=self._load_loop, args=(rate, list(frames)),
+                                                name="VirtualBusLoad", daemon=True)
+        self._load_thread.start()
+
+    def stop_load(self) -> None:
+        """Stops the synthetic traffic thread, if it's running."""
+        if self._load_thread is not None:
+            self._load_stop.set()
+            self._load_thread.join()
+            self._load_thread = None
+
+    def _load_loop(self, rate : float, frames : list):
+        start = time.perf_counter()
+        sent = 0
+        index = 0
+        while not self._load_stop.is_set():
+            due = int((time.perf_counter() - start) * rate)
+            while sent < due:
+                can_id, data = frames[index]
+                if data is None: # generated data: rolling counter
+                    data = (sent & 0xFFFFFFFFFFFFFFFF).to_bytes(8, 'little')
+                self.transmit(can_id, data)
+                sent += 1
+                index = index + 1 if index + 1 < len(frames) else 0
+            self.load_frames = sent
+            self._load_stop.wait(0.001)
+
+    def _attach(self, client : _VirtualClient):
+        with self._lock:
+            self._clients.append(client)
+
+    def _detach(self, client : _VirtualClient):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+            client.connected = False
+            client.not_empty.notify_all()
+
+class VirtualDLL:
+    """
+    A virtual RP1210 adapter driver. Pass it to `RP1210API.setDLL()` in place of a CDLL.
+    ---
+    Params:
+    - `bus` : VirtualBus to connect to; a new bus is created if none is given
+    - `max_clients` : max number of simultaneous clients (int)
+    - `rx_queue_size` : RX queue size in bytes per client; 0 = use ClientConnect's RcvBufferSize (int)
+    - `dll_version`, `api_version`, `fw_version` : strings returned by the version functions
+    """
+    def __init__(self, bus : VirtualBus = None, max_clients : int = 16, rx_queue_size : int = 0,
+                    dll_version = "1.0", api_version = "3.0", fw_version = "1.0") -> None:
+        self.bus = bus if bus is not None else VirtualBus()
+        self.max_clients = max_clients
+        self.rx_queue_size = rx_queue_size
+        self.dll_version = dll_version
+        self.api_version = api_version
+        self.fw_version = fw_version
+        self.clients = {} #type: dict[int, _VirtualClient]
+        # RP1210API sets argtypes/restype on each function, so expose them as partial objects
+        # (bound methods don't allow attribute assignment)
+        for name in list(RP1210_FUNCTION_TYPES) + list(RP1210C_FUNCTION_TYPES):
+            setattr(self, name, partial(getattr(type(self), name[7:]), self))
+
+    def getClient(self, client_id : int) -> _VirtualClient:
+        """Returns the state of a connected client, or None."""
+        return self.clients.get(client_id)
+
+    ####################
+    # RP1210 FUNCTIONS #
+    ####################
+
+    def ClientConnect(self, hwnd, device_id, protocol, tx_buffer_size, rx_buffer_size,
+                        app_packetizing = 0) -> int:
+        name = bytes(protocol).split(b'\x00')[0].split(b':')[0].split(b',')[0].strip().upper()
+        if name not in (b"J1939", b"CAN"):
+            return ERR_INVALID_PROTOCOL
+        with self.bus._lock:
+            if len(self.clients) >= self.max_clients:
+                return ERR_CLIENT_AREA_FULL
+            client_id = 0
+            while client_id in self.clients:
+                client_id += 1
+            queue_size = self.rx_queue_size or (rx_buffer_size if rx_buffer_size > 0 else 8000)
+            client = _VirtualClient(self, client_id, name.decode(), queue_size, self.bus._lock)
+            self.clients[client_id] = client
+        self.bus._attach(client)
+        return client_id
+
+    def ClientDisconnect(self, client_id) -> int:
+        client = self.clients.pop(client_id, None)
+        if client is None:
+            return ERR_INVALID_CLIENT_ID
+        self.bus._detach(client)
+        return 0
+
+    def SendMessage(self, client_id, msg, size, notify_status = 0, block = 0) -> int:
+        client = self.clients.get(client_id)
+        if client is None:
+            return -ERR_INVALID_CLIENT_ID
+        msg = bytes(msg[:size])
+        if client.protocol == "J1939":
+            if len(msg) < 6:
+                return -ERR_MESSAGE_NOT_SENT
+            if len(msg) > 6 + 1785:
+                return -ERR_MESSAGE_TOO_LONG
+            pgn = int.from_bytes(msg[0:3], 'little')
+            can_id = j1939ToCANID(pgn, msg[3] & 0b111, msg[4], msg[5])
+            self.bus.transmit(can_id, msg[6:], True, client, msg[3] >> 7)
+        else:
+            if len(msg) < 1:
+                return -ERR_MESSAGE_NOT_SENT
+            extended = msg[0] != 0
+            id_size = 4 if extended else 2
+            if len(msg) < 1 + id_size:
+                return -ERR_MESSAGE_NOT_SENT
+            if len(msg) > 1 + id_size + 8:
+                return -ERR_MESSAGE_TOO_LONG
+            can_id = int.from_bytes(msg[1:1 + id_size], 'big')
+            can_id &= 0x1FFFFFFF if extended else 0x7FF
+            self.bus.transmit(can_id, msg[1 + id_size:], extended, client)
+        client.transmitted += 1
+        return 0
+
+    def ReadMessage(self, client_id, buffer, size, block = 0) -> int:
+        client = self.clients.get(client_id)
+        if client is None:
+            return -ERR_INVALID_CLIENT_ID
+        with client.not_empty:
+            if client.rx_overflowed:
+                client.rx_overflowed = False
+                return -ERR_RX_QUEUE_FULL
+            if not client.rx_queue:
+                if not block:
+                    return 0
+                client.not_empty.wait_for(lambda: client.rx_queue or not client.connected,
+                                            client.block_timeout)
+                if not client.connected:
+                    return -ERR_CLIENT_DISCONNECTED
+                if not client.rx_queue:
+                    return 0
+            msg = client.rx_queue.popleft()
+            client.rx_queue_bytes -= len(msg)
+        if len(msg) > size:
+            return -ERR_MESSAGE_TOO_LONG
+        memmove(buffer, msg, len(msg))
+        return len(msg)
+
+    def ReadVersion(self, dll_major, dll_minor, api_major, api_minor) -> int:
+        dll = self.dll_version.split('.') + ['0']
+        api = self.api_version.split('.') + ['0']
+        for buffer, val in ((dll_major, dll[0]), (dll_minor, dll[1]),
+                            (api_major, api[0]), (api_minor, api[1])):
+            self._write_string(buffer, val)
+        return 0
+
+    def ReadDetailedVersion(self, client_id, api_version, dll_version, fw_version) -> int:
+        if client_id not in self.clients:
+            return ERR_INVALID_CLIENT_ID
+        self._write_string(api_version, self.api_version)
+        self._write_string(dll_version, self.dll_version)
+        self._write_string(fw_version, self.fw_version)
+        return 0
+
+    def GetErrorMsg(self, error_code, buffer) -> int:
+        if error_code not in RP1210_ERRORS:
+            return ERR_CODE_NOT_FOUND
+        self._write_string(buffer, RP1210_ERRORS[error_code])
+        return 0
+
+    def GetLastErrorMsg(self, error_code, sub_error_code, buffer, client_id) -> int:
+        return self.GetErrorMsg(error_code, buffer)
+
+    def GetHardwareStatus(self, client_id, buffer, size, block = 0) -> int:
+        if client_id not in self.clients:
+            return ERR_INVALID_CLIENT_ID
+        status = bytearray(max(size, 0))
+        if status:
+            status[0] = 0x03 # device active, device connected
+        memmove(buffer, bytes(status), len(status))
+        return 0
+
+    def Ioctl(self, client_id, ioctl_id, input_buffer, output_buffer) -> int:
+        return ERR_INVALID_IOCTL_ID
+
+    def SendCommand(self, command, client_id, command_data, size) -> int:
+        client = self.clients.get(client_id)
+        if client is None:
+            return ERR_INVALID_CLIENT_ID
+        data = bytes(command_data[:size]) if size else b''
+        with self.bus._lock:
+            if command == 3: # Set_All_Filters_States_to_Pass
+                client.filter_state = FILTER_PASS
+                client.j1939_filters.clear()
+                client.can_filters.clear()
+            elif command == 17: # Set_All_Filters_States_to_Discard
+                client.filter_state = FILTER_DISCARD
+                client.j1939_filters.clear()
+                client.can_filters.clear()
+            elif command == 4: # Set_Message_Filtering_For_J1939
+                if len(data) < 7:
+                    return ERR_INVALID_COMMAND
+                pgn = int.from_bytes(data[1:4], 'little') & 0x3FFFF
+                if (pgn >> 8) & 0xFF < 0xF0: # PDU1; match on destination address instead of PS
+                    pgn &= 0x3FF00
+                client.j1939_filters.append((data[0], pgn, data[4], data[5], data[6]))
+                client.filter_state = FILTER_LIST
+            elif command == 5: # Set_Message_Filtering_For_CAN
+                if len(data) < 9:
+                    return ERR_INVALID_COMMAND
+                client.can_filters.append((data[0], int.from_bytes(data[1:5], 'big'),
+                                            int.from_bytes(data[5:9], 'big')))
+                client.filter_state = FILTER_LIST
+            elif command in (25, 26): # Set_J1939_Filter_Type, Set_CAN_Filter_Type
+                client.filter_exclusive = bool(data[:1] == b'\x01')
+            elif command == 16: # Echo_Transmitted_Messages
+                client.echo = bool(data[:1] == b'\x01')
+            elif command == 18: # Set_Message_Receive
+                client.receive = bool(data[:1] == b'\x01')
+            elif command == 39: # Flush_Tx_Rx_Buffers
+                client.rx_queue.clear()
+                client.rx_queue_bytes = 0
+                client.rx_overflowed = False
+            elif command == 215: # Set_BlockTimeout
+                if len(data) < 2 or data[0] == 0 or data[1] == 0:
+                    client.block_timeout = None
+                else:
+                    client.block_timeout = data[0] * data[1] / 1000
+            elif command == 45: # Get_Protocol_Connection_Speed
+                self._write_string(command_data, str(self.bus.baud))
+            elif command not in IGNORED_COMMANDS:
+                return ERR_INVALID_COMMAND
+        return 0
+
+    #######################
+    # PROTECTED FUNCTIONS #
+    #######################
+
+    @staticmethod
+    def _write_string(buffer, val : str):
+        """Writes a null-terminated string into a ctypes buffer, truncating it to fit."""
+        try:
+            size = sizeof(buffer)
+        except TypeError: # not a ctypes object; nowhere to write
+            return
+        encoded = val.encode('utf-8')[:max(size - 1, 0)] + b'\x00'
+        memmove(buffer, encoded, min(len(encoded), size))
@@ -34,17 +34,19 @@ def sanitize_msg_param(param, num_bytes : int = 0, byteorder : str = 'big') -> b
             return b'' + b'\x00' * num_bytes
         return sanitize_msg_param(str.encode(param, 'utf8'), num_bytes, byteorder)
     elif isinstance(param, bytes):
-         # convert to int, run sanitize_msg_param again
+        # slice/pad directly; same result as converting to int and back, without the round trip
         if num_bytes == 0:
             if param == b'': # len == 1 for b'', but we don't want to return b'\x00'
                 return b''
             num_bytes = len(param)
         if byteorder == 'little':
-            param2 = param[::-1]
-        else:
-            param2 = param
-        val = int.from_bytes(param2[:num_bytes], byteorder)
-        return sanitize_msg_param(val, num_bytes, byteorder)
+            param = param[::-1]
+            if len(param) >= num_bytes:
+                return param[:num_bytes]
+            return param + b'\x00' * (num_bytes - len(param))
+        if len(param) >= num_bytes:
+            return param[:num_bytes]
+        return b'\x00' * (num_bytes - len(param)) + param
     elif isinstance(param, float):
         # convert to int, run sanitize_msg_param again
         return sanitize_msg_param(int(param), num_bytes, byteorder)
@@ -58,4 +60,6 @@ def sanitize_msg_param(param, num_bytes : int = 0, byteorder : str = 'big') -> b
 # Import everything from RP1210.py
 from RP1210.RP1210 import *
 # Import other modules (not necessary in Python 3.9+)
-from RP1210 import Commands, J1939, UDS
+from RP1210 import Commands, J1939, UDS, AsyncClient, VirtualDriver, Capture, Replay
+from RP1210 import Transport, Router, Filters, Correlator, Network, Statistics, Cache, Signals, DBC
+from RP1210.AsyncClient import AsyncRP1210Client
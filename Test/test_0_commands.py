@@ -4,6 +4,7 @@ Tests command strings for basic correctness, following the RP1210C standard.
 Doesn't test commands on an adapter.
 """
 
+import pytest
 from RP1210 import Commands, sanitize_msg_param
 
 def test_reset():
@@ -154,3 +155,17 @@ def test_setBlockingTimeout():
     for x in range(255):
         for y in range(255):
             assert Commands.setBlockingTimeout(x, y) == sanitize_msg_param(x, 1) + sanitize_msg_param(y, 1)
+
+def test_struct_fast_paths_match_generic():
+    # int args take the precompiled-struct path; bytes args go through sanitize_msg_param
+    assert Commands.setJ1939Filters(1, 0x1F004, 0xAB, 0xCD) == \
+        Commands.setJ1939Filters(b'\x01', b'\x01\xF0\x04', b'\xAB', b'\xCD')
+    assert Commands.setCANFilters(1, 0xFF00FF0F, 0x1234) == \
+        Commands.setCANFilters(b'\x01', b'\xFF\x00\xFF\x0F', b'\x12\x34')
+    assert Commands.protectJ1939Address(0xAC, 0xDEADBEEF) == \
+        Commands.protectJ1939Address(b'\xAC', b'\xDE\xAD\xBE\xEF')
+    # out-of-range ints still raise like they always have
+    with pytest.raises(OverflowError):
+        Commands.setJ1939Filters(1, 0x1000000)
+    with pytest.raises(OverflowError):
+        Commands.setCANFilters(256, 0, 0)
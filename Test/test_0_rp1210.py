@@ -4,6 +4,9 @@ import os
 from RP1210 import sanitize_msg_param
 import RP1210
 import pytest
+from utilities import DummyDLL, dummy_client
+import threading
+import time
 
 API_NAMES = ["PEAKRP32", "DLAUSB32", "DGDPA5MA", "NULN2R32",
              "CMNSI632", "CIL7R32", "DrewLinQ", "DTKRP32"]
@@ -177,6 +180,8 @@ def test_sanitize_msg_param_bytes():
     assert sanitize_msg_param(b'\xFF\xFF\xFF', 1) == b'\xFF'
     assert sanitize_msg_param(b'\x01\x02\x03', 1) == b'\x01'
     assert sanitize_msg_param(b'\x01\x02\x03', 1, 'little') == b'\x03'
+    assert sanitize_msg_param(b'\x01\x02', 4, 'little') == b'\x02\x01\x00\x00'
+    assert sanitize_msg_param(bytearray(b'\x01\x02'), 3) == b'\x00\x01\x02'
     
 def test_sanitize_msg_param_str():
      assert sanitize_msg_param("0") == b'0'
@@ -328,3 +333,255 @@ def test_RP1210VendorList_setDevice_Error():
         vendors.setVendor(vendor)
         with pytest.raises(TypeError):
             vendors.device = "dinglebop"
+
+def test_RxArena_init():
+    arena = RP1210.RxArena(4, 32)
+    assert len(arena.buffer) == 4 * 32
+    assert list(arena.offsets) == [0, 32, 64, 96]
+    assert len(arena) == 0
+    assert list(arena) == []
+    with pytest.raises(IndexError):
+        arena[0]
+    with pytest.raises(ValueError):
+        RP1210.RxArena(0)
+
+def test_ReadMany():
+    msgs = [b'\x00\x00\x00\x01' + bytes(range(i + 6)) for i in range(5)]
+    api = RP1210.RP1210API("dummy")
+    api.setDLL(DummyDLL(msgs))
+    arena = RP1210.RxArena(3, 64)
+    assert api.ReadMany(0, arena) == 3
+    assert arena.messages() == msgs[:3]
+    assert arena[-1] == msgs[2]
+    assert arena.message(1) == msgs[1]
+    assert api.ReadMany(0, arena, 5) == 2 # only 2 left in queue
+    assert [bytes(msg) for msg in arena] == msgs[3:]
+    assert api.ReadMany(0, arena) == 0
+    assert len(arena) == 0
+
+def test_ReadMany_max_messages():
+    msgs = [b'\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00'] * 10
+    api = RP1210.RP1210API("dummy")
+    api.setDLL(DummyDLL(msgs))
+    arena = RP1210.RxArena(8)
+    assert api.ReadMany(0, arena, 2) == 2
+    assert api.ReadMany(0, arena) == 8
+
+def test_ReadMany_blocks_on_first_read_only():
+    dll = DummyDLL([b'\x00' * 10] * 3)
+    api = RP1210.RP1210API("dummy")
+    api.setDLL(dll)
+    api.ReadMany(0, RP1210.RxArena(8), BlockOnRead=1)
+    assert dll.read_calls == [1, 0, 0, 0]
+
+def test_ReadMany_error():
+    api = RP1210.RP1210API("dummy")
+    api.setDLL(DummyDLL([0x10000 - 144, b'\x00' * 10]))
+    arena = RP1210.RxArena(8)
+    assert api.ReadMany(0, arena) == -144
+    assert len(arena) == 0
+    # errors after the first message just end the batch
+    api.setDLL(DummyDLL([b'\x00' * 10, 0x10000 - 144]))
+    assert api.ReadMany(0, arena) == 1
+
+def test_ReadMany_matches_ReadDirect():
+    msgs = [bytes([i]) * (10 + i) for i in range(20)]
+    api = RP1210.RP1210API("dummy")
+    api.setDLL(DummyDLL(msgs))
+    direct = [api.ReadDirect(0) for _ in range(10)]
+    arena = RP1210.RxArena(16)
+    api.ReadMany(0, arena)
+    assert direct + arena.messages() == msgs
+
+def test_RxRingBuffer():
+    ring = RP1210.RxRingBuffer(3, 16)
+    assert not ring
+    assert ring.pop() == b''
+    assert ring.pop_many() == []
+    for i in range(3):
+        ring.push(bytes([i]) * (i + 1))
+    assert len(ring) == 3
+    assert ring.pop() == b'\x00'
+    assert ring.pop_many(1) == [b'\x01\x01']
+    ring.push(b'\x03')
+    ring.push(b'\x04')
+    ring.push(b'\x05') # full; drops b'\x02\x02\x02'
+    assert ring.overflows == 1
+    assert ring.received == 6
+    assert ring.pop_many() == [b'\x03', b'\x04', b'\x05']
+    ring.push(b'\x00' * 32) # truncated to slot size
+    assert ring.pop() == b'\x00' * 16
+    ring.push(b'\x00')
+    ring.clear()
+    assert not ring
+
+def test_RxRingBuffer_errors():
+    ring = RP1210.RxRingBuffer(4)
+    ring.error(144)
+    ring.error(139)
+    assert ring.errors == 2
+    assert ring.rx_queue_full == 1
+    assert ring.last_error == 139
+
+def test_RxRingBuffer_wait():
+    ring = RP1210.RxRingBuffer(4)
+    timer = threading.Timer(0.05, ring.push, args=(b'\x01',))
+    timer.start()
+    assert ring.pop(timeout=None) == b'\x01'
+    assert ring.pop_many(timeout=0.01) == []
+
+def test_RP1210Client_reader():
+    msgs = [i.to_bytes(4, 'big') + b'\x00' * 14 for i in range(100)]
+    client = dummy_client(DummyDLL(msgs))
+    assert client.rx_batch() == []
+    ring = client.start_reader(capacity=256, blocking=False)
+    assert client.start_reader() is ring
+    assert client.reader_running()
+    received = []
+    while len(received) < 100:
+        batch = client.rx_batch(timeout=1.0)
+        assert batch
+        received += batch
+    assert received == msgs
+    assert client.rx() == b''
+    assert client.stop_reader()
+    assert not client.reader_running()
+    assert ring.received == 100
+    assert ring.overflows == 0
+
+def test_RxRingBuffer_close():
+    ring = RP1210.RxRingBuffer(4)
+    threading.Timer(0.05, ring.close).start()
+    assert ring.pop(timeout=None) == b'' and ring.isClosed()
+    ring.push(b'\x01')
+    assert ring.pop_many(timeout=None) == [b'\x01'] # buffered messages can still be popped
+    assert ring.pop_many(timeout=None) == []
+
+def test_RxRingBuffer_pop_into():
+    ring = RP1210.RxRingBuffer(8, 16)
+    for i in range(5):
+        ring.push(bytes([i]) * (i + 1))
+    arena = RP1210.RxArena(max_msgs=3, slot_size=4)
+    assert ring.pop_into(arena) == 3 and arena.messages() == [b'\x00', b'\x01' * 2, b'\x02' * 3]
+    assert ring.pop_into(arena, max_msgs=5) == 2 and arena.messages() == [b'\x03' * 4, b'\x04' * 4] # truncated
+    assert ring.pop_into(arena, timeout=0.01) == 0 and len(arena) == 0
+
+def test_RP1210Client_reader_rx():
+    msgs = [i.to_bytes(4, 'big') + b'\x00' * 14 for i in range(10)]
+    dll = DummyDLL(msgs)
+    client = dummy_client(dll)
+    ring = client.start_reader(blocking=False)
+    while ring.received < 10:
+        time.sleep(0.001)
+    arena = RP1210.RxArena(max_msgs=4)
+    assert client.rx_many(arena).messages() == msgs[:4] # from the ring, not the DLL
+    assert client.rx_many(arena, max_msgs=2).messages() == msgs[4:6]
+    assert client.rx(blocking=1) == msgs[6]
+    assert client.rx_batch() == msgs[7:]
+    # a blocking read is woken up when the reader stops
+    threading.Timer(0.05, client.stop_reader).start()
+    start = time.perf_counter()
+    assert client.rx(blocking=1) == b''
+    assert time.perf_counter() - start < 1.0 and not client.reader_running()
+
+def test_RP1210Client_reader_overflow():
+    msgs = [b'\x00' * 10] * 10
+    dll = DummyDLL(msgs)
+    client = dummy_client(dll)
+    ring = client.start_reader(capacity=4, blocking=False)
+    while ring.received < 10:
+        time.sleep(0.001)
+    client.disconnect()
+    assert not client.reader_running()
+    assert len(client.rxBuffer) == 4
+    assert client.rxBuffer.overflows == 6
+    assert client.rx_batch() == msgs[:4]
+
+def test_SendMany():
+    dll = DummyDLL()
+    api = RP1210.RP1210API("dummy")
+    api.setDLL(dll)
+    msgs = [b'\x01\x02\x03', bytearray(b'\x04\x05'), RP1210.J1939.J1939Message(pgn=0xF004, sa=0, size=8)]
+    results = api.SendMany(0, msgs)
+    assert list(results) == [0, 0, 0]
+    assert results.typecode == 'h'
+    assert dll.tx_msgs == [bytes(msg) for msg in msgs]
+
+def test_SendMany_packed():
+    dll = DummyDLL()
+    api = RP1210.RP1210API("dummy")
+    api.setDLL(dll)
+    assert list(api.SendMany(0, bytearray(b'\x01\x02\x03\x04\x05\x06'), [0, 1, 3, 6])) == [0, 0, 0]
+    assert dll.tx_msgs == [b'\x01', b'\x02\x03', b'\x04\x05\x06']
+    for offsets in ([0, 3], [-1, 2], [0, 2, 1, 2]): # past the end, negative, decreasing
+        with pytest.raises(ValueError):
+            api.SendMany(0, b'\x01\x02', offsets)
+    assert len(dll.tx_msgs) == 3
+
+def test_SendMany_errors():
+    err = 0x10000 - 137
+    api = RP1210.RP1210API("dummy")
+    dll = DummyDLL(tx_results=[0, err, 0])
+    api.setDLL(dll)
+    assert list(api.SendMany(0, [b'\x00'] * 3)) == [0, -137, 0]
+    dll = DummyDLL(tx_results=[0, err, 0])
+    api.setDLL(dll)
+    assert list(api.SendMany(0, [b'\x00'] * 3, StopOnError=True)) == [0, -137]
+    assert len(dll.tx_msgs) == 2
+
+def test_RP1210Client_tx_many():
+    dll = DummyDLL()
+    client = dummy_client(dll)
+    assert list(client.tx_many([b'\x01' * 10, b'\x02' * 10])) == [0, 0]
+    assert dll.tx_msgs == [b'\x01' * 10, b'\x02' * 10]
+    client.getAPI().setDLL(None)
+    assert list(client.tx_many([b'\x01', b'\x02'])) == [128, 128]
+    assert list(client.tx_many(b'\x01\x02', [0, 1, 2])) == [128, 128]
+    assert list(client.tx_many(bytes((i,)) for i in range(3))) == [128] * 3 # a generator
+    client.getAPI().setDLL(dll)
+    assert list(client.tx_many(bytes((i,)) for i in range(3))) == [0] * 3
+    assert dll.tx_msgs[-3:] == [b'\x00', b'\x01', b'\x02']
+
+def test_setDLL_binds_functions():
+    dll = DummyDLL()
+    api = RP1210.RP1210API("dummy")
+    api.setDLL(dll)
+    assert api._SendMessage is dll.RP1210_SendMessage
+    assert api._ReadMessage is dll.RP1210_ReadMessage
+    for name in ("RP1210_SendMessage", "RP1210_ReadMessage"): # DummyDLL shares one noop for the rest
+        argtypes, restype = RP1210.RP1210_FUNCTION_TYPES[name]
+        assert getattr(dll, name).argtypes == argtypes
+        assert getattr(dll, name).restype == restype
+    assert not api.conformsToRP1210C() # DummyDLL has no RP1210C functions
+
+def test_setDLL_lazy_functions():
+    """Bound functions should load the DLL on first use, and be unbound by setDLL(None)."""
+    dll = DummyDLL()
+    class LazyAPI(RP1210.RP1210API):
+        def loadDLL(self):
+            self.setDLL(dll)
+            return dll
+    api = LazyAPI("dummy")
+    assert api._SendMessage is not dll.RP1210_SendMessage
+    assert api.SendMessage(0, b'\x01\x02') == 0
+    assert dll.tx_msgs == [b'\x01\x02']
+    assert api._SendMessage is dll.RP1210_SendMessage
+    api.setDLL(None)
+    assert api._SendMessage is not dll.RP1210_SendMessage
+    assert not api._api_valid
+
+def test_SendMessage_fast_lane():
+    """bytes skip sanitize_msg_param; other types should produce the same message."""
+    dll = DummyDLL()
+    api = RP1210.RP1210API("dummy")
+    api.setDLL(dll)
+    api.SendMessage(0, b'\x00\x01\x02')
+    api.SendMessage(0, bytearray(b'\x00\x01\x02'))
+    api.SendMessage(0, b'\x00\x01\x02\x03', 2)
+    assert dll.tx_msgs == [b'\x00\x01\x02', b'\x00\x01\x02', b'\x00\x01']
+
+def test_ReadDirect_error():
+    api = RP1210.RP1210API("dummy")
+    api.setDLL(DummyDLL([0x10000 - 141, b'\x01' * 10]))
+    assert api.ReadDirect(0) == b''
+    assert api.ReadDirect(0) == b'\x01' * 10
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+import RP1210
+from utilities import DummyDLL, dummy_client
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_async_messages():
+    msgs = [i.to_bytes(4, 'big') + b'\x00' * 6 for i in range(50)]
+    client = dummy_client(DummyDLL(msgs))
+    async def main():
+        received = []
+        async with RP1210.AsyncRP1210Client(client, blocking=False) as aclient:
+            assert aclient.isRunning()
+            async for msg in aclient.messages():
+                received.append(msg)
+                if len(received) == len(msgs):
+                    break
+        assert not client.reader_running()
+        return received
+    assert run(main()) == msgs
+
+def test_async_batches():
+    msgs = [b'\x00' * 10] * 20
+    client = dummy_client(DummyDLL(msgs))
+    async def main():
+        count = 0
+        async with RP1210.AsyncRP1210Client(client, blocking=False, batch_size=8) as aclient:
+            async for batch in aclient.messages(batches=True):
+                assert 0 < len(batch) <= 8
+                count += len(batch)
+                if count == len(msgs):
+                    break
+        return count
+    assert run(main()) == len(msgs)
+
+def test_async_rx_after_stop():
+    client = dummy_client(DummyDLL([b'\x01' * 10]))
+    async def main():
+        aclient = RP1210.AsyncRP1210Client(client, blocking=False)
+        await aclient.start()
+        assert await aclient.rx() == b'\x01' * 10
+        await aclient.stop()
+        assert await aclient.rx() == b''
+        assert [msg async for msg in aclient.messages()] == []
+    run(main())
+
+def test_async_stop_wakes_waiting_reader():
+    client = dummy_client(DummyDLL())
+    async def main():
+        aclient = RP1210.AsyncRP1210Client(client, blocking=False)
+        await aclient.start()
+        waiter = asyncio.ensure_future(aclient.rx_batch())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        await aclient.stop()
+        return await asyncio.wait_for(waiter, 1.0)
+    assert run(main()) == []
+
+def test_async_tx_backpressure():
+    full = 0x10000 - 137 # ERR_TX_QUEUE_FULL
+    dll = DummyDLL(tx_results=[full, full, full, 0])
+    client = dummy_client(dll)
+    async def main():
+        aclient = RP1210.AsyncRP1210Client(client)
+        return await aclient.tx(b'\x01\x02\x03\x04\x05\x06\x07', retry_interval=0.001)
+    assert run(main()) == 0
+    assert len(dll.tx_msgs) == 4
+
+def test_async_tx_timeout():
+    full = 0x10000 - 137
+    dll = DummyDLL(tx_results=[full] * 1000)
+    client = dummy_client(dll)
+    async def main():
+        aclient = RP1210.AsyncRP1210Client(client)
+        return await aclient.tx(b'\x01\x02\x03\x04\x05\x06\x07', retry_interval=0.001, timeout=0.02)
+    assert run(main()) == -137
+
+def test_async_commands():
+    client = dummy_client(DummyDLL())
+    async def main():
+        aclient = RP1210.AsyncRP1210Client(client)
+        assert await aclient.command(3) == 0
+        assert await aclient.setAllFiltersToPass() == 0
+        assert aclient.getClientID.__name__ == "getClientID"
+        assert aclient.clientID == client.clientID
+        with pytest.raises(AttributeError):
+            aclient.doesntExist
+    run(main())
@@ -0,0 +1,91 @@
+import threading
+import RP1210
+from RP1210.Cache import LastValueCache
+from RP1210.J1939 import J1939Message, toJ1939Message
+from RP1210.VirtualDriver import VirtualBus, VirtualDLL
+from utilities import dummy_client, frame
+
+def test_newest_value():
+    cache = RP1210.Cache.LastValueCache(max_entries=8)
+    cache.feed(frame(0xF004, 0x00, data=b'\x01' * 8, timestamp=1), now=1.0)
+    cache.feed(frame(0xF004, 0x01, data=b'\x02' * 8, timestamp=2), now=1.5)
+    cache.feed(frame(0xF004, 0x00, data=b'\x03' * 8, timestamp=3), now=2.0)
+    assert len(cache) == 2 and (0xF004, 0x00) in cache and (0xF004, 0x17) not in cache
+    assert cache.get(0xF004, 0x00) == frame(0xF004, 0x00, data=b'\x03' * 8, timestamp=3)
+    assert cache.data(0xF004, 0x01) == b'\x02' * 8
+    assert cache.entry(0xF004, 0x00)[1] == 2.0
+    msg = cache.message(0xF004, 0x00)
+    assert (msg.pgn, msg.sa, msg.timestamp) == (0xF004, 0x00, 3)
+    assert cache.get(0xF004, 0x17) is None and cache.message(0xFEF1, 0x00) is None
+    assert cache.keys() == [(0xF004, 0x00), (0xF004, 0x01)]
+    assert cache.updates == 3
+
+def test_pdu1_and_messages():
+    cache = LastValueCache(echo=True)
+    cache.feed(b'\x00' * 4 + b'\x00' + toJ1939Message(0xEF00, 6, 0x03, 0x00, b'\x01' * 8))
+    cache.feed(b'\x00' * 4 + b'\x01' + toJ1939Message(0xEF00, 6, 0x03, 0x21, b'\x02' * 8)) # newer, to 0x21
+    assert cache.message(0xEF00, 0x03).da == 0x21 and cache.message(0xEF21, 0x03).isEcho()
+    assert len(cache) == 1
+    msg = J1939Message(pgn=0xFEF1, sa=0x00, data=b'\x05' * 8, size=8)
+    cache.feed(msg)
+    assert cache.data(0xFEF1, 0x00) == b'\x05' * 8
+    # messages longer than a slot are kept whole
+    big = bytes(range(200))
+    cache.feed(b'\x00' * 5 + toJ1939Message(0xFECA, 6, 0x00, 0xFF, big))
+    assert cache.data(0xFECA, 0x00) == big
+    assert cache.snapshot()[(0xFECA, 0x00)][0] == cache.get(0xFECA, 0x00)
+
+def test_staleness_and_capacity():
+    cache = LastValueCache(max_entries=3)
+    for sa, now in ((0x00, 1.0), (0x01, 2.0), (0x02, 3.0), (0x03, 3.0)):
+        cache.feed(frame(0xFEF1, sa, data=bytes(8)), now=now)
+    assert len(cache) == 3 and cache.dropped == 1 and (0xFEF1, 0x03) not in cache
+    assert cache.age(0xFEF1, 0x01, now=3.5) == 1.5 and cache.age(0xFEF1, 0x03) is None
+    assert cache.stale(1.0, now=3.5) == [(0xFEF1, 0x00), (0xFEF1, 0x01)]
+    cache.feed(frame(0xFEF1, 0x00, data=bytes(8)), now=3.5)
+    assert cache.stale(1.0, now=3.5) == [(0xFEF1, 0x01)]
+    assert len(cache.buffer) == 3 * 32 # fixed, however many frames
+    cache.clear()
+    assert len(cache) == 0 and cache.snapshot() == {}
+    cache.feed(frame(0xFEF1, 0x03, data=bytes(8)))
+    assert cache.keys() == [(0xFEF1, 0x03)]
+
+def test_concurrent_reads():
+    cache = LastValueCache(max_entries=16)
+    stop = threading.Event()
+    def writer():
+        count = 0
+        while not stop.is_set():
+            count += 1
+            for sa in range(16): # data and timestamp both hold the count: a torn read would differ
+                cache.feed(frame(0xF004, sa, data=count.to_bytes(8, 'big'), timestamp=count), now=float(count))
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(2000):
+            msg_frame, received = cache.entry(0xF004, 0x05) or (frame(0xF004, 0x05, data=bytes(8)), 0.0)
+            count = int.from_bytes(msg_frame[-8:], 'big')
+            assert int.from_bytes(msg_frame[:4], 'big') == count == received
+        for _ in range(50):
+            snapshot = cache.snapshot()
+            counts = [int.from_bytes(entry[0][-8:], 'big') for entry in snapshot.values()]
+            assert all(entry[1] == count for entry, count in zip(snapshot.values(), counts))
+            assert max(counts) - min(counts) <= 1 # all from the same moment: one pass of the writer
+    finally:
+        stop.set()
+        thread.join()
+
+def test_virtual_bus():
+    bus = VirtualBus()
+    client = dummy_client(VirtualDLL(bus))
+    client.setAllFiltersToPass()
+    try:
+        for value in range(5):
+            bus.injectJ1939(0xF004, 0x00, bytes((value,)) * 8)
+            bus.injectJ1939(0xFEF1, 0x00, bytes((value + 10,)) * 8)
+        cache = LastValueCache()
+        cache.feed_batch(iter(client.rx, b''))
+    finally:
+        client.disconnect()
+    assert cache.data(0xF004, 0x00) == b'\x04' * 8 and cache.data(0xFEF1, 0x00) == b'\x0e' * 8
+    assert cache.updates == 10
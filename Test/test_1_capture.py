@@ -0,0 +1,175 @@
+import os
+import time
+import pytest
+import RP1210
+from RP1210 import J1939, Capture
+from RP1210.Capture import CaptureReader, CaptureWriter
+from RP1210.VirtualDriver import VirtualBus, VirtualDLL
+from utilities import DummyDLL, dummy_client
+
+def frame(i, echo = False):
+    msg = J1939.toJ1939Message(0xF004, 6, 0x00, 0xFF, i.to_bytes(8, 'big'))
+    return i.to_bytes(4, 'big') + (b'\x00' if echo else b'') + msg
+
+def test_write_read(tmp_path):
+    path = str(tmp_path / "test.rpcap")
+    with CaptureWriter(path, timestamp_weight=1000.0, buffer_size=100) as writer:
+        for i in range(50):
+            writer.write(frame(i), time_ns=i * 1000)
+        writer.write_many([frame(50), frame(51)], time_ns=51000)
+        assert writer.records == 52
+    assert writer.isClosed()
+    assert Capture.isCaptureFile(path)
+    reader = CaptureReader(path, chunk_size=37)
+    assert (reader.version, reader.protocol, reader.timestamp_weight) == (1, "J1939", 1000.0)
+    records = list(reader.records())
+    assert len(records) == reader.count() == 52
+    assert records[10] == (10000, 0, frame(10))
+    msgs = list(reader)
+    assert [msg.timestamp for msg in msgs] == list(range(52))
+    assert msgs[5].pgn == 0xF004 and msgs[5].data == (5).to_bytes(8, 'big')
+
+def test_append_and_echo(tmp_path):
+    path = str(tmp_path / "test.rpcap")
+    with CaptureWriter(path) as writer:
+        writer.write(frame(1))
+    with CaptureWriter(path) as writer:
+        writer.write(frame(2, echo=True), flags=Capture.FLAG_ECHO)
+    msgs = list(CaptureReader(path))
+    assert [msg.data[-1] for msg in msgs] == [1, 2]
+    assert not msgs[1].isEcho()
+    # the header has to match what's being appended
+    for kwargs in ({"echo": True}, {"protocol": "CAN"}, {"timestamp_weight": 1000.0}):
+        with pytest.raises(ValueError):
+            CaptureWriter(path, **kwargs)
+    assert CaptureReader(path).count() == 2
+
+def test_append_after_truncated_record(tmp_path):
+    path = str(tmp_path / "test.rpcap")
+    with CaptureWriter(path) as writer:
+        for i in range(3):
+            writer.write(frame(i), time_ns=i)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 5)
+    with CaptureWriter(path) as writer:
+        writer.write(frame(3), time_ns=3)
+    records = list(CaptureReader(path).records())
+    assert records == [(0, 0, frame(0)), (1, 0, frame(1)), (3, 0, frame(3))]
+    assert os.path.getsize(path) == Capture.HEADER.size + 3 * (Capture.RECORD.size + len(frame(0)))
+
+def test_truncated_record(tmp_path):
+    path = str(tmp_path / "test.rpcap")
+    with CaptureWriter(path) as writer:
+        writer.write(frame(1))
+        writer.write(frame(2))
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 3)
+    assert CaptureReader(path).count() == 1
+
+def test_not_a_capture(tmp_path):
+    path = str(tmp_path / "test.bin")
+    with open(path, "wb") as f:
+        f.write(b'\x00' * 100)
+    assert not Capture.isCaptureFile(path)
+    with pytest.raises(ValueError):
+        CaptureReader(path)
+    with pytest.raises(ValueError):
+        CaptureWriter(path)
+
+def test_client_recorder(tmp_path):
+    path = str(tmp_path / "test.rpcap")
+    msgs = [frame(i) for i in range(10)]
+    client = dummy_client(DummyDLL(msgs))
+    with CaptureWriter(path) as writer:
+        client.setRecorder(writer)
+        assert client.getRecorder() is writer
+        client.rx()
+        client.rx_many(RP1210.RxArena(4))
+        client.setRecorder(None)
+        client.rx()
+    assert [record[2] for record in CaptureReader(path).records()] == msgs[:5]
+
+def test_reader_thread_recorder(tmp_path):
+    path = str(tmp_path / "test.rpcap")
+    bus = VirtualBus()
+    client = dummy_client(VirtualDLL(bus))
+    client.setAllFiltersToPass()
+    with CaptureWriter(path) as writer:
+        client.setRecorder(writer)
+        client.start_reader(blocking=False)
+        for i in range(100):
+            bus.injectJ1939(0xF004, 0x00, i.to_bytes(8, 'big'))
+        deadline = time.perf_counter() + 2
+        while len(client.rxBuffer) < 100 and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        client.disconnect()
+    assert [msg.data[-1] for msg in CaptureReader(path)] == list(range(100))
+    assert client.rx_batch() == [record[2] for record in CaptureReader(path).records()]
+
+def write_capture(path, num_msgs = 1000, start_ns = 0):
+    """Writes PGNs 0xF004 (SA 0x00), 0xFECA (SA 0x00, 0x03) and 0xEA00 (SA 0xF9, DA varies)."""
+    pgns = ((0xF004, 0x00, 0xFF), (0xFECA, 0x00, 0xFF), (0xFECA, 0x03, 0xFF), (0xEA00, 0xF9, 0x00))
+    with CaptureWriter(path) as writer:
+        for i in range(num_msgs):
+            pgn, sa, da = pgns[i % 4]
+            if pgn == 0xEA00:
+                da = i & 0xFF
+            msg = J1939.toJ1939Message(pgn, 6, sa, da, i.to_bytes(8, 'big'))
+            writer.write(i.to_bytes(4, 'big') + msg, time_ns=start_ns + i * 1000)
+
+def test_mapped_query(tmp_path):
+    path = str(tmp_path / "test.rpcap")
+    write_capture(path)
+    with Capture.MappedCapture(path, block_size=64) as capture:
+        assert len(capture) == 1000
+        assert capture.timeRange() == (0, 999000)
+        assert (0xFECA, 0x03) in capture.keys()
+        result = capture.query(pgn=0xFECA, sa=0x00)
+        assert len(result) == 250
+        assert [msg.data[-1] for msg in result[:3].messages()] == [1, 5, 9]
+        # time range: start inclusive, end exclusive
+        result = capture.query(pgn=0xFECA, sa=0x00, start_ns=101000, end_ns=301000)
+        assert result.times() == list(range(101000, 301000, 4000))
+        record = result[0]
+        assert (record.time_ns, record.flags) == (101000, 0)
+        assert isinstance(record.frame, memoryview)
+        assert record.message().pgn == 0xFECA
+        # PGN only, SA only, PDU1 PGN regardless of destination
+        assert len(capture.query(pgn=0xFECA)) == 500
+        assert capture.query(pgn=0xFECA).times()[:2] == [1000, 2000]
+        assert len(capture.query(sa=0x00)) == 500
+        assert len(capture.query(pgn=0xEA05)) == 250
+        assert len(capture.query(pgn=0x1234)) == 0
+        # time only, and everything
+        assert len(capture.query(start_ns=500000)) == 500
+        assert len(list(capture)) == 1000
+        del record, result
+
+def test_mapped_index_persisted(tmp_path):
+    path = str(tmp_path / "test.rpcap")
+    write_capture(path, 500)
+    with Capture.MappedCapture(path, block_size=64) as capture:
+        expected = capture.query(pgn=0xF004, start_ns=10000).offsets
+    assert os.path.isfile(path + Capture.INDEX_SUFFIX)
+    write_capture(path, 10, start_ns=10 ** 9)
+    with Capture.MappedCapture(path, block_size=64) as capture:
+        assert capture._load_index() # saved index covers the appended records too
+        assert len(capture) == 510
+        assert capture.query(pgn=0xF004, start_ns=10000, end_ns=10 ** 9).offsets == expected
+        assert len(capture.query(start_ns=10 ** 9)) == 10
+        # records appended while open
+        write_capture(path, 4, start_ns=2 * 10 ** 9)
+        assert capture.refresh() == 4
+        assert len(capture.query(pgn=0xF004, start_ns=2 * 10 ** 9)) == 1
+    # a different block size rebuilds the index
+    with Capture.MappedCapture(path, block_size=10, persist_index=False) as capture:
+        assert len(capture) == 514
+
+def test_mapped_non_monotonic(tmp_path):
+    path = str(tmp_path / "test.rpcap")
+    write_capture(path, 100, start_ns=10 ** 6)
+    write_capture(path, 100, start_ns=0) # host clock went backwards
+    with Capture.MappedCapture(path, block_size=16) as capture:
+        assert not capture._monotonic
+        assert len(capture.query(start_ns=0, end_ns=100000)) == 100
+        assert len(capture.query(pgn=0xF004, start_ns=10 ** 6)) == 25
@@ -0,0 +1,155 @@
+import threading
+import pytest
+import RP1210
+from RP1210 import Correlator
+from RP1210.Correlator import RequestNACK
+from RP1210.J1939 import J1939Message
+from RP1210.Transport import TPTransmitter
+from RP1210.VirtualDriver import VirtualBus, VirtualDLL
+from utilities import dummy_client, frame
+
+def ack(control, sa, pgn, address = 0xF9) -> bytes:
+    data = bytes((control, 0xFF, 0xFF, 0xFF, address)) + pgn.to_bytes(3, 'little')
+    return frame(Correlator.PGN_ACKNOWLEDGMENT, sa, 0xFF, data)
+
+def requests_sent(sent) -> list[tuple]:
+    """(PGN requested, destination) for each request in `sent`."""
+    msgs = [J1939Message(b'\x00' * 4 + msg) for msg in sent]
+    assert all(msg.pgn & 0x3FF00 == Correlator.PGN_REQUEST and msg.sa == 0xF9 for msg in msgs)
+    return [(int.from_bytes(msg.data[:3], 'little'), msg.da) for msg in msgs]
+
+def test_specific_requests():
+    sent = []
+    corr = RP1210.Correlator.Correlator(sent.append, address=0xF9)
+    vin = corr.request(0xFEEC, da=0x00, now=0.0)
+    software = corr.request(0xFEDA, da=0x00, now=0.0)
+    again = corr.request(0xFEEC, da=0x00, now=0.5) # same request: not sent again
+    other = corr.request(0xFEEC, da=0x03, now=0.0)
+    assert requests_sent(sent) == [(0xFEEC, 0x00), (0xFEDA, 0x00), (0xFEEC, 0x03)]
+    assert corr.numPending() == 4
+    # unrelated traffic and responses from other addresses don't complete anything
+    assert corr.feed(frame(0xF004, 0x00, 0xFF, b'\x00' * 8), now=0.1) is None
+    assert corr.feed(frame(0xFEEC, 0x17, 0xFF, b'OTHER*'), now=0.1) is None
+    assert corr.feed(frame(0xFEEC, 0x00, 0xFF, b'VIN1234*'), now=0.1).data == b'VIN1234*'
+    assert vin.result(0).data == b'VIN1234*' and again.result(0) is vin.result(0)
+    assert not software.done() and not other.done()
+    # the rest time out, each on its own deadline
+    assert corr.nextDeadline() == pytest.approx(1.25)
+    assert corr.expire(now=1.3) == 2
+    with pytest.raises(TimeoutError):
+        software.result(0)
+    with pytest.raises(TimeoutError):
+        other.result(0)
+    assert (corr.sent, corr.answered, corr.timed_out, corr.numPending()) == (3, 2, 2, 0)
+    assert corr.nextDeadline() is None
+
+def test_global_request():
+    sent = []
+    corr = Correlator.Correlator(sent.append, address=0xF9, timeout=0.5)
+    ids = corr.request(0xFEEB, now=0.0)
+    engine = corr.request(0xFEEB, da=0x00, now=0.0)
+    assert requests_sent(sent) == [(0xFEEB, 0xFF), (0xFEEB, 0x00)]
+    corr.feed(frame(0xFEEB, 0x00, 0xFF, b'ENGINE**'), now=0.1)
+    corr.feed(frame(0xFEEB, 0x03, 0xFF, b'TRANS***'), now=0.1)
+    corr.feed(frame(0xFEEB, 0x03, 0xFF, b'TRANS2**'), now=0.2) # first response is kept
+    assert engine.result(0).data == b'ENGINE**'
+    assert not ids.done()
+    corr.expire(now=0.6)
+    assert {sa: msg.data for sa, msg in ids.result(0).items()} == {0x00: b'ENGINE**', 0x03: b'TRANS***'}
+    # nobody answering a global request isn't an error
+    empty = corr.request(0xFEDA, now=1.0)
+    corr.expire(now=2.0)
+    assert empty.result(0) == {}
+
+def test_acknowledgments():
+    sent = []
+    corr = Correlator.Correlator(sent.append, address=0xF9)
+    nack = corr.request(0xFEDA, da=0x00, now=0.0)
+    denied = corr.request(0xFEEC, da=0x00, now=0.0)
+    positive = corr.request(0xEF00, da=0x00, now=0.0) # PDU1: PS isn't part of the PGN
+    pdu1 = corr.request(0xEF00, da=0x03, now=0.0)
+    assert corr.feed(ack(Correlator.NACK, 0x00, 0xFEDA, address=0x3D), now=0.1) is None # not ours
+    corr.feed(ack(Correlator.NACK, 0x00, 0xFEDA), now=0.1)
+    corr.feed(ack(Correlator.ACK_ACCESS_DENIED, 0x00, 0xFEEC, address=0xFF), now=0.1)
+    corr.feed(ack(Correlator.ACK, 0x00, 0xEF00), now=0.1)
+    with pytest.raises(RequestNACK) as error:
+        nack.result(0)
+    assert (error.value.pgn, error.value.sa, error.value.control) == (0xFEDA, 0x00, Correlator.NACK)
+    with pytest.raises(RequestNACK) as error:
+        denied.result(0)
+    assert error.value.control == Correlator.ACK_ACCESS_DENIED
+    assert positive.result(0).pgn & 0x3FF00 == Correlator.PGN_ACKNOWLEDGMENT
+    # PDU1 responses to other nodes aren't ours
+    assert corr.feed(frame(0xEF00, 0x03, 0x3D, b'\x01' * 8), now=0.1) is None
+    assert corr.feed(frame(0xEF00, 0x03, 0xF9, b'\x02' * 8), now=0.1) is not None
+    assert pdu1.result(0).data == b'\x02' * 8
+    assert corr.refused == 2
+
+def test_transport_responses():
+    to_corr, to_ecu = [], []
+    corr = Correlator.Correlator(lambda msg: to_ecu.append(b'\x00' * 4 + msg), address=0xF9)
+    ecu = TPTransmitter(lambda msg: to_corr.append(b'\x00' * 4 + msg), bam_interval=0.0)
+    software = corr.request(0xFEDA, da=0x00, now=0.0)
+    proprietary = corr.request(0xEF00, da=0x00, timeout=0.6, now=0.0)
+    to_ecu.clear()
+    # one response as BAM, the other over RTS/CTS to us, which outlasts the request's timeout
+    bam = bytes(range(40))
+    ecu.transmit(J1939Message(pgn=0xFEDA, sa=0x00, data=bam, size=len(bam)), now=0.0)
+    rts = bytes(range(100, 200))
+    ecu.transmit(J1939Message(pgn=0xEF00, sa=0x00, da=0xF9, data=rts, size=len(rts)), now=0.0)
+    now = 0.0
+    while to_corr or to_ecu:
+        now += 0.5
+        while to_corr:
+            corr.feed(to_corr.pop(0), now=now)
+        while to_ecu:
+            ecu.feed(to_ecu.pop(0), now=now)
+        ecu.poll(now)
+    assert software.result(0).data == bam
+    assert proprietary.result(0).data == rts
+    assert ecu.completed == 2 and corr.timed_out == 0
+
+def test_cancel():
+    corr = Correlator.Correlator(lambda msg: None, address=0xF9)
+    first = corr.request(0xFEEC, da=0x00, now=0.0)
+    first.cancel()
+    corr.feed(frame(0xFEEC, 0x00, 0xFF, b'VIN*'), now=0.1) # completing a cancelled future is fine
+    second = corr.request(0xFEEC, da=0x00, now=0.0)
+    assert corr.cancelAll() == 1
+    assert second.cancelled() and corr.numPending() == 0
+    # cancelled requests are dropped when they would have timed out
+    third = corr.request(0xFEDA, da=0x00, now=0.0)
+    third.cancel()
+    assert corr.numPending() == 1
+    assert corr.expire(now=2.0) == 0 and corr.numPending() == 0
+
+def test_many_requests_over_virtual_bus():
+    bus = VirtualBus()
+    client = dummy_client(VirtualDLL(bus))
+    client.setAllFiltersToPass()
+    ecu_addresses = range(0x00, 0x20)
+    def answer(msg):
+        # a stand-in for the ECUs: each answers requests addressed to it with its address
+        msg = J1939Message(b'\x00' * 4 + msg)
+        if msg.pgn & 0x3FF00 == Correlator.PGN_REQUEST and msg.da in ecu_addresses:
+            pgn = int.from_bytes(msg.data[:3], 'little')
+            bus.injectJ1939(pgn, msg.da, bytes((msg.da,)) * 8)
+    corr = Correlator.Correlator(answer, address=0xF9, timeout=2.0)
+    futures = {(pgn, da): corr.request(pgn, da) for pgn in (0xFEEC, 0xFEEB, 0xFEDA) for da in ecu_addresses}
+    # a reader thread feeds frames while this one waits on the futures
+    stop = threading.Event()
+    def reader():
+        while not stop.is_set():
+            for msg in iter(client.rx, b''):
+                corr.feed(msg)
+            stop.wait(0.001)
+    thread = threading.Thread(target=reader)
+    thread.start()
+    try:
+        for (pgn, da), future in futures.items():
+            assert future.result(timeout=2).data == bytes((da,)) * 8
+    finally:
+        stop.set()
+        thread.join()
+        client.disconnect()
+    assert corr.answered == len(futures) == 96
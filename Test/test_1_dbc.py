@@ -0,0 +1,99 @@
+import os
+import RP1210
+from RP1210 import DBC
+from RP1210.J1939 import J1939Message, toJ1939Message
+
+SAMPLE = '''VERSION ""
+
+NS_ :
+    BA_
+    VAL_
+
+BS_:
+
+BU_: Engine Trans Tool
+
+BO_ 2364540158 EEC1: 8 Engine
+ SG_ EngineTorqueMode : 0|4@1+ (1,0) [0|15] "" Vector__XXX
+ SG_ DriversDemandTorque : 8|8@1+ (1,-125) [-125|125] "%" Vector__XXX
+ SG_ EngineSpeed : 24|16@1+ (0.125,0) [0|8031.875] "rpm" Tool
+
+BO_ 2364539905 EEC1_Trans: 8 Trans
+ SG_ EngineSpeed : 24|16@1+ (0.125,0) [0|8031.875] "rpm" Tool
+
+BO_ 2566844926 CCVS1: 8 Engine
+ SG_ WheelBasedVehicleSpeed : 8|16@1+ (0.00390625,0) [0|250.996] "km/h" Tool
+ SG_ ParkingBrakeSwitch : 2|2@1+ (1,0) [0|3] "" Tool
+
+BO_ 2565808384 PropA: 8 Tool
+ SG_ Mode M : 0|8@1+ (1,0) [0|255] "" Engine
+ SG_ SetpointA m1 : 8|16@1+ (1,0) [0|65535] "" Engine
+ SG_ Offset : 15|16@0- (0.5,0) [0|0] "" Engine
+
+BO_ 1024 ClassicCAN: 2 Tool
+ SG_ Counter : 0|8@1+ (1,0) [0|255] "" Engine
+
+BO_ 3221225472 VECTOR__INDEPENDENT_SIG_MSG: 0 Vector__XXX
+ SG_ Unused : 0|8@1+ (1,0) [0|0] "" Vector__XXX
+
+CM_ SG_ 2364540158 EngineSpeed "Actual engine speed";
+BA_DEF_ SG_ "SPN" INT 0 524287;
+BA_ "SPN" SG_ 2364540158 EngineSpeed 190;
+BA_ "SPN" SG_ 2566844926 WheelBasedVehicleSpeed 84;
+'''
+
+def write(tmp_path, text = SAMPLE) -> str:
+    path = str(tmp_path / "j1939.dbc")
+    with open(path, "w") as f:
+        f.write(text)
+    return path
+
+def test_parse():
+    db = RP1210.DBC.parseDBC(SAMPLE)
+    assert [message.name for message in db.messages] == ["EEC1", "EEC1_Trans", "CCVS1", "PropA", "ClassicCAN"]
+    eec1 = db.message(0xF004)
+    assert (eec1.frame_id, eec1.pgn, eec1.sa, eec1.da, eec1.pri) == (0x0CF004FE, 0xF004, 0xFE, 0xFF, 3)
+    assert db.message(0xF004, sa=0x01).name == "EEC1_Trans" and len(db.messagesFor(0xF004)) == 2
+    prop = db.byName("PropA")
+    assert (prop.pgn, prop.da, prop.sa) == (0xEF00, 0x21, 0x00) # PDU1: PS is the destination
+    assert db.message(0xEF21) is prop and 0xEF00 in db and 0xFEF1 in db and 0xFECA not in db
+    assert db.byName("ClassicCAN").pgn is None and not db.byName("ClassicCAN").extended
+    assert db.skipped == [("PropA", "SetpointA")]
+    speed = eec1.signals[2]
+    assert (speed.start, speed.length, speed.scale, speed.unit, speed.spn) == (24, 16, 0.125, "rpm", 190)
+    offset = prop.signals[1]
+    assert (offset.little_endian, offset.signed, offset.special) == (False, True, False)
+    assert db.pgns() == [0xF004, 0xFEF1, 0xEF00]
+
+def test_decode():
+    decoder = DBC.parseDBC(SAMPLE).decoder()
+    frame = b'\x00' * 4 + toJ1939Message(0xF004, 3, 0x00, 0xFF, bytes((3, 145, 0xFF, 0x60, 0x2E, 0xFF, 0xFF, 0xFF)))
+    msg = J1939Message(frame)
+    assert DBC.parseDBC(SAMPLE).message(msg.pgn, msg.sa).name == "EEC1"
+    assert decoder.decode(frame) == {"EngineTorqueMode": 3, "DriversDemandTorque": 20, "EngineSpeed": 1484.0}
+    prop = b'\x00' * 4 + toJ1939Message(0xEF00, 6, 0xF9, 0x21, bytes((1, 0xFF, 0xFE, 0xFF)))
+    assert decoder.decode(prop) == {"Mode": 1, "Offset": -1.0}
+
+def test_cache(tmp_path):
+    path = write(tmp_path)
+    db = DBC.loadDBC(path)
+    assert not db.cached and os.path.exists(path + DBC.CACHE_SUFFIX)
+    cached = DBC.loadDBC(path)
+    assert cached.cached and cached.path == path
+    assert [repr(message) for message in cached.messages] == [repr(message) for message in db.messages]
+    assert cached.skipped == db.skipped and cached.message(0xF004).signals[2].spn == 190
+    assert cached.decoder().plans() == db.decoder().plans()
+    frame = b'\x00' * 4 + toJ1939Message(0xFEF1, 6, 0x00, 0xFF, bytes((0xF3, 0x00, 0x19, 0, 0, 0, 0, 0)))
+    assert cached.decoder().decode(frame) == db.decoder().decode(frame) == {"WheelBasedVehicleSpeed": 25.0,
+                                                                            "ParkingBrakeSwitch": 0}
+    # a different file, different options, or a damaged cache means parsing again
+    assert not DBC.loadDBC(path, special=False).cached
+    write(tmp_path, SAMPLE.replace("EngineSpeed : 24|16@1+ (0.125,0)", "EngineSpeed : 24|16@1+ (0.25,0)"))
+    changed = DBC.loadDBC(path)
+    assert not changed.cached and changed.message(0xF004).signals[2].scale == 0.25
+    assert DBC.loadDBC(path).cached
+    with open(path + DBC.CACHE_SUFFIX, "r+b") as f:
+        f.truncate(DBC.CACHE_HEADER.size + 10)
+    assert not DBC.loadDBC(path).cached
+    other = str(tmp_path / "elsewhere.cache")
+    assert not DBC.loadDBC(path, cache_path=other, persist_cache=False).cached and not os.path.exists(other)
@@ -0,0 +1,209 @@
+import random
+import pytest
+import RP1210
+from RP1210 import Filters, J1939
+from RP1210.Filters import DISCARD, PASS, FilterRule, SoftwareFilter
+from RP1210.J1939 import J1939Message
+from RP1210.VirtualDriver import VirtualBus, VirtualDLL
+from utilities import dummy_client, frame
+
+def reference(rules, default, frame) -> bool:
+    """Straightforward first-match evaluation on a decoded message."""
+    msg = J1939Message(frame)
+    pgn = msg.pgn & 0x3FF00 if msg.pdu() == 1 else msg.pgn
+    for rule in rules:
+        if rule.pgns is not None and pgn not in rule.pgns:
+            continue
+        if rule.pgn_range is not None and not rule.pgn_range[0] <= pgn <= rule.pgn_range[1]:
+            continue
+        if not (rule.sa_table[msg.sa] and rule.da_table[msg.da] and rule.pri_table[msg.pri]):
+            continue
+        if rule.data_size and not (len(msg.data) >= rule.data_size and
+                int.from_bytes(msg.data[:rule.data_size], 'big') & rule.data_mask == rule.data_value):
+            continue
+        return rule.action
+    return default
+
+def test_rules_in_order():
+    filt = SoftwareFilter([
+        FilterRule(pgn=0xFECA, action=PASS),
+        FilterRule(sa=range(0x80, 0xF8), action=DISCARD),
+        FilterRule(pgn=0xFF00, data_mask=b'\xFF', data_value=b'\x42', action=PASS),
+        FilterRule(pri=(0, 1, 2, 3), action=PASS),
+    ], default=DISCARD)
+    assert filt.accepts(frame(0xFECA, 0x90))
+    assert not filt.accepts(frame(0xF004, 0x90, pri=3))
+    assert filt.accepts(frame(0xF004, 0x00, pri=3))
+    assert not filt.accepts(frame(0xF004, 0x00, pri=6))
+    assert filt.accepts(frame(0xFF00, 0x00, data=b'\x42\x00'))
+    assert not filt.accepts(frame(0xFF00, 0x00, data=b'\x43\x00'))
+    assert filt.accepts(frame(0xFF00, 0x00, data=b'\x43\x00', pri=2)) # falls through to the pri rule
+    assert not filt.accepts(frame(0xFF00, 0x00, data=b''))
+    assert (filt.passed, filt.discarded) == (4, 4)
+
+def test_pdu1_and_destination():
+    filt = SoftwareFilter([FilterRule(pgn=0xEA00, da=(0x00, 0xFF))], default=DISCARD)
+    assert filt.accepts(frame(0xEA00, 0xF9, da=0x00, data=b'\xCA\xFE\x00'))
+    assert filt.accepts(frame(0xEAFF, 0xF9, da=0xFF, data=b'\xCA\xFE\x00'))
+    assert not filt.accepts(frame(0xEA00, 0xF9, da=0x3D, data=b'\xCA\xFE\x00'))
+    # PDU2 messages have DA 0xFF whatever the DA byte says
+    filt = SoftwareFilter([FilterRule(da=0xFF, action=DISCARD)], default=PASS)
+    assert not filt.accepts(frame(0xF004, 0x00, da=0x12))
+    assert filt.accepts(frame(0xEF00, 0x00, da=0x12))
+
+def test_matches_reference():
+    rng = random.Random(18)
+    rules = []
+    for _ in range(12):
+        kwargs = {"action": rng.random() < 0.5}
+        if rng.random() < 0.5:
+            kwargs["pgn"] = rng.sample([0xF004, 0xFECA, 0xFEF1, 0xEA00, 0xEF00, 0xFF10], 2)
+        if rng.random() < 0.2:
+            kwargs["pgn_range"] = (0xFF00, 0xFFFF)
+        if rng.random() < 0.4:
+            kwargs["sa"] = range(rng.randrange(128), 256)
+        if rng.random() < 0.3:
+            kwargs["da"] = rng.sample(range(256), 20) + [0xFF]
+        if rng.random() < 0.3:
+            kwargs["pri"] = rng.sample(range(8), 3)
+        if rng.random() < 0.3:
+            kwargs["data_mask"] = bytes((0xF0, 0x0F))
+            kwargs["data_value"] = bytes((rng.randrange(256), rng.randrange(256)))
+        rules.append(FilterRule(**kwargs))
+    filt = SoftwareFilter(rules, default=PASS)
+    frames = [frame(rng.choice([0xF004, 0xFECA, 0xFEF1, 0xEA00, 0xEF00, 0xFF10, 0xFF80, 0x1F004]),
+                    rng.randrange(256), rng.randrange(256), rng.randbytes(rng.randrange(9)), rng.randrange(8))
+                for _ in range(3000)]
+    for f in frames:
+        assert filt.accepts(f) == reference(rules, PASS, f)
+        assert filt.accepts(J1939Message(f)) == reference(rules, PASS, f)
+
+def test_batches():
+    filt = SoftwareFilter(default=PASS)
+    filt.addRule(sa=0x00, action=DISCARD)
+    frames = [frame(0xF004, sa) for sa in (0x00, 0x01, 0x00, 0x02)]
+    assert filt.filter(frames) == [frames[1], frames[3]]
+    arena = RP1210.RxArena(4, 32)
+    for i, f in enumerate(frames):
+        arena.buffer[arena.offsets[i]:arena.offsets[i] + len(f)] = f
+        arena.lengths[i] = len(f)
+    arena.count = 4
+    assert [bytes(f) for f in filt.filter(arena)] == [frames[1], frames[3]]
+    assert filt.filter_buffer(arena.buffer, arena.offsets[:4], arena.lengths[:4]) == [1, 3]
+    packed = b''.join(frames)
+    bounds = [i * len(frames[0]) for i in range(5)]
+    assert filt.filter_buffer(packed, bounds) == [1, 3]
+    # echo frames
+    filt = SoftwareFilter([FilterRule(sa=0x01)], echo=True)
+    echoed = [f[:4] + b'\x01' + f[4:] for f in frames]
+    assert filt.filter(echoed) == [echoed[1]]
+    filt.clear()
+    assert filt.filter(echoed) == []
+
+def test_filter_buffer_matches_decode_batch():
+    np = pytest.importorskip("numpy")
+    filt = SoftwareFilter([FilterRule(pgn=0xFEF1, action=DISCARD)], default=PASS)
+    frames = [frame(0xF004, 0x00, data=bytes(8)), frame(0xFEF1, 0x01, data=bytes(3)),
+                frame(0xFECA, 0x02, data=bytes(20))]
+    packed = b''.join(frames)
+    bounds = [0]
+    for f in frames:
+        bounds.append(bounds[-1] + len(f))
+    decoded = J1939.decode_batch(packed, bounds)
+    assert len(decoded) == len(frames)
+    passed = filt.filter_buffer(packed, bounds)
+    assert passed == [0, 2]
+    assert list(decoded['pgn'][np.array(passed)]) == [0xF004, 0xFECA]
+    assert list(decoded['size'][np.array(passed)]) == [8, 20]
+
+def test_plan_can_filters():
+    ids = [0x18FEF100, 0x18FEF103, 0x0CF00400, 0x0CF00403]
+    plan = Filters.planCANFilters(ids, max_filters=4)
+    assert plan.exact and plan.software is None
+    assert sorted(plan.filters) == sorted((1, 0x1FFFFFFF, can_id) for can_id in ids)
+    # two filters: each pair shares all but the low two bits
+    plan = Filters.planCANFilters(ids, max_filters=2)
+    assert not plan.exact
+    assert sorted(plan.filters) == [(1, 0x1FFFFFFC, 0x0CF00400), (1, 0x1FFFFFFC, 0x18FEF100)]
+    assert plan.fraction == 8 / (1 << 29)
+    assert plan.wants(0x18FEF103) and not plan.wants(0x18FEF101)
+    # with a traffic profile, the busy IDs stay out and the estimate is exact for the profile
+    traffic = {0x18FEF100: 10, 0x18FEF101: 1000, 0x18FEF103: 10, 0x0CF00400: 100, 0x0CF00401: 100}
+    plan = Filters.planCANFilters(ids, max_filters=3, traffic=traffic)
+    for can_id in ids:
+        assert any(can_id & mask == header for _, mask, header in plan.filters)
+    assert not any(0x18FEF101 & mask == header for _, mask, header in plan.filters)
+    assert not any(0x0CF00401 & mask == header for _, mask, header in plan.filters)
+    assert plan.fraction == 120 / 1220
+    # J1939 PGNs on a CAN client, any priority
+    assert Filters.j1939CANFilter(0xF004) == (0x3FFFF00, 0xF00400)
+    assert Filters.j1939CANFilter(0xEA00, sa=0xF9, da=0x00) == (0x3FFFFFF, 0xEA00F9)
+    assert Filters.j1939CANFilter(0xFEF1, da=0x0E) == (0x3FFFF00, 0xFEF100) # PDU2: no destination
+    assert Filters.j1939CANFilter(da=0x0E) == (0xFF00, 0x0E00)
+    plan = Filters.planCANFilters([Filters.j1939CANFilter(0xF004), 0x0CF00400], max_filters=1)
+    assert plan.filters == [(1, 0x3FFFF00, 0xF00400)] and plan.exact
+    assert Filters.planCANFilters(ids, max_filters=0).pass_all
+
+def test_plan_j1939_filters():
+    wanted = [(0xF004, 0x00), (0xF004, 0x03), (0xFEF1, 0x00), 0xFECA, (0xEA00, 0xF9)]
+    plan = Filters.planJ1939Filters(wanted, max_filters=5)
+    assert plan.exact and len(plan.filters) == 5
+    assert (1, 0xFECA, 0, 0) in plan.filters and (5, 0xEA00, 0xF9, 0) in plan.filters
+    plan = Filters.planJ1939Filters(wanted, max_filters=4)
+    assert (1, 0xF004, 0, 0) in plan.filters and len(plan.filters) == 4
+    assert plan.software.accepts(frame(0xF004, 0x03))
+    assert not plan.software.accepts(frame(0xF004, 0x01))
+    assert plan.software.accepts(frame(0xEA00, 0xF9, da=0x00))
+    # J1939 filters can't be narrowed within a field, so 3 filters means passing everything
+    assert Filters.planJ1939Filters(wanted, max_filters=3).pass_all
+    # measured traffic: merging by source is cheaper when the other PGNs from it are quiet
+    frames = [frame(0xF004, 0x00)] * 50 + [frame(0xFEF1, 0x00)] * 5 + [frame(0xFEF1, 0x03)] * 45
+    traffic = Filters.measureTraffic(frames)
+    assert traffic == {0xF00400: 50, 0xFEF100: 5, 0xFEF103: 45}
+    plan = Filters.planJ1939Filters([(0xF004, 0x00), (0xFEF1, 0x00)], max_filters=1, traffic=traffic)
+    assert plan.filters == [(4, 0, 0x00, 0)]
+    assert plan.fraction == 0.55
+
+class FilterRecorder():
+    """Stands in for an RP1210Client whose driver holds at most `limit` filters."""
+    def __init__(self, limit):
+        self.limit = limit
+        self.filters = None
+
+    def setAllFiltersToPass(self):
+        self.filters = "pass"
+        return 0
+
+    def setAllFiltersToDiscard(self):
+        self.filters = []
+        return 0
+
+    def setCANFilters(self, *args):
+        if len(self.filters) >= self.limit:
+            return Filters.ERR_MAX_FILTERS_EXCEEDED
+        self.filters.append(args)
+        return 0
+
+def test_program_filters():
+    bus = VirtualBus()
+    client = dummy_client(VirtualDLL(bus))
+    plan = Filters.planJ1939Filters([(0xF004, 0x00), (0xF004, 0x03), (0xEA00, None)], max_filters=2)
+    assert plan.program(client) == 0
+    bus.injectJ1939(0xF004, 0x00, b'\x01' * 8)
+    bus.injectJ1939(0xF004, 0x01, b'\x02' * 8) # let through by the adapter, dropped by software
+    bus.injectJ1939(0xF003, 0x00, b'\x03' * 8)
+    bus.injectJ1939(0xEA00, 0x3D, b'\x04' * 3, da=0xF9)
+    frames = list(iter(client.rx, b''))
+    assert [J1939Message(f).data[0] for f in frames] == [1, 2, 4]
+    assert [J1939Message(f).data[0] for f in plan.software.filter(frames)] == [1, 4]
+    client.disconnect()
+    # a driver with fewer filters than planned for: the plan is redone to fit
+    ids = [0x100, 0x101, 0x102, 0x104]
+    plan = Filters.planCANFilters(ids, max_filters=4, extended=False)
+    recorder = FilterRecorder(2)
+    assert plan.program(recorder) == 0
+    assert plan.max_filters == 2 and len(recorder.filters) == 2
+    assert recorder.filters == [args for args in plan.filters]
+    assert all(any(can_id & mask == header for _, mask, header in plan.filters) for can_id in ids)
+    assert all(can_type == 0 for can_type, _, _ in plan.filters)
+    assert Filters.planCANFilters(ids, max_filters=4).program(FilterRecorder(0)) == 0
@@ -1,6 +1,7 @@
 from typing import Union
 from RP1210 import J1939, Commands, sanitize_msg_param
 import binascii
+import random
 import pytest
 
 
@@ -534,6 +535,20 @@ def test_generateNetMgmtName(aac, ig, vsi, vs, func, func_inst, ecu_inst, mc, id
     assert len(actual_result) == 8
     assert actual_result == expected
 
+def test_decodeNetMgmtName():
+    """decodeNetMgmtName() is the inverse of generateNetMgmtName()"""
+    assert J1939.decodeNetMgmtName(b'R1<\xc3\xaa\x94\n\xe2') == (1, 6, 2, 5, 148, 21, 2, 1561, 1847634)
+    assert J1939.decodeNetMgmtName(b'\xff\xff\xff\xff\xff\xfe\xfc\xff') == (1, 7, 15, 126, 254, 31, 7, 2047, 2097151)
+    assert J1939.decodeNetMgmtName(0) == (0,) * 9
+    rng = random.Random(21)
+    for _ in range(200):
+        fields = (rng.randrange(2), rng.randrange(8), rng.randrange(16), rng.randrange(127),
+                    rng.randrange(255), rng.randrange(32), rng.randrange(8), rng.randrange(2048),
+                    rng.randrange(1 << 21))
+        name = J1939.generateNetMgmtName(*fields)
+        assert J1939.decodeNetMgmtName(name) == fields
+        assert J1939.decodeNetMgmtName(int.from_bytes(name, 'little')) == fields
+
 def test_generateNetMgmtName_invalid_input():
     """Test generateNetMgmtName() function with invalid inputs"""
     # a list of different data types
@@ -566,4 +581,90 @@ def test_generateNetMgmtName_invalid_input():
             parameters_range[field]=val
             with pytest.raises(IndexError, match=r".* is not in the range .*"):
                 J1939.generateNetMgmtName(*parameters_range)
-    
\ No newline at end of file
+    
+def test_J1939Message_lazy_encoding_matches_toJ1939Message():
+    rng = random.Random(12)
+    for _ in range(500):
+        pgn, pri, sa, da = rng.randrange(1 << 18), rng.randrange(8), rng.randrange(256), rng.randrange(256)
+        how = rng.randrange(2)
+        data = bytes(rng.randrange(256) for _ in range(rng.randrange(12)))
+        msg = J1939.J1939Message()
+        msg.pgn = pgn
+        msg.pri = pri
+        msg.sa = sa
+        msg.da = da
+        msg.how = how
+        msg.data = data
+        expected = J1939.toJ1939Message(msg.pgn, msg.pri, msg.sa, msg.da, msg.data, msg.size, msg.how)
+        assert msg.msg == expected
+        assert bytes(msg) == expected and len(msg) == len(expected) and msg == expected
+        built = J1939.J1939Message(pgn=pgn, pri=pri, sa=sa, da=da, data=data, size=len(data), how=how)
+        assert built.msg == J1939.toJ1939Message(built.pgn, pri, sa, built.da, data, len(data), how)
+
+def test_J1939Message_encodes_once():
+    msg = J1939.J1939Message(pgn=0xF004, sa=0x00, data=b'\x01' * 8, size=8)
+    msg.pri = 3
+    msg.sa = 0x17
+    assert msg._dirty
+    encoded = msg.msg
+    assert not msg._dirty
+    assert msg.msg is encoded
+    msg[4] = 0x20 # byte assignment re-parses the message
+    assert msg.sa == 0x20 and msg.msg == encoded[:4] + b'\x20' + encoded[5:]
+    msg += 0x55
+    assert msg.data == b'\x01' * 8 + b'\x55'
+
+def test_J1939Message_slots():
+    msg = J1939.J1939Message()
+    assert not hasattr(msg, '__dict__')
+    with pytest.raises(AttributeError):
+        msg.not_a_field = 1
+
+def test_J1939FrameView_matches_J1939Message():
+    rng = random.Random(13)
+    for echo in (False, True):
+        for _ in range(300):
+            frame = rng.randbytes(4) + (bytes((rng.randrange(2),)) if echo else b'')
+            frame += J1939.toJ1939Message(rng.choice((0xF004, 0xEA00, 0x1FECA, rng.randrange(1 << 24))),
+                                            rng.randrange(8), rng.randrange(256), rng.randrange(256),
+                                            rng.randbytes(rng.randrange(12)), how=rng.randrange(2))
+            frame = frame[:rng.choice((len(frame), rng.randrange(len(frame) + 1)))] # some short frames
+            msg = J1939.J1939Message(frame, echo=echo)
+            view = J1939.J1939FrameView(frame, echo)
+            assert (view.timestamp, view.pgn, view.pri, view.how, view.sa, view.da, view.dp, view.res) == \
+                    (msg.timestamp, msg.pgn, msg.pri, msg.how, msg.sa, msg.da, msg.dp, msg.res)
+            assert (view.pf(), view.ps(), view.pdu(), view.isRequest(), view.isEcho()) == \
+                    (msg.pf(), msg.ps(), msg.pdu(), msg.isRequest(), msg.isEcho())
+            assert bytes(view.data) == msg.data and view.size == msg.size
+            assert bytes(view) == msg.msg and len(view) == len(msg) and view == msg.msg
+            promoted = view.toMessage()
+            assert promoted.msg == msg.msg and promoted.timestamp == msg.timestamp
+
+def test_J1939FrameView_zero_copy():
+    import RP1210
+    arena = RP1210.RxArena(2, 32)
+    frame = b'\x00\x00\x00\x07' + J1939.toJ1939Message(0xF004, 3, 0x00, 0xFF, b'\x01' * 8)
+    arena.buffer[0:len(frame)] = frame
+    arena.lengths[0] = len(frame)
+    arena.count = 1
+    view = J1939.J1939FrameView().bind(arena[0])
+    assert view.pgn == 0xF004 and view.timestamp == 7
+    data = view.data
+    assert isinstance(data, memoryview)
+    arena.buffer[4 + 6] = 0x55 # the view sees changes to the underlying buffer
+    assert data[0] == 0x55
+    del data
+    # ctypes buffers work too
+    view.bind(arena._slots[0])
+    assert view.sa == 0x00 and view.size == 32 - 10
+
+def test_toJ1939Message_fast_path_matches_generic():
+    # int args take the precompiled-struct path; bytes args go through sanitize_msg_param
+    for pgn, pri, sa, da, how in ((0x1FECA, 6, 0x12, 0xFF, 0), (0xEA00, 0xFF, 0, 0x3D, 1), (0, 0, 0, 0, 0xFF)):
+        assert J1939.toJ1939Message(pgn, pri, sa, da, b'\x01\x02', size=4, how=how) == \
+            J1939.toJ1939Message(pgn.to_bytes(3, 'big'), bytes((pri,)), bytes((sa,)), bytes((da,)),
+                                    b'\x01\x02', size=4, how=bytes((how,)))
+    with pytest.raises(OverflowError):
+        J1939.toJ1939Message(0x1000000, 6, 0, 0, b'')
+    with pytest.raises(OverflowError):
+        J1939.toJ1939Message(0xF004, 256, 0, 0, b'')
@@ -0,0 +1,108 @@
+import random
+import pytest
+import RP1210
+from RP1210 import J1939
+
+np = pytest.importorskip("numpy")
+
+def random_frames(count, echo = False, seed = 1939):
+    rng = random.Random(seed)
+    frames = []
+    for i in range(count):
+        pgn = rng.choice((0xF004, 0xFECA, 0xEA00, 0x1FECA, 0x2F004, 0xEF00, rng.randrange(1 << 18)))
+        msg = J1939.toJ1939Message(pgn, rng.randrange(8), rng.randrange(256), rng.randrange(256),
+                                    bytes(rng.randrange(256) for _ in range(rng.randrange(20))),
+                                    how=rng.randrange(2))
+        prefix = rng.randrange(1 << 32).to_bytes(4, 'big')
+        if echo:
+            prefix += bytes((rng.randrange(2),))
+        frames.append(prefix + msg)
+    return frames
+
+def assert_matches(frames, batch, buffer, echo = False):
+    assert len(batch) == len(frames)
+    for frame, row in zip(frames, batch):
+        msg = J1939.J1939Message(frame, echo=echo)
+        assert row['timestamp'] == msg.timestamp
+        assert row['echo'] == msg.isEcho()
+        assert (row['pgn'], row['pri'], row['how'], row['sa'], row['da']) == (msg.pgn, msg.pri, msg.how, msg.sa, msg.da)
+        assert (row['dp'], row['res'], row['pf'], row['ps']) == (msg.dp, msg.res, msg.pf(), msg.ps())
+        start = int(row['data_offset'])
+        assert bytes(buffer[start:start + row['size']]) == msg.data
+
+@pytest.mark.parametrize("echo", [False, True])
+def test_decode_batch_matches_J1939Message(echo):
+    frames = random_frames(500, echo)
+    buffer = b''.join(frames)
+    offsets = np.cumsum([0] + [len(frame) for frame in frames])
+    assert_matches(frames, J1939.decode_batch(buffer, offsets, echo=echo), buffer, echo)
+
+def test_decode_batch_short_frames():
+    frames = [b'', b'\x00\x01', b'\x01\x02\x03\x04\xCA\xFE', b'\x00' * 10]
+    buffer = b''.join(frames)
+    offsets = [0, 0, 2, 8, 18]
+    assert_matches(frames, J1939.decode_batch(buffer, offsets), buffer)
+
+def test_decode_batch_arena():
+    frames = random_frames(10)
+    arena = RP1210.RxArena(16, 64)
+    for i, frame in enumerate(frames):
+        arena.buffer[arena.offsets[i]:arena.offsets[i] + len(frame)] = frame
+        arena.lengths[i] = len(frame)
+    arena.count = len(frames)
+    batch = J1939.decode_batch(arena.buffer, arena.offsets[:arena.count], arena.lengths[:arena.count])
+    assert_matches(frames, batch, arena.buffer)
+
+def test_decode_batch_empty_and_invalid():
+    assert len(J1939.decode_batch(b'', [0])) == 0
+    with pytest.raises(ValueError):
+        J1939.decode_batch(b'\x00' * 10, [0, 11])
+    with pytest.raises(ValueError):
+        J1939.decode_batch(b'\x00' * 10, [5, 2])
+
+def random_payloads(count, seed = 73):
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(count):
+        lamps = bytes((rng.randrange(256), 0x00))
+        payloads.append(lamps + bytes(rng.randrange(256) for _ in range(4 * rng.randrange(5))))
+    return payloads
+
+def test_decode_dtcs_batch_matches_DiagnosticMessage():
+    payloads = random_payloads(200) + [b'', b'\x40', b'\x10\xFF\x01\x02\x03'] # short/partial payloads
+    dtcs = J1939.decode_dtcs_batch(payloads)
+    expected = []
+    for i, payload in enumerate(payloads):
+        dm = J1939.DiagnosticMessage()
+        dm.data = payload # bytes passed to __init__ are parsed as RP1210_ReadMessage output
+        for dtc in dm:
+            expected.append((i, dtc.spn, dtc.fmi, dtc.oc, dtc.cm(), dm.mil(), dm.rsl(), dm.awl(), dm.pl()))
+    assert dtcs.tolist() == expected
+
+def test_decode_dtcs_batch_offsets():
+    payloads = random_payloads(20)
+    buffer = b'\x00' * 3 + b''.join(payloads)
+    offsets = np.cumsum([3] + [len(payload) for payload in payloads])
+    assert (J1939.decode_dtcs_batch(buffer, offsets) == J1939.decode_dtcs_batch(payloads)).all()
+    with pytest.raises(ValueError):
+        J1939.decode_dtcs_batch(b'\x00' * 4, [0, 5])
+
+def test_encode_dtcs_batch():
+    payloads = random_payloads(200) + [b'\x55\x00']
+    dtcs = J1939.decode_dtcs_batch(payloads)
+    # payloads without DTCs lose their lamps, so compare those separately
+    encoded = J1939.encode_dtcs_batch(dtcs, len(payloads))
+    for payload, result in zip(payloads, encoded):
+        if len(payload) > 2:
+            assert result == payload
+        else:
+            assert result == b'\x00\x00'
+    # matches DTC.to_bytes, and works with a dict of columns in any order
+    columns = {'source': [1, 0, 1], 'spn': [532, 0x7FFFF, 100], 'fmi': [4, 31, 0], 'oc': [7, 126, 1],
+                'awl': [1, 0, 1]}
+    encoded = J1939.encode_dtcs_batch(columns, reserved=0xFF)
+    assert encoded == [b'\x00\xFF' + J1939.DTC.to_bytes(0x7FFFF, 31, 126),
+                        b'\x04\xFF' + J1939.DTC.to_bytes(532, 4, 7) + J1939.DTC.to_bytes(100, 0, 1)]
+    assert J1939.encode_dtcs_batch({'source': [], 'spn': [], 'fmi': [], 'oc': []}) == []
+    with pytest.raises(ValueError):
+        J1939.encode_dtcs_batch(columns, num_payloads=1)
@@ -1,3 +1,4 @@
+import random
 import pytest
 from RP1210 import J1939
 from RP1210.J1939 import DTC, DiagnosticMessage, J1939Message, toJ1939Message
@@ -342,4 +343,11 @@ def test_diagnosticmessage_iterate():
         assert dm1[i].spn == i * 23
         assert dm1[i].fmi == i
         assert dm1[i].oc == 1 + i*3
-    
\ No newline at end of file
+    
+def test_DTC_to_bytes_matches_reference():
+    rng = random.Random(14)
+    for _ in range(1000):
+        spn, fmi, oc = rng.randrange(1 << 19), rng.randrange(32), rng.randrange(128)
+        assert DTC.to_bytes(spn, fmi, oc) == toDTC(spn, fmi, oc)
+    # non-int arguments take the generic path
+    assert DTC.to_bytes(b'\x05\xBE\xEF', 3.0, 4.0) == toDTC(0x5BEEF, 3, 4)
@@ -0,0 +1,94 @@
+from RP1210 import Network
+from RP1210.J1939 import J1939Message, generateNetMgmtName, toJ1939Message
+from RP1210.Network import CANNOT_CLAIM, CONFLICT, JOIN, LEAVE, NetworkTable
+
+def claim(sa, name, da = 0xFF) -> bytes:
+    return b'\x00' * 4 + toJ1939Message(Network.PGN_ADDRESS_CLAIMED, 6, sa, da, name)
+
+def make_name(identity, aac = 1, func = 0) -> bytes:
+    return generateNetMgmtName(aac, 0, 0, 0, func, 0, 0, 0x123, identity)
+
+def kinds(events) -> list[tuple]:
+    return [(event.kind, event.sa) for event in events]
+
+def test_claims_and_lookups():
+    received = []
+    table = NetworkTable(on_event=received.append)
+    engine, brakes = make_name(1, func=0), make_name(2, func=9)
+    assert kinds(table.feed(claim(0x00, engine), now=1.0)) == [(JOIN, 0x00)]
+    assert kinds(table.feed(claim(0x0B, brakes), now=1.0)) == [(JOIN, 0x0B)]
+    assert table.feed(claim(0x00, engine), now=2.0) == [] # repeated claims change nothing
+    assert table.feed(J1939Message(claim(0x0B, brakes)), now=2.0) == []
+    assert table.feed(b'\x00' * 4 + toJ1939Message(0xF004, 3, 0x00, 0xFF, bytes(8)), now=2.0) == []
+    assert len(table) == 2 and 0x00 in table and 0x03 not in table
+    assert table.name(0x00) == int.from_bytes(engine, 'little')
+    assert table.address(brakes) == 0x0B
+    assert table.address(int.from_bytes(brakes, 'little')) == 0x0B
+    assert table.fields(0x0B) == (1, 0, 0, 0, 9, 0, 0, 0x123, 2)
+    assert table.fields(0x03) is None
+    assert table.items() == {0x00: table.name(0x00), 0x0B: table.name(0x0B)}
+    assert table.lastSeen(0x00) == 2.0
+    assert kinds(received) == [(JOIN, 0x00), (JOIN, 0x0B)]
+    assert str(received[0]).startswith("join 0x00: NAME 0x")
+    assert table.claims == 4
+
+def test_move_conflict_and_cannot_claim():
+    table = NetworkTable()
+    low, high = make_name(1), make_name(2) # the lower NAME wins contention
+    table.feed(claim(0x80, high))
+    # an ECU moving to another address leaves the old one
+    events = table.feed(claim(0x81, high))
+    assert kinds(events) == [(LEAVE, 0x80), (JOIN, 0x81)] and events[1].other == 0x80
+    # the lower NAME takes the address away
+    events = table.feed(claim(0x81, low))
+    assert kinds(events) == [(CONFLICT, 0x81), (LEAVE, 0x81), (JOIN, 0x81)]
+    assert events[0].name == table.name(0x81) == int.from_bytes(low, 'little')
+    assert events[1].name == events[0].other == int.from_bytes(high, 'little')
+    assert table.address(high) is None
+    # a higher NAME can't take it back
+    events = table.feed(claim(0x81, high))
+    assert kinds(events) == [(CONFLICT, 0x81)] and events[0].name == int.from_bytes(low, 'little')
+    assert table.address(low) == 0x81
+    # the loser gives up
+    events = table.feed(claim(Network.NULL_ADDRESS, high))
+    assert kinds(events) == [(CANNOT_CLAIM, Network.NULL_ADDRESS)]
+    assert table.unclaimed() == {int.from_bytes(high, 'little')}
+    assert table.feed(claim(Network.NULL_ADDRESS, high)) == [] # reported once
+    events = table.feed(claim(0x82, high))
+    assert kinds(events) == [(JOIN, 0x82)] and table.unclaimed() == set()
+    # cannot claim from an ECU with an address: it's lost it
+    assert kinds(table.feed(claim(Network.NULL_ADDRESS, low))) == [(LEAVE, 0x81), (CANNOT_CLAIM, 0xFE)]
+    assert len(table) == 1
+
+def test_max_age():
+    table = NetworkTable(max_age=5.0, echo=True)
+    echoed = lambda frame: frame[:4] + b'\x00' + frame[4:]
+    table.feed(echoed(claim(0x00, make_name(1))), now=0.0)
+    table.feed(echoed(claim(0x03, make_name(2))), now=0.0)
+    table.feed(echoed(b'\x00' * 4 + toJ1939Message(0xF004, 3, 0x00, 0xFF, bytes(8))), now=4.0)
+    assert kinds(table.expire(now=4.5)) == []
+    assert table.lastSeen(0x00) == 4.0
+    assert kinds(table.expire(now=6.0)) == [(LEAVE, 0x03)]
+    assert len(table) == 1
+    assert kinds(table.expire(now=10.0)) == [(LEAVE, 0x00)]
+    table.feed(echoed(claim(0x00, make_name(1))), now=10.0)
+    table.clear()
+    assert len(table) == 0 and table.address(make_name(1)) is None
+
+def test_request_claims_and_mass_reclaim():
+    sent = []
+    table = NetworkTable()
+    table.requestClaims(sent.append)
+    request = J1939Message(b'\x00' * 4 + sent[0])
+    assert (request.pgn & 0x3FF00, request.sa, request.da) == (0xEA00, 0xFE, 0xFF)
+    assert request.data[:3] == b'\x00\xEE\x00'
+    # every ECU claims at once, several times, some swapping addresses
+    names = [make_name(i) for i in range(200)]
+    frames = [claim(sa, name) for _ in range(3) for sa, name in enumerate(names)]
+    events = table.feed_batch(frames)
+    assert kinds(events) == [(JOIN, sa) for sa in range(200)]
+    frames = [claim(199 - sa, name) for sa, name in enumerate(names)] # everyone moves
+    table.feed_batch(frames)
+    assert all(table.address(name) == 199 - sa for sa, name in enumerate(names))
+    assert all(table.name(199 - sa) == int.from_bytes(name, 'little') for sa, name in enumerate(names))
+    assert len(table) == 200
@@ -0,0 +1,81 @@
+import time
+import pytest
+import RP1210
+from RP1210 import J1939
+from RP1210.Capture import FLAG_TX, CaptureWriter, MappedCapture
+from RP1210.Replay import ReplayClient
+
+def frame(i):
+    return i.to_bytes(4, 'big') + J1939.toJ1939Message(0xF004, 6, 0x00, 0xFF, i.to_bytes(8, 'big'))
+
+def records(num_msgs, interval_ns):
+    return [(i * interval_ns, 0, frame(i)) for i in range(num_msgs)]
+
+def test_replay_as_fast_as_possible():
+    replay = ReplayClient(records(100, 10 ** 9), speed=0)
+    msgs = []
+    while not replay.isFinished():
+        msgs.append(replay.rx())
+    assert msgs == [frame(i) for i in range(100)]
+    assert replay.rx() == b''
+    stats = replay.stats()
+    assert stats.frames == 100 and stats.target_rate == 0.0
+
+def test_replay_timing():
+    # 20 frames, 5 ms apart = 95 ms at 1x
+    replay = ReplayClient(records(20, 5 * 10 ** 6))
+    start = time.perf_counter()
+    assert replay.rx() == frame(0)
+    assert replay.rx() == b'' # not due yet
+    msgs = list(replay)
+    elapsed = time.perf_counter() - start
+    assert msgs == [frame(i) for i in range(1, 20)]
+    assert 0.09 <= elapsed < 0.5
+    stats = replay.stats()
+    assert stats.target_rate == pytest.approx(200.0)
+    assert stats.max_lag < 0.05
+
+def test_replay_speed_and_batches():
+    replay = ReplayClient(records(40, 10 ** 7), speed=10.0) # 1 ms apart
+    replay.start()
+    time.sleep(0.02)
+    batch = replay.rx_batch()
+    assert 15 <= len(batch) <= 40
+    assert batch == [frame(i) for i in range(len(batch))]
+    assert len(replay.rx_batch(max_msgs=2, timeout=None)) in (1, 2)
+    arena = RP1210.RxArena(8)
+    total = len(batch) + 2
+    while not replay.isFinished():
+        total += len(replay.rx_many(arena, blocking=1))
+    assert total >= 40
+
+def test_replay_capture_file(tmp_path):
+    path = str(tmp_path / "test.rpcap")
+    with CaptureWriter(path) as writer:
+        for time_ns, flags, msg in records(10, 1000):
+            writer.write(msg, flags, time_ns)
+    assert list(ReplayClient(path, speed=0)) == [frame(i) for i in range(10)]
+    with MappedCapture(path, persist_index=False) as capture:
+        result = capture.query(start_ns=5000)
+        assert list(ReplayClient(result, speed=0)) == [frame(i) for i in range(5, 10)]
+        del result
+
+def test_replay_tx():
+    replay = ReplayClient([], speed=0, clientID=3)
+    assert replay.getClientID() == 3
+    assert replay.tx(b'\x01\x02\x03', 2) == 0
+    assert replay.sent == [b'\x01\x02']
+    assert replay.command(3) == 0
+    assert replay.isFinished()
+
+def test_replay_clock_and_tx_records():
+    recorded = [(0, 0, frame(0)), (1000, FLAG_TX, frame(100)), (2 * 10 ** 6, 0, frame(1)),
+                (3 * 10 ** 6, FLAG_TX, frame(101))]
+    replay = ReplayClient(recorded)
+    assert not replay.isFinished()
+    time.sleep(0.02)
+    assert replay.stats().elapsed == 0.0 # isFinished() doesn't start the clock
+    assert replay.rx() == frame(0)
+    assert replay.rx() == b'' # due 2 ms after the first read, not after isFinished()
+    assert replay.rx(blocking=1) == frame(1)
+    assert replay.isFinished() and replay.stats().frames == 2 and replay.sent == []
@@ -0,0 +1,93 @@
+import pytest
+import RP1210
+from RP1210 import Router
+from RP1210.J1939 import J1939Message
+from RP1210.Replay import ReplayClient
+from utilities import frame
+
+def collector():
+    msgs = []
+    return msgs, msgs.append
+
+def test_routingPGN():
+    assert Router.routingPGN(0xEF3D) == 0xEF00
+    assert Router.routingPGN(0x1EA17) == 0x1EA00
+    assert Router.routingPGN(0xF004) == 0xF004
+    assert Router.routingPGN(0x3FEF1) == 0x3FEF1
+
+def test_subscriptions():
+    router = Router.Router()
+    speed, on_speed = collector()
+    dm1_engine, on_dm1_engine = collector()
+    prop, on_prop = collector()
+    mine, on_mine = collector()
+    everything, on_everything = collector()
+    subs = [router.subscribe(on_speed, pgn=0xF004),
+            router.subscribe(on_dm1_engine, pgn=0xFECA, sa=0x00),
+            router.subscribe(on_prop, pgn_range=(0xFF00, 0xFFFF)),
+            router.subscribe(on_mine, da=0xF9),
+            router.subscribe(on_everything)]
+    frames = [frame(0xF004, 0x00), frame(0xFECA, 0x00), frame(0xFECA, 0x03), frame(0xFF12, 0x17),
+                frame(0xEF00, 0x17, da=0xF9), frame(0xEF00, 0x17, da=0x3D), frame(0xF004, 0x01)]
+    assert router.dispatch_batch(frames) == 2 + 2 + 1 + 2 + 2 + 1 + 2
+    assert [msg.sa for msg in speed] == [0x00, 0x01]
+    assert len(dm1_engine) == 1 and dm1_engine[0].pgn == 0xFECA
+    assert [msg.pgn for msg in prop] == [0xFF12]
+    assert [msg.pgn for msg in mine] == [0xEFF9]
+    assert len(everything) == len(frames)
+    assert [sub.count for sub in subs] == [2, 1, 1, 1, 7]
+    assert router.frames == 7 and router.unmatched == 0
+    # every handler of a frame gets the same (single) decoded message
+    assert speed[0] is everything[0]
+    router.unsubscribe(subs[4])
+    assert router.dispatch(frame(0xFEF1, 0x00)) == 0
+    assert router.unmatched == 1
+    assert router.handlers(0xF004, 0x00) == [on_speed]
+    with pytest.raises(ValueError):
+        router.unsubscribe(subs[4])
+
+def test_pdu1_pgn_ignores_ps():
+    router = Router.Router()
+    msgs, handler = collector()
+    router.subscribe(handler, pgn=0xEA00)
+    router.subscribe(handler, pgn=0xEA00, da=0x00)
+    router.dispatch(frame(0xEA00, 0xF9, da=0x00, data=b'\xCA\xFE\x00'))
+    router.dispatch(frame(0xEA00, 0xF9, da=0xFF, data=b'\xCA\xFE\x00'))
+    assert [msg.da for msg in msgs] == [0x00, 0x00, 0xFF]
+
+def test_dispatch_sources():
+    router = Router.Router()
+    msgs, handler = collector()
+    router.subscribe(handler, pgn=0xF004)
+    # J1939Message, memoryview (RxArena) and echo frames
+    router.dispatch(J1939Message(frame(0xF004, 0x00)))
+    arena = RP1210.RxArena(2)
+    raw = frame(0xF004, 0x01)
+    arena.buffer[0:len(raw)] = raw
+    arena.lengths[0] = len(raw)
+    arena.count = 1
+    router.dispatch_batch(arena)
+    echo_router = Router.Router(echo=True)
+    echo_router.subscribe(handler, pgn=0xF004)
+    echo_router.dispatch(raw[:4] + b'\x01' + raw[4:])
+    assert [msg.sa for msg in msgs] == [0x00, 0x01, 0x01]
+    assert msgs[2].isEcho()
+    # poll() reads from anything with rx_batch()
+    replay = ReplayClient([(i, 0, frame(0xF004, i)) for i in range(5)], speed=0)
+    assert router.poll(replay) == 5
+
+def test_index_varied_traffic():
+    router = Router.Router()
+    msgs, handler = collector()
+    subs = [router.subscribe(handler, sa=0x00), router.subscribe(handler, pgn_range=(0xFF08, 0xFF0B), da=0xFF),
+            router.subscribe(handler, pgn=0xEA00, da=0xF9)]
+    # every (PGN, SA) here is new, and none of it is remembered: the index is built by subscribe()
+    for pgn in range(0xFF00, 0xFF10):
+        router.dispatch(frame(pgn, 0x00))
+        router.dispatch(frame(pgn, 0x01))
+    assert [sub.count for sub in subs] == [16, 8, 0]
+    assert router.handlers(0xEA00, 0x03, da=0xF9) == [handler]
+    assert router.handlers(0xEA00, 0x00, da=0xF9) == [handler] * 2
+    assert router.handlers(0xEA00, 0x03, da=0x3D) == [] and router.handlers(0xEA00, 0x03, da=0x3D) == []
+    router.unsubscribe(subs[0])
+    assert router.handlers(0xFF09, 0x00) == [handler] and router.handlers(0xFF00, 0x00) == []
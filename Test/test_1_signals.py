@@ -0,0 +1,88 @@
+import math
+import random
+import pytest
+import RP1210
+from RP1210.J1939 import J1939Message
+from RP1210.Signals import Signal, SignalDecoder, parsePosition, VALID, ERROR, NOT_AVAILABLE
+from utilities import frame
+
+def pack(frames) -> tuple:
+    offsets = [0]
+    for msg in frames:
+        offsets.append(offsets[-1] + len(msg))
+    return b''.join(frames), offsets
+
+EEC1 = [Signal("EngineTorqueMode", position="1.1", length=4, spn=899),
+        Signal("DriversDemandTorque", position="2", length=8, offset=-125, unit="%", spn=512),
+        Signal("EngineSpeed", position="4-5", length=16, scale=0.125, unit="rpm", spn=190),
+        Signal("EngineStarterMode", position="7.1", length=4, spn=1675)]
+
+def test_positions():
+    assert parsePosition("1") == 0 and parsePosition("4-5") == 24
+    assert parsePosition("1.5") == 4 and parsePosition("2.1-2.4") == 8
+    for bad in ("0", "1.9", "x"):
+        with pytest.raises(ValueError):
+            parsePosition(bad)
+    assert Signal("a", start=7, length=12, little_endian=False).byteSpan() == (0, 1)
+    assert Signal("a", start=4, length=12).byteSpan() == (0, 1)
+
+def test_decode_j1939():
+    decoder = RP1210.Signals.SignalDecoder({0xF004: EEC1})
+    data = bytes((0x03, 0x7D + 20, 0xFF, 0x60, 0x2E, 0xFF, 0xF0, 0xFF))
+    assert decoder.decode(frame(0xF004, data=data)) == {"EngineTorqueMode": 3, "DriversDemandTorque": 20,
+                                                    "EngineSpeed": 1484.0, "EngineStarterMode": 0}
+    assert decoder.decode(J1939Message(frame(0xF004, data=data)))["EngineSpeed"] == 1484.0
+    assert decoder.decodeData(0xF004, data) == decoder.decode(frame(0xF004, data=data))
+    assert decoder.decode(frame(0xFEF1, data=data)) is None and 0xFEF1 not in decoder
+    # not available / error values, and short data (padded with 0xFF)
+    special = bytes((0x0E, 0xFE, 0xFF, 0xFF, 0xFF, 0xFF))
+    assert decoder.decode(frame(0xF004, data=special)) == dict.fromkeys(decoder.decode(frame(0xF004, data=data)))
+    assert decoder.statuses(0xF004, special) == {"EngineTorqueMode": ERROR, "DriversDemandTorque": ERROR,
+                                                "EngineSpeed": NOT_AVAILABLE, "EngineStarterMode": NOT_AVAILABLE}
+    assert decoder.statuses(0xF004, data)["EngineSpeed"] == VALID
+
+def test_byte_orders_and_signs():
+    decoder = SignalDecoder()
+    decoder.addSignals(0xEF00, [Signal("Motorola", start=7, length=12, little_endian=False),
+                                Signal("Signed", start=16, length=8, signed=True, special=False),
+                                Signal("Wide", start=31, length=32, little_endian=False, special=False)])
+    decoder.addSignals(0xEF00, Signal("Flag", start=23, length=1))
+    with pytest.raises(ValueError):
+        decoder.addSignals(0xEF00, Signal("Flag", start=0, length=1))
+    data = bytes((0xAB, 0xC0, 0xFE, 0x12, 0x34, 0x56, 0x78))
+    values = decoder.decode(frame(0xEF00, data=data, da=0x21)) # PDU1: PS is the destination
+    assert values == {"Motorola": 0xABC, "Signed": -2, "Wide": 0x12345678, "Flag": 1}
+    assert [signal.name for signal in decoder.signals(0xEF21)] == ["Motorola", "Signed", "Wide", "Flag"]
+    with pytest.raises(ValueError):
+        SignalDecoder({0xFEF1: [Signal("Long", start=4, length=64)]}) # 9 bytes
+
+def test_batch_matches_single():
+    np = pytest.importorskip("numpy")
+    rng = random.Random(24)
+    decoder = SignalDecoder({
+        0xF004: EEC1,
+        0xEF00: [Signal("Motorola", start=7, length=12, little_endian=False, scale=0.5),
+                Signal("Signed", start=16, length=16, signed=True, special=False),
+                Signal("Past8", start=60, length=16, scale=2, offset=-1), # needs bytes 7 - 9
+                Signal("Whole", start=0, length=64, special=False)],
+    })
+    frames = []
+    for _ in range(500):
+        pgn = rng.choice((0xF004, 0xEF00, 0xFEF1))
+        data = bytes(rng.choice((rng.randrange(256), 0xFE, 0xFF)) for _ in range(rng.choice((3, 8, 8, 12))))
+        frames.append(frame(pgn, data=data, sa=rng.randrange(4), da=rng.randrange(256)))
+    columns = decoder.decode_batch(*pack(frames))
+    assert set(columns) == {0xF004, 0xEF00}
+    assert len(columns[0xF004]) + len(columns[0xEF00]) == sum(1 for msg in frames if msg[5] != 0xFE)
+    for pgn, decoded in columns.items():
+        for i, row in enumerate(decoded.rows):
+            expected = decoder.decode(frames[row])
+            assert decoded.sa[i] == frames[row][8]
+            for name, value in expected.items():
+                if value is None:
+                    assert math.isnan(decoded[name][i]) and decoded.status(name)[i] != VALID
+                else:
+                    assert decoded[name][i] == pytest.approx(value, rel=1e-12)
+    only = decoder.decode_batch(*pack(frames), pgns=[0xEF00])
+    assert list(only) == [0xEF00]
+    assert np.array_equal(only[0xEF00].rows, columns[0xEF00].rows)
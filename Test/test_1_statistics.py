@@ -0,0 +1,133 @@
+import random
+import pytest
+import RP1210
+from RP1210 import Statistics
+from RP1210.J1939 import J1939Message
+from RP1210.Statistics import BusStatistics
+from RP1210.VirtualDriver import VirtualBus, VirtualDLL
+from utilities import dummy_client, frame
+
+def traffic(seconds = 2.0, start = 0) -> list[bytes]:
+    """Engine speed from 0x00 every 10 ms, vehicle speed from 0x00 and 0x17 every 100 ms (µs ticks)."""
+    frames = []
+    for i in range(int(seconds * 100)):
+        ticks = start + i * 10000
+        frames.append(frame(0xF004, 0x00, timestamp=ticks))
+        if i % 10 == 0:
+            frames.append(frame(0xFEF1, 0x00, timestamp=ticks + 1000))
+            frames.append(frame(0xFEF1, 0x17, data=b'\x00' * 5, timestamp=ticks + 2000))
+    return frames
+
+def pack(frames) -> tuple:
+    offsets = [0]
+    for msg in frames:
+        offsets.append(offsets[-1] + len(msg))
+    return b''.join(frames), offsets
+
+def test_frame_bits_and_baud():
+    assert Statistics.frameBits(8) == 67 + 64 + 7
+    assert Statistics.frameBits(0) == 67 + 3
+    assert Statistics.frameBits(20) == 4 * Statistics.frameBits(8) # TP.CM + 3 TP.DT
+    assert Statistics.parseBaud(str(b'250000\x00\x00')) == 250000
+    assert Statistics.parseBaud("") == 0
+
+def test_rates_and_load():
+    stats = RP1210.Statistics.BusStatistics(baud=250000, window=1.0)
+    stats.feed_batch(traffic(2.0))
+    snap = stats.snapshot()
+    assert snap.span == pytest.approx(0.99) # the last full bucket, plus 90 ms of this one
+    assert snap.pgnRates() == {0xF004: pytest.approx(100, abs=2), 0xFEF1: pytest.approx(20, abs=2)}
+    assert snap.sourceRates() == {0x00: pytest.approx(110, abs=2), 0x17: pytest.approx(10, abs=2)}
+    rate, interval, jitter = snap.streams[(0xF004, 0x00)]
+    assert interval == pytest.approx(0.01) and jitter == pytest.approx(0.0, abs=1e-6)
+    bits = 110 * Statistics.frameBits(8) + 10 * Statistics.frameBits(5)
+    assert snap.load == pytest.approx(bits / 250000, rel=0.02)
+    assert stats.total_frames == 240
+    assert snap.traffic()[(0xFEF1 << 8) | 0x17] == pytest.approx(10, abs=1)
+
+def test_window_slides():
+    stats = BusStatistics(window=1.0, buckets=10)
+    stats.feed_batch(traffic(1.0))
+    assert (0xFEF1, 0x17) in stats.snapshot().streams
+    # only engine speed for the next second: vehicle speed falls out of the window
+    stats.feed_batch(frame(0xF004, 0x00, timestamp=1000000 + i * 10000) for i in range(100))
+    snap = stats.snapshot()
+    assert list(snap.streams) == [(0xF004, 0x00)]
+    assert snap.frames == pytest.approx(100, abs=1)
+
+def test_jitter_and_pdu1():
+    stats = BusStatistics(timestamp_weight=1000.0) # ms ticks
+    for ticks in (0, 90, 200, 290, 400): # 90 / 110 ms apart, then 50 ms
+        stats.feed(frame(0xEF00, 0x03, da=0x00, timestamp=ticks))
+    stats.feed(frame(0xEF00, 0x03, da=0x21, timestamp=450)) # same PDU1 PGN, other destination
+    rate, interval, jitter = stats.snapshot().streams[(0xEF00, 0x03)]
+    assert interval == pytest.approx(0.09)
+    assert jitter == pytest.approx(480 ** 0.5 / 1000)
+    # J1939Messages work too, and a single frame has no interval yet
+    stats.feed(J1939Message(frame(0xFECA, 0x03, timestamp=460)))
+    assert stats.snapshot().streams[(0xFECA, 0x03)][1:] == (None, None)
+
+def test_timestamp_wraparound():
+    stats = BusStatistics()
+    stats.feed_batch(traffic(1.0, start=0xFFFFFFFF - 500000))
+    snap = stats.snapshot()
+    rate, interval, jitter = snap.streams[(0xF004, 0x00)]
+    assert rate == pytest.approx(100, abs=2) and interval == pytest.approx(0.01)
+
+def test_stream_overflow():
+    stats = BusStatistics(max_streams=4)
+    stats.feed_batch(frame(0xFF00 + i, 0x80, timestamp=i * 1000) for i in range(10))
+    snap = stats.snapshot()
+    assert len(snap.streams) == 5 # 4 streams, and the rest together
+    assert snap.streams[(-1, -1)][0] * snap.span == pytest.approx(6)
+
+def test_feed_buffer_matches_feed():
+    pytest.importorskip("numpy")
+    frames = traffic(3.0)
+    one, batched = BusStatistics(), BusStatistics()
+    one.feed_batch(frames)
+    for i in range(0, len(frames), 50):
+        batched.feed_buffer(*pack(frames[i:i + 50]))
+    expected, snap = one.snapshot(), batched.snapshot()
+    assert (snap.frames, snap.span, snap.load) == (expected.frames, expected.span, pytest.approx(expected.load))
+    for stream, (rate, interval, jitter) in expected.streams.items():
+        assert snap.streams[stream] == pytest.approx((rate, interval, jitter), abs=1e-6)
+    assert batched.total_frames == len(frames)
+
+def test_feed_buffer_overflow_matches_feed():
+    pytest.importorskip("numpy")
+    rng = random.Random(22)
+    frames = []
+    ticks = 0
+    for _ in range(2000):
+        ticks += rng.randrange(100, 3000)
+        frames.append(frame(rng.choice((0xF004, 0xFEF1, 0xFECA, 0xFEEE)), rng.randrange(3), timestamp=ticks))
+    one, batched = BusStatistics(max_streams=2), BusStatistics(max_streams=2)
+    one.feed_batch(frames)
+    for i in range(0, len(frames), 37):
+        batched.feed_buffer(*pack(frames[i:i + 37]))
+    expected, snap = one.snapshot(), batched.snapshot()
+    assert list(snap.streams) == list(expected.streams) and len(snap.streams) == 3
+    for stream, (rate, interval, jitter) in expected.streams.items():
+        if stream == (-1, -1):
+            assert interval is None and jitter is None
+            assert snap.streams[stream] == (pytest.approx(rate), None, None)
+        else:
+            assert snap.streams[stream] == pytest.approx((rate, interval, jitter), abs=1e-6)
+
+def test_virtual_bus_arena():
+    pytest.importorskip("numpy")
+    bus = VirtualBus(baud=250000)
+    client = dummy_client(VirtualDLL(bus))
+    client.setAllFiltersToPass()
+    try:
+        for i in range(40):
+            bus.injectJ1939(0xF004, 0x00, b'\x00' * 8)
+            bus.injectJ1939(0xFEF1, 0x17, b'\x00' * 8)
+        stats = BusStatistics(baud=Statistics.parseBaud(client.getBaud()))
+        arena = client.rx_many(RP1210.RxArena(max_msgs=128))
+        stats.feed_buffer(arena.buffer, arena.offsets[:arena.count], arena.lengths[:arena.count])
+    finally:
+        client.disconnect()
+    assert stats.total_frames == 80
+    assert stats.snapshot().sourceRates().keys() == {0x00, 0x17}
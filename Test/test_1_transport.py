@@ -0,0 +1,266 @@
+import random
+import time
+import pytest
+from RP1210 import Transport
+from RP1210.J1939 import J1939Message
+from RP1210.Transport import TPReassembler, TPTransmitter
+from utilities import frame
+
+def cm(sa, da, control, pgn) -> bytes:
+    return frame(Transport.TP_CM, sa, da, bytes(control) + pgn.to_bytes(3, 'little'))
+
+def bam(sa, pgn, data) -> list[bytes]:
+    """BAM announcement followed by its data packets."""
+    packets = (len(data) + 6) // 7
+    frames = [cm(sa, 0xFF, (Transport.CM_BAM, len(data) & 0xFF, len(data) >> 8, packets, 0xFF), pgn)]
+    for seq in range(1, packets + 1):
+        chunk = data[(seq - 1) * 7:seq * 7]
+        frames.append(frame(Transport.TP_DT, sa, 0xFF, bytes((seq,)) + chunk + b'\xFF' * (7 - len(chunk)),
+                            timestamp=seq))
+    return frames
+
+def dt(sa, da, seq, data) -> bytes:
+    chunk = data[(seq - 1) * 7:seq * 7]
+    return frame(Transport.TP_DT, sa, da, bytes((seq,)) + chunk + b'\xFF' * (7 - len(chunk)))
+
+def test_bam_with_passthrough():
+    tp = TPReassembler()
+    data = bytes(range(20))
+    frames = bam(0x00, 0xFECA, data)
+    frames.insert(2, frame(0xF004, 0x00, 0xFF, b'\x11' * 8, pri=3))
+    msgs = list(tp.messages(frames, now=0.0))
+    assert [msg.pgn for msg in msgs] == [0xF004, 0xFECA]
+    assert msgs[1].data == data and msgs[1].sa == 0x00 and msgs[1].da == 0xFF
+    assert msgs[1].timestamp == 3
+    assert tp.completed == 1 and tp.numSessions() == 0 and tp.bufferedBytes() == 0
+
+def test_many_concurrent_sessions():
+    rng = random.Random(15)
+    tp = TPReassembler(max_sessions=1000)
+    expected = {}
+    streams = []
+    for sa in range(250):
+        data = rng.randbytes(rng.randrange(9, 200))
+        expected[(sa, 0xFF)] = data
+        streams.append(bam(sa, 0xFECA, data))
+    for sa in range(250): # RTS/CTS sessions between other nodes, listened in on
+        data = rng.randbytes(rng.randrange(9, 200))
+        packets = (len(data) + 6) // 7
+        expected[(sa, 0x3D)] = data
+        streams.append([cm(sa, 0x3D, (Transport.CM_RTS, len(data) & 0xFF, len(data) >> 8, packets, 0xFF), 0xEF00)]
+                        + [dt(sa, 0x3D, seq, data) for seq in range(1, packets + 1)])
+    received = {}
+    while streams: # interleave every session's packets
+        stream = rng.choice(streams)
+        msg = tp.feed(stream.pop(0), now=0.0)
+        if msg is not None:
+            received[(msg.sa, msg.da)] = msg.data
+        if not stream:
+            streams.remove(stream)
+    assert received == expected
+    assert tp.completed == 500 and tp.numSessions() == 0
+
+def test_rts_cts_responder():
+    sent = []
+    tp = TPReassembler(address=0xF9, send=sent.append, packets_per_cts=4)
+    data = bytes(range(60)) # 9 packets
+    assert tp.feed(cm(0x00, 0xF9, (Transport.CM_RTS, 60, 0, 9, 0xFF), 0xEF00), now=0.0) is None
+    assert J1939Message(b'\x00' * 4 + sent[-1]).data == bytes((Transport.CM_CTS, 4, 1, 0xFF, 0xFF, 0x00, 0xEF, 0x00))
+    for seq in (1, 2, 4): # packet 3 is lost
+        tp.feed(dt(0x00, 0xF9, seq, data), now=0.1)
+    cts = J1939Message(b'\x00' * 4 + sent[-1])
+    assert (cts.sa, cts.da) == (0xF9, 0x00)
+    assert cts.data[:3] == bytes((Transport.CM_CTS, 4, 3)) # re-requests from the missing packet
+    for seq in range(3, 7):
+        tp.feed(dt(0x00, 0xF9, seq, data), now=0.2)
+    assert J1939Message(b'\x00' * 4 + sent[-1]).data[:3] == bytes((Transport.CM_CTS, 3, 7))
+    tp.feed(dt(0x00, 0xF9, 7, data), now=0.3)
+    tp.feed(dt(0x00, 0xF9, 8, data), now=0.3)
+    msg = tp.feed(dt(0x00, 0xF9, 9, data), now=0.3)
+    assert msg.data == data and msg.pgn == 0xEFF9 and msg.da == 0xF9
+    assert J1939Message(b'\x00' * 4 + sent[-1]).data == bytes((Transport.CM_EOM_ACK, 60, 0, 9, 0xFF, 0x00, 0xEF, 0x00))
+
+def test_timeouts():
+    sent = []
+    tp = TPReassembler(address=0xF9, send=sent.append)
+    data = bytes(30)
+    for f in bam(0x00, 0xFECA, data)[:2]:
+        tp.feed(f, now=0.0)
+    tp.feed(cm(0x01, 0xF9, (Transport.CM_RTS, 30, 0, 5, 0xFF), 0xEF00), now=0.0)
+    assert tp.numSessions() == 2
+    assert tp.expire(now=Transport.T1 + 0.01) == 1 # BAM; the RTS session waits cts_timeout for data
+    assert tp.expire(now=Transport.T2 + 0.01) == 1
+    assert J1939Message(b'\x00' * 4 + sent[-1]).data[:2] == bytes((Transport.CM_ABORT, Transport.ABORT_TIMEOUT))
+    assert tp.timed_out == 2 and tp.numSessions() == 0
+    # packets keep a session alive
+    frames = bam(0x02, 0xFECA, data)
+    for i, f in enumerate(frames):
+        msg = tp.feed(f, now=i * 0.5)
+    assert msg.data == data
+
+def test_limits():
+    sent = []
+    tp = TPReassembler(address=0xF9, send=sent.append, max_sessions=2, max_total_bytes=100,
+                        max_message_size=500)
+    tp.feed(cm(0x00, 0xF9, (Transport.CM_RTS, 0xF9, 0x06, 255, 0xFF), 0xEF00), now=0.0) # 1785 bytes
+    assert J1939Message(b'\x00' * 4 + sent[-1]).data[:2] == bytes((Transport.CM_ABORT, Transport.ABORT_TOO_LARGE))
+    tp.feed(bam(0x01, 0xFECA, bytes(70))[0], now=0.0)
+    tp.feed(bam(0x02, 0xFECA, bytes(70))[0], now=0.0) # over max_total_bytes
+    tp.feed(bam(0x03, 0xFECA, bytes(20))[0], now=0.0)
+    tp.feed(cm(0x04, 0xF9, (Transport.CM_RTS, 20, 0, 3, 0xFF), 0xEF00), now=0.0) # over max_sessions
+    assert J1939Message(b'\x00' * 4 + sent[-1]).data[:2] == bytes((Transport.CM_ABORT, Transport.ABORT_BUSY))
+    assert tp.rejected == 3 and tp.numSessions() == 2 and tp.bufferedBytes() == 91
+    # invalid size/packet counts are rejected too
+    tp.clear()
+    tp.feed(cm(0x05, 0xFF, (Transport.CM_BAM, 100, 0, 2, 0xFF), 0xFECA), now=0.0)
+    assert tp.rejected == 4 and tp.numSessions() == 0
+
+def test_abort_and_replace():
+    tp = TPReassembler()
+    data = bytes(range(30))
+    rts = cm(0x00, 0x3D, (Transport.CM_RTS, 30, 0, 5, 0xFF), 0xEF00)
+    tp.feed(rts, now=0.0)
+    tp.feed(dt(0x00, 0x3D, 1, data), now=0.0)
+    # the receiver aborts
+    tp.feed(cm(0x3D, 0x00, (Transport.CM_ABORT, Transport.ABORT_RESOURCES, 0xFF, 0xFF, 0xFF), 0xEF00), now=0.0)
+    assert tp.aborted == 1 and tp.numSessions() == 0
+    # a new RTS from the same sender replaces the session in progress
+    tp.feed(rts, now=0.0)
+    tp.feed(dt(0x00, 0x3D, 1, bytes(30)), now=0.0)
+    tp.feed(rts, now=0.0)
+    for seq in range(1, 6):
+        msg = tp.feed(dt(0x00, 0x3D, seq, data), now=0.0)
+    assert msg.data == data and tp.aborted == 2
+
+def test_echo_and_messages():
+    tp = TPReassembler(echo=True)
+    data = bytes(range(10))
+    frames = [f[:4] + b'\x00' + f[4:] for f in bam(0x17, 0xFEE5, data)]
+    msgs = list(tp.messages(frames, now=0.0))
+    assert len(msgs) == 1 and msgs[0].data == data
+    # J1939Message input
+    tp = TPReassembler()
+    msgs = [J1939Message(f) for f in bam(0x17, 0xFEE5, data)] + [J1939Message(frame(0xF004, 0, 0xFF, bytes(8)))]
+    out = list(tp.messages(msgs, now=0.0))
+    assert [msg.pgn for msg in out] == [0xFEE5, 0xF004]
+    assert Transport.isTransportPGN(0xECFF) and Transport.isTransportPGN(0xEB00)
+    assert not Transport.isTransportPGN(0x1EC00)
+
+def message(pgn, sa, da, data) -> J1939Message:
+    return J1939Message(pgn=pgn, sa=sa, da=da, data=data, size=len(data))
+
+def test_transmit_bam():
+    sent = []
+    tx = TPTransmitter(sent.append, bam_interval=0.05)
+    data = bytes(range(20))
+    session = tx.transmit(message(0xFECA, 0x17, 0xFF, data), now=0.0)
+    assert session.bam and session.packets == 3 and len(sent) == 1
+    assert tx.poll(now=0.049) == pytest.approx(0.05)
+    assert len(sent) == 1
+    tx.poll(now=0.05)
+    assert len(sent) == 2
+    assert tx.poll(now=0.1) == pytest.approx(0.15)
+    assert tx.poll(now=0.16) is None
+    assert len(sent) == 4 and session.succeeded() and tx.isIdle()
+    assert session.elapsed() == pytest.approx(0.16)
+    rx = TPReassembler()
+    msgs = [rx.feed(b'\x00' * 4 + msg, now=0.0) for msg in sent]
+    assert msgs[-1].data == data and msgs[-1].pgn == 0xFECA and msgs[-1].sa == 0x17
+    # single frames are sent as-is; oversized messages are refused
+    assert tx.transmit(message(0xF004, 0x00, 0xFF, bytes(8))) is None
+    assert len(sent) == 5
+    with pytest.raises(ValueError):
+        tx.transmit(message(0xFECA, 0x00, 0xFF, bytes(1786)))
+
+def test_transmit_bam_late_poll():
+    sent = []
+    tx = TPTransmitter(sent.append, bam_interval=0.05)
+    session = tx.transmit(message(0xFECA, 0x17, 0xFF, bytes(40)), now=0.0)
+    assert session.packets == 6
+    # polled late: one packet per call, never closer together than bam_interval
+    assert tx.poll(now=0.30) == pytest.approx(0.35)
+    assert len(sent) == 2 and session.state == Transport.SESSION_SENDING
+    assert tx.poll(now=0.31) == pytest.approx(0.35) and len(sent) == 2
+    for i, now in enumerate((0.40, 0.45, 0.60, 0.70), 3):
+        tx.poll(now=now)
+        assert len(sent) == i
+    assert session.state == Transport.SESSION_SENDING
+    tx.poll(now=0.75)
+    assert len(sent) == 7 and session.succeeded()
+
+def test_transmit_bam_pacing():
+    times = []
+    tx = TPTransmitter(lambda msg: times.append(time.perf_counter()), bam_interval=0.005)
+    tx.transmit(message(0xFECA, 0x17, 0xFF, bytes(70)))
+    assert tx.run(timeout=2)
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert len(gaps) == 10
+    assert all(gap >= 0.004 for gap in gaps)
+    assert (times[-1] - times[0]) == pytest.approx(0.05, abs=0.01)
+    assert tx.throughput() > 0
+
+def connect_pair(tx_address, rx_address, **tx_kwargs):
+    """A TPTransmitter and a responding TPReassembler, connected through message queues."""
+    to_rx, to_tx = [], []
+    tx = TPTransmitter(lambda msg: to_rx.append(b'\x00' * 4 + msg), **tx_kwargs)
+    rx = TPReassembler(address=rx_address, send=lambda msg: to_tx.append(b'\x00' * 4 + msg))
+    def pump(now = 0.0, drop = ()):
+        received = []
+        while to_rx or to_tx:
+            while to_rx:
+                frame = to_rx.pop(0)
+                if frame[10:11] in drop and J1939Message(frame).pgn & 0xFF00 == Transport.TP_DT:
+                    drop = tuple(d for d in drop if d != frame[10:11]) # lose each packet once
+                    continue
+                msg = rx.feed(frame, now)
+                if msg is not None:
+                    received.append(msg)
+            while to_tx:
+                tx.feed(to_tx.pop(0), now)
+        return received
+    return tx, rx, pump
+
+def test_transmit_rts_cts():
+    tx, rx, pump = connect_pair(0xF9, 0x3D)
+    rx.packets_per_cts = 4
+    data = bytes(range(100))
+    session = tx.transmit(message(0xEF00, 0xF9, 0x3D, data), now=0.0)
+    assert not session.bam
+    received = pump(drop=(b'\x06',)) # packet 6 is lost and has to be re-requested
+    assert [msg.data for msg in received] == [data]
+    assert received[0].pgn == 0xEF3D and received[0].sa == 0xF9
+    # the CTS after the second window asks for 6 onwards, so 6-8 are sent twice
+    assert session.succeeded() and session.packets_sent == session.packets + 3
+    assert tx.completed == 1 and tx.bytes_sent == 100 and tx.isIdle()
+
+def test_transmit_concurrent_sessions():
+    tx, rx, pump = connect_pair(0xF9, (0x00, 0x01, 0x02), max_sessions=2)
+    sessions = [tx.transmit(message(0xEF00, 0xF9, da, bytes((da,)) * 30), now=0.0)
+                for da in (0x00, 0x01, 0x02)]
+    bam = tx.transmit(message(0xFECA, 0xF9, 0xFF, bytes(30)), now=0.0)
+    assert [s.state for s in sessions] == [Transport.SESSION_WAITING] * 2 + [Transport.SESSION_QUEUED]
+    assert bam.state == Transport.SESSION_SENDING
+    received = pump()
+    received += pump()
+    assert sorted(msg.da for msg in received) == [0x00, 0x01, 0x02]
+    assert all(s.succeeded() for s in sessions)
+    for now in (1.0, 1.1, 1.2, 1.3, 1.4): # one BAM packet per poll
+        tx.poll(now=now)
+    assert bam.succeeded() and tx.isIdle()
+
+def test_transmit_timeout_hold_and_abort():
+    sent = []
+    tx = TPTransmitter(sent.append)
+    session = tx.transmit(message(0xEF00, 0xF9, 0x3D, bytes(20)), now=0.0)
+    # receiver holds the session open (CTS for 0 packets), extending the deadline to T4
+    tx.feed(cm(0x3D, 0xF9, (Transport.CM_CTS, 0, 0xFF, 0xFF, 0xFF), 0xEF00), now=1.0)
+    assert tx.poll(now=1.5) == pytest.approx(1.0 + Transport.T4)
+    tx.poll(now=1.0 + Transport.T4)
+    assert session.state == Transport.SESSION_TIMED_OUT and session.abort_reason == Transport.ABORT_TIMEOUT
+    assert J1939Message(b'\x00' * 4 + sent[-1]).data[:2] == bytes((Transport.CM_ABORT, Transport.ABORT_TIMEOUT))
+    # receiver aborts
+    session = tx.transmit(message(0xEF00, 0xF9, 0x3D, bytes(20)), now=0.0)
+    assert tx.feed(cm(0x3D, 0x00, (Transport.CM_ABORT, 1, 0xFF, 0xFF, 0xFF), 0xEF00), now=0.0) is None
+    assert tx.feed(cm(0x3D, 0xF9, (Transport.CM_ABORT, 1, 0xFF, 0xFF, 0xFF), 0xEF00), now=0.0) is session
+    assert session.state == Transport.SESSION_ABORTED and session.abort_reason == 1
+    assert (tx.timed_out, tx.aborted, tx.completed) == (1, 1, 0)
@@ -0,0 +1,216 @@
+import threading
+import time
+from ctypes import create_string_buffer
+import pytest
+import RP1210
+from RP1210 import J1939, VirtualDriver
+from RP1210.VirtualDriver import VirtualBus, VirtualDLL
+from utilities import dummy_client
+
+def connect(bus, protocol = b"J1939:Baud=Auto", **kwargs):
+    api = RP1210.RP1210API("VIRTUAL")
+    api.setDLL(VirtualDLL(bus, **kwargs))
+    client_id = api.ClientConnect(1, protocol)
+    assert client_id < 128
+    return api, client_id
+
+def read_all(api, client_id):
+    msgs = []
+    while True:
+        msg = api.ReadDirect(client_id)
+        if not msg:
+            return msgs
+        msgs.append(msg)
+
+def test_can_id_conversion():
+    for pgn, pri, sa, da in ((0xF004, 3, 0x00, 0xFF), (0xEA00, 6, 0xF9, 0x00), (0x1EF00, 7, 0x17, 0x3D)):
+        can_id = VirtualDriver.j1939ToCANID(pgn, pri, sa, da)
+        assert VirtualDriver.canIDToJ1939(can_id) == (pgn, pri, sa, da)
+    assert VirtualDriver.j1939ToCANID(0xF004, 3, 0x00, 0x00) == 0x0CF00400
+
+def test_setDLL_valid():
+    api = RP1210.RP1210API("VIRTUAL")
+    api.setDLL(VirtualDLL())
+    assert api.isValid()
+    assert api.ReadVersionDirect() == ("1.0", "3.0")
+    assert api.GetErrorMsg(139) == RP1210.RP1210_ERRORS[139]
+
+def test_filters_default_to_discard():
+    bus = VirtualBus()
+    api, client_id = connect(bus)
+    bus.injectJ1939(0xF004, 0x00, b'\x01' * 8)
+    assert read_all(api, client_id) == []
+    api.SendCommand(3, client_id)
+    bus.injectJ1939(0xF004, 0x00, b'\x01' * 8)
+    assert len(read_all(api, client_id)) == 1
+
+def test_multiple_clients_and_echo():
+    bus = VirtualBus()
+    tx_api, tx_id = connect(bus)
+    rx_api, rx_id = connect(bus)
+    tx_api.SendCommand(3, tx_id)
+    rx_api.SendCommand(3, rx_id)
+    assert bus.numClients() == 2
+    sent = J1939.toJ1939Message(0xFEF1, 6, 0x00, 0xFF, b'\x11' * 8)
+    assert tx_api.SendMessage(tx_id, sent) == 0
+    # sender doesn't see its own message without echo
+    assert read_all(tx_api, tx_id) == []
+    received = read_all(rx_api, rx_id)
+    assert len(received) == 1
+    msg = J1939.J1939Message(received[0])
+    assert (msg.pgn, msg.sa, msg.pri, msg.data) == (0xFEF1, 0x00, 6, b'\x11' * 8)
+    # echo on: both clients get an echo byte; only the sender's copy is flagged
+    tx_api.SendCommand(16, tx_id, b'\x01', 1)
+    tx_api.SendMessage(tx_id, sent)
+    echoed = read_all(tx_api, tx_id)
+    assert len(echoed) == 1
+    assert J1939.J1939Message(echoed[0], echo=True).isEcho()
+    assert len(read_all(rx_api, rx_id)) == 1
+
+def test_same_dll_multiple_clients():
+    bus = VirtualBus()
+    api = RP1210.RP1210API("VIRTUAL")
+    api.setDLL(VirtualDLL(bus, max_clients=2))
+    first = api.ClientConnect(1)
+    second = api.ClientConnect(1)
+    assert (first, second) == (0, 1)
+    assert api.ClientConnect(1) == VirtualDriver.ERR_CLIENT_AREA_FULL
+    api.SendCommand(3, second)
+    api.SendMessage(first, J1939.toJ1939Message(0xF004, 3, 0x00, 0xFF, b'\x00' * 8))
+    assert len(read_all(api, second)) == 1
+    assert api.ClientDisconnect(first) == 0
+    assert api.ClientDisconnect(first) == VirtualDriver.ERR_INVALID_CLIENT_ID
+    assert bus.numClients() == 1
+
+def test_j1939_filters():
+    bus = VirtualBus()
+    api, client_id = connect(bus)
+    api.SendCommand(4, client_id, RP1210.Commands.setJ1939Filters(1, pgn=0xF004), 7)
+    api.SendCommand(4, client_id, RP1210.Commands.setJ1939Filters(4 + 8, source=0x3D, dest=0xF9), 7)
+    bus.injectJ1939(0xF004, 0x00, b'\x01' * 8)
+    bus.injectJ1939(0xF003, 0x00, b'\x02' * 8)
+    bus.injectJ1939(0xEA00, 0x3D, b'\x03' * 3, da=0xF9)
+    bus.injectJ1939(0xEA00, 0x3D, b'\x04' * 3, da=0x00)
+    data = [J1939.J1939Message(msg).data for msg in read_all(api, client_id)]
+    assert data == [b'\x01' * 8, b'\x03' * 3]
+    # exclusive filter type inverts the match
+    api.SendCommand(25, client_id, b'\x01', 1)
+    bus.injectJ1939(0xF004, 0x00, b'\x01' * 8)
+    bus.injectJ1939(0xF003, 0x00, b'\x02' * 8)
+    data = [J1939.J1939Message(msg).data for msg in read_all(api, client_id)]
+    assert data == [b'\x02' * 8]
+    # discard clears the filter list
+    api.SendCommand(17, client_id)
+    bus.injectJ1939(0xF003, 0x00, b'\x02' * 8)
+    assert read_all(api, client_id) == []
+
+def test_can_client():
+    bus = VirtualBus()
+    can_api, can_id = connect(bus, b"CAN:Baud=250")
+    j1939_api, j1939_id = connect(bus)
+    j1939_api.SendCommand(3, j1939_id)
+    can_api.SendCommand(5, can_id, RP1210.Commands.setCANFilters(1, 0x00FFFF00, 0x00F00400), 9)
+    bus.injectJ1939(0xF004, 0x00, b'\x01' * 8, pri=3)
+    bus.injectJ1939(0xF003, 0x00, b'\x02' * 8)
+    bus.inject(0x123, b'\x05', extended=False)
+    received = read_all(can_api, can_id)
+    assert len(received) == 1
+    assert received[0][4:] == b'\x01' + (0x0CF00400).to_bytes(4, 'big') + b'\x01' * 8
+    # standard frame sent by the CAN client isn't visible to J1939 clients; extended frames are
+    read_all(j1939_api, j1939_id)
+    assert can_api.SendMessage(can_id, b'\x00\x01\x23\x07') == 0
+    assert can_api.SendMessage(can_id, b'\x01\x18\xFE\xF1\x00' + b'\xAA' * 8) == 0
+    received = read_all(j1939_api, j1939_id)
+    assert len(received) == 1
+    msg = J1939.J1939Message(received[0])
+    assert (msg.pgn, msg.sa, msg.data) == (0xFEF1, 0x00, b'\xAA' * 8)
+
+def test_long_j1939_message():
+    bus = VirtualBus()
+    tx_api, tx_id = connect(bus)
+    rx_api, rx_id = connect(bus)
+    can_api, can_id = connect(bus, b"CAN")
+    rx_api.SendCommand(3, rx_id)
+    can_api.SendCommand(3, can_id)
+    data = bytes(range(100))
+    tx_api.SendMessage(tx_id, J1939.toJ1939Message(0xFECA, 6, 0x00, 0xFF, data))
+    assert J1939.J1939Message(rx_api.ReadDirect(rx_id)).data == data
+    assert read_all(can_api, can_id) == []
+
+def test_rx_queue_limit():
+    bus = VirtualBus()
+    api, client_id = connect(bus, rx_queue_size=10 * 18)
+    api.SendCommand(3, client_id)
+    for i in range(15):
+        bus.injectJ1939(0xF004, 0x00, i.to_bytes(8, 'big'))
+    client = api.getDLL().getClient(client_id)
+    assert client.rx_dropped == 5
+    buffer = create_string_buffer(256)
+    assert api.ReadMessage(client_id, buffer) == -VirtualDriver.ERR_RX_QUEUE_FULL
+    msgs = read_all(api, client_id)
+    assert [J1939.J1939Message(msg).data[-1] for msg in msgs] == list(range(10))
+    # flush empties the queue
+    bus.injectJ1939(0xF004, 0x00, b'\x00' * 8)
+    api.SendCommand(39, client_id)
+    assert read_all(api, client_id) == []
+
+def test_blocking_read_and_disconnect():
+    bus = VirtualBus()
+    api, client_id = connect(bus)
+    api.SendCommand(3, client_id)
+    threading.Timer(0.05, bus.injectJ1939, (0xF004, 0x00, b'\x01' * 8)).start()
+    assert J1939.J1939Message(api.ReadDirect(client_id, BlockOnRead=1)).data == b'\x01' * 8
+    # Set_BlockTimeout: 2 * 10 ms
+    api.SendCommand(215, client_id, b'\x02\x0A', 2)
+    start = time.perf_counter()
+    assert api.ReadDirect(client_id, BlockOnRead=1) == b''
+    assert time.perf_counter() - start >= 0.015
+    api.SendCommand(215, client_id, b'\x00\x00', 2)
+    threading.Timer(0.05, api.ClientDisconnect, (client_id,)).start()
+    buffer = create_string_buffer(256)
+    assert api.ReadMessage(client_id, buffer, 256, 1) == -VirtualDriver.ERR_CLIENT_DISCONNECTED
+
+def test_commands():
+    bus = VirtualBus(baud=500000)
+    api, client_id = connect(bus)
+    buffer = create_string_buffer(17)
+    assert api.SendCommand(45, client_id, buffer, 17) == 0
+    assert buffer.value == b"500000"
+    assert api.SendCommand(19, client_id, b'\x00' * 10, 10) == 0
+    assert api.SendCommand(999, client_id) == VirtualDriver.ERR_INVALID_COMMAND
+    assert api.SendCommand(3, 50) == VirtualDriver.ERR_INVALID_CLIENT_ID
+
+def test_invalid_protocol():
+    api = RP1210.RP1210API("VIRTUAL")
+    api.setDLL(VirtualDLL())
+    assert api.ClientConnect(1, b"J1708") == VirtualDriver.ERR_INVALID_PROTOCOL
+
+def test_synthetic_load():
+    bus = VirtualBus(baud=250000)
+    assert bus.frameRate(0.5) == pytest.approx(976.5625)
+    api, client_id = connect(bus, rx_queue_size=1 << 20)
+    api.SendCommand(3, client_id)
+    bus.start_load(rate=2000)
+    time.sleep(0.1)
+    bus.stop_load()
+    msgs = read_all(api, client_id)
+    assert len(msgs) == bus.load_frames > 50
+    assert J1939.J1939Message(msgs[0]).pgn == VirtualDriver.DEFAULT_LOAD_PGNS[0][0]
+
+def test_client_reader():
+    bus = VirtualBus()
+    client = dummy_client(VirtualDLL(bus))
+    client.setAllFiltersToPass()
+    assert client.getBaud().startswith("b'250000")
+    ring = client.start_reader(blocking=True)
+    for i in range(100):
+        bus.injectJ1939(0xF004, 0x00, i.to_bytes(8, 'big'))
+    msgs = []
+    deadline = time.perf_counter() + 2
+    while len(msgs) < 100 and time.perf_counter() < deadline:
+        msgs += client.rx_batch(timeout=0.1)
+    client.disconnect()
+    assert not client.reader_running()
+    # the blocked read is woken up by the disconnect
+    assert ring.last_error in (0, VirtualDriver.ERR_CLIENT_DISCONNECTED)
+    assert [J1939.J1939Message(msg).data[-1] for msg in msgs] == list(range(100))
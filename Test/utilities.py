@@ -1,4 +1,8 @@
 import configparser
+import os
+from ctypes import memmove
+import RP1210
+from RP1210.J1939 import toJ1939Message
 
 class RP1210ConfigTestUtility():
 
@@ -67,3 +71,61 @@ class RP1210ConfigTestUtility():
     def verifyprotocoldata(self, func, protocol_id, field, fallback=None):
         section = "ProtocolInformation" + str(protocol_id)
         return self.verifydata(func, section, field, fallback)
+
+class DummyDLL():
+    """
+    Stand-in for an RP1210 CDLL. Plays back queued messages from RP1210_ReadMessage and records
+    everything passed to RP1210_SendMessage.
+    """
+    def __init__(self, rx_msgs = None, tx_results = None):
+        self.rx_msgs = list(rx_msgs or [])
+        self.tx_msgs = []
+        self.tx_results = list(tx_results or [])
+        self.read_calls = []
+
+        def read_message(client_id, buffer, size, block):
+            self.read_calls.append(block)
+            if not self.rx_msgs:
+                return 0
+            msg = self.rx_msgs.pop(0)
+            if isinstance(msg, int): # error code
+                return msg
+            memmove(buffer, msg, len(msg))
+            return len(msg)
+
+        def send_message(client_id, msg, size, notify, block):
+            self.tx_msgs.append(bytes(msg[:size]))
+            if self.tx_results:
+                return self.tx_results.pop(0)
+            return 0
+
+        def noop(*args):
+            return 0
+
+        self.RP1210_ReadMessage = read_message
+        self.RP1210_SendMessage = send_message
+        self.RP1210_ClientConnect = noop
+        self.RP1210_ClientDisconnect = noop
+        self.RP1210_ReadVersion = noop
+        self.RP1210_GetErrorMsg = noop
+        self.RP1210_GetHardwareStatus = noop
+        self.RP1210_SendCommand = noop
+
+def dummy_client(dll) -> RP1210.RP1210Client:
+    """Returns an RP1210Client connected to a DummyDLL."""
+    test_files = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test-files")
+    ini_path = os.path.join(test_files, "ini-files", "DGDPA5MA.ini")
+    client = RP1210.RP1210Client(os.path.join(test_files, "RP121032.ini"), config_dir=ini_path)
+    client.setVendor(RP1210.RP1210Config("DGDPA5MA", config_path=ini_path))
+    client.getAPI().setDLL(dll)
+    client.connect()
+    return client
+
+def frame(pgn : int, sa : int = 0x00, da : int = 0xFF, data : bytes = b'\x00' * 8, pri : int = 6,
+            timestamp : int = 0, echo = False) -> bytes:
+    """
+    Returns a raw J1939 frame, as RP1210_ReadMessage gives it: the 4-byte timestamp (adapter ticks,
+    wrapping at 32 bits), the echo byte if `echo`, then the message from `toJ1939Message()`.
+    """
+    return ((int(timestamp) & 0xFFFFFFFF).to_bytes(4, 'big') + (b'\x00' if echo else b'')
+            + toJ1939Message(pgn, pri, sa, da, data))
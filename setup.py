@@ -14,6 +14,7 @@ setup(
   url = 'https://github.com/dfieschko/RP1210',
   keywords = ['RP1210', 'RP1210C', 'J1939', 'CAN', 'UDS'],
   install_requires=[],
+  extras_require={'numpy': ['numpy']},
   classifiers=[
     'Development Status :: 3 - Alpha',      # "3 - Alpha", "4 - Beta" or "5 - Production/Stable"
     'Intended Audience :: Developers',